@@ -36,12 +36,18 @@ import shutil
 import time
 import socket
 import binascii
+import collections
 import platform
 import locale
 import ast
 
 import shlex
 
+try:
+    from re import _parser as sre_parse  # type: ignore[attr-defined] # Python 3.11+
+except ImportError:
+    import sre_parse  # pylint: disable=deprecated-module
+
 # For Python 3 sys.stdout creates \r\n as newline for Windows.
 # Checkmk can't handle this therefore we rewrite sys.stdout to a new_stdout function.
 # If you want to use the old behaviour just use old_stdout.
@@ -78,6 +84,10 @@ TTY_COLORS = {
 
 CONFIG_ERROR_PREFIX = "CANNOT READ CONFIG FILE: "  # detected by check plugin
 
+# Lines are truncated while reading when they exceed this size or, if configured, the
+# size needed for maxlinesize characters
+MAX_LINE_BYTES = 1024 * 1024
+
 PY2 = sys.version_info[0] == 2
 PY3 = sys.version_info[0] == 3
 
@@ -382,16 +392,29 @@ class State(object):  # pylint: disable=useless-object-inheritance
 
 
 class LogLinesIter(object):  # pylint: disable=useless-object-inheritance
+    """Read the lines of a log file in chunks of BLOCKSIZE bytes
+
+    Only complete lines are returned, an incomplete line at the end of the file is
+    left for the next run. Lines are decoded one by one and the number of bytes of
+    each line is kept, so the position always points right behind the last line
+    returned. Lines longer than max_line_bytes are truncated while reading, which
+    keeps the memory needed independent of the size of the file.
+    """
     # this is supposed to become a proper iterator.
     # for now, we need a persistent buffer to fix things
-    BLOCKSIZE = 8192
+    BLOCKSIZE = 65536
 
-    def __init__(self, logfile, encoding):
+    def __init__(self, logfile, encoding, max_line_bytes=None):
         super(LogLinesIter, self).__init__()
         self._fd = os.open(logfile, os.O_RDONLY)
-        self._lines = []  # List[Text]
-        self._buffer = b''
+        self._lines = collections.deque()  # Deque[Tuple[Text, int]]: line and its size in bytes
+        self._buffer = b''  # the beginning of an incomplete line
+        self._long_line = None  # truncated text and size of a line exceeding max_line_bytes
+        self._position = 0
+        self._last_line = None
+        self._last_size = 0
         self._reached_end = False  # used for optimization only
+        self._max_line_bytes = max_line_bytes or MAX_LINE_BYTES
         self._enc = encoding or self._get_encoding()
         self._nl = u'\n'
         # for Windows we need a bit special processing. It is difficult to fit this processing
@@ -424,6 +447,7 @@ class LogLinesIter(object):  # pylint: disable=useless-object-inheritance
         for bom, encoding in ENCODINGS:
             if self._buffer.startswith(bom):
                 self._buffer = self._buffer[len(bom):]
+                self._position = len(bom)
                 LOGGER.debug("Detected %r encoding by BOM", encoding)
                 return encoding
 
@@ -432,44 +456,85 @@ class LogLinesIter(object):  # pylint: disable=useless-object-inheritance
         LOGGER.debug("Locale Preferred encoding is %s, using %s", pref_encoding, encoding)
         return encoding
 
+    def _binary_nl(self):
+        # Encoding two newlines gets rid of a byte order mark, e.g. in case of "utf_16"
+        one, two = self._nl.encode(self._enc), (self._nl * 2).encode(self._enc)
+        return two[len(one):]
+
     def _update_lines(self):
         """
-        Try to read more lines from file.
+        Read chunks from the file until a line is complete or the end is reached.
         """
-        binary_nl = self._nl.encode(self._enc)
-        while binary_nl not in self._buffer:
+        binary_nl = self._binary_nl()
+        # In multi byte encodings like UTF-16 the newline has to start at a character boundary
+        unit = len(binary_nl)
+        while not self._lines:
             new_bytes = os.read(self._fd, LogLinesIter.BLOCKSIZE)
             if not new_bytes:
                 break
-            self._buffer += new_bytes
 
+            buff = self._buffer + new_bytes
+            start = 0
+            end = buff.find(binary_nl)
+            while end >= 0:
+                if (end - start) % unit:
+                    end = buff.find(binary_nl, end + 1)
+                    continue
+                end += unit
+                self._add_line(buff[start:end])
+                start = end
+                end = buff.find(binary_nl, start)
+            self._buffer = buff[start:]
+
+            if len(self._buffer) > self._max_line_bytes:
+                self._truncate_line(unit)
+
+    def _add_line(self, raw_line):
+        if self._long_line is not None:
+            line, size = self._long_line
+            self._long_line = None
+            self._lines.append((line, size + len(raw_line)))
+            return
         # in case of decoding error, replace with U+FFFD REPLACEMENT CHARACTER
-        raw_lines = self._buffer.decode(self._enc, "replace").split(self._nl)
-        self._buffer = raw_lines.pop().encode(self._enc)  # unfinished line
-        self._lines.extend(l + self._nl for l in raw_lines)
+        self._lines.append((raw_line.decode(self._enc, "replace"), len(raw_line)))
+
+    def _truncate_line(self, unit):
+        """Keep the beginning of a too long line and drop the rest until its end"""
+        if self._long_line is None:
+            head = self._buffer[:self._max_line_bytes - self._max_line_bytes % unit]
+            self._long_line = (head.decode(self._enc, "replace") + u"[TRUNCATED]\n", 0)
+        line, size = self._long_line
+        dropped = len(self._buffer) - len(self._buffer) % unit
+        self._long_line = (line, size + dropped)
+        self._buffer = self._buffer[dropped:]
 
     def set_position(self, position):
         if position is None:
             return
         self._buffer = b''
-        self._lines = []
-        os.lseek(self._fd, position, os.SEEK_SET)
+        self._long_line = None
+        self._lines.clear()
+        self._position = os.lseek(self._fd, position, os.SEEK_SET)
 
     def get_position(self):
         """
         Return the position where we want to continue next time
         """
-        pointer_pos = os.lseek(self._fd, 0, os.SEEK_CUR)
-        bytes_unused = sum((len(l.encode(self._enc)) for l in self._lines), len(self._buffer))
-        return pointer_pos - bytes_unused
+        return self._position
 
     def skip_remaining(self):
-        os.lseek(self._fd, 0, os.SEEK_END)
+        self._position = os.lseek(self._fd, 0, os.SEEK_END)
         self._buffer = b''
-        self._lines = []
+        self._long_line = None
+        self._lines.clear()
 
     def push_back_line(self, line):
-        self._lines.insert(0, line)
+        if line is self._last_line:
+            size = self._last_size
+        else:
+            size = len(line.encode(self._enc))
+        self._lines.appendleft((line, size))
+        self._position -= size
 
     def next_line(self):
         if self._reached_end:  # optimization only
@@ -479,7 +544,9 @@ class LogLinesIter(object):  # pylint: disable=useless-object-inheritance
             self._update_lines()
 
         if self._lines:
-            return self._lines.pop(0)
+            self._last_line, self._last_size = self._lines.popleft()
+            self._position += self._last_size
+            return self._last_line
 
         self._reached_end = True
         return None
@@ -506,9 +573,14 @@ def process_logfile(section, filestate, debug):
     In case the file has never been seen before returns a list of logfile lines
     and None in case the logfile cannot be opened.
     """
+    max_line_bytes = MAX_LINE_BYTES
+    if section.options.maxlinesize is not None:
+        # A character takes up to four bytes, the newline included
+        max_line_bytes = min(max_line_bytes, 4 * (section.options.maxlinesize + 1))
+
     # TODO: Make use of the ContextManager feature of LogLinesIter
     try:
-        log_iter = LogLinesIter(section.name_fs, section.options.encoding)
+        log_iter = LogLinesIter(section.name_fs, section.options.encoding, max_line_bytes)
     except OSError:
         if debug:
             raise
@@ -521,16 +593,16 @@ def process_logfile(section, filestate, debug):
         inode = stat.st_ino if is_inode_capable(section.name_fs) else 1
         # If we have never seen this file before, we set the inode to -1
         prev_inode = filestate.get('inode', -1)
-        filestate['inode'] = inode
 
         # Look at which file offset we have finished scanning the logfile last time.
         offset = filestate.get('offset')
-        # Set the current pointer to the file end
-        filestate['offset'] = stat.st_size
 
         # If we have never seen this file before, we do not want
         # to make a fuss about ancient log messages... (unless configured to)
         if offset is None and not (section.options.fromstart or debug):
+            # Set the current pointer to the file end
+            filestate['inode'] = inode
+            filestate['offset'] = stat.st_size
             return header, []
 
         # If the inode of the logfile has changed it has appearently
@@ -543,6 +615,7 @@ def process_logfile(section, filestate, debug):
         # Our previously stored offset is the current end ->
         # no new lines in this file
         if offset == stat.st_size:
+            filestate['inode'] = inode
             return header, []
 
         # If our offset is beyond the current end, the logfile has been
@@ -555,10 +628,22 @@ def process_logfile(section, filestate, debug):
         # now seek to offset where interesting data begins
         log_iter.set_position(offset)
 
+        matcher = PatternMatcher(
+            [pattern for _lev, pattern, _cont, _repl in section.compiled_patterns])
+        continuation_matchers = [
+            [
+                cont_pattern if isinstance(cont_pattern, int) else PatternMatcher([cont_pattern])
+                for cont_pattern in cont_patterns
+            ]
+            for _lev, _pattern, cont_patterns, _repl in section.compiled_patterns
+        ]
+
         worst = -1
         warnings_and_errors = []
+        output_size = 0
         lines_parsed = 0
         start_time = time.time()
+        start_position = log_iter.get_position()
 
         while True:
             line = log_iter.next_line()
@@ -581,9 +666,21 @@ def process_logfile(section, filestate, debug):
                 log_iter.skip_remaining()
                 break
 
-            # Check if maximum processing time (per file) is exceeded. Check only
-            # every 100'th line in order to save system calls
-            if section.options.maxtime is not None and lines_parsed % 100 == 10 \
+            # Check if maximum number of new bytes (per file) is exceeded
+            if section.options.maxbytes is not None \
+                    and log_iter.get_position() - start_position > section.options.maxbytes:
+                warnings_and_errors.append(
+                    u"%s Maximum number (%d) of new bytes in log file exceeded.\n" % (
+                        section.options.overflow,
+                        section.options.maxbytes,
+                    ))
+                worst = max(worst, section.options.overflow_level)
+                log_iter.skip_remaining()
+                break
+
+            # Check if maximum processing time (per file) is exceeded. The lines are
+            # limited in size, so checking each line keeps the limit close.
+            if section.options.maxtime is not None \
                     and time.time() - start_time > section.options.maxtime:
                 warnings_and_errors.append(
                     u"%s Maximum parsing time (%.1f sec) of this log file exceeded.\n" % (
@@ -595,44 +692,42 @@ def process_logfile(section, filestate, debug):
                 break
 
             level = "."
-            for lev, pattern, cont_patterns, replacements in section.compiled_patterns:
-
-                matches = pattern.search(line[:-1])
-                if matches:
-                    level = lev
-                    levelint = {'C': 2, 'W': 1, 'O': 0, 'I': -1, '.': -1}[lev]
-                    worst = max(levelint, worst)
-
-                    # TODO: the following for block should be a method of the iterator
-                    # Check for continuation lines
-                    for cont_pattern in cont_patterns:
-                        if isinstance(cont_pattern, int):  # add that many lines
-                            for _unused_x in range(cont_pattern):
-                                cont_line = log_iter.next_line()
-                                if cont_line is None:  # end of file
-                                    break
+            index, groups = matcher.match(line[:-1])
+            if index is not None:
+                lev, _pattern, _cont_patterns, replacements = section.compiled_patterns[index]
+                level = lev
+                levelint = {'C': 2, 'W': 1, 'O': 0, 'I': -1, '.': -1}[lev]
+                worst = max(levelint, worst)
+
+                # TODO: the following for block should be a method of the iterator
+                # Check for continuation lines
+                for cont_pattern in continuation_matchers[index]:
+                    if isinstance(cont_pattern, int):  # add that many lines
+                        for _unused_x in range(cont_pattern):
+                            cont_line = log_iter.next_line()
+                            if cont_line is None:  # end of file
+                                break
+                            line = line[:-1] + "\1" + cont_line
+
+                    else:  # pattern is regex
+                        while True:
+                            cont_line = log_iter.next_line()
+                            if cont_line is None:  # end of file
+                                break
+                            # Do not let the continuation lines grow the line without limit
+                            if len(line) < max_line_bytes and \
+                                    cont_pattern.match(cont_line[:-1])[0] is not None:
                                 line = line[:-1] + "\1" + cont_line
+                            else:
+                                log_iter.push_back_line(cont_line)  # sorry for stealing this line
+                                break
 
-                        else:  # pattern is regex
-                            while True:
-                                cont_line = log_iter.next_line()
-                                if cont_line is None:  # end of file
-                                    break
-                                if cont_pattern.search(cont_line[:-1]):
-                                    line = line[:-1] + "\1" + cont_line
-                                else:
-                                    log_iter.push_back_line(
-                                        cont_line)  # sorry for stealing this line
-                                    break
-
-                    # Replacement
-                    for replace in replacements:
-                        line = replace.replace('\\0', line.rstrip()) + "\n"
-                        for num, group in enumerate(matches.groups()):
-                            if group is not None:
-                                line = line.replace('\\%d' % (num + 1), group)
-
-                    break  # matching rule found and executed
+                # Replacement
+                for replace in replacements:
+                    line = replace.replace('\\0', line.rstrip()) + "\n"
+                    for num, group in enumerate(groups):
+                        if group is not None:
+                            line = line.replace('\\%d' % (num + 1), group)
 
             if level == "I":
                 level = "."
@@ -643,12 +738,18 @@ def process_logfile(section, filestate, debug):
             if sys.stdout.isatty():
                 out_line = "%s%s%s" % (TTY_COLORS[level], out_line.replace(
                     "\1", "\nCONT:"), TTY_COLORS['normal'])
-            warnings_and_errors.append("%s\n" % out_line)
+            # Without maxcontextlines, write_output() stops at maxoutputsize anyway. There
+            # is no need to keep the lines beyond.
+            if output_size <= section.options.maxoutputsize or section.options.maxcontextlines:
+                out_line = "%s\n" % out_line
+                output_size += len(out_line.encode('utf-8'))
+                warnings_and_errors.append(out_line)
 
         new_offset = log_iter.get_position()
     finally:
         log_iter.close()
 
+    filestate['inode'] = inode
     filestate['offset'] = new_offset
 
     # Handle option maxfilesize, regardless of warning or errors that have happened
@@ -674,6 +775,7 @@ class Options(object):  # pylint: disable=useless-object-inheritance
         'encoding': None,
         'maxfilesize': None,
         'maxlines': None,
+        'maxbytes': None,
         'maxtime': None,
         'maxlinesize': None,
         'regex': None,
@@ -699,6 +801,10 @@ class Options(object):  # pylint: disable=useless-object-inheritance
     def maxlines(self):
         return self._attr_or_default('maxlines')
 
+    @property
+    def maxbytes(self):
+        return self._attr_or_default('maxbytes')
+
     @property
     def maxtime(self):
         return self._attr_or_default('maxtime')
@@ -749,7 +855,7 @@ class Options(object):  # pylint: disable=useless-object-inheritance
             if key == 'encoding':
                 ''.encode(value)  # make sure it's an encoding
                 self.values[key] = value
-            elif key in ('maxlines', 'maxlinesize', 'maxfilesize', 'maxoutputsize'):
+            elif key in ('maxlines', 'maxbytes', 'maxlinesize', 'maxfilesize', 'maxoutputsize'):
                 self.values[key] = int(value)
             elif key in ('maxtime',):
                 self.values[key] = float(value)
@@ -866,6 +972,69 @@ def _compile_continuation_pattern(raw_pattern):
         return re.compile(_search_optimize_raw_pattern(raw_pattern), re.UNICODE)
 
 
+def _required_literal(pattern):
+    """Return a text every match of the compiled pattern contains, or None
+
+    The second item tells whether the pattern matches exactly this text. Only
+    literal characters on the top level of the pattern are considered, anything
+    we do not understand results in no literal at all.
+    """
+    if not isinstance(pattern.pattern, text_type) or pattern.flags & re.IGNORECASE:
+        return None, False
+
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:  # pylint: disable=broad-except
+        return None, False
+
+    runs = [[]]
+    for op, av in parsed:
+        if op == sre_parse.LITERAL:
+            runs[-1].append(av)
+        else:
+            runs.append([])
+
+    longest = max(runs, key=len)
+    if not longest:
+        return None, False
+    chr_ = unichr if PY2 else chr  # pylint: disable=undefined-variable
+    return u"".join(chr_(c) for c in longest), len(runs) == 1
+
+
+class PatternMatcher(object):  # pylint: disable=useless-object-inheritance
+    """Finds the first of a list of compiled patterns matching a text
+
+    Python's regex engine tries all alternatives of a pattern at each position of
+    the text, a combined pattern of many patterns is slower than searching them one
+    by one. Most logwatch patterns contain a literal text, though. Looking for it
+    with the substring search is much cheaper than a regex search and rules out the
+    pattern for most lines. Patterns consisting of a literal text only do not need
+    the regex search at all.
+    """
+    def __init__(self, patterns):
+        super(PatternMatcher, self).__init__()
+        self._patterns = []
+        for pattern in patterns:
+            literal, is_literal = _required_literal(pattern)
+            self._patterns.append((literal, is_literal and not pattern.groups, pattern.search))
+
+    def match(self, text):
+        """Return the index and the groups of the first matching pattern
+
+        (None, None) is returned in case no pattern matches.
+        """
+        for index, (literal, literal_only, search) in enumerate(self._patterns):
+            if literal is not None:
+                if literal not in text:
+                    continue
+                if literal_only:
+                    return index, ()
+            match = search(text)
+            if match is not None:
+                return index, match.groups()
+        return None, None
+
+
 class LogfileSection(object):  # pylint: disable=useless-object-inheritance
     def __init__(self, logfile_ref):
         super(LogfileSection, self).__init__()
@@ -10,6 +10,7 @@ In the future all inventory code should be moved to this module."""
 
 import os
 from contextlib import suppress
+from pathlib import Path
 from typing import (
     Container,
     Dict,
@@ -31,6 +32,8 @@ import cmk.utils.paths
 import cmk.utils.store as store
 import cmk.utils.tty as tty
 from cmk.utils.exceptions import MKGeneralException
+from cmk.utils.inventory_archive import InventoryArchive
+from cmk.utils.inventory_index import InventoryIndex, inventory_index_path
 from cmk.utils.log import console
 from cmk.utils.structured_data import StructuredDataTree
 from cmk.utils.type_defs import (
@@ -490,10 +493,14 @@ def _save_inventory_tree(
     store.makedirs(cmk.utils.paths.inventory_output_dir)
 
     filepath = cmk.utils.paths.inventory_output_dir + "/" + hostname
+    archive = InventoryArchive(Path(cmk.utils.paths.inventory_archive_dir, hostname))
     if inventory_tree.is_empty():
         # Remove empty inventory files. Important for host inventory icon
         if os.path.exists(filepath):
+            # The newest archived tree may be stored as delta to the removed tree
+            archive.store_newest_tree(store.load_object_from_file(filepath, default={}))
             os.remove(filepath)
+            _update_inventory_index(hostname, None)
         if os.path.exists(filepath + ".gz"):
             os.remove(filepath + ".gz")
         return None
@@ -506,16 +513,38 @@ def _save_inventory_tree(
 
     if old_tree.is_empty():
         console.verbose("New inventory tree\n")
-    else:
-        console.verbose("Inventory tree has changed\n")
-        old_time = os.stat(filepath).st_mtime
-        arcdir = "%s/%s" % (cmk.utils.paths.inventory_archive_dir, hostname)
-        store.makedirs(arcdir)
-        os.rename(filepath, arcdir + ("/%d" % old_time))
+        inventory_tree.save_to(cmk.utils.paths.inventory_output_dir, hostname)
+        _update_inventory_index(hostname, inventory_tree)
+        return old_tree
+
+    console.verbose("Inventory tree has changed\n")
+    old_time = os.stat(filepath).st_mtime
+    old_raw_tree = store.load_object_from_file(filepath)
     inventory_tree.save_to(cmk.utils.paths.inventory_output_dir, hostname)
+    # The previous tree is archived as delta to the new tree
+    archive.archive("%d" % old_time, old_raw_tree, inventory_tree.get_raw_tree())
+    _update_inventory_index(hostname, inventory_tree)
     return old_tree
 
 
+def _update_inventory_index(hostname: HostName,
+                            inventory_tree: Optional[StructuredDataTree]) -> None:
+    """Update the site wide index of the inventory tables used by the GUI
+
+    The GUI indexes missing or outdated trees on its own, so a failure is not fatal."""
+    try:
+        index = InventoryIndex(inventory_index_path())
+        if inventory_tree is None:
+            index.remove_host(hostname)
+            return
+        mtime = int(os.stat(cmk.utils.paths.inventory_output_dir + "/" + hostname).st_mtime)
+        index.update_host(hostname, inventory_tree.get_raw_tree(), mtime)
+    except Exception as e:
+        if cmk.utils.debug.enabled():
+            raise
+        console.verbose("Cannot update the inventory index: %s\n" % e)
+
+
 def _save_status_data_tree(hostname: HostName, status_data_tree: StructuredDataTree) -> None:
     if status_data_tree and not status_data_tree.is_empty():
         store.makedirs(cmk.utils.paths.status_data_dir)
@@ -4,7 +4,8 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
-from typing import List
+import importlib
+from typing import Iterable, List
 
 import cmk.utils.debug
 import cmk.utils.paths
@@ -50,6 +51,20 @@ def load_all_plugins() -> List[str]:
     return errors
 
 
+def load_selected_plugins(module_names: Iterable[str]) -> List[str]:
+    """Load only the given agent based plugin modules (see cmk.base.plugin_index)"""
+    errors = []
+    for module_name in module_names:
+        try:
+            importlib.import_module(module_name)
+        except Exception as exception:
+            plugin = module_name.rsplit(".", 1)[-1]
+            errors.append(f"Error in agent based plugin {plugin}: {exception}\n")
+            if cmk.utils.debug.enabled():
+                raise
+    return errors
+
+
 __all__ = [
     "add_check_plugin",
     "add_discovery_ruleset",
@@ -77,6 +92,7 @@ __all__ = [
     "iter_all_snmp_sections",
     "len_snmp_sections",
     "load_all_plugins",
+    "load_selected_plugins",
     "set_discovery_ruleset",
     "set_host_label_ruleset",
 ]
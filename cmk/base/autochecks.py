@@ -225,6 +225,28 @@ def _load_raw_autochecks(
             (str(exc).capitalize(), path.stem, path))
 
 
+def autocheck_plugin_names_of(hostname: HostName) -> Set[CheckPluginName]:
+    """Names of the plugins used by the autochecks of a host
+
+    In contrast to the AutochecksManager this does not need the plugins to be loaded"""
+    try:
+        raw_autochecks = _load_raw_autochecks(
+            path=_autochecks_path_for(hostname),
+            check_variables=None,
+        )
+    except Exception as e:
+        logger.exception("Error in autochecks of host %s: %s", hostname, e)
+        if cmk.utils.debug.enabled():
+            raise
+        return set()
+
+    return {
+        CheckPluginName(maincheckify(entry["check_plugin_name"]))
+        for entry in raw_autochecks
+        if isinstance(entry, dict) and "check_plugin_name" in entry
+    }
+
+
 def parse_autochecks_file(
     hostname: HostName,
     service_description: GetServiceDescription,
@@ -22,10 +22,12 @@ from six import ensure_binary
 import cmk.utils.debug
 import cmk.utils.log as log
 import cmk.utils.man_pages as man_pages
+import cmk.utils.store as store
 from cmk.utils.check_utils import maincheckify
 from cmk.utils.diagnostics import deserialize_cl_parameters, DiagnosticsCLParameters
 from cmk.utils.encoding import ensure_str_with_fallback
 from cmk.utils.exceptions import MKGeneralException, MKBailOut
+from cmk.utils.inventory_archive import InventoryArchive
 from cmk.utils.labels import DiscoveredHostLabelsStore
 from cmk.utils.macros import replace_macros_in_str
 from cmk.utils.paths import (
@@ -34,6 +36,7 @@ from cmk.utils.paths import (
     counters_dir,
     data_source_cache_dir,
     discovered_host_labels_dir,
+    inventory_archive_dir,
     local_checks_dir,
     logwatch_dir,
     nagios_startscript,
@@ -769,6 +772,12 @@ class AutomationDeleteHosts(Automation):
         #
         # These files are cleaned up by the disk space mechanism.
 
+        # The newest archived inventory tree may be stored as delta to the current tree
+        inventory_path = "%s/inventory/%s" % (var_dir, hostname)
+        if os.path.exists(inventory_path):
+            InventoryArchive(Path(inventory_archive_dir, hostname)).store_newest_tree(
+                store.load_object_from_file(inventory_path, default={}))
+
         # single files
         for path in [
                 "%s/%s" % (precompiled_hostchecks_dir, hostname),
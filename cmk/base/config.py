@@ -105,6 +105,7 @@ import cmk.base.autochecks as autochecks
 import cmk.base.check_utils
 import cmk.base.default_config as default_config
 import cmk.base.ip_lookup as ip_lookup
+import cmk.base.plugin_index as plugin_index
 from cmk.base.api.agent_based.checking_classes import CheckPlugin
 from cmk.base.api.agent_based.register.check_plugins_legacy import create_check_plugin_from_legacy
 from cmk.base.api.agent_based.register.section_plugins_legacy import (
@@ -1444,6 +1445,72 @@ def load_all_agent_based_plugins(get_check_api_context: GetCheckApiContext,) ->
     return errors
 
 
+def load_with_plugins_for_hosts(
+    get_check_api_context: GetCheckApiContext,
+    hostnames: List[HostName],
+) -> List[str]:
+    """Load the configuration and only the plugins needed for checking the given hosts
+
+    The plugin files are looked up in the plugin index, so only the files providing
+    the check plugins of the hosts and their sections are executed. The needed check
+    plugins are taken from the autochecks and the manual checks of the hosts (and
+    of the nodes in case of clusters).
+
+    In contrast to the usual order, the configuration is loaded before the plugins.
+    The configuration may refer to variables of checks which are not loaded, so
+    the defaults of these variables are taken from the index.
+
+    In case the index does not understand some of the plugin files, it can not tell
+    which plugins they provide. All plugins are loaded then."""
+    index = plugin_index.load_plugin_index()
+
+    unsupported_files = index.unsupported_files()
+    if unsupported_files:
+        console.vverbose("Loading all plugins, the plugin index does not support: %s\n" %
+                         ", ".join(unsupported_files))
+        errors = load_all_agent_based_plugins(get_check_api_context)
+        load()
+        return errors
+
+    _initialize_data_structures()
+    globals().update(copy.deepcopy(index.check_variable_defaults()))
+    load()
+
+    check_plugin_names, special_agent_names = _plugin_names_needed_by(hostnames)
+    selection = index.select(
+        check_plugin_names=check_plugin_names,
+        special_agent_names=special_agent_names,
+    )
+    errors = agent_based_register.load_selected_plugins(selection.agent_based_modules)
+    errors.extend(load_checks(get_check_api_context, selection.legacy_check_files))
+
+    # Now that the checks are loaded, apply the configured check variables and the
+    # discovery rulesets of the loaded plugins
+    global_dict = globals()
+    for varname, value in _check_variable_defaults.items():
+        global_dict.setdefault(varname, copy.copy(value))
+    _perform_post_config_loading_actions()
+
+    return errors
+
+
+def _plugin_names_needed_by(hostnames: List[HostName]) -> Tuple[Set[CheckPluginNameStr], Set[str]]:
+    """Check plugin names and special agent names, computed without any plugin loaded"""
+    config_cache = get_config_cache()
+    check_plugin_names: Set[CheckPluginNameStr] = set()
+    special_agent_names: Set[str] = set()
+    for hostname in hostnames:
+        host_config = config_cache.get_host_config(hostname)
+        for name in [hostname] + (host_config.nodes or []):
+            node_config = config_cache.get_host_config(name)
+            check_plugin_names.update(str(n) for n in autochecks.autocheck_plugin_names_of(name))
+            check_plugin_names.update(
+                checktype for _ruleset, checktype, _item, _params in node_config.static_checks)
+            special_agent_names.update(
+                agentname for agentname, _params in node_config.special_agents)
+    return check_plugin_names, special_agent_names
+
+
 def _initialize_data_structures() -> None:
     """Initialize some data structures which are populated while loading the checks"""
     global _all_checks_loaded
@@ -45,6 +45,7 @@ import cmk.base.core_config as core_config
 import cmk.base.plugin_contexts as plugin_contexts
 import cmk.base.sources as sources
 import cmk.base.ip_lookup as ip_lookup
+import cmk.base.nagios_checker as nagios_checker
 
 from cmk.base.check_utils import ServiceID
 from cmk.base.config import ConfigCache, HostConfig, ObjectAttributes
@@ -1000,6 +1001,53 @@ def _precompile_hostchecks(serial: ConfigSerial) -> None:
             sys.exit(5)
 
 
+def get_needed_ip_addresses(
+    config_cache: ConfigCache,
+    host_config: HostConfig,
+) -> Tuple[Dict[HostName, Optional[HostAddress]], Dict[HostName, Optional[HostAddress]]]:
+    """The IP addresses of the host and its nodes, which are needed for checking the host"""
+    hostname = host_config.hostname
+    needed_ipaddresses: Dict[HostName, Optional[HostAddress]] = {}
+    needed_ipv6addresses: Dict[HostName, Optional[HostAddress]] = {}
+    if host_config.is_cluster:
+        if host_config.nodes is None:
+            raise TypeError()
+
+        for node in host_config.nodes:
+            node_config = config_cache.get_host_config(node)
+            if node_config.is_ipv4_host:
+                needed_ipaddresses[node] = config.lookup_ip_address(node_config,
+                                                                    family=socket.AF_INET)
+
+            if node_config.is_ipv6_host:
+                needed_ipv6addresses[node] = config.lookup_ip_address(node_config,
+                                                                      family=socket.AF_INET6)
+
+        try:
+            if host_config.is_ipv4_host:
+                needed_ipaddresses[hostname] = config.lookup_ip_address(host_config,
+                                                                        family=socket.AF_INET)
+        except Exception:
+            pass
+
+        try:
+            if host_config.is_ipv6_host:
+                needed_ipv6addresses[hostname] = config.lookup_ip_address(host_config,
+                                                                          family=socket.AF_INET6)
+        except Exception:
+            pass
+    else:
+        if host_config.is_ipv4_host:
+            needed_ipaddresses[hostname] = config.lookup_ip_address(host_config,
+                                                                    family=socket.AF_INET)
+
+        if host_config.is_ipv6_host:
+            needed_ipv6addresses[hostname] = config.lookup_ip_address(host_config,
+                                                                      family=socket.AF_INET6)
+
+    return needed_ipaddresses, needed_ipv6addresses
+
+
 def _dump_precompiled_hostcheck(config_cache: ConfigCache,
                                 serial: ConfigSerial,
                                 hostname: HostName,
@@ -1050,6 +1098,10 @@ def _dump_precompiled_hostcheck(config_cache: ConfigCache,
         output.write("    sys.stdout.write(\"ERROR: Only executable with sites python\\n\")\n")
         output.write("    sys.exit(2)\n\n")
 
+    # Hand over the execution to the checker helper, which has everything loaded already
+    if config.nagios_checker_helper:
+        output.write(nagios_checker.launcher_source(hostname))
+
     # Self-compile: replace symlink with precompiled python-code, if
     # we are run for the first time
     if config.delay_precompile:
@@ -1123,43 +1175,7 @@ if '-d' in sys.argv:
     output.write("config.load_packed_config(serial=LATEST_SERIAL)\n")
 
     # IP addresses
-    needed_ipaddresses, needed_ipv6addresses, = {}, {}
-    if host_config.is_cluster:
-        if host_config.nodes is None:
-            raise TypeError()
-
-        for node in host_config.nodes:
-            node_config = config_cache.get_host_config(node)
-            if node_config.is_ipv4_host:
-                needed_ipaddresses[node] = config.lookup_ip_address(node_config,
-                                                                    family=socket.AF_INET)
-
-            if node_config.is_ipv6_host:
-                needed_ipv6addresses[node] = config.lookup_ip_address(node_config,
-                                                                      family=socket.AF_INET6)
-
-        try:
-            if host_config.is_ipv4_host:
-                needed_ipaddresses[hostname] = config.lookup_ip_address(host_config,
-                                                                        family=socket.AF_INET)
-        except Exception:
-            pass
-
-        try:
-            if host_config.is_ipv6_host:
-                needed_ipv6addresses[hostname] = config.lookup_ip_address(host_config,
-                                                                          family=socket.AF_INET6)
-        except Exception:
-            pass
-    else:
-        if host_config.is_ipv4_host:
-            needed_ipaddresses[hostname] = config.lookup_ip_address(host_config,
-                                                                    family=socket.AF_INET)
-
-        if host_config.is_ipv6_host:
-            needed_ipv6addresses[hostname] = config.lookup_ip_address(host_config,
-                                                                      family=socket.AF_INET6)
-
+    needed_ipaddresses, needed_ipv6addresses = get_needed_ip_addresses(config_cache, host_config)
     output.write("config.ipaddresses = %r\n\n" % needed_ipaddresses)
     output.write("config.ipv6addresses = %r\n\n" % needed_ipv6addresses)
 
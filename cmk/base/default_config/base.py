@@ -28,6 +28,7 @@ tcp_connect_timeout = 5.0
 tcp_connect_timeouts: _List = []
 use_dns_cache = True  # prevent DNS by using own cache file
 delay_precompile = False  # delay Python compilation to Nagios execution
+nagios_checker_helper = False  # forward precompiled host checks to the checker helper
 restart_locking = "abort"  # also possible: "wait", None
 check_submission = "file"  # alternative: "pipe"
 agent_min_version = 0  # warn, if plugin has not at least version
@@ -23,6 +23,13 @@ notification_rules: _List[_Dict[str, _Any]] = []
 # Check every 10 seconds for ripe bulks
 notification_bulk_interval = 10
 notification_plugin_timeout = 60
+# Parallel calls of the notification plugins which are not spooled. The limits and
+# timeouts are lists of pairs of the plugin name (None for plain email) and the value.
+notification_plugin_pool: _Dict[str, _Any] = {
+    "max_workers": 4,
+    "plugin_limits": [],
+    "plugin_timeouts": [],
+}
 
 # Notification Spooling.
 
@@ -14,7 +14,7 @@ import select
 import socket
 import time
 from urllib.parse import quote
-from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import livestatus
 import cmk.utils.version as cmk_version
@@ -417,27 +417,41 @@ def apply_matchers(matchers: Iterable[Matcher], rule: EventRule,
     return None
 
 
+def compile_matchers(matchers: Iterable[Tuple[Matcher, Tuple[str, ...]]],
+                     rule: EventRule) -> List[Matcher]:
+    """The matchers which evaluate a condition of the rule
+
+    The matchers are given together with the keys of a rule they evaluate. A matcher
+    always matches in case the rule has none of its keys, so it can be skipped."""
+    return [matcher for matcher, keys in matchers if any(key in rule for key in keys)]
+
+
+def event_rule_matchers() -> List[Tuple[Matcher, Tuple[str, ...]]]:
+    """The matchers of event_match_rule() and the keys of a rule they evaluate"""
+    return [
+        (event_match_site, ("match_site",)),
+        (event_match_folder, ("match_folder",)),
+        (event_match_hosttags, ("match_hosttags",)),
+        (event_match_hostgroups, ("match_hostgroups",)),
+        (event_match_servicegroups_fixed, ("match_servicegroups",)),
+        (event_match_exclude_servicegroups_fixed, ("match_exclude_servicegroups",)),
+        (event_match_servicegroups_regex, ("match_servicegroups_regex",)),
+        (event_match_exclude_servicegroups_regex, ("match_exclude_servicegroups_regex",)),
+        (event_match_contacts, ("match_contacts",)),
+        (event_match_contactgroups, ("match_contactgroups",)),
+        (event_match_hosts, ("match_hosts",)),
+        (event_match_exclude_hosts, ("match_exclude_hosts",)),
+        (event_match_services, ("match_services",)),
+        (event_match_exclude_services, ("match_exclude_services",)),
+        (event_match_plugin_output, ("match_plugin_output",)),
+        (event_match_checktype, ("match_checktype",)),
+        (event_match_timeperiod, ("match_timeperiod",)),
+        (event_match_servicelevel, ("match_sl",)),
+    ]
+
+
 def event_match_rule(rule: EventRule, context: EventContext) -> Optional[str]:
-    return apply_matchers([
-        event_match_site,
-        event_match_folder,
-        event_match_hosttags,
-        event_match_hostgroups,
-        event_match_servicegroups_fixed,
-        event_match_exclude_servicegroups_fixed,
-        event_match_servicegroups_regex,
-        event_match_exclude_servicegroups_regex,
-        event_match_contacts,
-        event_match_contactgroups,
-        event_match_hosts,
-        event_match_exclude_hosts,
-        event_match_services,
-        event_match_exclude_services,
-        event_match_plugin_output,
-        event_match_checktype,
-        event_match_timeperiod,
-        event_match_servicelevel,
-    ], rule, context)
+    return apply_matchers([matcher for matcher, _keys in event_rule_matchers()], rule, context)
 
 
 def event_match_site(rule: EventRule, context: EventContext) -> Optional[str]:
@@ -1116,6 +1116,32 @@ modes.register(
         ],
     ))
 
+
+def mode_nagios_checker_helper() -> None:
+    from cmk.base.nagios_checker import NagiosCheckerHelper  # pylint: disable=import-outside-toplevel
+    NagiosCheckerHelper().run()
+
+
+modes.register(
+    Mode(
+        long_option="nagios-checker-helper",
+        handler_function=mode_nagios_checker_helper,
+        needs_config=False,
+        short_help="Execute the checker helper for the Nagios core",
+        long_help=[
+            "Starts a long running process which executes the precompiled host "
+            "checks of the Nagios core. The helper keeps the plugins and the "
+            "activated configuration loaded and restarts itself once a new "
+            "configuration has been activated.",
+            "The precompiled host checks only use the helper when the option "
+            "nagios_checker_helper is enabled. They fall back to the regular "
+            "execution in case the helper is not running. As long as the option "
+            "is disabled, the helper only waits for the next configuration.",
+            "In OMD sites using the Nagios core, the helper is started and "
+            "stopped by the init script nagios-checker-helper.",
+        ],
+    ))
+
 #.
 #   .--update--------------------------------------------------------------.
 #   |                                   _       _                          |
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Long running checker helper for the Nagios core
+
+With the Nagios core every "Check_MK" service executes a precompiled host check
+in a new Python process. Most of the time of these processes is spent for the
+interpreter startup, the module imports and the loading of the plugins.
+
+The checker helper is started once, loads the plugins and the packed config and
+then waits for requests on a UNIX socket. The precompiled host checks contain a
+small launcher (see :func:`launcher_source`) which forwards the host name to the
+helper and outputs the result. In case the helper is not available, the host
+check falls back to the regular in process execution.
+
+Each request is processed in a forked child process, so the state of one check
+(counters, caches, exceptions, ...) can not affect the following checks. The
+helper restarts itself once a new configuration has been activated.
+
+In OMD sites using the Nagios core, the init script nagios-checker-helper starts
+the helper together with the core. As long as the option nagios_checker_helper is
+disabled, the helper does not load the plugins and only waits for the next
+configuration.
+
+Protocol:
+
+    request:  "<hostname>\\n"
+    response: "<exit code>\\n<check output>"
+"""
+
+import io
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+from pathlib import Path
+from types import FrameType
+from typing import Optional, Set, Tuple
+
+import cmk.utils.paths
+from cmk.utils.exceptions import MKTerminate, MKTimeout
+from cmk.utils.type_defs import HostName, LATEST_SERIAL
+
+import cmk.base.config as config
+
+logger = logging.getLogger("cmk.base.nagios_checker")
+
+# Maximum time a single host check may take. Nagios is killing the launcher after
+# its service_check_timeout, the helper needs to clean up on its own.
+DEFAULT_CHECK_TIMEOUT = 60
+
+_ConfigID = Tuple[str, float, float, float]
+
+
+def launcher_source(hostname: HostName) -> str:
+    """Python code to be placed at the top of a precompiled host check
+
+    The code only uses modules of the standard library which are already imported
+    by the host check (sys) or are cheap to import (socket). The check is executed
+    in process in case the helper can not be reached or the user asked for
+    verbose or debug output."""
+    return """
+import socket
+if not [a for a in sys.argv[1:] if a in ("-v", "--verbose", "-d")]:
+    try:
+        _helper = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        _helper.connect(%(socket_path)r)
+        _helper.sendall(%(request)r)
+        _helper.shutdown(socket.SHUT_WR)
+        _chunks = []
+        while True:
+            _chunk = _helper.recv(65536)
+            if not _chunk:
+                break
+            _chunks.append(_chunk)
+        _helper.close()
+        _exit_code, _output = b"".join(_chunks).split(b"\\n", 1)
+        sys.stdout.write(_output.decode("utf-8"))
+        sys.exit(int(_exit_code))
+    except (socket.error, ValueError):
+        pass  # Helper not available: Execute the host check in this process
+
+""" % {
+        "socket_path": cmk.utils.paths.nagios_checker_socket,
+        "request": _encode_request(hostname),
+    }
+
+
+def _encode_request(hostname: HostName) -> bytes:
+    return ("%s\n" % hostname).encode("utf-8")
+
+
+def _decode_request(data: bytes) -> HostName:
+    hostname = data.decode("utf-8").split("\n", 1)[0].strip()
+    if not hostname:
+        raise ValueError("Got request without host name")
+    return hostname
+
+
+def _encode_response(exit_code: int, output: str) -> bytes:
+    return ("%d\n%s" % (exit_code, output)).encode("utf-8")
+
+
+class NagiosCheckerHelper:
+    def __init__(self,
+                 socket_path: Optional[Path] = None,
+                 check_timeout: int = DEFAULT_CHECK_TIMEOUT) -> None:
+        super(NagiosCheckerHelper, self).__init__()
+        self._socket_path = (Path(cmk.utils.paths.nagios_checker_socket)
+                             if socket_path is None else socket_path)
+        self._check_timeout = check_timeout
+        self._children: Set[int] = set()
+        self._reload_requested = False
+        self._shutdown_requested = False
+
+    def run(self) -> None:
+        """Serve requests until the helper is terminated or the config changes
+
+        In case of a config change the helper replaces itself with a fresh
+        process, which then loads the new plugins and config. As long as the
+        helper is disabled in the activated configuration, it only waits for
+        the next configuration without loading the plugins."""
+        config_id = _current_config_id()
+
+        signal.signal(signal.SIGHUP, self._request_reload)
+        signal.signal(signal.SIGTERM, self._request_shutdown)
+
+        if _helper_enabled():
+            _load_plugins_and_config()
+            self._serve(config_id)
+        else:
+            logger.info("The checker helper is disabled, waiting for a configuration change")
+            self._wait_for_config_change(config_id)
+
+        if self._reload_requested:
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    def _serve(self, config_id: _ConfigID) -> None:
+        server = self._open_socket()
+        try:
+            while not self._shutdown_requested:
+                self._reap_children()
+
+                if self._reload_requested or _current_config_id() != config_id:
+                    logger.info("Configuration changed, restarting")
+                    self._reload_requested = True
+                    break
+
+                try:
+                    readable = select.select([server], [], [], 1.0)[0]
+                except InterruptedError:
+                    continue
+
+                if readable:
+                    self._accept(server)
+        finally:
+            server.close()
+            self._remove_socket()
+
+    def _wait_for_config_change(self, config_id: _ConfigID) -> None:
+        while not self._shutdown_requested and not self._reload_requested:
+            if _current_config_id() != config_id:
+                logger.info("Configuration changed, restarting")
+                self._reload_requested = True
+                break
+            time.sleep(1.0)
+
+    def _request_reload(self, signum: int, frame: Optional[FrameType]) -> None:
+        self._reload_requested = True
+
+    def _request_shutdown(self, signum: int, frame: Optional[FrameType]) -> None:
+        self._shutdown_requested = True
+
+    def _open_socket(self) -> socket.socket:
+        self._remove_socket()
+        self._socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(str(self._socket_path))
+        os.chmod(str(self._socket_path), 0o660)
+        server.listen(socket.SOMAXCONN)
+        logger.info("Listening on %s", self._socket_path)
+        return server
+
+    def _remove_socket(self) -> None:
+        try:
+            self._socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _accept(self, server: socket.socket) -> None:
+        try:
+            conn = server.accept()[0]
+        except (BlockingIOError, InterruptedError):
+            return
+
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                server.close()
+                self._serve_request(conn)
+            except Exception:
+                logger.exception("Failed to process request")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)  # pylint: disable=protected-access
+
+        conn.close()
+        self._children.add(pid)
+
+    def _reap_children(self) -> None:
+        for pid in list(self._children):
+            try:
+                if os.waitpid(pid, os.WNOHANG)[0] == 0:
+                    continue
+            except ChildProcessError:
+                pass
+            self._children.discard(pid)
+
+    def _serve_request(self, conn: socket.socket) -> None:
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        chunks = []
+        while True:
+            chunk = conn.recv(4096)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if b"\n" in chunk:
+                break
+
+        hostname = _decode_request(b"".join(chunks))
+        exit_code, output = self._execute_host_check(hostname)
+        conn.sendall(_encode_response(exit_code, output))
+        conn.close()
+
+    def _execute_host_check(self, hostname: HostName) -> Tuple[int, str]:
+        """Execute the checks of the host the same way the precompiled host check does"""
+        import cmk.base.agent_based.checking as checking  # pylint: disable=import-outside-toplevel
+        import cmk.base.core_nagios as core_nagios  # pylint: disable=import-outside-toplevel
+
+        def _handle_timeout(signum: int, frame: Optional[FrameType]) -> None:
+            raise MKTimeout("Timed out")
+
+        captured = io.StringIO()
+        orig_stdout, sys.stdout = sys.stdout, captured
+        signal.signal(signal.SIGALRM, _handle_timeout)
+        signal.alarm(self._check_timeout)
+        try:
+            # The precompiled host check contains the looked up addresses of the host
+            config.ipaddresses, config.ipv6addresses = core_nagios.get_needed_ip_addresses(
+                config.get_config_cache(),
+                config.get_config_cache().get_host_config(hostname))
+            exit_code = checking.do_check(hostname, None)
+        except MKTerminate:
+            captured.write("<Interrupted>\n")
+            exit_code = 1
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 3
+        except Exception as e:
+            captured.write(
+                "UNKNOWN - Exception in precompiled check: %s (details in long output)\n" % e)
+            captured.write("Traceback: %s\n" % traceback.format_exc())
+            exit_code = 3
+        finally:
+            signal.alarm(0)
+            sys.stdout = orig_stdout
+
+        return exit_code, captured.getvalue()
+
+
+def _load_plugins_and_config() -> None:
+    """Load what a precompiled host check loads, but the plugins of all hosts"""
+    import cmk.base.check_api as check_api  # pylint: disable=import-outside-toplevel
+    config.load_all_agent_based_plugins(check_api.get_check_api_context)
+    config.load_packed_config(LATEST_SERIAL)
+
+
+def _helper_enabled() -> bool:
+    """Whether the activated configuration enables the helper
+
+    Only the packed config is read, the plugins are not needed for this."""
+    try:
+        return bool(
+            config.PackedConfigStore(LATEST_SERIAL).read().get("nagios_checker_helper", False))
+    except FileNotFoundError:
+        return False  # No configuration activated yet
+    except Exception:
+        logger.exception("Failed to read the activated configuration")
+        return False
+
+
+def _current_config_id() -> _ConfigID:
+    """Identifies the currently activated configuration and plugins
+
+    Each "cmk -U" creates a new serial directory and points the "latest" link to
+    it. Changed local plugins update the mtime of their directories."""
+    latest_path = cmk.utils.paths.make_helper_config_path(LATEST_SERIAL)
+    return (
+        os.path.realpath(latest_path),
+        _mtime(latest_path / "precompiled_check_config.mk"),
+        _mtime(Path(cmk.utils.paths.local_checks_dir)),
+        _mtime(Path(cmk.utils.paths.local_agent_based_plugins_dir)),
+    )
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
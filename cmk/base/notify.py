@@ -20,11 +20,14 @@ import io
 import logging
 import os
 import re
+import select
 import signal
 import subprocess
 import sys
+import threading
 import time
-from typing import Dict, Tuple, List, Any, Optional, FrozenSet, Set, Union, cast, Mapping
+from typing import (Any, Callable, Dict, FrozenSet, IO, List, Mapping, Optional, Set, Tuple, Union,
+                    cast)
 import traceback
 import uuid
 
@@ -33,6 +36,7 @@ from six import ensure_str
 import livestatus
 import cmk.utils.debug
 import cmk.utils.log as log
+from cmk.utils.caching import config_cache as _config_cache
 from cmk.utils.macros import replace_macros_in_str
 from cmk.utils.notify import (
     find_wato_folder,
@@ -71,6 +75,9 @@ logger = logging.getLogger('cmk.base.notify')
 _log_to_stdout = False
 notify_mode = "notify"
 
+# Seconds a notification plugin gets to exit after being terminated on timeout
+_NOTIFICATION_PLUGIN_KILL_GRACE = 5.0
+
 ContactName = str
 
 NotifyPluginParams = Dict  # TODO: Improve this
@@ -118,7 +125,10 @@ Notifications = Dict[NotificationKey, NotificationValue]
 notification_logdir = cmk.utils.paths.var_dir + "/notify"
 notification_spooldir = cmk.utils.paths.var_dir + "/notify/spool"
 notification_bulkdir = cmk.utils.paths.var_dir + "/notify/bulk"
+notification_bulk_index = notification_bulkdir + "/.index.mk"
+notification_bulk_index_lock = notification_bulkdir + "/.index.lock"
 notification_log = cmk.utils.paths.log_dir + "/notify.log"
+notification_plugin_pool_metrics_file = cmk.utils.paths.var_dir + "/notify/plugin_pool_metrics.mk"
 
 notification_log_template = \
     u"$CONTACTNAME$ - $NOTIFICATIONTYPE$ - " \
@@ -434,11 +444,17 @@ def notify_keepalive() -> None:
     cmk.base.utils.register_sigint_handler()
     events.event_keepalive(
         event_function=notify_notify,
-        call_every_loop=send_ripe_bulks,
+        call_every_loop=_notify_keepalive_loop,
         loop_interval=config.notification_bulk_interval,
+        shutdown_function=shutdown_notification_plugin_pool,
     )
 
 
+def _notify_keepalive_loop() -> None:
+    send_ripe_bulks()
+    log_notification_plugin_pool_metrics()
+
+
 #.
 #   .--Rule-Based-Notifications--------------------------------------------.
 #   |            ____        _      _                        _             |
@@ -468,10 +484,20 @@ def notify_rulebased(raw_context: EventContext, analyse: bool = False) -> Notify
     num_rule_matches = 0
     rule_info = []
 
-    for rule in config.notification_rules + user_notification_rules():
-        contact_info = _get_contact_info_text(rule)
+    rules = config.notification_rules + user_notification_rules()
+    rule_index = _notification_rule_index(rules)
+    candidates = rule_index.candidates(raw_context)
+    for nr, rule in enumerate(rules):
+        if candidates is not None and nr not in candidates:
+            if not analyse and not logger.isEnabledFor(log.VERBOSE):
+                continue
+            # The analysis shows the reasons of all rules just like rbn_match_rule()
+            why_not = (rbn_match_rule(rule, raw_context)
+                       if analyse else rule_index.why_not_candidate(nr, rule, raw_context))
+        else:
+            why_not = rule_index.match(nr, rule, raw_context)
 
-        why_not = rbn_match_rule(rule, raw_context)
+        contact_info = _get_contact_info_text(rule)
         if why_not:
             logger.log(log.VERBOSE, contact_info)
             logger.log(log.VERBOSE, " -> does not match: %s", why_not)
@@ -630,13 +656,18 @@ def _process_notifications(raw_context: EventContext, notifications: Notificatio
                     elif config.notification_spooling in ("local", "both"):
                         create_spoolfile({"context": context, "plugin": plugin_name})
                     else:
-                        call_notification_script(plugin_name, context)
+                        notification_plugin_pool().submit(plugin_name, context)
 
             except Exception:
                 if cmk.utils.debug.enabled():
                     raise
                 logger.exception("    ERROR:")
 
+        # The keepalive mode continues with the next notification while the plugins run
+        if not analyse and not (keepalive and keepalive.enabled()):
+            notification_plugin_pool().wait()
+            log_notification_plugin_pool_metrics()
+
     return plugin_info
 
 
@@ -801,18 +832,130 @@ def rbn_get_bulk_params(rule: EventRule) -> Optional[NotifyBulkParameters]:
 
 
 def rbn_match_rule(rule: EventRule, context: EventContext) -> Optional[str]:
-    return events.apply_matchers([
-        rbn_match_rule_disabled,
-        events.event_match_rule,
-        rbn_match_escalation,
-        rbn_match_escalation_throtte,
-        rbn_match_host_event,
-        rbn_match_service_event,
-        rbn_match_notification_comment,
-        rbn_match_hostlabels,
-        rbn_match_servicelabels,
-        rbn_match_event_console,
-    ], rule, context)
+    return events.apply_matchers([matcher for matcher, _keys in rbn_rule_matchers()], rule, context)
+
+
+def rbn_rule_matchers() -> List[Tuple[events.Matcher, Tuple[str, ...]]]:
+    """The matchers of rbn_match_rule() and the keys of a rule they evaluate"""
+    return [(rbn_match_rule_disabled, ("disabled",))] + events.event_rule_matchers() + [
+        (rbn_match_escalation, ("match_escalation",)),
+        (rbn_match_escalation_throtte, ("match_escalation_throttle",)),
+        (rbn_match_host_event, ("match_host_event",)),
+        (rbn_match_service_event, ("match_service_event",)),
+        (rbn_match_notification_comment, ("match_notification_comment",)),
+        (rbn_match_hostlabels, ("match_hostlabels",)),
+        (rbn_match_servicelabels, ("match_servicelabels",)),
+        (rbn_match_event_console, ("match_ec",)),
+    ]
+
+
+class NotificationRuleIndex:
+    """The notification rules compiled for matching many events
+
+    Each rule only keeps the matchers which evaluate one of its conditions. The rules
+    are indexed by the conditions which are cheap to look up: the type of the event
+    (host or service), the host names and one of the required host tags. Only the
+    candidate rules of an event need to be matched, the others cannot match it.
+
+    The index is built once per configuration, the rules must not be changed."""
+    def __init__(self, rules: List[EventRule]) -> None:
+        super().__init__()
+        all_matchers = rbn_rule_matchers()
+        self._matchers = [events.compile_matchers(all_matchers, rule) for rule in rules]
+        self._index_matchers: List[List[events.Matcher]] = []
+        self._unindexed: Dict[str, Set[int]] = {"HOST": set(), "SERVICE": set()}
+        self._by_host: Dict[str, Dict[HostName, Set[int]]] = {"HOST": {}, "SERVICE": {}}
+        self._by_tag: Dict[str, Dict[str, Set[int]]] = {"HOST": {}, "SERVICE": {}}
+        for nr, rule in enumerate(rules):
+            self._index_matchers.append(self._add_rule(nr, rule))
+
+    def _add_rule(self, nr: int, rule: EventRule) -> List[events.Matcher]:
+        """Add the rule to the index, returns the matchers of the indexed conditions"""
+        index_matchers: Set[events.Matcher] = set()
+        if rule.get("disabled"):
+            return [rbn_match_rule_disabled]
+
+        # Conditions which only service or only host events can fulfill
+        service_only = host_only = False
+        for key, matcher in [
+            ("match_services", events.event_match_services),
+            ("match_checktype", events.event_match_checktype),
+        ]:
+            if key in rule:
+                service_only = True
+                index_matchers.add(matcher)
+        if rule.get("match_servicegroups"):
+            service_only = True
+            index_matchers.add(events.event_match_servicegroups_fixed)
+        if rule.get("match_servicegroups_regex", (None, None))[1]:
+            service_only = True
+            index_matchers.add(events.event_match_servicegroups_regex)
+        if "match_service_event" in rule and "match_host_event" not in rule:
+            service_only = True
+            index_matchers.add(rbn_match_service_event)
+        if "match_host_event" in rule and "match_service_event" not in rule:
+            host_only = True
+            index_matchers.add(rbn_match_host_event)
+        whats = [
+            what for what, excluded in [("HOST", service_only), ("SERVICE", host_only)]
+            if not excluded
+        ]
+
+        required_tag = None
+        for tag in rule.get("match_hosttags") or []:
+            if tag and tag[0] != "!" and tag[-1] != "+":
+                required_tag = tag
+                break
+
+        for what in whats:
+            if "match_hosts" in rule:
+                for host_name in rule["match_hosts"]:
+                    self._by_host[what].setdefault(host_name, set()).add(nr)
+            elif required_tag is not None:
+                self._by_tag[what].setdefault(required_tag, set()).add(nr)
+            else:
+                self._unindexed[what].add(nr)
+
+        if "match_hosts" in rule:
+            index_matchers.add(events.event_match_hosts)
+        elif required_tag is not None:
+            index_matchers.add(events.event_match_hosttags)
+        return [matcher for matcher in self._matchers[nr] if matcher in index_matchers]
+
+    def candidates(self, context: EventContext) -> Optional[Set[int]]:
+        """The numbers of the rules which may match the event, None means all rules"""
+        what = context.get("WHAT")
+        if what not in self._unindexed:
+            return None
+        candidates = set(self._unindexed[what])
+        candidates.update(self._by_host[what].get(context.get("HOSTNAME", ""), ()))
+        by_tag = self._by_tag[what]
+        for tag in set(context.get("HOSTTAGS", "").split()):
+            candidates.update(by_tag.get(tag, ()))
+        return candidates
+
+    def match(self, nr: int, rule: EventRule, context: EventContext) -> Optional[str]:
+        """Like rbn_match_rule(), but only with the matchers of the conditions of the rule"""
+        return events.apply_matchers(self._matchers[nr], rule, context)
+
+    def why_not_candidate(self, nr: int, rule: EventRule, context: EventContext) -> str:
+        """The reason why a rule which is no candidate does not match
+
+        This is the first reason of the indexed conditions. In case the rule has a
+        further condition which is evaluated before, rbn_match_rule() may tell a
+        different reason."""
+        return (events.apply_matchers(self._index_matchers[nr], rule, context) or
+                self.match(nr, rule, context) or "")
+
+
+def _notification_rule_index(rules: List[EventRule]) -> NotificationRuleIndex:
+    """The index of the rules, which is kept until the configuration is loaded again"""
+    cache = _config_cache.get("notification_rule_index")
+    rule_ids = tuple(id(rule) for rule in rules)
+    if cache.get("rule_ids") != rule_ids:
+        cache["rule_ids"] = rule_ids
+        cache["index"] = NotificationRuleIndex(rules)
+    return cache["index"]
 
 
 def rbn_match_rule_disabled(rule: EventRule, _context: EventContext) -> Optional[str]:
@@ -1485,36 +1628,36 @@ def call_notification_script(plugin_name: NotificationPluginNameStr,
         return 2
 
     plugin_log("executing %s" % path)
+    # The plugin gets an own process group, so the plugin and the processes it started are
+    # terminated on timeout. The output is read with a deadline instead of using SIGALRM,
+    # which only works in the main thread, but the plugins may be called by the workers of
+    # the plugin pool.
+    p = subprocess.Popen([path],
+                         stdout=subprocess.PIPE,
+                         stderr=subprocess.STDOUT,
+                         env=notification_script_env(plugin_context),
+                         close_fds=True,
+                         start_new_session=True)
+
+    timeout = _notification_plugin_timeout(plugin_name)
+    deadline = time.time() + timeout
+    stdout = p.stdout
+    assert stdout is not None
     try:
-        set_notification_timeout()
-        p = subprocess.Popen([path],
-                             stdout=subprocess.PIPE,
-                             stderr=subprocess.STDOUT,
-                             env=notification_script_env(plugin_context),
-                             encoding="utf-8",
-                             close_fds=True)
-
-        stdout = p.stdout
-        assert stdout is not None
-        while True:
-            # read and output stdout linewise to ensure we don't force python to produce
-            # one - potentially huge - memory buffer
-            line = stdout.readline()
-            if line != '':
-                plugin_log("Output: %s" % line.rstrip())
-                if _log_to_stdout:
-                    out.output(ensure_str(line))
-            else:
-                break
-        # the stdout is closed but the return code may not be available just yet - wait for the
-        # process to actually finish
-        exitcode = p.wait()
-        clear_notification_timeout()
-    except NotificationTimeout:
-        plugin_log("Notification plugin did not finish within %d seconds. Terminating." %
-                   config.notification_plugin_timeout)
-        # p.kill() requires python 2.6!
-        os.kill(p.pid, signal.SIGTERM)
+        timed_out = _read_notification_script_output(p, stdout, timeout, deadline, plugin_log)
+    finally:
+        stdout.close()
+
+    try:
+        # the stdout is closed but the return code may not be available just yet - wait for
+        # the process to actually finish
+        exitcode = p.wait(timeout=max(0, deadline - time.time()) + _NOTIFICATION_PLUGIN_KILL_GRACE)
+    except subprocess.TimeoutExpired:
+        plugin_log("Notification plugin did not exit. Killing it.")
+        _signal_process_group(p, signal.SIGKILL)
+        exitcode = 1
+
+    if timed_out:
         exitcode = 1
 
     if exitcode != 0:
@@ -1523,6 +1666,61 @@ def call_notification_script(plugin_name: NotificationPluginNameStr,
     return exitcode
 
 
+def _read_notification_script_output(p: subprocess.Popen, stdout: IO[bytes], timeout: int,
+                                     deadline: float, plugin_log: Callable[[str], None]) -> bool:
+    """Log the output of the plugin until it closes it or is killed after the timeout
+
+    On timeout, the process group of the plugin is terminated. In case it does not exit
+    within the grace period, it is killed. Processes which left the process group may
+    keep the output open, it is not read any further then. Returns whether the plugin
+    timed out."""
+    timed_out = False
+    buf = b""
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            if timed_out:
+                plugin_log("Notification plugin did not terminate. Killing it.")
+                _signal_process_group(p, signal.SIGKILL)
+                break
+            timed_out = True
+            plugin_log("Notification plugin did not finish within %d seconds. Terminating." %
+                       timeout)
+            _signal_process_group(p, signal.SIGTERM)
+            deadline = time.time() + _NOTIFICATION_PLUGIN_KILL_GRACE
+            continue
+
+        readable, _writable, _exceptional = select.select([stdout], [], [], remaining)
+        if not readable:
+            continue
+        # read and output stdout linewise to ensure we don't force python to produce
+        # one - potentially huge - memory buffer
+        chunk = os.read(stdout.fileno(), 4096)
+        if not chunk:
+            break
+        *lines, buf = (buf + chunk).split(b"\n")
+        for line in lines:
+            _log_notification_script_output(line + b"\n", plugin_log)
+
+    if buf:
+        _log_notification_script_output(buf, plugin_log)
+    return timed_out
+
+
+def _log_notification_script_output(line: bytes, plugin_log: Callable[[str], None]) -> None:
+    text = line.decode("utf-8", errors="replace")
+    plugin_log("Output: %s" % text.rstrip())
+    if _log_to_stdout:
+        out.output(text)
+
+
+def _signal_process_group(p: subprocess.Popen, sig: int) -> None:
+    try:
+        os.killpg(p.pid, sig)
+    except OSError:
+        pass
+
+
 # Construct the environment for the notification script
 def notification_script_env(plugin_context: PluginContext) -> PluginContext:
     # Use half of the maximum allowed string length MAX_ARG_STRLEN
@@ -1548,6 +1746,11 @@ def notification_script_env(plugin_context: PluginContext) -> PluginContext:
     return notify_env
 
 
+def _notification_plugin_timeout(plugin_name: NotificationPluginNameStr) -> int:
+    timeouts = dict(config.notification_plugin_pool.get("plugin_timeouts", []))
+    return timeouts.get(plugin_name or None, config.notification_plugin_timeout)
+
+
 class NotificationTimeout(MKException):
     pass
 
@@ -1565,6 +1768,196 @@ def clear_notification_timeout() -> None:
     signal.alarm(0)
 
 
+#.
+#   .--Plugin pool---------------------------------------------------------.
+#   |          ____  _             _                            _          |
+#   |         |  _ \| |_   _  __ _(_)_ __     _ __   ___   ___ | |         |
+#   |         | |_) | | | | |/ _` | | '_ \   | '_ \ / _ \ / _ \| |         |
+#   |         |  __/| | |_| | (_| | | | | |  | |_) | (_) | (_) | |         |
+#   |         |_|   |_|\__,_|\__, |_|_| |_|  | .__/ \___/ \___/|_|         |
+#   |                        |___/           |_|                           |
+#   +----------------------------------------------------------------------+
+#   |  Parallel execution of the notification plugins which are called     |
+#   |  directly, i.e. without spooling.                                    |
+#   '----------------------------------------------------------------------'
+
+
+class NotificationPluginStats:
+    """Run time and failure counters of one notification plugin"""
+    def __init__(self) -> None:
+        super().__init__()
+        self.num_calls = 0
+        self.num_temporary_failures = 0
+        self.num_permanent_failures = 0
+        self.total_run_time = 0.0
+        self.max_run_time = 0.0
+
+    def add(self, exitcode: int, run_time: float) -> None:
+        self.num_calls += 1
+        if exitcode == 1:
+            self.num_temporary_failures += 1
+        elif exitcode != 0:
+            self.num_permanent_failures += 1
+        self.total_run_time += run_time
+        self.max_run_time = max(self.max_run_time, run_time)
+
+    def to_dict(self) -> Dict[str, Union[int, float]]:
+        return {
+            "calls": self.num_calls,
+            "temporary_failures": self.num_temporary_failures,
+            "permanent_failures": self.num_permanent_failures,
+            "total_run_time": self.total_run_time,
+            "max_run_time": self.max_run_time,
+        }
+
+
+class NotificationPluginPool:
+    """Calls the notification plugins in a bounded number of worker threads
+
+    The plugins are external processes, the workers only wait for them. Besides the
+    overall number of workers, the number of parallel calls of a plugin can be limited,
+    e.g. for a ticket system which only accepts a few connections. Calls of the same
+    plugin are started in the order they were submitted. A failed call is not repeated:
+    Notifications which need to be retried have to be delivered by the spooler."""
+    def __init__(self, max_workers: int, plugin_limits: Dict[Optional[NotificationPluginNameStr],
+                                                             int]) -> None:
+        super().__init__()
+        self._max_workers = max(1, max_workers)
+        self._plugin_limits = plugin_limits
+        self._condition = threading.Condition()
+        self._queue: List[Tuple[NotificationPluginNameStr, PluginContext]] = []
+        self._running: Dict[Optional[NotificationPluginNameStr], int] = {}
+        self._workers: List[threading.Thread] = []
+        self._num_idle_workers = 0
+        self._shutdown = False
+        self._max_queue_depth = 0
+        self._plugin_stats: Dict[str, NotificationPluginStats] = {}
+
+    def submit(self, plugin_name: NotificationPluginNameStr, plugin_context: PluginContext) -> None:
+        with self._condition:
+            if self._shutdown:
+                raise MKGeneralException("The notification plugin pool has been shut down")
+            self._queue.append((plugin_name, plugin_context))
+            self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+            # Idle workers may not have picked up the jobs submitted before yet, so compare
+            # with the number of queued jobs instead of only checking for an idle worker
+            if len(self._queue) > self._num_idle_workers and len(self._workers) < self._max_workers:
+                worker = threading.Thread(target=self._work,
+                                          name="notify-worker-%d" % len(self._workers),
+                                          daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify_all()
+
+    def wait(self) -> None:
+        """Wait until all submitted plugin calls are finished"""
+        with self._condition:
+            while self._queue or any(self._running.values()):
+                self._condition.wait()
+
+    def shutdown(self) -> None:
+        """Finish the submitted plugin calls and stop the workers"""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "workers": len(self._workers),
+                "running": sum(self._running.values()),
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self._max_queue_depth,
+                "plugins": {name: stats.to_dict() for name, stats in self._plugin_stats.items()},
+            }
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    if self._shutdown and not self._queue:
+                        return
+                    self._num_idle_workers += 1
+                    self._condition.wait()
+                    self._num_idle_workers -= 1
+                    job = self._next_job()
+
+            plugin_name, plugin_context = job
+            start_time = time.time()
+            try:
+                exitcode = call_notification_script(plugin_name, plugin_context)
+            except Exception:
+                logger.exception("    ERROR:")
+                exitcode = 2
+            run_time = time.time() - start_time
+
+            with self._condition:
+                self._running[plugin_name or None] -= 1
+                self._plugin_stats.setdefault(plugin_name or "plain email",
+                                              NotificationPluginStats()).add(exitcode, run_time)
+                self._condition.notify_all()
+
+    def _next_job(self) -> Optional[Tuple[NotificationPluginNameStr, PluginContext]]:
+        """The oldest queued call of a plugin which has not reached its limit"""
+        blocked: Set[Optional[NotificationPluginNameStr]] = set()
+        for index, (plugin_name, _plugin_context) in enumerate(self._queue):
+            key = plugin_name or None
+            if key in blocked:
+                continue
+            limit = self._plugin_limits.get(key)
+            if limit is not None and self._running.get(key, 0) >= limit:
+                blocked.add(key)
+                continue
+            self._running[key] = self._running.get(key, 0) + 1
+            return self._queue.pop(index)
+        return None
+
+
+_notification_plugin_pool: Optional[NotificationPluginPool] = None
+
+
+def notification_plugin_pool() -> NotificationPluginPool:
+    global _notification_plugin_pool
+    if _notification_plugin_pool is None:
+        settings = config.notification_plugin_pool
+        _notification_plugin_pool = NotificationPluginPool(settings.get("max_workers", 1), {
+            plugin_name or None: limit for plugin_name, limit in settings.get("plugin_limits", [])
+        })
+    return _notification_plugin_pool
+
+
+def shutdown_notification_plugin_pool() -> None:
+    global _notification_plugin_pool
+    if _notification_plugin_pool is None:
+        return
+    _notification_plugin_pool.shutdown()
+    log_notification_plugin_pool_metrics()
+    _notification_plugin_pool = None
+
+
+def log_notification_plugin_pool_metrics() -> None:
+    """Log the metrics of the plugin pool and save them for the keepalive mode"""
+    if _notification_plugin_pool is None:
+        return
+
+    metrics = _notification_plugin_pool.metrics()
+    logger.log(log.VERBOSE, "Plugin pool: %d workers, %d running, %d queued (max. %d)",
+               metrics["workers"], metrics["running"], metrics["queue_depth"],
+               metrics["max_queue_depth"])
+    for plugin_name, stats in sorted(metrics["plugins"].items()):
+        logger.log(
+            log.VERBOSE, "  %s: %d calls, %d temporary failures, %d permanent failures, "
+            "%.2f s run time (max. %.2f s)", plugin_name, stats["calls"],
+            stats["temporary_failures"], stats["permanent_failures"], stats["total_run_time"],
+            stats["max_run_time"])
+
+    if keepalive and keepalive.enabled():
+        store.save_object_to_file(notification_plugin_pool_metrics_file, metrics)
+
+
 #.
 #   .--Spooling------------------------------------------------------------.
 #   |               ____                    _ _                            |
@@ -1721,11 +2114,18 @@ def do_bulk_notify(plugin_name: NotificationPluginNameStr, params: NotifyPluginP
         ])
 
     logger.info("    --> storing for bulk notification %s", "|".join(bulk_path))
-    bulk_dirname = create_bulk_dirname(bulk_path)
-    notify_uuid = fresh_uuid()
-    filename = bulk_dirname + "/" + notify_uuid
-    open(filename + ".new", "w").write("%r\n" % ((params, plugin_context),))
-    os.rename(filename + ".new", filename)  # We need an atomic creation!
+    # The index is updated before the notification is stored. In case we crash in
+    # between, the index counts one notification too much until the bulk is sent.
+    with store.locked(notification_bulk_index_lock):
+        bulk_dirname = create_bulk_dirname(bulk_path)
+        bulk_index = _load_bulk_index()
+        _add_to_bulk_index(bulk_index, bulk_dirname, time.time())
+        store.save_object_to_file(notification_bulk_index, bulk_index)
+
+        notify_uuid = fresh_uuid()
+        filename = bulk_dirname + "/" + notify_uuid
+        open(filename + ".new", "w").write("%r\n" % ((params, plugin_context),))
+        os.rename(filename + ".new", filename)  # We need an atomic creation!
     logger.info("        - stored in %s", filename)
 
 
@@ -1804,14 +2204,38 @@ def remove_if_orphaned(bulk_dir: str, max_age: float, ref_time: Optional[float]
             logger.info("    -> Error removing it: %s", e)
 
 
-def find_bulks(only_ripe: bool) -> NotifyBulks:
+# The bulk index keeps the number of notifications, the time of the oldest notification
+# and the bulk parameters of each bulk directory (relative to notification_bulkdir). This
+# way the ripe bulks are found without looking at every notification file. Only the
+# directories of the bulks to send are listed.
+BulkIndex = Dict[str, Dict[str, Any]]
+
+
+def _load_bulk_index() -> BulkIndex:
+    """Load the bulk index, build it from the bulk directories in case it is missing
+
+    Bulks spooled by former versions are indexed this way. The caller has to hold the
+    lock of the index."""
+    try:
+        bulk_index = store.load_object_from_file(notification_bulk_index, default=None)
+    except Exception as e:
+        logger.info("Cannot read bulk index, rebuilding it: %s", e)
+        bulk_index = None
+
+    if not isinstance(bulk_index, dict):
+        bulk_index = _scan_bulk_dirs()
+        store.save_object_to_file(notification_bulk_index, bulk_index)
+    return bulk_index
+
+
+def _scan_bulk_dirs() -> BulkIndex:
     if not os.path.exists(notification_bulkdir):
-        return []
+        return {}
 
     def listdir_visible(path: str) -> List[str]:
         return [x for x in os.listdir(path) if not x.startswith(".")]
 
-    bulks: NotifyBulks = []
+    bulk_index: BulkIndex = {}
     now = time.time()
     for contact in listdir_visible(notification_bulkdir):
         contact_dir = os.path.join(notification_bulkdir, contact)
@@ -1819,64 +2243,125 @@ def find_bulks(only_ripe: bool) -> NotifyBulks:
             method_dir = os.path.join(contact_dir, method)
             for bulk in listdir_visible(method_dir):
                 bulk_dir = os.path.join(method_dir, bulk)
-
                 uuids, oldest = bulk_uuids(bulk_dir)
                 if not uuids:
                     remove_if_orphaned(bulk_dir, max_age=60, ref_time=now)
                     continue
-                age = now - oldest
+                _add_to_bulk_index(bulk_index, bulk_dir, oldest, len(uuids))
+    return bulk_index
+
+
+def _add_to_bulk_index(bulk_index: BulkIndex,
+                       bulk_dir: str,
+                       timestamp: float,
+                       num_notifications: int = 1) -> None:
+    key = os.path.relpath(bulk_dir, notification_bulkdir)
+    entry = bulk_index.get(key)
+    if entry is not None:
+        entry["count"] += num_notifications
+        entry["oldest"] = min(entry["oldest"], timestamp)
+        return
 
-                # e.g. 60,10,host,localhost OR timeperiod:late_night,1000,host,localhost
-                parts = bulk_parts(method_dir, bulk)
-                if parts is None:
+    # e.g. 60,10,host,localhost OR timeperiod:late_night,1000,host,localhost
+    method_dir, bulk = os.path.split(bulk_dir)
+    parts = bulk_parts(method_dir, bulk)
+    if parts is None:
+        return
+    interval, timeperiod, max_count = parts
+    bulk_index[key] = {
+        "count": num_notifications,
+        "oldest": timestamp,
+        "interval": interval,
+        "timeperiod": timeperiod,
+        "max_count": max_count,
+    }
+
+
+def _update_bulk_index_entry(bulk_dir: str) -> None:
+    """Set the index entry of a bulk from the notification files in its directory
+
+    This is needed after (a part of) the bulk has been sent. Empty bulks are removed."""
+    with store.locked(notification_bulk_index_lock):
+        bulk_index = _load_bulk_index()
+        bulk_index.pop(os.path.relpath(bulk_dir, notification_bulkdir), None)
+        uuids, oldest = bulk_uuids(bulk_dir) if os.path.isdir(bulk_dir) else ([], 0.0)
+        if uuids:
+            _add_to_bulk_index(bulk_index, bulk_dir, oldest, len(uuids))
+        else:
+            try:
+                os.rmdir(bulk_dir)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.info("Warning: cannot remove directory %s: %s", bulk_dir, e)
+        store.save_object_to_file(notification_bulk_index, bulk_index)
+
+
+def find_bulks(only_ripe: bool) -> NotifyBulks:
+    if not os.path.exists(notification_bulkdir):
+        return []
+
+    bulks: NotifyBulks = []
+    now = time.time()
+    with store.locked(notification_bulk_index_lock):
+        bulk_index = _load_bulk_index()
+
+    for key, entry in sorted(bulk_index.items()):
+        bulk_dir = os.path.join(notification_bulkdir, key)
+        age = now - entry["oldest"]
+        interval, timeperiod, count = entry["interval"], entry["timeperiod"], entry["max_count"]
+        num_notifications = entry["count"]
+
+        if interval is not None:
+            if age >= interval:
+                logger.info("Bulk %s is ripe: age %d >= %d", bulk_dir, age, interval)
+            elif num_notifications >= count:
+                logger.info("Bulk %s is ripe: count %d >= %d", bulk_dir, num_notifications, count)
+            else:
+                logger.info("Bulk %s is not ripe yet (age: %d, count: %d)!", bulk_dir, age,
+                            num_notifications)
+                if only_ripe:
                     continue
-                interval, timeperiod, count = parts
+        else:
+            try:
+                active = cmk.base.core.timeperiod_active(str(timeperiod))
+            except Exception:
+                # This prevents sending bulk notifications if a
+                # livestatus connection error appears. It also implies
+                # that an ongoing connection error will hold back bulk
+                # notifications.
+                logger.info("Error while checking activity of timeperiod %s: assuming active",
+                            timeperiod)
+                active = True
 
-                if interval is not None:
-                    if age >= interval:
-                        logger.info("Bulk %s is ripe: age %d >= %d", bulk_dir, age, interval)
-                    elif len(uuids) >= count:
-                        logger.info("Bulk %s is ripe: count %d >= %d", bulk_dir, len(uuids), count)
-                    else:
-                        logger.info("Bulk %s is not ripe yet (age: %d, count: %d)!", bulk_dir, age,
-                                    len(uuids))
-                        if only_ripe:
-                            continue
+            if active is True and num_notifications < count:
+                # Only add a log entry every 10 minutes since timeperiods
+                # can be very long (The default would be 10s).
+                if now % 600 <= config.notification_bulk_interval:
+                    logger.info("Bulk %s is not ripe yet (timeperiod %s: active, count: %d)",
+                                bulk_dir, timeperiod, num_notifications)
 
-                    bulks.append((bulk_dir, age, interval, 'n.a.', count, uuids))
-                else:
-                    try:
-                        active = cmk.base.core.timeperiod_active(str(timeperiod))
-                    except Exception:
-                        # This prevents sending bulk notifications if a
-                        # livestatus connection error appears. It also implies
-                        # that an ongoing connection error will hold back bulk
-                        # notifications.
-                        logger.info(
-                            "Error while checking activity of timeperiod %s: assuming active",
+                if only_ripe:
+                    continue
+            elif active is False:
+                logger.info("Bulk %s is ripe: timeperiod %s has ended", bulk_dir, timeperiod)
+            elif num_notifications >= count:
+                logger.info("Bulk %s is ripe: count %d >= %d", bulk_dir, num_notifications, count)
+            else:
+                logger.info("Bulk %s is ripe: timeperiod %s is not known anymore", bulk_dir,
                             timeperiod)
-                        active = True
-
-                    if active is True and len(uuids) < count:
-                        # Only add a log entry every 10 minutes since timeperiods
-                        # can be very long (The default would be 10s).
-                        if now % 600 <= config.notification_bulk_interval:
-                            logger.info(
-                                "Bulk %s is not ripe yet (timeperiod %s: active, count: %d)",
-                                bulk_dir, timeperiod, len(uuids))
-
-                        if only_ripe:
-                            continue
-                    elif active is False:
-                        logger.info("Bulk %s is ripe: timeperiod %s has ended", bulk_dir,
-                                    timeperiod)
-                    elif len(uuids) >= count:
-                        logger.info("Bulk %s is ripe: count %d >= %d", bulk_dir, len(uuids), count)
-                    else:
-                        logger.info("Bulk %s is ripe: timeperiod %s is not known anymore", bulk_dir,
-                                    timeperiod)
 
-                    bulks.append((bulk_dir, age, 'n.a.', timeperiod, count, uuids))
+        # Only the directories of these bulks are read
+        uuids, _oldest = bulk_uuids(bulk_dir) if os.path.isdir(bulk_dir) else ([], 0.0)
+        if not uuids:
+            # Left over by a crash between updating the index and storing the notification
+            _update_bulk_index_entry(bulk_dir)
+            continue
+
+        if interval is not None:
+            bulks.append((bulk_dir, age, interval, 'n.a.', count, uuids))
+        else:
+            bulks.append((bulk_dir, age, 'n.a.', timeperiod, count, uuids))
     return bulks
 
 
@@ -1967,12 +2452,9 @@ def notify_bulk(dirname: str, uuids: UUIDs) -> None:
     if unhandled_uuids:
         notify_bulk(dirname, unhandled_uuids)
 
-    # Remove directory. Not neccessary if emtpy
-    try:
-        os.rmdir(dirname)
-    except Exception as e:
-        if not unhandled_uuids:
-            logger.info("Warning: cannot remove directory %s: %s", dirname, e)
+    # Count the notifications which have been added in the meantime or remove the
+    # directory in case it is empty
+    _update_bulk_index_entry(dirname)
 
 
 def call_bulk_notification_script(
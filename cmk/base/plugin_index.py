@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Index of the plugins provided by the plugin files
+
+Loading all legacy check plugins and all agent based plugins takes a lot of time,
+even if only the plugins of a single host are needed. The index records which
+sections, check plugins, inventory plugins and special agents each plugin file
+provides. It is created by parsing the files, without executing them.
+
+The index is persisted. Each entry is bound to the modification time and size of
+its file, so entries are updated automatically when a file is changed, added or
+removed (e.g. local files or files installed by an MKP).
+
+The index only understands the usual ways of registering plugins: Literal keys
+assigned to the registries of the legacy checks at the top level of a file and calls
+of the register functions with literal names in agent based plugins. Files doing
+anything else (e.g. computing plugin names, registering in loops or from functions)
+are marked as unsupported. As long as there are unsupported files, all plugins are
+loaded.
+"""
+
+import ast
+import importlib
+import logging
+import os
+import pickle
+import pkgutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import cmk.utils.paths
+import cmk.utils.store as store
+from cmk.utils.check_utils import maincheckify, section_name_of
+from cmk.utils.type_defs import CheckPluginNameStr
+
+logger = logging.getLogger("cmk.base.plugin_index")
+
+# Increase this in case the structure of the entries changes
+_INDEX_VERSION = 2
+
+_AGENT_BASED_PACKAGE = "cmk.base.plugins.agent_based"
+
+_KIND_AGENT_BASED = "agent_based"
+_KIND_LEGACY_CHECK = "legacy_check"
+_KIND_LEGACY_INCLUDE = "legacy_include"
+
+_REGISTER_FUNCTIONS = ("agent_section", "snmp_section", "check_plugin", "inventory_plugin")
+
+# The dictionaries legacy checks register their plugins and settings in
+_LEGACY_REGISTRIES = (
+    "active_check_info",
+    "check_default_levels",
+    "check_includes",
+    "check_info",
+    "factory_settings",
+    "precompile_params",
+    "snmp_info",
+    "snmp_scan_functions",
+    "special_agent_info",
+)
+
+Fingerprint = Tuple[int, int]
+IndexEntry = Dict[str, Any]
+
+
+class PluginSelection(NamedTuple):
+    agent_based_modules: List[str]
+    legacy_check_files: List[str]
+
+
+def plugin_index_path() -> Path:
+    return Path(cmk.utils.paths.tmp_dir, "plugin_index")
+
+
+class PluginIndex:
+    """Maps the plugins to the files providing them
+
+    The entries are keyed by the module name (agent based plugins) or the path
+    of the file (legacy check plugins and includes)."""
+    def __init__(self, entries: Dict[str, IndexEntry]) -> None:
+        super(PluginIndex, self).__init__()
+        self._entries = entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entries(self) -> Dict[str, IndexEntry]:
+        return self._entries
+
+    def unsupported_files(self) -> List[str]:
+        """The files the index does not understand, all plugins have to be loaded then"""
+        return sorted(entry["path"] for entry in self._entries.values() if entry["unsupported"])
+
+    def _of_kind(self, kind: str) -> Iterable[Tuple[str, IndexEntry]]:
+        return ((key, entry) for key, entry in self._entries.items() if entry["kind"] == kind)
+
+    def check_variable_defaults(self) -> Dict[str, Any]:
+        """The default values of the variables introduced by the legacy checks and includes
+
+        Only variables with literal values are known to the index. The configuration may
+        refer to these variables, even if the check defining them is not loaded."""
+        defaults: Dict[str, Any] = {}
+        for kind in (_KIND_LEGACY_INCLUDE, _KIND_LEGACY_CHECK):
+            for _key, entry in self._of_kind(kind):
+                defaults.update(entry["variables"])
+        return defaults
+
+    def select(
+            self,
+            check_plugin_names: Iterable[str],
+            inventory_plugin_names: Iterable[str] = (),
+            special_agent_names: Iterable[str] = (),
+    ) -> PluginSelection:
+        """Compute the files needed to provide the given plugins and their sections"""
+        check_plugin_names = {n for name in check_plugin_names for n in _name_variants(name)}
+        inventory_plugin_names = {
+            n for name in inventory_plugin_names for n in _name_variants(name)
+        }
+
+        selected: Set[str] = set()
+
+        needed_sections: Set[str] = set()
+        for key, entry in self._entries.items():
+            for plugin_name, sections in entry["check_plugins"].items():
+                if plugin_name in check_plugin_names:
+                    selected.add(key)
+                    needed_sections.update(sections)
+
+            for plugin_name, sections in entry["inventory_plugins"].items():
+                if plugin_name in inventory_plugin_names:
+                    selected.add(key)
+                    needed_sections.update(sections)
+
+            if set(entry["special_agents"]).intersection(special_agent_names):
+                selected.add(key)
+
+        # Add the providers of the raw sections which are parsed into the needed sections
+        # and the sections superseding them
+        needed_raw_sections: Set[str] = set()
+        for key, entry in self._entries.items():
+            for raw_section_name, parsed_section_name in entry["sections"].items():
+                if parsed_section_name in needed_sections:
+                    selected.add(key)
+                    needed_raw_sections.add(raw_section_name)
+
+        for key, entry in self._entries.items():
+            if set(entry["supersedes"]).intersection(needed_raw_sections):
+                selected.add(key)
+
+        return PluginSelection(
+            agent_based_modules=sorted(
+                k for k, e in self._of_kind(_KIND_AGENT_BASED) if k in selected),
+            legacy_check_files=[k for k, _e in self._of_kind(_KIND_LEGACY_CHECK) if k in selected],
+        )
+
+
+def _name_variants(plugin_name: str) -> Set[str]:
+    """Management board plugins are created on the fly from the regular ones"""
+    names = {maincheckify(plugin_name)}
+    if plugin_name.startswith("mgmt_"):
+        names.add(maincheckify(plugin_name[5:]))
+    return names
+
+
+def load_plugin_index() -> PluginIndex:
+    """Load the persisted index and update the entries of changed files"""
+    path = plugin_index_path()
+    stored = _read_index_file(path)
+    if stored.get("version") != _INDEX_VERSION:
+        stored = {}
+    stored_entries: Dict[str, IndexEntry] = stored.get("entries", {})
+
+    entries: Dict[str, IndexEntry] = {}
+    changed = False
+    for key, kind, file_path in _iter_plugin_files():
+        fingerprint = _fingerprint(file_path)
+        if fingerprint is None:
+            continue
+
+        entry = stored_entries.get(key)
+        if (entry is None or entry["kind"] != kind or entry["path"] != file_path or
+                tuple(entry["fingerprint"]) != fingerprint):
+            entry = _create_entry(kind, file_path, fingerprint)
+            changed = True
+
+        entries[key] = entry
+
+    if changed or set(entries) != set(stored_entries):
+        _write_index_file(path, {"version": _INDEX_VERSION, "entries": entries})
+
+    return PluginIndex(entries)
+
+
+def _read_index_file(path: Path) -> Dict[str, Any]:
+    try:
+        with path.open("rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.debug("Failed to read the plugin index, recreating it: %s", e)
+        return {}
+
+
+def _write_index_file(path: Path, data: Dict[str, Any]) -> None:
+    # Write to a temporary file first: Concurrent processes may read the index
+    store.makedirs(path.parent)
+    tmp_path = path.with_suffix(".%d.tmp" % os.getpid())
+    with tmp_path.open("wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path.rename(path)
+
+
+def _fingerprint(file_path: str) -> Optional[Fingerprint]:
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _iter_plugin_files() -> Iterable[Tuple[str, str, str]]:
+    """Yields the key, kind and path of all plugin files
+
+    In case a file exists in the local hierarchy and the shipped one, only the local
+    file is used (like during regular loading)."""
+    seen_legacy: Set[str] = set()
+    for directory in (str(cmk.utils.paths.local_checks_dir), cmk.utils.paths.checks_dir):
+        if not os.path.exists(directory):
+            continue
+        for file_name in sorted(os.listdir(directory)):
+            if file_name[0] == "." or file_name[-1] == "~" or file_name in seen_legacy:
+                continue
+            seen_legacy.add(file_name)
+            file_path = directory + "/" + file_name
+            kind = _KIND_LEGACY_INCLUDE if file_name.endswith(".include") else _KIND_LEGACY_CHECK
+            yield file_path, kind, file_path
+
+    package = importlib.import_module(_AGENT_BASED_PACKAGE)
+    seen_modules: Set[str] = set()
+    for module_info in pkgutil.iter_modules(list(getattr(package, "__path__", []))):
+        if module_info.ispkg or module_info.name in seen_modules:
+            continue  # packages contain helpers only, they are imported by the plugins
+        seen_modules.add(module_info.name)
+        module_dir = getattr(module_info.module_finder, "path", None)
+        if module_dir is None:
+            continue
+        yield ("%s.%s" % (_AGENT_BASED_PACKAGE, module_info.name), _KIND_AGENT_BASED,
+               os.path.join(module_dir, module_info.name + ".py"))
+
+
+def _create_entry(kind: str, file_path: str, fingerprint: Fingerprint) -> IndexEntry:
+    entry: IndexEntry = {
+        "kind": kind,
+        "path": file_path,
+        "fingerprint": fingerprint,
+        "unsupported": False,
+        "sections": {},
+        "supersedes": [],
+        "check_plugins": {},
+        "inventory_plugins": {},
+        "special_agents": [],
+        "variables": {},
+    }
+
+    try:
+        with open(file_path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=file_path)
+    except (OSError, SyntaxError, ValueError) as e:
+        # Let the regular loading report the problem
+        logger.debug("Failed to index %s: %s", file_path, e)
+        entry["unsupported"] = True
+        return entry
+
+    if kind == _KIND_AGENT_BASED:
+        _index_agent_based_module(tree, entry)
+    else:
+        _index_legacy_file(tree, entry)
+
+    return entry
+
+
+def _index_agent_based_module(tree: ast.AST, entry: IndexEntry) -> None:
+    # The names the register module and functions are imported as
+    register_names = {"register"}
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.ImportFrom):
+            continue
+        for alias in node.names:
+            if alias.name in _REGISTER_FUNCTIONS + ("register",):
+                if alias.asname not in (None, alias.name):
+                    entry["unsupported"] = True  # Registering under another name
+                register_names.add(alias.name)
+
+    understood_nodes: Set[int] = set()
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Attribute) and node.attr == "RuleSetType" and
+                isinstance(node.value, ast.Name)):
+            understood_nodes.add(id(node.value))
+            continue
+
+        if not isinstance(node, ast.Call):
+            continue
+
+        func = node.func
+        if isinstance(func, ast.Attribute):
+            registering = isinstance(func.value, ast.Name) and func.value.id in register_names
+            function_name = func.attr
+        elif isinstance(func, ast.Name):
+            registering = func.id in register_names
+            function_name = func.id
+        else:
+            continue
+
+        if function_name not in _REGISTER_FUNCTIONS:
+            continue
+
+        if not registering:
+            entry["unsupported"] = True  # e.g. v1.register.check_plugin(...)
+            continue
+
+        understood_nodes.add(id(func))
+        if isinstance(func, ast.Attribute):
+            understood_nodes.add(id(func.value))
+
+        if not _index_register_call(function_name, node, entry):
+            entry["unsupported"] = True
+
+    # Any other use of the register functions, e.g. assigning them to other names
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Name) and node.id in register_names and
+                id(node) not in understood_nodes):
+            entry["unsupported"] = True
+
+
+def _index_register_call(function_name: str, node: ast.Call, entry: IndexEntry) -> bool:
+    if any(kw.arg is None for kw in node.keywords) or node.args:
+        return False  # Arguments which are not known to the index
+    kwargs = {kw.arg: kw.value for kw in node.keywords if kw.arg is not None}
+    name = _literal(kwargs.get("name"))
+    if not isinstance(name, str):
+        return False
+
+    if function_name in ("agent_section", "snmp_section"):
+        parsed_section_name = _literal(kwargs.get("parsed_section_name"), name)
+        supersedes = _literal(kwargs.get("supersedes"), [])
+        if not isinstance(parsed_section_name, str) or not isinstance(supersedes, list):
+            return False
+        entry["sections"][name] = parsed_section_name
+        entry["supersedes"].extend(supersedes)
+        return True
+
+    sections = _literal(kwargs.get("sections"), [name])
+    if not isinstance(sections, list):
+        return False
+
+    plugins = entry["check_plugins" if function_name == "check_plugin" else "inventory_plugins"]
+    plugins[name] = sections
+    return True
+
+
+def _index_legacy_file(tree: ast.Module, entry: IndexEntry) -> None:
+    """Index the top level statements of a legacy check or include file
+
+    Functions of the file using the registries may register plugins when being called
+    at the top level, the index does not follow these calls."""
+    local_functions = _registering_functions(tree)
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            executed: List[ast.AST] = list(node.decorator_list)
+        else:
+            executed = [node]
+
+        if (not _index_legacy_statement(node, entry) or _calls_any(executed, local_functions) or
+                _uses_legacy_registry(executed, node)):
+            entry["unsupported"] = True
+
+
+def _index_legacy_statement(node: ast.stmt, entry: IndexEntry) -> bool:
+    if isinstance(
+            node,
+        (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Import, ast.ImportFrom)):
+        return True
+
+    if isinstance(node, ast.Expr):
+        if isinstance(node.value, ast.Constant):
+            return True  # Docstrings and the like
+        return isinstance(node.value, ast.Call) and _index_legacy_call(node.value, entry)
+
+    if isinstance(node, ast.Assign):
+        return all(_index_legacy_assignment(target, node.value, entry) for target in node.targets)
+
+    return False
+
+
+def _index_legacy_call(node: ast.Call, entry: IndexEntry) -> bool:
+    func = node.func
+    if not (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)):
+        return False
+
+    if (func.value.id, func.attr) == ("check_config_variables", "append"):
+        return len(node.args) == 1 and isinstance(_literal(node.args[0]), str)
+
+    if (func.value.id, func.attr) == ("factory_settings", "update"):
+        if len(node.args) != 1 or node.keywords or not isinstance(node.args[0], ast.Dict):
+            return False
+        for key, value in zip(node.args[0].keys, node.args[0].values):
+            varname = _literal(key)
+            if not isinstance(varname, str):
+                return False
+            _index_legacy_variable(varname, value, entry)
+        return True
+
+    return False
+
+
+def _index_legacy_assignment(target: ast.expr, value: ast.expr, entry: IndexEntry) -> bool:
+    if isinstance(target, ast.Name):
+        _index_legacy_variable(target.id, value, entry)
+        return True
+
+    if not (isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name) and
+            target.value.id in _LEGACY_REGISTRIES):
+        return False
+
+    key = _literal(_subscript_index(target))
+    if not isinstance(key, str):
+        return False
+
+    registry = target.value.id
+    if registry == "check_info":
+        _index_legacy_check(key, entry)
+    elif registry == "snmp_info":
+        entry["sections"].setdefault(section_name_of(key), section_name_of(key))
+    elif registry == "special_agent_info":
+        entry["special_agents"].append(key)
+    elif registry == "factory_settings":
+        _index_legacy_variable(key, value, entry)
+    return True
+
+
+def _registering_functions(tree: ast.Module) -> Set[str]:
+    """The functions of the file using the registries, directly or by calling each other"""
+    function_defs = {
+        node.name: node
+        for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    }
+    registering = {
+        name for name, node in function_defs.items() if _uses_legacy_registry([node], node)
+    }
+    while True:
+        callers = {
+            name for name, node in function_defs.items()
+            if name not in registering and _calls_any([node], registering)
+        }
+        if not callers:
+            return registering
+        registering.update(callers)
+
+
+def _calls_any(nodes: List[ast.AST], function_names: Set[str]) -> bool:
+    return any(
+        isinstance(sub_node, ast.Call) and isinstance(sub_node.func, ast.Name) and
+        sub_node.func.id in function_names for node in nodes for sub_node in ast.walk(node))
+
+
+def _uses_legacy_registry(nodes: List[ast.AST], statement: ast.stmt) -> bool:
+    """Whether the registries are used in other ways than the understood statements"""
+    understood: Set[int] = set()
+    if isinstance(statement, ast.Assign):
+        understood.update(
+            id(target.value) for target in statement.targets if isinstance(target, ast.Subscript))
+    elif isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call):
+        understood.add(id(getattr(statement.value.func, "value", None)))
+
+    return any(
+        isinstance(sub_node, ast.Name) and sub_node.id in _LEGACY_REGISTRIES and
+        id(sub_node) not in understood for node in nodes for sub_node in ast.walk(node))
+
+
+def _index_legacy_check(check_plugin_name: CheckPluginNameStr, entry: IndexEntry) -> None:
+    section_name = section_name_of(check_plugin_name)
+    entry["check_plugins"][maincheckify(check_plugin_name)] = [section_name]
+    if "." not in check_plugin_name:
+        entry["sections"][section_name] = section_name
+
+
+def _index_legacy_variable(varname: str, value: ast.AST, entry: IndexEntry) -> None:
+    if varname.startswith("_"):
+        return
+    try:
+        entry["variables"][varname] = ast.literal_eval(value)
+    except (ValueError, TypeError):
+        pass  # Not a literal, e.g. functions or compiled regexes
+
+
+def _subscript_index(node: ast.Subscript) -> Optional[ast.AST]:
+    index = node.slice
+    if isinstance(index, ast.Index):  # Python < 3.9
+        return index.value
+    return index
+
+
+_NOT_LITERAL = object()
+
+
+def _literal(node: Optional[ast.AST], default: Any = None) -> Any:
+    if node is None:
+        return default
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError):
+        return _NOT_LITERAL
@@ -6,19 +6,18 @@
 
 import os
 import struct
-import subprocess
 import threading
 import time
 from logging import Logger
 from pathlib import Path
-from typing import Any, AnyStr, Dict, Iterable, List, Optional, Tuple, Union
+from typing import Any, AnyStr, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from cmk.utils.log import VERBOSE
 from cmk.utils.render import date_and_time
 
-from .actions import quote_shell_string
 from .config import Config
 from .event import Event
+from .history_store import HistoryStore, convert_history_files
 from .query import QueryGET
 from .settings import Settings
 
@@ -38,6 +37,7 @@ class History:
         self._lock = threading.Lock()
         self._mongodb = MongoDB()
         self._active_history_period = ActiveHistoryPeriod()
+        self._store = HistoryStore(settings.paths.history_dir.value, logger)
         self.reload_configuration(config)
 
     def reload_configuration(self, config: Config) -> None:
@@ -291,15 +291,20 @@ def _get_mongodb(history: History, query: QueryGET) -> Iterable[Any]:
 
 
 def _reload_configuration_files(history: History) -> None:
-    pass
+    # Move the history of former versions into the indexed store
+    with history._lock:
+        convert_history_files(history._store, history._settings.paths.history_dir.value,
+                              history._logger)
 
 
 def _flush_files(history: History) -> None:
-    _expire_logfiles(history._settings, history._config, history._logger, history._lock, True)
+    _expire_logfiles(history._settings, history._config, history._logger, history._lock,
+                     history._store, True)
 
 
 def _housekeeping_files(history: History) -> None:
-    _expire_logfiles(history._settings, history._config, history._logger, history._lock, False)
+    _expire_logfiles(history._settings, history._config, history._logger, history._lock,
+                     history._store, False)
 
 
 # Make a new entry in the event history. Each entry is tab-separated line
@@ -323,9 +328,8 @@ def _add_files(history: History, event: Event, what: str, who: str, addinfo: str
             for colname, defval in history._event_columns
         ]
 
-        with get_logfile(history._config, history._settings.paths.history_dir.value,
-                         history._active_history_period).open(mode='ab') as f:
-            f.write(b"\t".join(columns) + b"\n")
+        history._store.add(_active_segment_period(history),
+                           b"\t".join(columns).decode("utf-8", errors="replace"))
 
 
 def quote_tab(col: Any) -> bytes:
@@ -374,6 +378,18 @@ def get_logfile(config: Config, log_dir: Path, active_history_period: ActiveHist
     return log_dir / ("%d.log" % timestamp)
 
 
+# Same as get_logfile(), but for the segments of the history store
+def _active_segment_period(history: History) -> int:
+    timestamp = _current_history_period(history._config)
+    active_history_period = history._active_history_period
+    if active_history_period.value is None or timestamp > active_history_period.value:
+        periods = [period for period, _path in history._store.segments()]
+        if periods:
+            timestamp = max(periods[-1], timestamp)
+        active_history_period.value = timestamp
+    return active_history_period.value
+
+
 # Return timestamp of the beginning of the current history
 # period.
 def _current_history_period(config: Config) -> int:
@@ -395,20 +411,20 @@ def _current_history_period(config: Config) -> int:
     return int(ts) - offset
 
 
-# Delete old log files
+# Delete the segments of the history store which have not been written to within the lifetime
 def _expire_logfiles(settings: Settings, config: Config, logger: Logger,
-                     lock_history: threading.Lock, flush: bool) -> None:
+                     lock_history: threading.Lock, store: HistoryStore, flush: bool) -> None:
     with lock_history:
         try:
             days = config["history_lifetime"]
             min_mtime = time.time() - days * 86400
             logger.log(VERBOSE, "Expiring logfiles (Horizon: %d days -> %s)", days,
                        date_and_time(min_mtime))
-            for path in settings.paths.history_dir.value.glob('*.log'):
-                if flush or path.stat().st_mtime < min_mtime:
-                    logger.info("Deleting log file %s (age %s)" %
-                                (path, date_and_time(path.stat().st_mtime)))
-                    path.unlink()
+            for _period, path in store.segments():
+                mtime = store.last_modified(path)
+                if flush or mtime < min_mtime:
+                    logger.info("Deleting log file %s (age %s)" % (path, date_and_time(mtime)))
+                    store.delete_segment(path)
         except Exception as e:
             if settings.options.debug:
                 raise
@@ -417,128 +433,29 @@ def _expire_logfiles(settings: Settings, config: Config, logger: Logger,
 
 def _get_files(history: History, logger: Logger, query: QueryGET) -> Iterable[Any]:
     filters, limit = query.filters, query.limit
-    history_entries: List[Any] = []
-    if not history._settings.paths.history_dir.value.exists():
-        return []
-
     logger.debug("Filters: %r", filters)
     logger.debug("Limit: %r", limit)
+    return _query_store(history, query, limit, logger)
 
-    # Be aware: The order here is important. It must match the order of the fields
-    # in the history file entries (See get_event_history_from_file). The fields in
-    # the file are currectly in the same order as StatusTableHistory.columns.
-    #
-    # Please note: Keep this in sync with livestatus/src/TableEventConsole.cc.
-    grepping_filters = [
-        'event_id',
-        'event_text',
-        'event_comment',
-        'event_host',
-        'event_host_regex',
-        'event_contact',
-        'event_application',
-        'event_rule_id',
-        'event_owner',
-        'event_ipaddress',
-        'event_core_host',
-    ]
-
-    # Optimization: use grep in order to reduce amount of read lines based on
-    # some frequently used filters.
-    #
-    # It's ok if the filters don't match 100% accurately on the right lines. If in
-    # doubt, you can output more lines than necessary. This is only a kind of
-    # prefiltering.
-    grep_pairs: List[Tuple[int, str]] = []
-    for column_name, operator_name, _predicate, argument in filters:
-        # Make sure that the greptexts are in the same order as in the
-        # actual logfiles. They will be joined with ".*"!
-        try:
-            nr = grepping_filters.index(column_name)
-            if operator_name in ['=', '~~']:
-                grep_pairs.append((nr, str(argument)))
-        except Exception:
-            pass
-
-    grep_pairs.sort()
-    greptexts = [x[1] for x in grep_pairs]
-    logger.debug("Texts for grep: %r", greptexts)
-
-    time_filters = [f for f in filters if f[0].split("_")[-1] == "time"]
-    logger.debug("Time filters: %r", time_filters)
-
-    # We do not want to open all files. So our strategy is:
-    # look for "time" filters and first apply the filter to
-    # the first entry and modification time of the file. Only
-    # if at least one of both timestamps is accepted then we
-    # take that file into account.
-    # Use the later logfiles first, to get the newer log entries
-    # first. When a limit is reached, the newer entries should
-    # be processed in most cases. We assume that now.
-    # To keep a consistent order of log entries, we should care
-    # about sorting the log lines in reverse, but that seems to
-    # already be done by the GUI, so we don't do that twice. Skipping
-    # this # will lead into some lines of a single file to be limited in
-    # wrong order. But this should be better than before.
-    for ts, path in sorted(((int(str(path.name)[:-4]), path)
-                            for path in history._settings.paths.history_dir.value.glob('*.log')),
-                           reverse=True):
-        if limit is not None and limit <= 0:
-            break
-        first_entry, last_entry = _get_logfile_timespan(path)
-        for _column_name, _operator_name, predicate, _argument in time_filters:
-            if predicate(first_entry):
-                break
-            if predicate(last_entry):
-                break
-        else:
-            # If no filter matches but we *have* filters
-            # then we skip this file. It cannot contain
-            # any useful entry for us.
-            if len(time_filters):
-                if history._settings.options.debug:
-                    history._logger.info("Skipping logfile %s.log because of time filter" % ts)
-                continue  # skip this file
-
-        new_entries = _parse_history_file(history, path, query, greptexts, limit, history._logger)
-        history_entries += new_entries
-        if limit is not None:
-            limit -= len(new_entries)
-
-    return history_entries
 
-
-def _parse_history_file(history: History, path: Path, query: Any, greptexts: List[str],
-                        limit: Optional[int], logger: Logger) -> List[Any]:
-    entries: List[Any] = []
-    line_no = 0
-    # If we have greptexts we pre-filter the file using the extremely
-    # fast GNU Grep
-    # Revert lines from the log file to have the newer lines processed first
-    cmd = 'tac %s' % quote_shell_string(str(path))
-    if greptexts:
-        cmd += " | egrep -i -e %s" % quote_shell_string(".*".join(greptexts))
-    grep = subprocess.Popen(cmd, shell=True, close_fds=True, stdout=subprocess.PIPE)  # nosec
-    if grep.stdout is None:
-        raise Exception("Huh? stdout vanished...")
-
-    for line in grep.stdout:
-        line_no += 1
-        if limit is not None and len(entries) > limit:
-            grep.kill()
-            grep.wait()
+def _query_store(history: History, query: QueryGET, limit: Optional[int],
+                 logger: Logger) -> Iterator[List[Any]]:
+    # The store only applies the filters on its indexed columns, all other
+    # filters are applied to the decoded entries. The newest entries are
+    # returned first, so a limit usually returns the interesting ones.
+    num_entries = 0
+    for line_no, entry in history._store.query(query.filters):
+        if limit is not None and num_entries >= limit:
             break
-
         try:
-            parts: List[Any] = line.decode('utf-8').rstrip('\n').split('\t')
+            parts: List[Any] = entry.split('\t')
             _convert_history_line(history, parts)
             values = [line_no] + parts
             if query.filter_row(values):
-                entries.append(values)
+                num_entries += 1
+                yield values
         except Exception as e:
-            logger.exception("Invalid line '%r' in history file %s: %s" % (line, path, e))
-
-    return entries
+            logger.exception("Invalid entry '%r' in history line %d: %s" % (entry, line_no, e))
 
 
 # Speed-critical function for converting string representation
@@ -591,19 +508,6 @@ def _unsplit(s: Any) -> Any:
     return s
 
 
-def _get_logfile_timespan(path: Path) -> Tuple[float, float]:
-    try:
-        with path.open(encoding="utf-8") as f:
-            first_entry = float(f.readline().split('\t', 1)[0])
-    except Exception:
-        first_entry = 0.0
-    try:
-        last_entry = path.stat().st_mtime
-    except Exception:
-        last_entry = 0.0
-    return first_entry, last_entry
-
-
 # Rip out/replace any characters which have a special meaning in the UTF-8
 # encoded history files, see e.g. quote_tab. In theory this shouldn't be
 # necessary, because there are a bunch of bytes which are not contained in any
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Indexed store for the event history of the file based archive
+
+The history is split into segments, one SQLite database per history period (see
+"history_rotation"). Expiring the history simply deletes whole segments.
+
+Each entry is saved in the tab separated format of the former history log files
+(see history.quote_tab()), together with indexed columns for the time, the host,
+the event ID and the rule ID of the entry. The filters of a query on these columns
+are translated to index lookups, the remaining filters are applied to the decoded
+entries by the caller.
+
+The line numbers of the entries (history_line) are unique across all segments and
+do not change, like the IDs of the entries in the MongoDB archive.
+"""
+
+import sqlite3
+from logging import Logger
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+SEGMENT_SUFFIX = ".sqlite"
+
+_SCHEMA = [
+    # host contains the lower case host name to support the case insensitive operators
+    """CREATE TABLE IF NOT EXISTS history (
+        line INTEGER PRIMARY KEY,
+        time REAL NOT NULL,
+        host TEXT NOT NULL,
+        event_id INTEGER NOT NULL,
+        rule_id TEXT NOT NULL,
+        data TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS history_time ON history (time)",
+    "CREATE INDEX IF NOT EXISTS history_host ON history (host)",
+    "CREATE INDEX IF NOT EXISTS history_event_id ON history (event_id)",
+    "CREATE INDEX IF NOT EXISTS history_rule_id ON history (rule_id)",
+]
+
+# Positions of the indexed values in the tab separated entries
+_TIME_FIELD = 0
+_EVENT_ID_FIELD = 4
+_HOST_FIELD = 11
+_RULE_ID_FIELD = 17
+
+_COMPARISON_OPERATORS = {"=", "<", ">", "<=", ">="}
+
+Filter = Tuple[str, str, Callable, Any]
+Condition = Tuple[str, List[Any]]
+
+
+class HistoryStore:
+    """The segments of the history in a directory
+
+    Adding entries and expiring segments must be serialized by the caller. Queries
+    use their own connections and may run concurrently."""
+    def __init__(self, directory: Path, logger: Logger) -> None:
+        super().__init__()
+        self._directory = directory
+        self._logger = logger
+        self._connection: Optional[sqlite3.Connection] = None
+        self._segment: Optional[Path] = None
+        self._next_line = 1
+
+    def segments(self) -> List[Tuple[int, Path]]:
+        """The periods and paths of all segments, the oldest first"""
+        if not self._directory.exists():
+            return []
+        return sorted((int(path.name[:-len(SEGMENT_SUFFIX)]), path)
+                      for path in self._directory.glob("*" + SEGMENT_SUFFIX))
+
+    def segment_path(self, period: int) -> Path:
+        return self._directory / ("%d%s" % (period, SEGMENT_SUFFIX))
+
+    def add(self, period: int, entry: str) -> None:
+        """Add an entry to the segment of the given period"""
+        connection = self._open_segment(self.segment_path(period))
+        with connection:
+            self._insert(connection, [entry])
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = None
+        self._segment = None
+
+    def _open_segment(self, path: Path) -> sqlite3.Connection:
+        if self._connection is not None and self._segment == path:
+            return self._connection
+
+        self.close()
+        # Continue with the line numbers of the newest segment in case this is a new one
+        newest = self.segments()
+        self._directory.mkdir(parents=True, exist_ok=True)
+        connection = _connect(path, check_same_thread=False)
+        max_line = connection.execute("SELECT max(line) FROM history").fetchone()[0]
+        if max_line is None and newest and newest[-1][1] != path:
+            max_line = _max_line(newest[-1][1])
+
+        self._connection = connection
+        self._segment = path
+        self._next_line = (max_line or 0) + 1
+        return connection
+
+    def _insert(self, connection: sqlite3.Connection, entries: Sequence[str]) -> None:
+        rows = []
+        for entry in entries:
+            fields = entry.split("\t", _RULE_ID_FIELD + 1)
+            rows.append((
+                self._next_line,
+                float(fields[_TIME_FIELD]),
+                fields[_HOST_FIELD].lower(),
+                int(fields[_EVENT_ID_FIELD]),
+                fields[_RULE_ID_FIELD],
+                entry,
+            ))
+            self._next_line += 1
+        connection.executemany("INSERT INTO history VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def delete_segment(self, path: Path) -> None:
+        if path == self._segment:
+            self.close()
+        for file_path in [path] + _sidecar_files(path):
+            if file_path.exists():
+                file_path.unlink()
+
+    def last_modified(self, path: Path) -> float:
+        # The changes are written to the write ahead log first
+        return max(p.stat().st_mtime for p in [path] + _sidecar_files(path) if p.exists())
+
+    def query(self, filters: Sequence[Filter]) -> Iterator[Tuple[int, str]]:
+        """Yield the line numbers and the entries possibly matching the filters, the newest first
+
+        Only the filters which can be answered by the indexes are applied, so the
+        caller has to apply all filters to the decoded entries."""
+        conditions = _index_conditions(filters)
+        where = " AND ".join(c for c, _a in conditions) or "1"
+        arguments = [a for _c, args in conditions for a in args]
+        time_conditions = _index_conditions([f for f in filters if f[0] == "history_time"])
+
+        for _period, path in reversed(self.segments()):
+            try:
+                connection = _connect(path, read_only=True)
+            except sqlite3.Error:
+                continue  # e.g. expired in the meantime
+
+            try:
+                if time_conditions and not _segment_in_time_range(connection, time_conditions):
+                    continue
+                yield from connection.execute(
+                    "SELECT line, data FROM history WHERE %s ORDER BY line DESC" % where, arguments)
+            except sqlite3.Error as e:
+                self._logger.error("Cannot read history segment %s: %s", path, e)
+            finally:
+                connection.close()
+
+    def convert_log_file(self, log_file: Path) -> None:
+        """Move the entries of a history log file of former versions into its segment"""
+        path = self.segment_path(int(log_file.name[:-4]))
+        with log_file.open(encoding="utf-8", errors="replace") as f:
+            entries = [line.rstrip("\n") for line in f if line.strip()]
+
+        connection = self._open_segment(path)
+        if entries and not _contains(connection, entries[-1]):
+            with connection:
+                self._insert(connection, [e for e in entries if _is_valid_entry(e)])
+        self.close()
+        log_file.unlink()
+
+
+def convert_history_files(store: HistoryStore, directory: Path, logger: Logger) -> None:
+    """Convert the history log files of former versions, the oldest first"""
+    if not directory.exists():
+        return
+
+    for _period, log_file in sorted(
+        (int(p.name[:-4]), p) for p in directory.glob("*.log") if p.name[:-4].isdigit()):
+        logger.info("Converting history file %s", log_file)
+        try:
+            store.convert_log_file(log_file)
+        except Exception as e:
+            logger.exception("Failed to convert history file %s: %s", log_file, e)
+
+
+def _connect(path: Path,
+             read_only: bool = False,
+             check_same_thread: bool = True) -> sqlite3.Connection:
+    if read_only:
+        return sqlite3.connect("file:%s?mode=ro" % path, uri=True)
+
+    connection = sqlite3.connect(str(path), check_same_thread=check_same_thread)
+    # Readers do not block the writer with a write ahead log. Syncing the log to
+    # disk with every entry is not needed, the log files were never synced either.
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    with connection:
+        for statement in _SCHEMA:
+            connection.execute(statement)
+    return connection
+
+
+def _sidecar_files(path: Path) -> List[Path]:
+    return [path.with_name(path.name + "-wal"), path.with_name(path.name + "-shm")]
+
+
+def _max_line(path: Path) -> Optional[int]:
+    try:
+        connection = _connect(path, read_only=True)
+    except sqlite3.Error:
+        return None
+    try:
+        return connection.execute("SELECT max(line) FROM history").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def _contains(connection: sqlite3.Connection, entry: str) -> bool:
+    time = float(entry.split("\t", 1)[0])
+    return connection.execute("SELECT 1 FROM history WHERE time = ? AND data = ?",
+                              (time, entry)).fetchone() is not None
+
+
+def _is_valid_entry(entry: str) -> bool:
+    fields = entry.split("\t", _RULE_ID_FIELD + 1)
+    try:
+        float(fields[_TIME_FIELD])
+        int(fields[_EVENT_ID_FIELD])
+        return len(fields) > _RULE_ID_FIELD
+    except (ValueError, IndexError):
+        return False
+
+
+def _segment_in_time_range(connection: sqlite3.Connection,
+                           time_conditions: List[Condition]) -> bool:
+    first, last = connection.execute("SELECT min(time), max(time) FROM history").fetchone()
+    if first is None:
+        return False
+    for condition, arguments in time_conditions:
+        operator = condition.split()[1]
+        value = arguments[0]
+        if operator == "=" and not first <= value <= last:
+            return False
+        if operator in ("<", "<=") and first > value:
+            return False
+        if operator in (">", ">=") and last < value:
+            return False
+    return True
+
+
+def _index_conditions(filters: Sequence[Filter]) -> List[Condition]:
+    """Translate the filters on indexed columns to SQL conditions
+
+    The conditions may match more entries than the filters, e.g. the host
+    names are compared case insensitive."""
+    conditions: List[Condition] = []
+    for column_name, operator_name, _predicate, argument in filters:
+        if column_name in ("history_line", "history_time", "event_id"):
+            if operator_name in _COMPARISON_OPERATORS:
+                sql_column = {
+                    "history_line": "line",
+                    "history_time": "time",
+                    "event_id": "event_id",
+                }[column_name]
+                conditions.append(("%s %s ?" % (sql_column, operator_name), [argument]))
+
+        elif column_name == "event_host":
+            if operator_name in ("=", "=~"):
+                conditions.append(("host = ?", [argument.lower()]))
+            elif operator_name == "in":
+                conditions.append(("host IN (%s)" % ", ".join("?" * len(argument)),
+                                   [a.lower() for a in argument]))
+
+        elif column_name == "event_rule_id":
+            if operator_name == "=":
+                conditions.append(("rule_id = ?", [argument]))
+
+    return conditions
@@ -80,6 +80,7 @@ from .query import MKClientError, Query, QueryGET, filter_operator_in
 from .rule_packs import load_config as load_config_using
 from .settings import FileDescriptor, PortNumber, Settings, settings as create_settings
 from .snmp import SNMPTrapEngine
+from .status_store import StatusStore
 
 
 class MatchPriority(NamedTuple):
@@ -452,6 +453,7 @@ class Perfcounters:
         "processing": 0.99,  # event processing
         "sync": 0.95,  # Replication sync
         "request": 0.95,  # Client requests
+        "save": 0.9,  # Saving the event status
     }
 
     # TODO: Why aren't self._times / self._rates / ... not initialized with their defaults?
@@ -3143,6 +3145,7 @@ class EventStatus:
         self.lock = threading.Lock()
         self._history = history
         self._logger = logger
+        self._status_store = StatusStore(settings.paths.status_file.value, logger)
         self.flush()
 
     def reload_configuration(self, config: Config) -> None:
@@ -3222,20 +3225,19 @@ class EventStatus:
         self._events = status["events"]
         self._rule_stats = status["rule_stats"]
         self._interval_starts = status["interval_starts"]
+        # The journal cannot express the order of the replicated events
+        self._status_store.request_snapshot()
 
     def save_status(self):
         now = time.time()
-        status = self.pack_status()
-        path = self.settings.paths.status_file.value
-        path_new = path.parent / (path.name + '.new')
-        # Believe it or not: cPickle is more than two times slower than repr()
-        with path_new.open(mode='wb') as f:
-            f.write((repr(status) + "\n").encode("utf-8"))
-            f.flush()
-            os.fsync(f.fileno())
-        path_new.rename(path)
+        num_changes = self._status_store.save(self.pack_status())
         elapsed = time.time() - now
-        self._logger.log(VERBOSE, "Saved event state to %s in %.3fms.", path, elapsed * 1000)
+        self._perfcounters.count_time("save", elapsed)
+        self._logger.log(VERBOSE, "Saved %d changes of the event state to %s in %.3fms.",
+                         num_changes, self.settings.paths.status_file.value, elapsed * 1000)
+
+    def wait_for_snapshot(self) -> None:
+        self._status_store.wait_for_snapshot()
 
     def reset_counters(self, rule_id):
         if rule_id:
@@ -3247,17 +3249,17 @@ class EventStatus:
 
     def load_status(self, event_server):
         path = self.settings.paths.status_file.value
-        if path.exists():
-            try:
-                status = ast.literal_eval(path.read_text(encoding="utf-8"))
+        try:
+            status = self._status_store.load()
+            if status is not None:
                 self._next_event_id = status["next_event_id"]
                 self._events = status["events"]
                 self._rule_stats = status["rule_stats"]
-                self._interval_starts = status.get("interval_starts", {})
+                self._interval_starts = status["interval_starts"]
                 self._logger.info("Loaded event state from %s." % path)
-            except Exception as e:
-                self._logger.exception("Error loading event state from %s: %s" % (path, e))
-                raise
+        except Exception as e:
+            self._logger.exception("Error loading event state from %s: %s" % (path, e))
+            raise
 
         # Add new columns and fix broken events
         for event in self._events:
@@ -3971,6 +3973,7 @@ def main() -> None:
 
         logger.log(VERBOSE, "Saving final event state")
         event_status.save_status()
+        event_status.wait_for_snapshot()
 
         logger.log(VERBOSE, "Cleaning up sockets")
         settings.paths.unix_socket.value.unlink()
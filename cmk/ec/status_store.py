@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Journaled persistence of the event status
+
+The status (open events, rule statistics, ...) is saved as a snapshot in the
+status file plus a journal of the changes made since the snapshot. Saving the
+status only appends the created, updated and deleted events to the journal, so
+the time needed does not depend on the number of open events anymore. When the
+journal has grown large enough, a new snapshot is written by a background thread.
+
+The journal is split into numbered files. A snapshot contains the number of the
+first journal file which is not contained in it. Loading the status reads the
+snapshot and replays the following journal files.
+
+The snapshot and the journal entries use the repr() format of the former status
+file, which is still read by load().
+"""
+
+import ast
+import os
+import threading
+from logging import Logger
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Start a new snapshot when the journal contains more records than this number
+# or the number of open events, whatever is larger.
+MIN_JOURNAL_RECORDS_FOR_SNAPSHOT = 1000
+
+Status = Dict[str, Any]
+EventCopies = Dict[int, Dict[str, Any]]
+
+_STATE_KEYS = ["next_event_id", "rule_stats", "interval_starts"]
+
+
+class StatusStore:
+    """The snapshot and the journal of the status in the status file"""
+    def __init__(self, path: Path, logger: Logger) -> None:
+        super().__init__()
+        self._path = path
+        self._logger = logger
+        self._lock = threading.Lock()
+        # The events and the state as they are saved, used to compute the changes
+        self._saved_events: EventCopies = {}
+        self._saved_state: Status = {}
+        self._journal_number = 0
+        self._journal_records = 0
+        self._snapshot_requested = False
+        self._snapshot_thread: Optional[threading.Thread] = None
+
+    def _journal_path(self, number: int) -> Path:
+        return self._path.parent / ("%s.journal.%d" % (self._path.name, number))
+
+    def _journal_paths(self) -> List[Tuple[int, Path]]:
+        prefix = self._path.name + ".journal."
+        return sorted((int(p.name[len(prefix):]), p)
+                      for p in self._path.parent.glob(prefix + "*")
+                      if p.name[len(prefix):].isdigit())
+
+    def load(self) -> Optional[Status]:
+        """Read the snapshot and replay the journal, returns None without a saved status"""
+        with self._lock:
+            status: Optional[Status] = None
+            first_journal = 0
+            if self._path.exists():
+                status = ast.literal_eval(self._path.read_text(encoding="utf-8"))
+                assert status is not None
+                status.setdefault("interval_starts", {})
+                # Status files of former versions have no journal
+                first_journal = status.get("journal", -1)
+
+            journals = self._journal_paths()
+            events = {event["id"]: event for event in status["events"]} if status else {}
+            for number, path in journals:
+                if number < first_journal or first_journal == -1:
+                    continue
+                if status is None:
+                    status = {"next_event_id": 1, "rule_stats": {}, "interval_starts": {}}
+                self._replay(path, status, events)
+
+            self._journal_number = journals[-1][0] + 1 if journals else 0
+            if status is None:
+                return None
+
+            status["events"] = list(events.values())
+            status.pop("journal", None)
+            self._remember(status)
+            if first_journal == -1:
+                # Make the loaded state the base of the following journal
+                self._write_snapshot(self._snapshot_status(status), self._journal_number)
+            return status
+
+    def _replay(self, path: Path, status: Status, events: EventCopies) -> None:
+        with path.open(encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    record = ast.literal_eval(line)
+                except (SyntaxError, ValueError):
+                    # An incomplete record of an interrupted save is the last one
+                    self._logger.warning("Ignoring invalid record in line %d of %s", line_no, path)
+                    break
+
+                what = record[0]
+                if what == "event":
+                    # Updated events keep their position, new ones are appended
+                    events[record[1]["id"]] = record[1]
+                elif what == "delete":
+                    events.pop(record[1], None)
+                elif what == "state":
+                    status.update(record[1])
+
+    def request_snapshot(self) -> None:
+        """Write a snapshot with the next save, e.g. after the order of the events changed"""
+        self._snapshot_requested = True
+
+    def save(self, status: Status) -> int:
+        """Append the changes since the last save to the journal, returns the number of changes
+
+        The caller must prevent concurrent changes of the status."""
+        with self._lock:
+            records = self._changes(status)
+            if records:
+                with self._journal_path(self._journal_number).open(mode="a", encoding="utf-8") as f:
+                    f.write("".join(repr(record) + "\n" for record in records))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._journal_records += len(records)
+
+            if self._snapshot_requested or self._journal_records > max(
+                    MIN_JOURNAL_RECORDS_FOR_SNAPSHOT, len(status["events"])):
+                self._start_snapshot(status)
+            return len(records)
+
+    def _changes(self, status: Status) -> List[Tuple[str, Any]]:
+        records: List[Tuple[str, Any]] = []
+        saved_events = self._saved_events
+        current_ids = set()
+        for event in status["events"]:
+            event_id = event["id"]
+            current_ids.add(event_id)
+            if saved_events.get(event_id) != event:
+                saved = dict(event)
+                saved_events[event_id] = saved
+                records.append(("event", saved))
+
+        for event_id in [i for i in saved_events if i not in current_ids]:
+            del saved_events[event_id]
+            records.append(("delete", event_id))
+
+        state = {key: status[key] for key in _STATE_KEYS}
+        if state != self._saved_state:
+            self._saved_state = _copy_state(state)
+            records.append(("state", self._saved_state))
+        return records
+
+    def _remember(self, status: Status) -> None:
+        self._saved_events = {event["id"]: dict(event) for event in status["events"]}
+        self._saved_state = _copy_state({key: status[key] for key in _STATE_KEYS})
+
+    def _snapshot_status(self, status: Status) -> Status:
+        # The saved copies are replaced, not changed, by later saves
+        snapshot = dict(self._saved_state)
+        snapshot["events"] = [self._saved_events[event["id"]] for event in status["events"]]
+        return snapshot
+
+    def _start_snapshot(self, status: Status) -> None:
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return  # Try again with the next save
+
+        snapshot = self._snapshot_status(status)
+
+        # The snapshot contains all journal files up to the current one
+        self._journal_number += 1
+        self._journal_records = 0
+        self._snapshot_requested = False
+        self._snapshot_thread = threading.Thread(target=self._write_snapshot,
+                                                 args=(snapshot, self._journal_number),
+                                                 name="StatusSnapshot")
+        self._snapshot_thread.start()
+
+    def _write_snapshot(self, snapshot: Status, first_journal: int) -> None:
+        try:
+            snapshot["journal"] = first_journal
+            path_new = self._path.parent / (self._path.name + '.new')
+            # Believe it or not: cPickle is more than two times slower than repr()
+            with path_new.open(mode='wb') as f:
+                f.write((repr(snapshot) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            path_new.rename(self._path)
+
+            for number, path in self._journal_paths():
+                if number < first_journal:
+                    path.unlink()
+            self._logger.info("Saved event state snapshot to %s", self._path)
+        except Exception as e:
+            self._logger.exception("Error saving event state snapshot to %s: %s", self._path, e)
+
+    def wait_for_snapshot(self) -> None:
+        thread = self._snapshot_thread
+        if thread is not None:
+            thread.join()
+
+
+def _copy_state(state: Status) -> Status:
+    return {key: value.copy() if isinstance(value, dict) else value for key, value in state.items()}
@@ -7,8 +7,10 @@
 import time
 import os
 import functools
+from pathlib import Path
 
 from typing import Callable, Set, Dict, Any, Union, List, NamedTuple, Tuple as _Tuple, Optional as _Optional
+from typing import Iterable, Iterator
 from six import ensure_str
 
 from livestatus import SiteId
@@ -23,6 +25,8 @@ from cmk.utils.cpu_tracking import CPUTracker
 
 import cmk.gui.utils as utils
 import cmk.gui.sites as sites
+import cmk.gui.config as config
+import cmk.gui.availability_rollups as availability_rollups
 from cmk.gui.view_utils import CSSClass
 from cmk.gui.type_defs import Rows, Row
 from cmk.gui.valuespec import (
@@ -51,6 +55,7 @@ AVSpan = Dict[str, Any]  # TODO: Improve this type
 SiteHost = _Tuple[SiteId, HostName]
 AVRawServices = Dict[ServiceName, List[AVSpan]]
 AVRawData = Dict[SiteHost, AVRawServices]
+AVObjectSpans = _Tuple[SiteHost, ServiceName, List[AVSpan]]
 AVEntry = Any
 AVData = List[AVEntry]
 AVTimelineSpan = _Tuple[_Optional[int], str, float, CSSClass]
@@ -703,6 +708,31 @@ def get_availability_rawdata(what,
         return get_bi_availability_rawdata(filterheaders, only_sites, av_object, include_output,
                                            avoptions)
 
+    av_objects, exceeded_log_row_limit = get_availability_spans(what, context, filterheaders,
+                                                                only_sites, av_object,
+                                                                include_output, include_long_output,
+                                                                avoptions, view_process_tracking)
+    av_rawdata: AVRawData = {}
+    for site_host, service, spans in av_objects:
+        av_rawdata.setdefault(site_host, {})[service] = spans
+    return av_rawdata, exceeded_log_row_limit
+
+
+def get_availability_spans(what: AVObjectType,
+                           context,
+                           filterheaders: str,
+                           only_sites: _Optional[List[SiteId]],
+                           av_object: AVObjectSpec,
+                           include_output: bool,
+                           include_long_output: bool,
+                           avoptions: AVOptions,
+                           view_process_tracking=None) -> _Tuple[Iterator[AVObjectSpans], bool]:
+    """Get the spans of the hosts or services, one object after the other
+
+    The objects are in the order of their first span and the spans of each object in
+    the order of the statehist table, like in the result of get_availability_rawdata().
+    The spans of an object are only created when the object is reached, see
+    compute_availability_of_objects()."""
     time_range: AVTimeRange = avoptions["range"][0]
 
     av_filter = "Filter: time >= %d\nFilter: time < %d\n" % time_range
@@ -719,6 +749,81 @@ def get_availability_rawdata(what,
     query = "GET statehist\n" + av_filter
     query += "Timelimit: %d\n" % avoptions["timelimit"]
 
+    columns = _get_availability_columns(include_output, include_long_output, avoptions)
+    query += "Columns: %s\n" % " ".join(columns)
+    query += filterheaders
+    logrow_limit = avoptions["logrow_limit"]
+    columns = ["site"] + columns
+
+    with CPUTracker() as fetch_rows_tracker:
+        rollup_spans = None
+        if not av_object and _rollups_applicable(what, include_output, include_long_output,
+                                                 avoptions):
+            rollup_spans = _get_spans_with_rollups(what, filterheaders, only_sites, columns[1:],
+                                                   avoptions)
+
+        if rollup_spans is not None:
+            rows = [[span[column] for column in columns] for span in rollup_spans]
+        else:
+            with sites.only_sites(only_sites), sites.prepend_site(), sites.set_limit(logrow_limit or
+                                                                                     None):
+                rows = sites.live().query(query)
+    num_rows = len(rows)
+
+    # Now we find out if the log row limit was exceeded or
+    # if the log's length is the limit by accident.
+    # If this limit was exceeded then we cut off the last element
+    # because it might be incomplete.
+    exceeded_log_row_limit: bool = False
+    if rollup_spans is None and logrow_limit and num_rows > logrow_limit:
+        exceeded_log_row_limit = True
+        del rows[-1]
+
+    with CPUTracker() as filter_rows_tracker:
+        _sort_rows_by_object(rows)
+
+    if view_process_tracking:
+        view_process_tracking.amount_unfiltered_rows = num_rows
+        view_process_tracking.amount_filtered_rows = num_rows
+        view_process_tracking.rows_after_limit = len(rows)
+        view_process_tracking.duration_fetch_rows = fetch_rows_tracker.duration
+        view_process_tracking.duration_filter_rows = filter_rows_tracker.duration
+
+    return _iter_spans_by_object(context, avoptions, columns, rows), exceeded_log_row_limit
+
+
+def _sort_rows_by_object(rows: List[List[Any]]) -> None:
+    # Sort by site/host and service, while keeping native order
+    first_rows: Dict[_Tuple[SiteId, HostName, ServiceName], int] = {}
+    for index, row in enumerate(rows):
+        first_rows.setdefault((row[0], row[1], row[2]), index)
+    rows.sort(key=lambda row: first_rows[(row[0], row[1], row[2])])
+
+
+def _iter_spans_by_object(context, avoptions: AVOptions, columns: List[str],
+                          rows: List[List[Any]]) -> Iterator[AVObjectSpans]:
+    spans: List[AVSpan] = []
+    for index, row in enumerate(rows):
+        rows[index] = []  # Free the rows already turned into spans
+        if spans and (row[0], row[1], row[2]) != (spans[0]["site"], spans[0]["host_name"],
+                                                  spans[0]["service_description"]):
+            yield _object_spans(context, avoptions, spans)
+            spans = []
+        spans.append(dict(zip(columns, row)))
+
+    if spans:
+        yield _object_spans(context, avoptions, spans)
+
+
+def _object_spans(context, avoptions: AVOptions, spans: List[AVSpan]) -> AVObjectSpans:
+    # When a group filter is set, only care about these groups in the group fields
+    if avoptions["grouping"] not in [None, "host"]:
+        filter_groups_of_entries(context, avoptions, spans)
+    return (spans[0]["site"], spans[0]["host_name"]), spans[0]["service_description"], spans
+
+
+def _get_availability_columns(include_output: bool, include_long_output: bool,
+                              avoptions: AVOptions) -> List[str]:
     # Add Columns needed for object identification
     columns = ["host_name", "service_description"]
 
@@ -747,41 +852,166 @@ def get_availability_rawdata(what,
     # If we group by host/service group then make sure that that information is available
     if avoptions["grouping"] not in [None, "host"]:
         columns.append(avoptions["grouping"])
+    return columns
 
-    query += "Columns: %s\n" % " ".join(columns)
-    query += filterheaders
-    logrow_limit = avoptions["logrow_limit"]
 
-    with sites.only_sites(only_sites), sites.prepend_site(), sites.set_limit(
-            logrow_limit or None), CPUTracker() as fetch_rows_tracker:
-        data = sites.live().query(query)
+def _rollups_applicable(what: AVObjectType, include_output: bool, include_long_output: bool,
+                        avoptions: AVOptions) -> bool:
+    """Whether the result only depends on the time each object spent in each state
 
-    columns = ["site"] + columns
-    spans: List[AVSpan] = [dict(zip(columns, span)) for span in data]
-    amount_filtered_rows = len(spans)
+    The daily rollups lose the order and the length of the single spans. This is
+    fine for the state durations of the availability table, but not for a timeline,
+    the outage statistics or melting short intervals. The rollups also do not
+    contain output, display names, aliases and group memberships of the spans."""
+    if not config.availability_rollups or what not in ["host", "service"]:
+        return False
+    if include_output or include_long_output or avoptions["show_timeline"]:
+        return False
+    if avoptions["short_intervals"] or all(get_outage_statistic_options(avoptions)):
+        return False
+    if avoptions["grouping"] not in [None, "host"]:
+        return False
+    return not {"use_display_name", "show_alias"}.intersection(avoptions["labelling"])
 
-    # When a group filter is set, only care about these groups in the group fields
-    with CPUTracker() as filter_rows_tracker:
-        if avoptions["grouping"] not in [None, "host"]:
-            filter_groups_of_entries(context, avoptions, spans)
 
-    # Now we find out if the log row limit was exceeded or
-    # if the log's length is the limit by accident.
-    # If this limit was exceeded then we cut off the last element
-    # because it might be incomplete.
-    exceeded_log_row_limit: bool = False
+def _get_spans_with_rollups(what: AVObjectType, filterheaders: str,
+                            only_sites: _Optional[List[SiteId]], columns: List[str],
+                            avoptions: AVOptions) -> _Optional[List[AVSpan]]:
+    """Get the spans of the time range from the daily rollups and the edges of the range
+
+    The closed days within the time range are taken from the rollups, which are filled
+    with one statehist query per missing day. Only the remaining edges of the time range
+    are queried from the statehist table. Each object gets one span per combination of
+    span attributes for the closed days. This results in the same state durations as
+    the statehist spans of the whole range.
+
+    Returns None in case the rollups can not be used for this query. The caller has
+    to query the spans of the whole time range then."""
+    time_range: AVTimeRange = avoptions["range"][0]
+    now = time.time()
+    days = availability_rollups.closed_days(time_range, now)
+    if not days or _annotations_reclassify(days[0][0], days[-1][1]):
+        return None
+
+    auth_user = sites.livestatus_auth_user()
+    scope = availability_rollups.scope_of(what, filterheaders, auth_user)
+    rollups = availability_rollups.StatehistRollups(
+        Path(cmk.utils.paths.var_dir, "availability_rollups.sqlite"))
+    rollups.use_scope(scope, now)
+
+    object_filter = "Filter: service_description %s\n" % ("!=" if what == "service" else "=")
+    leading_spans = trailing_spans = None
+    if int(time_range[0]) < days[0][0]:
+        leading_spans = _query_statehist((time_range[0], days[0][0]), object_filter + filterheaders,
+                                         only_sites, columns, avoptions["timelimit"],
+                                         avoptions["logrow_limit"])
+        if leading_spans is None:
+            return None
+    if days[-1][1] < int(time_range[1]):
+        trailing_spans = _query_statehist((days[-1][1], time_range[1]),
+                                          object_filter + filterheaders, only_sites, columns,
+                                          avoptions["timelimit"], avoptions["logrow_limit"])
+        if trailing_spans is None:
+            return None
+    edge_spans = [spans for spans in [leading_spans, trailing_spans] if spans is not None]
+
+    query_sites = [
+        site_id for site_id in sites.live().alive_sites()
+        if only_sites is None or site_id in only_sites
+    ]
+    summaries = {}
+    for site_id in query_sites:
+        for day in rollups.missing_days(scope, site_id, days):
+            # The closed days are stored, they must not be cut by the limits
+            day_spans = _query_statehist(day, object_filter + filterheaders, [site_id],
+                                         ["host_name", "service_description", "duration"] +
+                                         availability_rollups.ROLLUP_COLUMNS, None, None)
+            assert day_spans is not None
+            rollups.add_day(scope, site_id, day, day_spans)
+        summaries[site_id] = rollups.summarize(scope, site_id, days)
+
+    # The statehist table starts to track an object at the beginning of the queried time
+    # range or when it appears in the history. Queried on its own, a day is the same as
+    # the day within a longer range for all objects the history knows of before the day.
+    # This is the case when an object is contained in every part of the time range. The
+    # other objects, e.g. the ones created or removed within the range, are queried for
+    # the whole time range.
+    objects_per_edge = [{(s["site"], s["host_name"], s["service_description"])
+                         for s in spans}
+                        for spans in edge_spans]
+    complete_objects = {(site_id, host_name, service_description)
+                        for site_id, summary in summaries.items()
+                        for (host_name, service_description), (num_days,
+                                                               _durations) in summary.items()
+                        if num_days == len(days)}
+    for objects in objects_per_edge:
+        complete_objects &= objects
+    incomplete_objects = set.union(
+        {(site_id, host_name, service_description)
+         for site_id, summary in summaries.items()
+         for host_name, service_description in summary}, *objects_per_edge) - complete_objects
+
+    spans_of_range: List[AVSpan] = []
+    if incomplete_objects:
+        incomplete_filter = "".join(
+            "Filter: host_name = %s\nFilter: service_description = %s\nAnd: 2\n" %
+            (host_name, service_description)
+            for _site_id, host_name, service_description in sorted(incomplete_objects))
+        if len(incomplete_objects) > 1:
+            incomplete_filter += "Or: %d\n" % len(incomplete_objects)
+        spans = _query_statehist(time_range, object_filter + incomplete_filter + filterheaders,
+                                 sorted({site_id for site_id, _h, _s in incomplete_objects}),
+                                 columns, avoptions["timelimit"], avoptions["logrow_limit"])
+        if spans is None:
+            return None
+        spans_of_range += [
+            span for span in spans
+            if (span["site"], span["host_name"], span["service_description"]) in incomplete_objects
+        ]
+
+    # Keep the order of the spans within each object: leading edge, days, trailing edge
+    rollup_spans = []
+    for site_id, summary in sorted(summaries.items()):
+        for object_key, (_num_days, durations) in sorted(summary.items()):
+            if (site_id,) + object_key in complete_objects:
+                rollup_spans += availability_rollups.rollup_spans(site_id, object_key, durations,
+                                                                  days)
+    for spans in [leading_spans, rollup_spans, trailing_spans]:
+        spans_of_range += [
+            span for span in spans or []
+            if (span["site"], span["host_name"], span["service_description"]) in complete_objects
+        ]
+    return spans_of_range
+
+
+def _query_statehist(time_range: AVTimeRange, filters: str, only_sites: _Optional[List[SiteId]],
+                     columns: List[str], timelimit: _Optional[int],
+                     logrow_limit: _Optional[int]) -> _Optional[List[AVSpan]]:
+    """Get the spans of a part of the time range, None in case the log row limit is exceeded"""
+    query = "GET statehist\nFilter: time >= %d\nFilter: time < %d\n" % time_range
+    if timelimit:
+        query += "Timelimit: %d\n" % timelimit
+    query += "Columns: %s\n" % " ".join(columns)
+    query += filters
+
+    with sites.only_sites(only_sites), sites.prepend_site(), sites.set_limit(logrow_limit or None):
+        data = sites.live().query(query)
     if logrow_limit and len(data) > logrow_limit:
-        exceeded_log_row_limit = True
-        spans = spans[:-1]
+        return None
+    return [dict(zip(["site"] + columns, span)) for span in data]
 
-    if view_process_tracking:
-        view_process_tracking.amount_unfiltered_rows = len(data)
-        view_process_tracking.amount_filtered_rows = amount_filtered_rows
-        view_process_tracking.rows_after_limit = len(spans)
-        view_process_tracking.duration_fetch_rows = fetch_rows_tracker.duration
-        view_process_tracking.duration_filter_rows = filter_rows_tracker.duration
 
-    return spans_by_object(spans), exceeded_log_row_limit
+def _annotations_reclassify(from_time: int, until_time: int) -> bool:
+    """Whether annotations change the spans within the given time"""
+    for annotation_entries in load_annotations().values():
+        for annotation in annotation_entries:
+            if all(
+                    annotation.get(key) is None
+                    for key in ["downtime", "host_state", "service_state"]):
+                continue
+            if annotation["from"] < until_time and annotation["until"] > from_time:
+                return True
+    return False
 
 
 def filter_groups_of_entries(context, avoptions, spans):
@@ -856,7 +1086,20 @@ def spans_by_object(spans: List[AVSpan]) -> AVRawData:
 
 # Compute an availability table. what is one of "bi", "host", "service".
 def compute_availability(what: AVObjectType, av_rawdata: AVRawData, avoptions: AVOptions) -> AVData:
-    reclassified_rawdata = reclassify_by_annotations(what, av_rawdata)
+    return compute_availability_of_objects(what, ((site_host, service, spans)
+                                                  for site_host, services in av_rawdata.items()
+                                                  for service, spans in services.items()),
+                                           avoptions)
+
+
+def compute_availability_of_objects(what: AVObjectType, av_objects: Iterable[AVObjectSpans],
+                                    avoptions: AVOptions) -> AVData:
+    """Compute an availability table from the spans of one object after the other
+
+    The spans of an object are not needed anymore once its entry is computed, apart
+    from the ones contained in the timeline of the entry. Together with
+    get_availability_spans() only the spans of one object need to be in memory."""
+    annotations = load_annotations()
 
     # Now compute availability table. We have the following possible states:
     # 1. "unmonitored"
@@ -879,123 +1122,122 @@ def compute_availability(what: AVObjectType, av_rawdata: AVRawData, avoptions: A
     grouping = avoptions["grouping"]
 
     # Note: in case of timeline, we have data from exacly one host/service
-    for site_host, site_host_entry in reclassified_rawdata.items():
-        for service, service_entry in site_host_entry.items():
+    for site_host, service, service_entry in av_objects:
+        service_entry = _reclassify_object_by_annotations(what, annotations, site_host, service,
+                                                          service_entry)
 
-            if grouping == "host":
-                group_ids: AVGroupIds = [site_host]
-            elif grouping in ["host_groups", "service_groups"]:
-                group_ids = set()
-            else:
-                group_ids = None
-
-            # First compute timeline
-            timeline_rows: AVTimelineRows = []
-            total_duration = 0
-            considered_duration = 0
-            for span in service_entry:
-
-                # Information about host/service groups are in the actual entries
-                if grouping in ["host_groups", "service_groups"] and what != "bi":
-                    assert isinstance(group_ids, set)
-                    group_ids.update(span[grouping])  # List of host/service groups
-
-                display_name = span.get("service_display_name", service)
-                state = span["state"]
-                host_alias = span.get("host_alias", site_host[1])
-                consider = True
-
-                if avoptions["service_period"] != "ignore" and (
-                    (span["in_service_period"] and avoptions["service_period"] != "honor") or
-                    (not span["in_service_period"] and avoptions["service_period"] == "honor")):
-                    s = "outof_service_period"
-                    consider = False
-                elif state == -1:
-                    s = "unmonitored"
-                    if not avoptions["consider"]["unmonitored"]:
-                        consider = False
-                elif state is None:
-                    # state is None means that this element was not known at this given time
-                    # So there is no reason for creating a fake pending state
+        if grouping == "host":
+            group_ids: AVGroupIds = [site_host]
+        elif grouping in ["host_groups", "service_groups"]:
+            group_ids = set()
+        else:
+            group_ids = None
+
+        # First compute timeline
+        timeline_rows: AVTimelineRows = []
+        total_duration = 0
+        considered_duration = 0
+        for span in service_entry:
+
+            # Information about host/service groups are in the actual entries
+            if grouping in ["host_groups", "service_groups"] and what != "bi":
+                assert isinstance(group_ids, set)
+                group_ids.update(span[grouping])  # List of host/service groups
+
+            display_name = span.get("service_display_name", service)
+            state = span["state"]
+            host_alias = span.get("host_alias", site_host[1])
+            consider = True
+
+            if avoptions["service_period"] != "ignore" and (
+                (span["in_service_period"] and avoptions["service_period"] != "honor") or
+                (not span["in_service_period"] and avoptions["service_period"] == "honor")):
+                s = "outof_service_period"
+                consider = False
+            elif state == -1:
+                s = "unmonitored"
+                if not avoptions["consider"]["unmonitored"]:
                     consider = False
-                elif span["in_notification_period"] == 0 and avoptions[
-                        "notification_period"] == "exclude":
+            elif state is None:
+                # state is None means that this element was not known at this given time
+                # So there is no reason for creating a fake pending state
+                consider = False
+            elif span["in_notification_period"] == 0 and avoptions[
+                    "notification_period"] == "exclude":
+                consider = False
+
+            elif span["in_notification_period"] == 0 and avoptions["notification_period"] == "honor":
+                s = "outof_notification_period"
+
+            elif (span["in_downtime"] or span["in_host_downtime"]
+                 ) and not (avoptions["downtimes"]["exclude_ok"] and
+                            state == 0) and not avoptions["downtimes"]["include"] == "ignore":
+                if avoptions["downtimes"]["include"] == "exclude":
                     consider = False
+                else:
+                    s = "in_downtime"
+            elif what != "host" and span["host_down"] and avoptions["consider"]["host_down"]:
+                # Reclassification due to state grouping
+                s = avoptions["state_grouping"].get("host_down", "host_down")
 
-                elif span["in_notification_period"] == 0 and avoptions[
-                        "notification_period"] == "honor":
-                    s = "outof_notification_period"
-
-                elif (span["in_downtime"] or span["in_host_downtime"]
-                     ) and not (avoptions["downtimes"]["exclude_ok"] and
-                                state == 0) and not avoptions["downtimes"]["include"] == "ignore":
-                    if avoptions["downtimes"]["include"] == "exclude":
-                        consider = False
-                    else:
-                        s = "in_downtime"
-                elif what != "host" and span["host_down"] and avoptions["consider"]["host_down"]:
-                    # Reclassification due to state grouping
-                    s = avoptions["state_grouping"].get("host_down", "host_down")
-
-                elif span["is_flapping"] and avoptions["consider"]["flapping"]:
-                    s = "flapping"
+            elif span["is_flapping"] and avoptions["consider"]["flapping"]:
+                s = "flapping"
+            else:
+                if what in ["service", "bi"]:
+                    s = {0: "ok", 1: "warn", 2: "crit", 3: "unknown"}.get(state, "unmonitored")
+                else:
+                    s = {0: "up", 1: "down", 2: "unreach"}.get(state, "unmonitored")
+
+                # Reclassification due to state grouping
+                if s in avoptions["state_grouping"]:
+                    s = avoptions["state_grouping"][s]
+
+                elif s in avoptions["host_state_grouping"]:
+                    s = avoptions["host_state_grouping"][s]
+
+            total_duration += span["duration"]
+            if consider:
+                timeline_rows.append((span, s))
+                considered_duration += span["duration"]
+
+        # Now merge consecutive rows with identical state
+        if not avoptions["dont_merge"]:
+            merge_timeline(timeline_rows)
+
+        # Melt down short intervals
+        if avoptions["short_intervals"]:
+            melt_short_intervals(timeline_rows, avoptions["short_intervals"],
+                                 avoptions["dont_merge"])
+
+        # Condense into availability
+        states: AVTimelineStates = {}
+        statistics: AVTimelineStatistics = {}
+        for span, s in timeline_rows:
+            states.setdefault(s, 0)
+            duration = span["duration"]
+            states[s] += duration
+            if need_statistics:
+                entry = statistics.get(s)
+                if entry:
+                    statistics[s] = (entry[0] + 1, min(entry[1], duration), max(entry[2], duration))
                 else:
-                    if what in ["service", "bi"]:
-                        s = {0: "ok", 1: "warn", 2: "crit", 3: "unknown"}.get(state, "unmonitored")
-                    else:
-                        s = {0: "up", 1: "down", 2: "unreach"}.get(state, "unmonitored")
-
-                    # Reclassification due to state grouping
-                    if s in avoptions["state_grouping"]:
-                        s = avoptions["state_grouping"][s]
-
-                    elif s in avoptions["host_state_grouping"]:
-                        s = avoptions["host_state_grouping"][s]
-
-                total_duration += span["duration"]
-                if consider:
-                    timeline_rows.append((span, s))
-                    considered_duration += span["duration"]
-
-            # Now merge consecutive rows with identical state
-            if not avoptions["dont_merge"]:
-                merge_timeline(timeline_rows)
-
-            # Melt down short intervals
-            if avoptions["short_intervals"]:
-                melt_short_intervals(timeline_rows, avoptions["short_intervals"],
-                                     avoptions["dont_merge"])
-
-            # Condense into availability
-            states: AVTimelineStates = {}
-            statistics: AVTimelineStatistics = {}
-            for span, s in timeline_rows:
-                states.setdefault(s, 0)
-                duration = span["duration"]
-                states[s] += duration
-                if need_statistics:
-                    entry = statistics.get(s)
-                    if entry:
-                        statistics[s] = (entry[0] + 1, min(entry[1],
-                                                           duration), max(entry[2], duration))
-                    else:
-                        statistics[s] = (1, duration, duration)  # count, min, max
-
-            availability_entry: AVEntry = {
-                "site": site_host[0],
-                "host": site_host[1],
-                "alias": host_alias,
-                "service": service,
-                "display_name": display_name,
-                "states": states,
-                "considered_duration": considered_duration,
-                "total_duration": total_duration,
-                "statistics": statistics,
-                "groups": group_ids,
-                "timeline": timeline_rows,
-            }
-
-            availability_table.append(availability_entry)
+                    statistics[s] = (1, duration, duration)  # count, min, max
+
+        availability_entry: AVEntry = {
+            "site": site_host[0],
+            "host": site_host[1],
+            "alias": host_alias,
+            "service": service,
+            "display_name": display_name,
+            "states": states,
+            "considered_duration": considered_duration,
+            "total_duration": total_duration,
+            "statistics": statistics,
+            "groups": group_ids,
+            "timeline": timeline_rows,
+        }
+
+        availability_table.append(availability_entry)
 
     # Apply filters
     filtered_table = []  # Type: AVData
@@ -1013,26 +1255,31 @@ def reclassify_by_annotations(what: AVObjectType, av_rawdata: AVRawData) -> AVRa
         return av_rawdata
 
     reclassified_rawdata: AVRawData = {}
-    for (site, host_name), history_entries in av_rawdata.items():
+    for site_host, history_entries in av_rawdata.items():
         new_entries: AVRawServices = {}
-        reclassified_rawdata[(site, host_name)] = new_entries
+        reclassified_rawdata[site_host] = new_entries
         for service_description, history in history_entries.items():
-            cycles: List[AVAnnotationKey] = []
-            cycles.append((site, host_name, service_description or None))
-            if what == "service":
-                cycles.insert(0, (site, host_name, None))
-
-            for anno_key in cycles:
-                if anno_key in annotations:
-                    new_entries[service_description] = \
-                          reclassify_history_by_annotations(history, annotations[anno_key])
-                    history = new_entries[service_description]
-                else:
-                    new_entries[service_description] = history
+            new_entries[service_description] = _reclassify_object_by_annotations(
+                what, annotations, site_host, service_description, history)
 
     return reclassified_rawdata
 
 
+def _reclassify_object_by_annotations(what: AVObjectType, annotations: AVAnnotations,
+                                      site_host: SiteHost, service_description: ServiceName,
+                                      history: List[AVSpan]) -> List[AVSpan]:
+    site, host_name = site_host
+    cycles: List[AVAnnotationKey] = []
+    cycles.append((site, host_name, service_description or None))
+    if what == "service":
+        cycles.insert(0, (site, host_name, None))
+
+    for anno_key in cycles:
+        if anno_key in annotations:
+            history = reclassify_history_by_annotations(history, annotations[anno_key])
+    return history
+
+
 ReclassifyConfig = NamedTuple("ReclassifyConfig", [
     ("downtime", _Optional[Any]),
     ("host_state", _Optional[Any]),
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Precomputed daily rollups of the state history for availability reports
+
+Computing the availability of a long time range makes livestatus replay the
+monitoring history of the whole range. Most of the range consists of days which
+have passed, so their history does not change anymore. The rollups store the
+result of the statehist table for each of these closed days: For each object the
+time spent with each combination of the span attributes the availability
+computation looks at (state, downtimes, flapping, host down, notification and
+service period). The computation itself is left to cmk.gui.availability, which
+gets one span per object and combination instead of the original spans.
+
+The days are filled on demand with one statehist query per day and site. The
+rollups are kept separately for each "scope", the combination of the queried
+object type, the filter headers and the livestatus auth user, since these decide
+about the objects and spans the statehist table returns.
+"""
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from livestatus import SiteId
+
+# The span attributes which decide about the classification of a span
+ROLLUP_COLUMNS = [
+    "state",
+    "host_down",
+    "in_downtime",
+    "in_host_downtime",
+    "in_notification_period",
+    "in_service_period",
+    "is_flapping",
+]
+
+# A day is closed when it has ended for this number of seconds. Livestatus may not
+# have seen the latest log entries of all sites yet.
+CLOSED_DAY_DELAY = 600
+
+# Rollups of scopes that were not used for this number of seconds are removed
+SCOPE_MAX_AGE = 86400 * 31
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS scopes (
+        scope TEXT PRIMARY KEY,
+        last_used REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS days (
+        scope TEXT NOT NULL,
+        site TEXT NOT NULL,
+        day INTEGER NOT NULL,
+        PRIMARY KEY (scope, site, day)
+    )""",
+    """CREATE TABLE IF NOT EXISTS rollups (
+        scope TEXT NOT NULL,
+        site TEXT NOT NULL,
+        day INTEGER NOT NULL,
+        host_name TEXT NOT NULL,
+        service_description TEXT NOT NULL,
+        %s,
+        duration INTEGER NOT NULL
+    )""" % ",\n        ".join("%s INTEGER" % column for column in ROLLUP_COLUMNS),
+    "CREATE INDEX IF NOT EXISTS rollups_day ON rollups (scope, site, day)",
+]
+
+Day = Tuple[int, int]
+ObjectKey = Tuple[str, str]
+RollupKey = Tuple[Optional[int], ...]
+ObjectRollup = Tuple[int, Dict[RollupKey, int]]
+
+
+def scope_of(what: str, filterheaders: str, auth_user: Optional[str]) -> str:
+    return hashlib.sha256(repr((what, filterheaders, auth_user)).encode("utf-8")).hexdigest()
+
+
+def closed_days(time_range: Tuple[float, float], now: float) -> List[Day]:
+    """The local days (start, end) which are completely within the range and have passed"""
+    start, end = time_range
+    end = min(end, now - CLOSED_DAY_DELAY)
+
+    day_start = _midnight(start, 0)
+    if day_start < start:
+        day_start = _midnight(start, 1)
+
+    days: List[Day] = []
+    while True:
+        day_end = _midnight(day_start, 1)
+        if day_end > end:
+            return days
+        days.append((day_start, day_end))
+        day_start = day_end
+
+
+def _midnight(timestamp: float, days_later: int) -> int:
+    # mktime() normalizes the day of month and takes care of DST changes
+    t = time.localtime(timestamp)
+    return int(time.mktime((t.tm_year, t.tm_mon, t.tm_mday + days_later, 0, 0, 0, 0, 0, -1)))
+
+
+class StatehistRollups:
+    """The rollups of the closed days in an SQLite database
+
+    The GUI processes may fill the same days concurrently, a day is only added once."""
+    def __init__(self, path: Path) -> None:
+        super().__init__()
+        self._path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self._path), timeout=60)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def use_scope(self, scope: str, now: float) -> None:
+        """Mark the scope as used and remove the rollups of scopes not used for a long time"""
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO scopes VALUES (?, ?)", (scope, now))
+                expired = [
+                    row[0]
+                    for row in connection.execute("SELECT scope FROM scopes WHERE last_used < ?", (
+                        now - SCOPE_MAX_AGE,))
+                ]
+                for expired_scope in expired:
+                    for table in ["scopes", "days", "rollups"]:
+                        connection.execute("DELETE FROM %s WHERE scope = ?" % table,
+                                           (expired_scope,))
+        finally:
+            connection.close()
+
+    def missing_days(self, scope: str, site: SiteId, days: List[Day]) -> List[Day]:
+        connection = self._connect()
+        try:
+            present = {
+                row[0] for row in connection.execute(
+                    "SELECT day FROM days WHERE scope = ? AND site = ? AND day >= ? AND day < ?", (
+                        scope, site, days[0][0], days[-1][1]))
+            }
+        finally:
+            connection.close()
+        return [day for day in days if day[0] not in present]
+
+    def add_day(self, scope: str, site: SiteId, day: Day, spans: Iterable[Dict]) -> None:
+        """Add the statehist spans of a closed day of a site"""
+        rollups: Dict[Tuple[str, str, RollupKey], int] = {}
+        for span in spans:
+            key = (span["host_name"], span["service_description"],
+                   tuple(span[column] for column in ROLLUP_COLUMNS))
+            rollups[key] = rollups.get(key, 0) + span["duration"]
+
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                if connection.execute("SELECT 1 FROM days WHERE scope = ? AND site = ? AND day = ?",
+                                      (scope, site, day[0])).fetchone():
+                    return  # Added by another process in the meantime
+                connection.execute("INSERT INTO days VALUES (?, ?, ?)", (scope, site, day[0]))
+                connection.executemany(
+                    "INSERT INTO rollups VALUES (%s)" % ", ".join(["?"] *
+                                                                  (len(ROLLUP_COLUMNS) + 6)),
+                    [(scope, site, day[0], host_name, service_description) + key + (duration,)
+                     for (host_name, service_description, key), duration in rollups.items()])
+        finally:
+            connection.close()
+
+    def summarize(self, scope: str, site: SiteId, days: List[Day]) -> Dict[ObjectKey, ObjectRollup]:
+        """The number of days each object appears on and its durations summed up over the days"""
+        columns = ", ".join(ROLLUP_COLUMNS)
+        summary: Dict[ObjectKey, ObjectRollup] = {}
+        connection = self._connect()
+        try:
+            condition = "scope = ? AND site = ? AND day >= ? AND day < ?"
+            args = (scope, site, days[0][0], days[-1][1])
+            for host_name, service_description, num_days in connection.execute(
+                    "SELECT host_name, service_description, COUNT(DISTINCT day) FROM rollups"
+                    " WHERE %s GROUP BY host_name, service_description" % condition, args):
+                summary[(host_name, service_description)] = (num_days, {})
+
+            for row in connection.execute(
+                    "SELECT host_name, service_description, %s, SUM(duration) FROM rollups"
+                    " WHERE %s GROUP BY host_name, service_description, %s ORDER BY %s" %
+                (columns, condition, columns, columns), args):
+                summary[(row[0], row[1])][1][tuple(row[2:-1])] = row[-1]
+        finally:
+            connection.close()
+        return summary
+
+
+def rollup_spans(site: SiteId, object_key: ObjectKey, durations: Dict[RollupKey, int],
+                 days: List[Day]) -> List[Dict]:
+    """Spans covering the closed days which sum up to the durations of the rollups"""
+    spans = []
+    for key, duration in durations.items():
+        span = {
+            "site": site,
+            "host_name": object_key[0],
+            "service_description": object_key[1],
+            "duration": duration,
+            "from": days[0][0],
+            "until": days[-1][1],
+        }
+        span.update(zip(ROLLUP_COLUMNS, key))
+        spans.append(span)
+    return spans
@@ -16,7 +16,7 @@ from cmk.utils.bi.bi_packs import BIAggregationPacks
 from cmk.utils.bi.bi_data_fetcher import BIStatusFetcher
 from cmk.utils.bi.bi_compiler import BICompiler
 from cmk.utils.bi.bi_lib import SitesCallback, BIStates, NodeResultBundle
-from cmk.utils.bi.bi_computer import BIComputer, BIAggregationFilter
+from cmk.utils.bi.bi_computer import BIComputer, BIAggregationFilter, BIStateCache
 from cmk.utils.bi.bi_trees import BICompiledRule
 
 from cmk.gui.exceptions import MKConfigError
@@ -927,13 +927,21 @@ def singlehost_table(view, columns, query, only_sites, limit, all_active_filters
     return rows
 
 
+# The computed states are kept between the requests handled by this process, so only the
+# changed parts of the aggregations need to be computed again.
+_bi_state_cache = BIStateCache()
+
+
 class BIManager:
     def __init__(self):
         sites_callback = SitesCallback(cmk.gui.sites.states, bi_livestatus_query)
-        self.compiler = BICompiler(self.bi_configuration_file(), sites_callback)
+        self.compiler = BICompiler(self.bi_configuration_file(), sites_callback,
+                                   config.bi_compilation_processes)
         self.compiler.load_compiled_aggregations()
         self.status_fetcher = BIStatusFetcher(sites_callback)
-        self.computer = BIComputer(self.compiler.compiled_aggregations, self.status_fetcher)
+        _bi_state_cache.set_compilation_time(self.compiler.get_compilation_time())
+        self.computer = BIComputer(self.compiler.compiled_aggregations, self.status_fetcher,
+                                   _bi_state_cache)
 
     @classmethod
     def bi_configuration_file(cls) -> str:
@@ -956,7 +964,8 @@ def get_cached_bi_manager() -> BIManager:
 def get_cached_bi_compiler() -> BICompiler:
     if "bi_compiler" not in g:
         sites_callback = SitesCallback(cmk.gui.sites.states, bi_livestatus_query)
-        g.bi_compiler = BICompiler(BIManager.bi_configuration_file(), sites_callback)
+        g.bi_compiler = BICompiler(BIManager.bi_configuration_file(), sites_callback,
+                                   config.bi_compilation_processes)
     return g.bi_compiler
 
 
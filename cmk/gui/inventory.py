@@ -10,7 +10,7 @@ import os
 import shutil
 import time
 import xml.dom.minidom  # type: ignore[import]
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Set, Tuple
 from pathlib import Path
 
 import dicttoxml  # type: ignore[import]
@@ -18,6 +18,14 @@ import dicttoxml  # type: ignore[import]
 import livestatus
 
 import cmk.utils.paths
+from cmk.utils.inventory_archive import (
+    diff_raw_trees,
+    InventoryArchive,
+    RawDelta,
+    RawTree,
+    restrict_to_delta,
+)
+from cmk.utils.inventory_index import InventoryIndex, inventory_index_path
 from cmk.utils.structured_data import StructuredDataTree, Container, Numeration, Attributes
 from cmk.utils.exceptions import (
     MKException,
@@ -113,14 +121,68 @@ def load_filtered_and_merged_tree(row):
     merge these trees and returns the filtered tree"""
     hostname = row.get("host_name")
     inventory_tree = _load_structured_data_tree("inventory", hostname)
+    merged_tree = _merge_inventory_and_status_data_tree(inventory_tree, load_status_data_tree(row))
+    return _filter_tree(merged_tree)
+
+
+def load_status_data_tree(row) -> Optional[StructuredDataTree]:
+    """Load the status data tree from row"""
     status_data_tree = _create_tree_from_raw_tree(row.get("host_structured_status"))
     # If no data from livestatus could be fetched (CRE) try to load from cache
     # or status dir
     if status_data_tree is None:
-        status_data_tree = _load_structured_data_tree("status_data", hostname)
+        status_data_tree = _load_structured_data_tree("status_data", row.get("host_name"))
+    return status_data_tree
 
-    merged_tree = _merge_inventory_and_status_data_tree(inventory_tree, status_data_tree)
-    return _filter_tree(merged_tree)
+
+def get_inventory_index(hostnames: Iterable[HostName]) -> Tuple[InventoryIndex, Set[HostName]]:
+    """The inventory index with the trees of the given hosts being up to date
+
+    The trees are normally indexed when they are saved by the inventory. Trees of hosts
+    which are missing or outdated, e.g. after an update, are indexed here. Also returns
+    the hosts with a corrupted inventory tree."""
+    index = InventoryIndex(inventory_index_path())
+    indexed_mtimes = index.mtimes()
+    corrupted_hosts = set()
+    for hostname in set(hostnames):
+        if '/' in hostname:
+            continue  # just for security reasons
+
+        path = Path(cmk.utils.paths.inventory_output_dir, hostname)
+        try:
+            mtime = int(path.stat().st_mtime)
+        except OSError:
+            if hostname in indexed_mtimes:
+                index.remove_host(hostname)
+            continue
+
+        if indexed_mtimes.get(hostname) == mtime:
+            continue
+
+        try:
+            raw_tree = store.load_object_from_file(path, default={})
+        except Exception as e:
+            if config.debug:
+                html.show_warning("%s" % e)
+            corrupted_hosts.add(hostname)
+            continue
+        index.update_host(hostname, raw_tree, mtime)
+    return index, corrupted_hosts
+
+
+def filter_and_merge_indexed_rows(inventory_path: str, rows: List[Dict],
+                                  status_data_tree: Optional[StructuredDataTree]):
+    """Like load_filtered_and_merged_tree(), but the inventory tree only consists of
+    the rows of the table at the inventory path, taken from the inventory index"""
+    inventory_tree = StructuredDataTree()
+    if rows:
+        inventory_tree.get_list(inventory_path).extend(rows)
+    return _filter_tree(_merge_inventory_and_status_data_tree(inventory_tree, status_data_tree))
+
+
+def has_restricted_inventory_paths() -> bool:
+    """Whether the user is only permitted to see parts of the inventory trees"""
+    return _get_permitted_inventory_paths() is not None
 
 
 def get_status_data_via_livestatus(site, hostname):
@@ -160,11 +222,12 @@ def get_history_deltas(hostname, search_timestamp=None):
 
     latest_timestamp = str(int(os.stat(inventory_path).st_mtime))
     inventory_archive_dir = "%s/inventory_archive/%s" % (cmk.utils.paths.var_dir, hostname)
-    try:
-        archived_timestamps = sorted(os.listdir(inventory_archive_dir))
-    except OSError:
+    if not os.path.isdir(inventory_archive_dir):
         return [], []
 
+    archive = InventoryArchive(Path(inventory_archive_dir))
+    archived_timestamps = archive.timestamps()
+
     all_timestamps = archived_timestamps + [latest_timestamp]
     previous_timestamp = None
 
@@ -178,25 +241,8 @@ def get_history_deltas(hostname, search_timestamp=None):
             previous_timestamp = all_timestamps[new_timestamp_idx - 1]
             required_timestamps = [search_timestamp]
 
-    tree_lookup: Dict[str, Any] = {}
-
-    def get_tree(timestamp):
-        if timestamp is None:
-            return StructuredDataTree()
-
-        if timestamp in tree_lookup:
-            return tree_lookup[timestamp]
-
-        if timestamp == latest_timestamp:
-            inventory_tree = load_filtered_inventory_tree(hostname)
-            if inventory_tree is None:
-                return
-            tree_lookup[timestamp] = inventory_tree
-        else:
-            inventory_archive_path = "%s/%s" % (inventory_archive_dir, timestamp)
-            tree_lookup[timestamp] = _filter_tree(
-                StructuredDataTree().load_from(inventory_archive_path))
-        return tree_lookup[timestamp]
+    # Only the trees up to the searched one are reconstructed
+    history = _InventoryHistory(inventory_path, latest_timestamp, archive, search_timestamp)
 
     corrupted_history_files = []
     delta_history = []
@@ -219,9 +265,7 @@ def get_history_deltas(hostname, search_timestamp=None):
             continue
 
         try:
-            previous_tree = get_tree(previous_timestamp)
-            current_tree = get_tree(timestamp)
-            delta_data = current_tree.compare_with(previous_tree)
+            delta_data = history.compare(previous_timestamp, timestamp)
             new, changed, removed, delta_tree = delta_data
             if new or changed or removed:
                 store.save_file(
@@ -238,6 +282,74 @@ def get_history_deltas(hostname, search_timestamp=None):
     return delta_history, corrupted_history_files
 
 
+class _InventoryHistory:
+    """The inventory trees of a host, reconstructed from the archive on demand
+
+    The archive reconstructs the trees from the newest to the oldest one. The trees
+    share their unchanged branches, so all of them are kept."""
+    def __init__(self, inventory_path: str, latest_timestamp: str, archive: InventoryArchive,
+                 newest_timestamp: Optional[str]) -> None:
+        super().__init__()
+        self._inventory_path = inventory_path
+        self._latest_timestamp = latest_timestamp
+        self._archive = archive
+        self._newest_timestamp = newest_timestamp
+        self._raw_trees: Dict[str, Optional[RawTree]] = {}
+        self._deltas: Dict[str, Optional[RawDelta]] = {}
+        self._archived_trees: Optional[Iterator] = None
+
+    def compare(self, previous_timestamp: Optional[str], timestamp: str):
+        """Compare the trees of two neighbouring timestamps
+
+        The delta stored in the archive between the trees tells which branches differ.
+        Only these are compared."""
+        raw_tree = self._get_raw_tree(timestamp)
+        if previous_timestamp is None:
+            return _filter_tree(_create_tree(raw_tree)).compare_with(StructuredDataTree())
+
+        previous_raw_tree = self._get_raw_tree(previous_timestamp)
+        delta = self._deltas.get(previous_timestamp)
+        if delta is None:
+            delta = diff_raw_trees(raw_tree, previous_raw_tree)
+
+        return _filter_tree(_create_tree(restrict_to_delta(raw_tree, delta))).compare_with(
+            _filter_tree(_create_tree(restrict_to_delta(previous_raw_tree, delta))))
+
+    def _get_raw_tree(self, timestamp: str) -> RawTree:
+        if timestamp == self._latest_timestamp:
+            self._load_current_raw_tree()
+        elif timestamp not in self._raw_trees:
+            if self._archived_trees is None:
+                self._archived_trees = self._archive.iter_trees(self._load_current_raw_tree,
+                                                                newest=self._newest_timestamp)
+            for archived_timestamp, raw_tree, delta in self._archived_trees:
+                self._raw_trees.setdefault(archived_timestamp, raw_tree)
+                self._deltas[archived_timestamp] = delta
+                if archived_timestamp <= timestamp:
+                    break
+
+        raw_tree = self._raw_trees.get(timestamp)
+        if raw_tree is None:
+            raise LoadStructuredDataError()
+        return raw_tree
+
+    def _load_current_raw_tree(self) -> Optional[RawTree]:
+        if self._latest_timestamp in self._raw_trees:
+            return self._raw_trees[self._latest_timestamp]
+        try:
+            raw_tree = store.load_object_from_file(self._inventory_path, default={})
+        except Exception as e:
+            if config.debug:
+                html.show_warning("%s" % e)
+            raw_tree = None
+        self._raw_trees[self._latest_timestamp] = raw_tree
+        return raw_tree
+
+
+def _create_tree(raw_tree: RawTree) -> StructuredDataTree:
+    return StructuredDataTree().create_tree_from_raw_tree(raw_tree)
+
+
 def get_short_inventory_filepath(hostname):
     return Path(cmk.utils.paths.inventory_output_dir).joinpath(hostname).relative_to(
         cmk.utils.paths.omd_root)
@@ -178,6 +178,15 @@ custom_links['admin'] = custom_links['user'] + [("Support", False, [
 
 debug_livestatus_queries = False
 
+# Cache the livestatus responses for this number of seconds (0 disables caching)
+livestatus_query_cache_ttl = 0
+
+# Compute availability reports from precomputed daily rollups of the state history
+availability_rollups = True
+
+# Take the rows of multi host inventory views from the site wide inventory index
+inventory_index = True
+
 # Show livestatus errors in multi site setup if some sites are
 # not reachable.
 show_livestatus_errors = True
@@ -520,6 +529,7 @@ bi_packs: _Dict = {}
 
 default_bi_layout = {"node_style": "builtin_hierarchy", "line_style": "straight"}
 bi_layouts: _Dict[str, _Dict] = {"templates": {}, "aggregations": {}}
+bi_compilation_processes = 1
 
 # Deprecated. Kept for compatibility.
 bi_compile_log = None
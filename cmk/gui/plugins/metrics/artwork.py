@@ -19,6 +19,7 @@ from cmk.gui.plugins.metrics import unit_info
 
 from cmk.gui.plugins.metrics import timeseries
 from cmk.gui.plugins.metrics import rrd_fetch
+from cmk.gui.plugins.metrics.graph_data_cache import graph_data_cache
 
 Label = Tuple[int, Optional[str], int]
 
@@ -258,6 +259,12 @@ def areastack(raw_points, base):
 
 
 def compute_graph_artwork_curves(graph_recipe, graph_data_range):
+    return graph_data_cache.get_curves(
+        graph_recipe, graph_data_range,
+        lambda: _compute_graph_artwork_curves(graph_recipe, graph_data_range))
+
+
+def _compute_graph_artwork_curves(graph_recipe, graph_data_range):
     # Fetch all raw RRD data
     rrd_data = rrd_fetch.fetch_rrd_data_for_graph(graph_recipe, graph_data_range)
 
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Cache of the computed graph curves
+
+Dashboards on wall displays render the same graphs for the same time window over and
+over again. The computed curves of a graph are kept in the GUI process, identified by
+the graph recipe, the time range rounded to the step and the objects the user is
+allowed to see. An entry is valid until the next step begins, new RRD data may be
+available then.
+"""
+
+import collections
+import copy
+import hashlib
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import cmk.gui.sites as sites
+from cmk.gui.log import logger
+
+# Expiry time, computation duration and curves of an entry
+_CacheEntry = Tuple[float, float, Any]
+
+
+class GraphDataCache:
+    def __init__(self, max_entries: int = 128) -> None:
+        super().__init__()
+        self._max_entries = max_entries
+        self._entries: 'collections.OrderedDict[str, _CacheEntry]' = collections.OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._saved_seconds = 0.0
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def statistics(self) -> Dict[str, float]:
+        """The number of hits and misses and the computation time saved by the hits"""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "saved_seconds": self._saved_seconds,
+        }
+
+    def get_curves(self, graph_recipe: Dict[str, Any], graph_data_range: Dict[str, Any],
+                   compute: Callable[[], Any]) -> Any:
+        """The curves of the graph, computed by compute() in case they are not cached
+
+        The caller gets its own copy of the curves and may modify it."""
+        step = _step_of(graph_data_range)
+        key = _cache_key(graph_recipe, graph_data_range, step, _permission_key())
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None and now < entry[0]:
+            self._entries.move_to_end(key)
+            self._hits += 1
+            self._saved_seconds += entry[1]
+            self._log_statistics()
+            return copy.deepcopy(entry[2])
+
+        self._misses += 1
+        curves = compute()
+        duration = time.time() - now
+
+        # Expires when the next step begins
+        self._entries[key] = ((now // step + 1) * step, duration, copy.deepcopy(curves))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        self._log_statistics()
+        return curves
+
+    def _log_statistics(self) -> None:
+        logger.debug("Graph data cache: %d hits, %d misses, %.3f seconds saved", self._hits,
+                     self._misses, self._saved_seconds)
+
+
+def _step_of(graph_data_range: Dict[str, Any]) -> int:
+    step = graph_data_range["step"]
+    # A str step is the step length and the number of RRD points, separated by a colon
+    if isinstance(step, str):
+        step = step.split(":")[0]
+    return max(1, int(float(step)))
+
+
+def _permission_key() -> Tuple[Optional[str], Tuple[str, ...]]:
+    """The Livestatus auth user and the sites, which limit the data the user gets"""
+    return sites.livestatus_auth_user(), tuple(sorted(sites.live().alive_sites()))
+
+
+def _cache_key(graph_recipe: Dict[str, Any], graph_data_range: Dict[str, Any], step: int,
+               permission_key: Tuple[Optional[str], Tuple[str, ...]]) -> str:
+    start_time, end_time = graph_data_range["time_range"]
+    return hashlib.sha256(
+        repr((
+            graph_recipe,
+            int(start_time) // step * step,
+            int(end_time) // step * step,
+            graph_data_range["step"],
+            permission_key,
+        )).encode("utf-8")).hexdigest()
+
+
+graph_data_cache = GraphDataCache()
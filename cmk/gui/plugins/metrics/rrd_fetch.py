@@ -14,7 +14,7 @@ import livestatus
 import cmk.utils.version as cmk_version
 from cmk.gui.plugins.metrics.utils import check_metrics, reverse_translate_metric_name
 import cmk.gui.plugins.metrics.timeseries as ts
-from cmk.utils.prediction import livestatus_lql, TimeSeries
+from cmk.utils.prediction import lq_logic, TimeSeries
 from cmk.gui.i18n import _
 from cmk.gui.exceptions import MKGeneralException
 import cmk.gui.sites as sites
@@ -27,14 +27,10 @@ def fetch_rrd_data_for_graph(graph_recipe, graph_data_range):
 
     by_service = group_needed_rrd_data_by_service(needed_rrd_data)
     rrd_data: Dict[Tuple[str, str, str, str, str, str], TimeSeries] = {}
-    for (site, host_name, service_description), entries in by_service.items():
-        try:
-            for (perfvar, cf, scale), data in \
-                fetch_rrd_data(site, host_name, service_description, entries, graph_recipe, graph_data_range):
-                rrd_data[(site, host_name, service_description, perfvar, cf,
-                          scale)] = TimeSeries(data)
-        except livestatus.MKLivestatusNotFoundError:
-            pass
+    for (site, host_name, service_description), entries, row in \
+            fetch_rrd_data_of_services(by_service, graph_recipe, graph_data_range):
+        for (perfvar, cf, scale), data in zip(entries, row):
+            rrd_data[(site, host_name, service_description, perfvar, cf, scale)] = TimeSeries(data)
 
     align_and_resample_rrds(rrd_data, graph_recipe["consolidation_function"])
     chop_last_empty_step(graph_data_range, rrd_data)
@@ -134,7 +130,64 @@ def group_needed_rrd_data_by_service(needed_rrd_data):
     return by_service
 
 
-def fetch_rrd_data(site, host_name, service_description, entries, graph_recipe, graph_data_range):
+def fetch_rrd_data_of_services(
+    by_service: Dict[Tuple[str, str, str], Set[Tuple[Any, Any, Any]]],
+    graph_recipe,
+    graph_data_range,
+) -> Iterator[Tuple[Tuple[str, str, str], List[Tuple[Any, Any, Any]], List[Any]]]:
+    """Fetch the RRD data of all the given services with as few Livestatus queries as possible
+
+    The services needing the same RRD columns are fetched with a single query to all of their
+    sites, which are queried in parallel by the multisite connection. Yields the service, the
+    metrics and the RRD data of each metric. Services which are not found are skipped."""
+    point_range = _point_range(graph_data_range)
+
+    by_columns: Dict[Tuple[bool, Tuple[Tuple[Any, Any, Any], ...]],
+                     List[Tuple[str, str, str]]] = collections.defaultdict(list)
+    for service, entries in by_service.items():
+        # The metrics can not be sorted directly, the consolidation function may be None
+        by_columns[(service[2] == "_HOST_", tuple(sorted(entries, key=repr)))].append(service)
+
+    for (is_host, entries), services in by_columns.items():
+        lql_columns = list(rrd_columns(entries, graph_recipe["consolidation_function"],
+                                       point_range))
+        query = _services_rrd_query(services, lql_columns, is_host)
+
+        with sites.only_sites(sorted({site for site, _host_name, _svc_desc in services})), \
+                sites.prepend_site():
+            rows = sites.live().query(query)
+
+        requested = set(services)
+        for row in rows:
+            if is_host:
+                service = (row[0], row[1], "_HOST_")
+                data = row[2:]
+            else:
+                service = (row[0], row[1], row[2])
+                data = row[3:]
+
+            # Hosts with the same name may exist on other sites of the query
+            if service in requested:
+                yield service, list(entries), data
+
+
+def _services_rrd_query(services: List[Tuple[str, str, str]], lql_columns: List[ColumnName],
+                        is_host: bool) -> str:
+    if is_host:
+        query = "GET hosts\nColumns: host_name %s\n" % " ".join(lql_columns)
+        query += lq_logic("Filter: host_name =", sorted({h for _s, h, _d in services}), "Or")
+        return query
+
+    query = "GET services\nColumns: host_name service_description %s\n" % " ".join(lql_columns)
+    for _site, host_name, service_description in sorted(set(services)):
+        query += "Filter: host_name = %s\nFilter: service_description = %s\nAnd: 2\n" % (
+            livestatus.lqencode(host_name), livestatus.lqencode(service_description))
+    if len(set(services)) > 1:
+        query += "Or: %d\n" % len(set(services))
+    return query
+
+
+def _point_range(graph_data_range) -> str:
     start_time, end_time = graph_data_range["time_range"]
 
     step: Union[int, float, str] = graph_data_range["step"]
@@ -142,12 +195,7 @@ def fetch_rrd_data(site, host_name, service_description, entries, graph_recipe,
     if not isinstance(step, str):
         step = max(1, step)
 
-    point_range = ":".join(map(str, (start_time, end_time, step)))
-    lql_columns = list(rrd_columns(entries, graph_recipe["consolidation_function"], point_range))
-    query = livestatus_lql([host_name], lql_columns, service_description)
-
-    with sites.only_sites(site):
-        return list(zip(entries, sites.live().query_row(query)))
+    return ":".join(map(str, (start_time, end_time, step)))
 
 
 def rrd_columns(metrics: List[Tuple[str, Optional[str], float]], rrd_consolidation: str,
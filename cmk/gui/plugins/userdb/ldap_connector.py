@@ -31,6 +31,7 @@ from __future__ import annotations
 import abc
 import copy
 import errno
+import hashlib
 import logging
 import os
 import re
@@ -107,16 +108,19 @@ ldap_attr_map = {
     'ad': {
         'user_id': 'samaccountname',
         'pw_changed': 'pwdlastset',
+        'changed': 'usnchanged',
     },
     'openldap': {
         'user_id': 'uid',
         'pw_changed': 'pwdchangedtime',
+        'changed': 'modifytimestamp',
         # group attributes
         'member': 'uniquemember',
     },
     '389directoryserver': {
         'user_id': 'uid',
         'pw_changed': 'krbPasswordExpiration',
+        'changed': 'modifytimestamp',
         # group attributes
         'member': 'member',
     },
@@ -217,6 +221,9 @@ class LDAPUserConnector(UserConnector):
         # File for storing the time of the last success event
         self._sync_time_file = Path(cmk.utils.paths.var_dir).joinpath('web/ldap_%s_sync_time.mk' %
                                                                       self.id())
+        # File for storing the change marker of the last sync for incremental syncs
+        self._sync_state_file = Path(cmk.utils.paths.var_dir).joinpath('web/ldap_%s_sync_state.mk' %
+                                                                       self.id())
 
         self._save_suffix()
 
@@ -769,6 +776,8 @@ class LDAPUserConnector(UserConnector):
         columns = [
             user_id_attr,  # needed in all cases as uniq id
         ] + self.needed_attributes()
+        if self._uses_incremental_sync():
+            columns.append(self._change_attr())
 
         filt = self.ldap_filter('users')
 
@@ -1165,7 +1174,20 @@ class LDAPUserConnector(UserConnector):
         self._logger.info('SYNC STARTED')
         self._logger.info('  SYNC PLUGINS: %s' % ', '.join(self._config['active_plugins'].keys()))
 
-        ldap_users = self.get_users()
+        # A sync of a single user does not update the sync state, it is always a full one
+        sync_state: Optional[Dict] = None
+        if self._uses_incremental_sync() and not only_username:
+            sync_state = self._new_sync_state()
+
+        incremental = sync_state is not None and self._can_sync_incrementally(sync_state)
+        if incremental:
+            marker = self._load_sync_state()['marker']
+            self._logger.info('  INCREMENTAL SYNC (Changes since %s)' % marker)
+            ldap_users = self.get_users(
+                add_filter='(%s>=%s)' %
+                (self._change_attr(), ldap.filter.escape_filter_chars(marker)))
+        else:
+            ldap_users = self.get_users()
 
         users = load_users_func(lock=True)
 
@@ -1181,14 +1203,17 @@ class LDAPUserConnector(UserConnector):
             return mode_create, user
 
         # Remove users which are controlled by this connector but can not be found in
-        # LDAP anymore
-        for user_id, user in list(users.items()):
-            user_connection_id = cleanup_connection_id(user.get('connector'))
-            if user_connection_id == connection_id and self._strip_suffix(
-                    user_id) not in ldap_users:
-                del users[user_id]  # remove the user
-                changes.append(_("LDAP [%s]: Removed user %s") % (connection_id, user_id))
-
+        # LDAP anymore. An incremental sync only gets the changed users, the removed
+        # users are found by the next full sync.
+        if not incremental:
+            for user_id, user in list(users.items()):
+                user_connection_id = cleanup_connection_id(user.get('connector'))
+                if user_connection_id == connection_id and self._strip_suffix(
+                        user_id) not in ldap_users:
+                    del users[user_id]  # remove the user
+                    changes.append(_("LDAP [%s]: Removed user %s") % (connection_id, user_id))
+
+        updated_user_ids = set()
         has_changed_passwords = False
         profiles_to_synchronize = {}
         for user_id, ldap_user in ldap_users.items():
@@ -1239,6 +1264,7 @@ class LDAPUserConnector(UserConnector):
                                                        user)  # returns a dict
 
             users[user_id] = user  # Update the user record
+            updated_user_ids.add(user_id)
             if mode_create:
                 add_internal_attributes(users[user_id])
                 changes.append(_("LDAP [%s]: Created user %s") % (connection_id, user_id))
@@ -1283,10 +1309,16 @@ class LDAPUserConnector(UserConnector):
                           (duration, self._num_queries))
 
         if changes or has_changed_passwords:
-            save_users_func(users)
+            if incremental:
+                save_users_func(users, updated_user_ids=updated_user_ids)
+            else:
+                save_users_func(users)
         else:
             release_users_lock()
 
+        if sync_state is not None:
+            self._save_sync_state(sync_state, ldap_users, incremental)
+
         self._set_last_sync_time()
 
     def _find_changed_user_keys(self, keys, user, new_user):
@@ -1319,6 +1351,79 @@ class LDAPUserConnector(UserConnector):
         with self._sync_time_file.open('w', encoding="utf-8") as f:
             f.write('%s\n' % time.time())
 
+    def _uses_incremental_sync(self) -> bool:
+        return 'incremental_sync' in self._config
+
+    def _change_attr(self) -> str:
+        return self._config['incremental_sync'].get('change_attr',
+                                                    self.ldap_attr('changed')).lower()
+
+    def _load_sync_state(self) -> Dict:
+        return store.load_object_from_file(self._sync_state_file, default={})
+
+    def _new_sync_state(self) -> Dict:
+        """The current state of the things which require a full sync when changed
+
+        The group memberships are attributes of the groups. Changing them does not
+        change the change marker of the users, so the change markers of the groups are
+        part of the state."""
+        change_attr = self._change_attr()
+        groups: List[_Tuple[DistinguishedName, Dict[str, List[str]]]] = []
+        if self.has_group_base_dn_configured():
+            groups += self._ldap_search(self.get_group_dn(), self.ldap_filter('groups'),
+                                        [change_attr], self._config['group_scope'])
+        filter_group_dn = self._config.get('user_filter_group')
+        if filter_group_dn:
+            groups += self._ldap_search(self._replace_macros(filter_group_dn),
+                                        columns=[change_attr],
+                                        scope='base')
+
+        group_markers = sorted((dn, obj.get(change_attr, [''])[0]) for dn, obj in groups)
+        return {
+            'server': getattr(self._ldap_obj, '_uri', None),
+            'config_hash': hashlib.sha256(repr(self._config).encode('utf-8')).hexdigest(),
+            'groups_hash': hashlib.sha256(repr(group_markers).encode('utf-8')).hexdigest(),
+        }
+
+    def _can_sync_incrementally(self, sync_state: Dict) -> bool:
+        last_state = self._load_sync_state()
+        if not last_state.get('marker'):
+            return False
+
+        full_sync_interval = self._config['incremental_sync'].get('full_sync_interval', 86400)
+        if last_state['last_full_sync'] + full_sync_interval <= time.time():
+            return False
+
+        # The change markers are not comparable between different servers (uSNChanged) and
+        # changed settings or groups may affect all users
+        for key, value in sync_state.items():
+            if last_state.get(key) != value:
+                self._logger.info('  FULL SYNC (Changed %s)' % key)
+                return False
+        return True
+
+    def _save_sync_state(self, sync_state: Dict, ldap_users: Dict, incremental: bool) -> None:
+        """Save the state together with the highest change marker of the synced users
+
+        The next incremental sync gets the users with an equal or higher change marker."""
+        last_state = self._load_sync_state()
+        change_attr = self._change_attr()
+        markers = [
+            ldap_user[change_attr][0]
+            for ldap_user in ldap_users.values()
+            if ldap_user.get(change_attr)
+        ]
+        if incremental:
+            markers.append(last_state['marker'])
+        if not markers:
+            return
+
+        sync_state = dict(
+            sync_state,
+            marker=max(markers, key=_change_marker_sort_key),
+            last_full_sync=last_state['last_full_sync'] if incremental else time.time())
+        store.save_object_to_file(self._sync_state_file, sync_state)
+
     def is_enabled(self) -> bool:
         sync_config = user_sync_config()
         if isinstance(sync_config, tuple) and self.id() not in sync_config[1]:
@@ -1397,7 +1502,7 @@ class LDAPConnectionValuespec(Transform):
                 (_("Users"), [key for key, _vs in user_elements]),
                 (_("Groups"), [key for key, _vs in group_elements]),
                 (_("Attribute Sync Plugins"), ["active_plugins"]),
-                (_("Other"), ["cache_livetime"]),
+                (_("Other"), ["cache_livetime", "incremental_sync"]),
             ],
             render="form",
             form_narrow=True,
@@ -1418,6 +1523,7 @@ class LDAPConnectionValuespec(Transform):
                 'group_member',
                 'suffix',
                 'create_only_on_login',
+                'incremental_sync',
             ],
             validate=self._validate_ldap_connection,
         )
@@ -1812,6 +1918,39 @@ class LDAPConnectionValuespec(Transform):
                  default_value=300,
                  display=["days", "hours", "minutes"],
              )),
+            ("incremental_sync",
+             Dictionary(
+                 title=_('Incremental synchronization'),
+                 help=
+                 _('By default each synchronization fetches all users from the LDAP directory and '
+                   'processes them. When this option is enabled, only the users which have been '
+                   'changed since the last synchronization are fetched, using an attribute which is '
+                   'updated by the directory on each change of an object. Users which have been '
+                   'removed from the directory are only found by a full synchronization, which is '
+                   'made in the configured interval. A full synchronization is also made when the '
+                   'connection settings or the groups have been changed or when another LDAP server '
+                   'is used.'),
+                 elements=[
+                     ("full_sync_interval",
+                      Age(
+                          title=_('Full synchronization interval'),
+                          minvalue=60,
+                          default_value=86400,
+                          display=["days", "hours", "minutes"],
+                      )),
+                     ("change_attr",
+                      TextInput(
+                          title=_("Change attribute"),
+                          help=_("The attribute which is updated on each change of an object. "
+                                 "The default is <tt>uSNChanged</tt> for Active Directory and "
+                                 "<tt>modifyTimestamp</tt> for the other directory types."),
+                          default_value=lambda: ldap_attr_of_connection(
+                              self._connection_id, 'changed'),
+                          attrencode=True,
+                      )),
+                 ],
+                 optional_keys=["change_attr"],
+             )),
         ]
 
         return other_elements
@@ -2046,6 +2185,14 @@ def ldap_filter_of_connection(connection_id, *args, **kwargs):
     return connection.ldap_filter(*args, **kwargs)
 
 
+def _change_marker_sort_key(marker: str) -> _Tuple[int, str]:
+    # Counters like uSNChanged are compared numerically, timestamps like modifyTimestamp
+    # (in the generalized time format) as strings
+    if marker.isdigit():
+        return len(marker.lstrip('0')), marker.lstrip('0')
+    return 0, marker
+
+
 def ldap_sync_simple(user_id: str, ldap_user: dict, user: dict, user_attr: str, attr: str):
     if attr in ldap_user:
         attr_value = ldap_user[attr][0]
@@ -29,6 +29,7 @@ from cmk.gui.availability import (
     AVObjectCells,
     AVData,
     AVRawData,
+    AVObjectSpans,
     AVEntry,
     AVTimeRange,
     AVOptionValueSpecs,
@@ -287,7 +288,7 @@ def show_availability_page(view: 'View', filterheaders: 'FilterHeaders') -> None
     if not user_errors:
         include_long_output = av_mode == "timeline" \
                 and "timeline_long_output" in avoptions["labelling"]
-        av_rawdata, has_reached_logrow_limit = availability.get_availability_rawdata(
+        av_objects, has_reached_logrow_limit = availability.get_availability_spans(
             what,
             view.context,
             filterheaders,
@@ -297,7 +298,11 @@ def show_availability_page(view: 'View', filterheaders: 'FilterHeaders') -> None
             include_long_output=include_long_output,
             avoptions=avoptions,
             view_process_tracking=view.process_tracking)
-        av_data = availability.compute_availability(what, av_rawdata, avoptions)
+        # The annotations only need the objects. Their spans are processed one object
+        # after the other and not kept.
+        av_rawdata: AVRawData = {}
+        av_data = availability.compute_availability_of_objects(
+            what, _remember_objects(av_objects, av_rawdata), avoptions)
 
     # Do CSV ouput
     if html.output_format == "csv_export" and config.user.may("general.csv_export"):
@@ -491,6 +496,13 @@ def _page_menu_entries_export_reporting() -> Iterator[PageMenuEntry]:
     )
 
 
+def _remember_objects(av_objects: Iterator[AVObjectSpans],
+                      av_rawdata: AVRawData) -> Iterator[AVObjectSpans]:
+    for site_host, service, spans in av_objects:
+        av_rawdata.setdefault(site_host, {})[service] = []
+        yield site_host, service, spans
+
+
 def do_render_availability(what: AVObjectType, av_rawdata: AVRawData, av_data: AVData,
                            av_mode: AVMode, av_object: AVObjectSpec, avoptions: AVOptions) -> None:
     if av_mode == "timeline":
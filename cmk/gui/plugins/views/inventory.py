@@ -18,6 +18,7 @@ from livestatus import SiteId
 from cmk.utils.regex import regex
 import cmk.utils.defines as defines
 import cmk.utils.render
+from cmk.utils.inventory_index import index_path_of
 from cmk.utils.structured_data import StructuredDataTree
 from cmk.utils.type_defs import HostName
 
@@ -33,6 +34,7 @@ from cmk.gui.valuespec import Dictionary, Checkbox
 from cmk.gui.escaping import escape_text
 from cmk.gui.plugins.visuals import (
     filter_registry,
+    Filter,
     VisualInfo,
     visual_info_registry,
 )
@@ -349,10 +351,10 @@ class ABCRowTable(RowTable):
 
         # Now create big table of all inventory entries of these hosts
         headers = ["site"] + host_columns
+        hostrows = [dict(zip(headers, row)) for row in data]
         rows = []
-        for row in data:
-            hostrow = dict(zip(headers, row))
-            for subrow in self._get_rows(hostrow):
+        for hostrow, subrows in self._get_rows_of_hosts(hostrows, view, limit, all_active_filters):
+            for subrow in subrows:
                 subrow.update(hostrow)
                 rows.append(subrow)
         return rows, len(data)
@@ -365,6 +367,10 @@ class ABCRowTable(RowTable):
         sites.live().set_only_sites(None)
         return data
 
+    def _get_rows_of_hosts(self, hostrows, view, limit, all_active_filters):
+        for hostrow in hostrows:
+            yield hostrow, self._get_rows(hostrow)
+
     def _get_rows(self, hostrow):
         inv_data = self._get_inv_data(hostrow)
         return self._prepare_rows(inv_data)
@@ -852,15 +858,119 @@ class RowTableInventory(ABCRowTable):
         super(RowTableInventory, self).__init__([info_name], ["host_structured_status"])
         self._inventory_path = inventory_path
 
+    def _get_rows_of_hosts(self, hostrows, view, limit, all_active_filters):
+        """Take the rows from the inventory index instead of loading the tree of each host
+
+        The filters, the sorting and the row limit of the view are applied within the
+        index as far as this gives the same result. Hosts with status data for the
+        table need their rows merged with the status data like before."""
+        if not config.inventory_index:
+            yield from super(RowTableInventory,
+                             self)._get_rows_of_hosts(hostrows, view, limit, all_active_filters)
+            return
+
+        index, corrupted_hosts = inventory.get_inventory_index(
+            hostrow["host_name"] for hostrow in hostrows)
+        parsed_path, _attribute_keys = inventory.parse_tree_path(self._inventory_path)
+        index_path = index_path_of(parsed_path)
+
+        status_data_trees = {}
+        for hostrow in hostrows:
+            status_data_tree = inventory.load_status_data_tree(hostrow)
+            if status_data_tree is not None and status_data_tree.get_sub_numeration(
+                    parsed_path) is not None:
+                status_data_trees[hostrow["host_name"]] = status_data_tree
+
+        # The rows of the other hosts are taken from the index as they are
+        merged_hosts = set(status_data_trees)
+        if inventory.has_restricted_inventory_paths():
+            merged_hosts = {hostrow["host_name"] for hostrow in hostrows}
+        plain_hosts = [
+            hostrow["host_name"] for hostrow in hostrows if hostrow["host_name"] not in merged_hosts
+        ]
+
+        conditions, complete = self._index_conditions(all_active_filters)
+        order_by, sortable = self._index_order(view)
+        index_limit = None
+        if limit is not None and complete and sortable and not merged_hosts:
+            # One more row than the limit, so the view knows that the limit is reached
+            index_limit = limit + 1
+
+        plain_rows = index.table_rows(index_path,
+                                      plain_hosts,
+                                      conditions,
+                                      order_by=order_by if index_limit is not None else None,
+                                      limit=index_limit)
+        merged_rows = index.table_rows(index_path, sorted(merged_hosts))
+
+        for hostrow in hostrows:
+            hostname = hostrow["host_name"]
+            if hostname in corrupted_hosts:
+                self._add_corrupted_tree_error(hostname)
+                yield hostrow, []
+            elif hostname in plain_rows:
+                yield hostrow, self._prepare_rows(plain_rows[hostname])
+            elif hostname in merged_rows or hostname in status_data_trees:
+                merged_tree = inventory.filter_and_merge_indexed_rows(
+                    self._inventory_path, merged_rows.get(hostname, []),
+                    status_data_trees.get(hostname))
+                invdata = None if merged_tree is None else inventory.get_inventory_data(
+                    merged_tree, self._inventory_path)
+                yield hostrow, self._prepare_rows(invdata or [])
+            else:
+                yield hostrow, []
+
+    def _index_conditions(self, all_active_filters):
+        """The conditions of the filters which can be applied within the index
+
+        Also tells whether these are all filters of the view which filter rows."""
+        conditions = []
+        complete = True
+        for filt in all_active_filters:
+            if type(filt).filter_table is Filter.filter_table:
+                continue  # Filters the livestatus query of the hosts
+
+            filt_conditions = None
+            if filt.info == self._info_names[0] and hasattr(filt, "inventory_index_conditions"):
+                filt_conditions = filt.inventory_index_conditions()
+
+            if filt_conditions is not None:
+                conditions += filt_conditions
+            elif any(html.request.var(varname) for varname in filt.htmlvars):
+                complete = False
+        return conditions, complete
+
+    def _index_order(self, view):
+        """The column to sort by within the index and whether the index can sort like the view"""
+        sorters = view.sorters
+        if not sorters:
+            return None, True
+
+        if len(sorters) > 1 or sorters[0].join_key:
+            return None, False
+
+        prefix = self._info_names[0] + "_"
+        column = sorters[0].sorter.ident
+        if not column.startswith(prefix):
+            return None, False
+
+        hint = inventory_displayhints.get(self._inventory_path + "*." + column[len(prefix):], {})
+        if "sort" in hint:
+            return None, False
+        return (column[len(prefix):], sorters[0].negate), True
+
+    def _add_corrupted_tree_error(self, hostname):
+        user_errors.add(
+            MKUserError(
+                "load_inventory_tree",
+                _("Cannot load HW/SW inventory tree %s. Please remove the corrupted file.") %
+                inventory.get_short_inventory_filepath(hostname)))
+
     def _get_inv_data(self, hostrow):
         try:
             merged_tree = inventory.load_filtered_and_merged_tree(hostrow)
         except inventory.LoadStructuredDataError:
-            user_errors.add(
-                MKUserError(
-                    "load_inventory_tree",
-                    _("Cannot load HW/SW inventory tree %s. Please remove the corrupted file.") %
-                    inventory.get_short_inventory_filepath(hostrow.get("host_name", ""))))
+            self._add_corrupted_tree_error(hostrow.get("host_name", ""))
             return []
 
         if merged_tree is None:
@@ -11,6 +11,7 @@ from typing import List, Optional, Tuple, Callable
 import cmk.gui.utils as utils
 import cmk.gui.inventory as inventory
 import cmk.utils.defines as defines
+from cmk.utils.inventory_index import Condition
 from cmk.gui.valuespec import (
     Age,
     DualListChoice,
@@ -73,6 +74,17 @@ class FilterInvtableText(Filter):
                 newrows.append(row)
         return newrows
 
+    def inventory_index_conditions(self) -> Optional[List[Condition]]:
+        """The conditions for filtering the rows within the inventory index"""
+        filtertext = (html.request.var(self.htmlvars[0]) or "").strip().lower()
+        if not filtertext:
+            return []
+        try:
+            re.compile(filtertext, re.IGNORECASE)
+        except re.error:
+            return None  # The error is shown by filter_table()
+        return [Condition(self.ident[len(self.info) + 1:], "~~", filtertext)]
+
 
 class FilterInvtableTimestampAsAge(Filter):
     def __init__(self, *, inv_info: str, ident: str, title: str) -> None:
@@ -168,6 +180,18 @@ class FilterInvtableIDRange(Filter):
                 newrows.append(row)
         return newrows
 
+    def inventory_index_conditions(self) -> Optional[List[Condition]]:
+        """The conditions for filtering the rows within the inventory index"""
+        column = self.ident[len(self.info) + 1:]
+        conditions = []
+        from_value = utils.saveint(html.request.var(self.ident + "_from"))
+        if from_value:
+            conditions.append(Condition(column, ">=", from_value))
+        to_value = utils.saveint(html.request.var(self.ident + "_to"))
+        if to_value:
+            conditions.append(Condition(column, "<=", to_value))
+        return conditions
+
 
 class FilterInvtableOperStatus(Filter):
     def __init__(self, *, inv_info: str, ident: str, title: str) -> None:
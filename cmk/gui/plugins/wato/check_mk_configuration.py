@@ -336,6 +336,83 @@ class ConfigVariableDebugLivestatusQueries(ConfigVariable):
         )
 
 
+@config_variable_registry.register
+class ConfigVariableLivestatusQueryCacheTTL(ConfigVariable):
+    def group(self):
+        return ConfigVariableGroupUserInterface
+
+    def domain(self):
+        return ConfigDomainGUI
+
+    def ident(self):
+        return "livestatus_query_cache_ttl"
+
+    def valuespec(self):
+        return Integer(
+            title=_("Cache Livestatus queries"),
+            help=_("Pages like dashboards often send the same Livestatus queries several times, "
+                   "e.g. to count the host and service states for different dashlets and "
+                   "sidebar snapins. When you set a time here, the responses of the sites are "
+                   "cached for this time by each GUI process and reused for identical queries "
+                   "of the same user. Commands sent to a site clear the cached responses of "
+                   "the site. Set it to 0 to disable the cache."),
+            unit=_("seconds"),
+            minvalue=0,
+            maxvalue=60,
+        )
+
+
+@config_variable_registry.register
+class ConfigVariableAvailabilityRollups(ConfigVariable):
+    def group(self):
+        return ConfigVariableGroupUserInterface
+
+    def domain(self):
+        return ConfigDomainGUI
+
+    def ident(self):
+        return "availability_rollups"
+
+    def valuespec(self):
+        return Checkbox(
+            title=_("Precompute availability of past days"),
+            label=_("use daily rollups of the state history"),
+            help=_("Availability reports of longer time ranges need to process the monitoring "
+                   "history of the whole time range. With this option the time each host and "
+                   "service spent in its states is stored for every past day once it has been "
+                   "computed. Reports then only process the history of the current day and the "
+                   "edges of the time range. The rollups are stored in "
+                   "<tt>var/check_mk/availability_rollups.sqlite</tt>. They are not used for "
+                   "timelines, outage statistics, grouping by host or service groups and "
+                   "labelling with aliases or display names."),
+        )
+
+
+@config_variable_registry.register
+class ConfigVariableInventoryIndex(ConfigVariable):
+    def group(self):
+        return ConfigVariableGroupUserInterface
+
+    def domain(self):
+        return ConfigDomainGUI
+
+    def ident(self):
+        return "inventory_index"
+
+    def valuespec(self):
+        return Checkbox(
+            title=_("Use the inventory index for inventory tables"),
+            label=_("take the rows of the inventory tables from the inventory index"),
+            help=_("Views showing an inventory table of many hosts, like the software "
+                   "packages of all hosts, load the whole HW/SW inventory tree of each host. "
+                   "With this option the rows are taken from a site wide index of the inventory "
+                   "tables, which is updated whenever the inventory of a host changes. Filtering, "
+                   "sorting and limiting the number of rows are then done within the index as "
+                   "far as possible. The index is stored in "
+                   "<tt>var/check_mk/inventory_index.sqlite</tt>."),
+        )
+
+
 @config_variable_registry.register
 class ConfigVariableSelectionLivetime(ConfigVariable):
     def group(self):
@@ -615,6 +692,31 @@ class ConfigVariableBIDefaultLayout(ConfigVariable):
         return [("round", _("Round")), ("straight", _("Straight")), ('elbow', _("Elbow"))]
 
 
+@config_variable_registry.register
+class ConfigVariableBICompilationProcesses(ConfigVariable):
+    def group(self):
+        return ConfigVariableGroupUserInterface
+
+    def domain(self):
+        return ConfigDomainGUI
+
+    def ident(self):
+        return "bi_compilation_processes"
+
+    def valuespec(self):
+        return Integer(
+            title=_("Processes for compiling BI aggregations"),
+            help=_("The BI aggregations are compiled by the GUI process which first needs them "
+                   "after a configuration change. With large BI configurations you can let "
+                   "several processes forked from this GUI process compile them in parallel. "
+                   "At most one process per CPU is used and a small number of aggregations is "
+                   "always compiled by the GUI process itself. Keep in mind that each process "
+                   "needs the memory of a GUI process while compiling."),
+            minvalue=1,
+            maxvalue=16,
+        )
+
+
 @config_variable_registry.register
 class ConfigVariablePagetitleDateFormat(ConfigVariable):
     def group(self):
@@ -1663,6 +1765,7 @@ class ConfigVariableActivateChangesConcurrency(ConfigVariable):
             _("Specifies the maximum number of parallel running site activate changes processes. "
               "Each site activation is handled in a separate apache process. If your configuration setup includes "
               "lots of sites, but your RAM is limited, you should reduce the maximum number of concurrent site updates. "
+              "The same limit applies to the parallel preparation of the site configurations. "
               "Note: The hardcoded minimum is set to 5."))
 
 
@@ -2385,6 +2488,31 @@ class ConfigVariableDelayPrecompile(ConfigVariable):
         )
 
 
+@config_variable_registry.register
+class ConfigVariableNagiosCheckerHelper(ConfigVariable):
+    def group(self):
+        return ConfigVariableGroupCheckExecution
+
+    def domain(self):
+        return ConfigDomainCore
+
+    def ident(self):
+        return "nagios_checker_helper"
+
+    def valuespec(self):
+        return Checkbox(
+            title=_("Use checker helper for host checks"),
+            label=_("hand over host checks to the checker helper"),
+            help=_("This option only affects the Nagios core. If you enable it, the precompiled "
+                   "host checks hand over the execution to a long running checker helper process "
+                   "(<tt>cmk --nagios-checker-helper</tt>) which keeps the plugins and the "
+                   "configuration loaded. This saves the interpreter start and the loading of "
+                   "the plugins for every check execution. The helper is started together with "
+                   "the site and picks up this option when the changes are activated. In case "
+                   "the helper is not running, the host checks are executed as usual."),
+        )
+
+
 @config_variable_registry.register
 class ConfigVariableClusterMaxCachefileAge(ConfigVariable):
     def group(self):
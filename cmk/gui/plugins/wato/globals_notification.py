@@ -10,8 +10,10 @@
 
 import cmk.utils.paths
 
+import cmk.gui.watolib as watolib
 from cmk.gui.valuespec import (
     Age,
+    Dictionary,
     TextInput,
     Integer,
     Tuple,
@@ -164,6 +166,79 @@ class ConfigVariableNotificationPluginTimeout(ConfigVariable):
         )
 
 
+@config_variable_registry.register
+class ConfigVariableNotificationPluginPool(ConfigVariable):
+    def group(self):
+        return ConfigVariableGroupNotifications
+
+    def domain(self):
+        return ConfigDomainCore
+
+    def ident(self):
+        return "notification_plugin_pool"
+
+    def valuespec(self):
+        return Dictionary(
+            title=_("Parallel notification plugin calls"),
+            help=_("Notification plugins which are called directly, i.e. when notification "
+                   "spooling is off, are executed in parallel. "
+                   "This way a slow plugin, e.g. a mail relay or a ticket system which is "
+                   "not responding, does not hold up all other notifications. The number of "
+                   "parallel calls can be limited for each plugin and each plugin can have "
+                   "its own timeout. Failed calls are not repeated, please use the "
+                   "notification spooler in case notifications have to be retried."),
+            elements=[
+                ("max_workers",
+                 Integer(
+                     title=_("Maximum number of parallel plugin calls"),
+                     minvalue=1,
+                     default_value=4,
+                 )),
+                ("plugin_limits",
+                 ListOf(
+                     Tuple(
+                         orientation="horizontal",
+                         elements=[
+                             DropdownChoice(
+                                 title=_("Plugin"),
+                                 choices=watolib.notification_script_choices,
+                             ),
+                             Integer(
+                                 title=_("Maximum number of parallel calls"),
+                                 minvalue=1,
+                                 default_value=1,
+                             ),
+                         ],
+                     ),
+                     title=_("Limits per plugin"),
+                     add_label=_("Add limit"),
+                 )),
+                ("plugin_timeouts",
+                 ListOf(
+                     Tuple(
+                         orientation="horizontal",
+                         elements=[
+                             DropdownChoice(
+                                 title=_("Plugin"),
+                                 choices=watolib.notification_script_choices,
+                             ),
+                             Age(
+                                 title=_("Timeout"),
+                                 minvalue=1,
+                                 default_value=60,
+                             ),
+                         ],
+                     ),
+                     title=_("Timeouts per plugin"),
+                     help=_("These plugins are interrupted after the configured time instead "
+                            "of the general notification plugin timeout."),
+                     add_label=_("Add timeout"),
+                 )),
+            ],
+            optional_keys=["plugin_limits", "plugin_timeouts"],
+        )
+
+
 @config_variable_registry.register
 class ConfigVariableNotificationLogging(ConfigVariable):
     def group(self):
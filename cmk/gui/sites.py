@@ -7,9 +7,11 @@
 from contextlib import contextmanager
 from typing import Any, cast, Dict, Iterator, List, NewType, Optional, Tuple, Union, NamedTuple
 
+import livestatus
 from livestatus import (
     MultiSiteConnection,
     MKLivestatusQueryError,
+    QueryCache,
     SiteId,
     SiteConfiguration,
     SiteConfigurations,
@@ -65,21 +67,50 @@ def cleanup_connections() -> Iterator[None]:
         yield
     finally:
         try:
-            disconnect()
+            release()
         except Exception:
             logger.exception("Error during livestatus cleanup")
             raise
 
 
+def release() -> None:
+    """Finishes using the Livestatus connections of the current request
+
+    In contrast to disconnect() the persistent connections are kept open to be
+    reused by the following requests of this process."""
+    if "live" in g:
+        logger.debug("Livestatus statistics: %r", statistics())
+        g.live.release()
+    g.pop('live', None)
+    g.pop('site_status', None)
+    g.pop('live_auth_user', None)
+
+
+def statistics() -> Dict[str, Any]:
+    """Usage statistics of the persistent connections and the query cache of this process"""
+    return {
+        "persistent_connections": {
+            socketurl: counts.copy()
+            for socketurl, counts in livestatus.persistent_connection_stats.items()
+        },
+        "query_cache": _query_cache.statistics() if _query_cache is not None else None,
+    }
+
+
 # TODO: This is not really shutting down or closing connections. It only removes references to
 # sockets and connection classes. This should really be cleaned up (context managers, ...)
 def disconnect() -> None:
-    """Actively closes all Livestatus connections."""
+    """Actively closes all Livestatus connections.
+
+    This also drops the idle persistent connections of the process, e.g. to not share
+    them with the parent process after forking."""
     logger.debug("Disconnecing site connections")
     if "live" in g:
         g.live.disconnect()
     g.pop('live', None)
     g.pop('site_status', None)
+    g.pop('live_auth_user', None)
+    livestatus.persistent_connections.clear()
 
 
 # TODO: This should live somewhere else, it's just a random helper...
@@ -132,6 +163,9 @@ def get_alias_of_host(site: Optional[SiteId], host_name: str) -> str:
 # The global livestatus object lives in g.live. This is initialized
 # automatically upon first access to the accessor function live()
 
+# The query cache is shared by all requests of a process
+_query_cache: Optional[QueryCache] = None
+
 # g.site_status keeps a dictionary for each site with the following keys:
 # "state"              --> "online", "disabled", "down", "unreach", "dead" or "waiting"
 # "exception"          --> An error exception in case of down, unreach, dead or waiting
@@ -172,6 +206,8 @@ def _connect_multiple_sites(user: LoggedInUser) -> None:
     else:
         g.live = MultiSiteConnection(enabled_sites, disabled_sites)
 
+    g.live.set_query_cache(_get_query_cache())
+
     # Fetch status of sites by querying the version of Nagios and livestatus
     # This may be cached by a proxy for up to the next configuration reload.
     g.live.set_prepend_site(True)
@@ -211,6 +247,16 @@ def _connect_multiple_sites(user: LoggedInUser) -> None:
     update_site_states_from_dead_sites()
 
 
+def _get_query_cache() -> Optional[QueryCache]:
+    global _query_cache
+    ttl = config.livestatus_query_cache_ttl
+    if not ttl:
+        _query_cache = None
+    elif _query_cache is None or _query_cache.ttl != ttl:
+        _query_cache = QueryCache(ttl)
+    return _query_cache
+
+
 def _get_enabled_and_disabled_sites(
         user: LoggedInUser) -> Tuple[SiteConfigurations, SiteConfigurations]:
     enabled_sites: SiteConfigurations = {}
@@ -316,6 +362,7 @@ def _set_initial_site_states(enabled_sites, disabled_sites):
 # AuthUser: header for livestatus.
 def _set_livestatus_auth(user: LoggedInUser, force_authuser: Optional[UserId]) -> None:
     user_id = _livestatus_auth_user(user, force_authuser)
+    g.live_auth_user = user_id
     if user_id is not None:
         g.live.set_auth_user('read', user_id)
         g.live.set_auth_user('action', user_id)
@@ -332,6 +379,12 @@ def _set_livestatus_auth(user: LoggedInUser, force_authuser: Optional[UserId]) -
     g.live.set_auth_domain('read')
 
 
+def livestatus_auth_user() -> Optional[UserId]:
+    """The user the objects of the livestatus queries are restricted to, None for all objects"""
+    live()
+    return g.live_auth_user
+
+
 # Returns either None when no auth user shal be set or the name of the user
 # to be used as livestatus auth user
 def _livestatus_auth_user(user: LoggedInUser, force_authuser: Optional[UserId]) -> Optional[UserId]:
@@ -6,7 +6,7 @@
 
 # TODO: Rework connection management and multiplexing
 
-from typing import cast, Union, Any, Callable, Dict, List, Optional, Tuple, Literal
+from typing import cast, Union, Any, Callable, Dict, Iterable, List, Optional, Tuple, Literal
 import time
 import os
 import traceback
@@ -60,6 +60,12 @@ from cmk.gui.plugins.userdb.utils import (
 )
 
 from cmk.gui.utils.urls import makeuri_contextless
+from cmk.gui.utils.user_attribute_store import (
+    AttributeChanges,
+    profile_file_path,
+    STORED_ATTRIBUTES,
+    user_attribute_store,
+)
 
 # Datastructures and functions needed before plugins can be loaded
 loaded_with_language: Union[bool, None, str] = False
@@ -729,45 +735,36 @@ def load_users(lock: bool = False) -> Users:
             if user_id in result:
                 result[user_id]['serial'] = utils.saveint(serial)
 
-    # Now read the user specific files
-    directory = cmk.utils.paths.var_dir + "/web/"
-    for d in os.listdir(directory):
-        if d[0] != '.':
-            uid = ensure_str(d)
-
-            # read special values from own files
-            if uid in result:
-                for attr, conv_func in [
-                    ('num_failed_logins', utils.saveint),
-                    ('last_pw_change', utils.saveint),
-                    ('enforce_pw_change', lambda x: bool(utils.saveint(x))),
-                    ('idle_timeout', _convert_idle_timeout),
-                    ('session_info', _convert_session_info),
-                    ('start_url', _convert_start_url),
-                    ('ui_theme', lambda x: x),
-                    ('ui_sidebar_position', lambda x: None if x == "None" else x),
-                ]:
-                    val = load_custom_attr(uid, attr, conv_func)
+    # Now read the user specific values. They are taken from the attribute store instead
+    # of reading the files in the profile directories of all users.
+    for uid, attributes in user_attribute_store().load_all().items():
+        if uid in result:
+            for attr, conv_func in [
+                ('num_failed_logins', utils.saveint),
+                ('last_pw_change', utils.saveint),
+                ('enforce_pw_change', lambda x: bool(utils.saveint(x))),
+                ('idle_timeout', _convert_idle_timeout),
+                ('session_info', _convert_session_info),
+                ('start_url', _convert_start_url),
+                ('ui_theme', lambda x: x),
+                ('ui_sidebar_position', lambda x: None if x == "None" else x),
+            ]:
+                if attributes.get(attr):
+                    val = conv_func(attributes[attr].strip())
                     if val is not None:
                         result[uid][attr] = val
 
-            # read automation secrets and add them to existing
-            # users or create new users automatically
-            try:
-                user_secret_path = Path(directory) / d / "automation.secret"
-                with user_secret_path.open(encoding="utf-8") as f:
-                    secret: Optional[str] = ensure_str(f.read().strip())
-            except IOError:
-                secret = None
-
-            if secret:
-                if uid in result:
-                    result[uid]["automation_secret"] = secret
-                else:
-                    result[uid] = {
-                        "roles": ["guest"],
-                        "automation_secret": secret,
-                    }
+        # read automation secrets and add them to existing
+        # users or create new users automatically
+        secret = attributes.get("automation_secret", "").strip()
+        if secret:
+            if uid in result:
+                result[uid]["automation_secret"] = secret
+            else:
+                result[uid] = {
+                    "roles": ["guest"],
+                    "automation_secret": secret,
+                }
 
     # populate the users cache
     g.users = result
@@ -785,16 +782,27 @@ def load_custom_attr(userid: UserId,
                      default: Any = None,
                      lock: bool = False) -> Any:
     path = Path(custom_attr_path(userid, key))
-    result = store.load_text_from_file(path, default=default, lock=lock)
-    if result == default:
-        return result
-    return conv_func(result.strip())
+    if key not in STORED_ATTRIBUTES:
+        result = store.load_text_from_file(path, default=default, lock=lock)
+        if result == default:
+            return result
+        return conv_func(result.strip())
+
+    if lock:
+        # The attribute file is the lock for updating the attribute, e.g. the sessions
+        store.aquire_lock(path)
+    value = user_attribute_store().load(ensure_str(userid), key)
+    if not value:
+        return default
+    return conv_func(value.strip())
 
 
 def save_custom_attr(userid: UserId, key: str, val: Any) -> None:
     path = custom_attr_path(userid, key)
     store.mkdir(os.path.dirname(path))
     store.save_file(path, '%s\n' % val)
+    if key in STORED_ATTRIBUTES:
+        user_attribute_store().save(ensure_str(userid), key, '%s\n' % val)
 
 
 def remove_custom_attr(userid: UserId, key: str) -> None:
@@ -802,6 +810,8 @@ def remove_custom_attr(userid: UserId, key: str) -> None:
         os.unlink(custom_attr_path(userid, key))
     except OSError:
         pass  # Ignore non existing files
+    if key in STORED_ATTRIBUTES:
+        user_attribute_store().save(ensure_str(userid), key, None)
 
 
 def get_online_user_ids() -> List[UserId]:
@@ -821,7 +831,11 @@ def split_dict(d: Dict[str, Any], keylist: List[str], positive: bool) -> Dict[st
     return {k: v for k, v in d.items() if (k in keylist) == positive}
 
 
-def save_users(profiles: Users) -> None:
+def save_users(profiles: Users, updated_user_ids: Optional[Iterable[UserId]] = None) -> None:
+    """Save all users
+
+    The profile directories are only written for the users of updated_user_ids, in case
+    the caller knows that only these users have been changed or added."""
     write_contacts_and_users_file(profiles)
 
     # Execute user connector save hooks
@@ -830,8 +844,11 @@ def save_users(profiles: Users) -> None:
     updated_profiles = _add_custom_macro_attributes(profiles)
 
     _save_auth_serials(updated_profiles)
-    _save_user_profiles(updated_profiles)
-    _cleanup_old_user_profiles(updated_profiles)
+    if updated_user_ids is None:
+        _save_user_profiles(updated_profiles)
+        _cleanup_old_user_profiles(updated_profiles)
+    else:
+        _save_user_profiles({user_id: updated_profiles[user_id] for user_id in updated_user_ids})
 
     # Release the lock to make other threads access possible again asap
     # This lock is set by load_users() only in the case something is expected
@@ -866,51 +883,45 @@ def _add_custom_macro_attributes(profiles: Users) -> Users:
 def _save_user_profiles(updated_profiles: Users) -> None:
     non_contact_keys = _non_contact_keys()
     multisite_keys = _multisite_keys()
+    changes: AttributeChanges = {}
 
     for user_id, user in updated_profiles.items():
-        user_dir = cmk.utils.paths.var_dir + "/web/" + ensure_str(user_id)
+        user_dir = Path(cmk.utils.paths.var_dir, "web", ensure_str(user_id))
         store.mkdir(user_dir)
 
-        # authentication secret for local processes
-        auth_file = user_dir + "/automation.secret"
-        if "automation_secret" in user:
-            store.save_file(auth_file, "%s\n" % user["automation_secret"])
-        elif os.path.exists(auth_file):
-            os.unlink(auth_file)
-
         # Write out user attributes which are written to dedicated files in the user
         # profile directory. The primary reason to have separate files, is to reduce
-        # the amount of data to be loaded during regular page processing
-        save_custom_attr(user_id, 'serial', str(user.get('serial', 0)))
-        save_custom_attr(user_id, 'num_failed_logins', str(user.get('num_failed_logins', 0)))
-        save_custom_attr(user_id, 'enforce_pw_change', str(int(user.get('enforce_pw_change',
-                                                                        False))))
-        save_custom_attr(user_id, 'last_pw_change', str(user.get('last_pw_change',
-                                                                 int(time.time()))))
-
-        if "idle_timeout" in user:
-            save_custom_attr(user_id, "idle_timeout", user["idle_timeout"])
-        else:
-            remove_custom_attr(user_id, "idle_timeout")
-
-        if user.get("start_url") is not None:
-            save_custom_attr(user_id, "start_url", repr(user["start_url"]))
-        else:
-            remove_custom_attr(user_id, "start_url")
-
-        # Is None on first load
-        if user.get("ui_theme") is not None:
-            save_custom_attr(user_id, "ui_theme", user["ui_theme"])
-        else:
-            remove_custom_attr(user_id, "ui_theme")
+        # the amount of data to be loaded during regular page processing. The changes
+        # of all users are applied to the attribute store at once.
+        attributes: Dict[str, Any] = {
+            # authentication secret for local processes
+            "automation_secret": user.get("automation_secret"),
+            "serial": str(user.get('serial', 0)),
+            "num_failed_logins": str(user.get('num_failed_logins', 0)),
+            "enforce_pw_change": str(int(user.get('enforce_pw_change', False))),
+            "last_pw_change": str(user.get('last_pw_change', int(time.time()))),
+            "idle_timeout": user.get("idle_timeout"),
+            "start_url": repr(user["start_url"]) if user.get("start_url") is not None else None,
+            # Is None on first load
+            "ui_theme": user.get("ui_theme"),
+            "ui_sidebar_position": user.get("ui_sidebar_position"),
+        }
 
-        if "ui_sidebar_position" in user:
-            save_custom_attr(user_id, 'ui_sidebar_position', user['ui_sidebar_position'])
-        else:
-            remove_custom_attr(user_id, "ui_sidebar_position")
+        user_changes = changes.setdefault(ensure_str(user_id), {})
+        for name, value in attributes.items():
+            path = profile_file_path(user_dir, name)
+            if value is None:
+                user_changes[name] = None
+                with suppress(FileNotFoundError):
+                    path.unlink()
+            else:
+                user_changes[name] = "%s\n" % value
+                store.save_file(path, user_changes[name])
 
         _save_cached_profile(user_id, user, multisite_keys, non_contact_keys)
 
+    user_attribute_store().update(changes)
+
 
 # During deletion of users we don't delete files which might contain user settings
 # and e.g. customized views which are not easy to reproduce. We want to keep the
@@ -924,6 +935,7 @@ def _cleanup_old_user_profiles(updated_profiles: Users) -> None:
         "transids.mk",
         "serial.mk",
     ]
+    changes: AttributeChanges = {}
     directory = cmk.utils.paths.var_dir + "/web"
     for user_dir in os.listdir(cmk.utils.paths.var_dir + "/web"):
         if user_dir not in ['.', '..'] and ensure_str(user_dir) not in updated_profiles:
@@ -934,6 +946,10 @@ def _cleanup_old_user_profiles(updated_profiles: Users) -> None:
             for to_delete in profile_files_to_delete:
                 if os.path.exists(entry + '/' + to_delete):
                     os.unlink(entry + '/' + to_delete)
+            changes[ensure_str(user_dir)] = {"automation_secret": None, "serial": None}
+
+    if changes:
+        user_attribute_store().update(changes)
 
 
 def write_contacts_and_users_file(profiles: Users,
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Store of the user attributes which are kept in the profile directories
+
+Some attributes of the users, like the sessions, the number of failed logins or the
+automation secret, are saved to dedicated files in the profile directory of each user
+(var/check_mk/web/[user]/). Loading all users had to read these files of every user.
+The store keeps these attributes of all users in a single SQLite database indexed by
+the user ID. It is updated in place when an attribute of a user changes.
+
+The profile files are still written, because they are replicated to the remote sites
+and read by other components. The store is filled from the profile files on first use
+and after the profile directories have been replaced, e.g. by the configuration sync.
+It is located outside of the replicated profile directories.
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import cmk.utils.paths
+
+# The attributes in the store. They are saved to "[name].mk" in the profile directory,
+# except the automation secret.
+STORED_ATTRIBUTES = [
+    "automation_secret",
+    "enforce_pw_change",
+    "idle_timeout",
+    "last_pw_change",
+    "num_failed_logins",
+    "serial",
+    "session_info",
+    "start_url",
+    "ui_sidebar_position",
+    "ui_theme",
+]
+
+# Changed attributes by user, None removes the attribute
+AttributeChanges = Dict[str, Dict[str, Optional[str]]]
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS attributes (
+        user_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (user_id, name)
+    )""",
+    """CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )""",
+]
+
+
+def user_attribute_store() -> "UserAttributeStore":
+    return UserAttributeStore(Path(cmk.utils.paths.var_dir, "web"),
+                              Path(cmk.utils.paths.var_dir, "user_attributes.sqlite"))
+
+
+def profile_file_path(profile_dir: Path, name: str) -> Path:
+    """The file in the profile directory of a user the attribute is saved to"""
+    if name == "automation_secret":
+        return profile_dir / "automation.secret"
+    return profile_dir / ("%s.mk" % name)
+
+
+class UserAttributeStore:
+    """The stored attributes of all users with a profile directory below profiles_dir
+
+    The values are the contents of the profile files."""
+    def __init__(self, profiles_dir: Path, path: Path) -> None:
+        super().__init__()
+        self._profiles_dir = profiles_dir
+        self._path = path
+
+    def _connect(self, fill: bool = True) -> sqlite3.Connection:
+        self._profiles_dir.mkdir(parents=True, exist_ok=True)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self._path), timeout=60, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            connection.execute(statement)
+        if fill and not self._is_filled(connection):
+            self._fill_from_profile_files(connection)
+        return connection
+
+    def _is_filled(self, connection: sqlite3.Connection) -> bool:
+        return connection.execute("SELECT 1 FROM meta WHERE key = 'filled'").fetchone() is not None
+
+    def _fill_from_profile_files(self, connection: sqlite3.Connection) -> None:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have filled the store in the meantime
+            if not self._is_filled(connection):
+                connection.execute("DELETE FROM attributes")
+                connection.executemany("INSERT INTO attributes VALUES (?, ?, ?)",
+                                       self._read_profile_files())
+                connection.execute("INSERT INTO meta VALUES ('filled', '1')")
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _read_profile_files(self) -> Iterable[Tuple[str, str, str]]:
+        for profile_dir in self._profiles_dir.iterdir():
+            if profile_dir.name.startswith(".") or not profile_dir.is_dir():
+                continue
+            for name in STORED_ATTRIBUTES:
+                try:
+                    value = profile_file_path(profile_dir, name).read_text(encoding="utf-8")
+                except (IOError, UnicodeDecodeError):
+                    continue
+                if value:
+                    yield profile_dir.name, name, value
+
+    def invalidate(self) -> None:
+        """Fill the store from the profile files again on next use
+
+        Needs to be called after the profile files have been changed without the store."""
+        connection = self._connect(fill=False)
+        try:
+            connection.execute("DELETE FROM meta WHERE key = 'filled'")
+        finally:
+            connection.close()
+
+    def load(self, user_id: str, name: str) -> Optional[str]:
+        connection = self._connect()
+        try:
+            row = connection.execute("SELECT value FROM attributes WHERE user_id = ? AND name = ?",
+                                     (user_id, name)).fetchone()
+        finally:
+            connection.close()
+        return None if row is None else row[0]
+
+    def load_all(self) -> Dict[str, Dict[str, str]]:
+        """The attributes of all users by user ID"""
+        attributes: Dict[str, Dict[str, str]] = {}
+        connection = self._connect()
+        try:
+            for user_id, name, value in connection.execute(
+                    "SELECT user_id, name, value FROM attributes"):
+                attributes.setdefault(user_id, {})[name] = value
+        finally:
+            connection.close()
+        return attributes
+
+    def save(self, user_id: str, name: str, value: Optional[str]) -> None:
+        self.update({user_id: {name: value}})
+
+    def update(self, changes: AttributeChanges) -> None:
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany("DELETE FROM attributes WHERE user_id = ? AND name = ?",
+                                       [(user_id, name)
+                                        for user_id, attributes in changes.items()
+                                        for name, value in attributes.items()
+                                        if value is None])
+                connection.executemany("INSERT OR REPLACE INTO attributes VALUES (?, ?, ?)",
+                                       [(user_id, name, value)
+                                        for user_id, attributes in changes.items()
+                                        for name, value in attributes.items()
+                                        if value is not None])
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        finally:
+            connection.close()
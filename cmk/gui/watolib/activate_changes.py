@@ -22,6 +22,7 @@ import os
 import shutil
 import time
 import abc
+import contextlib
 import multiprocessing
 import traceback
 import subprocess
@@ -29,7 +30,7 @@ import hashlib
 from itertools import filterfalse
 from logging import Logger
 from pathlib import Path
-from typing import Dict, Set, List, Optional, Tuple, Union, NamedTuple, Any, Callable
+from typing import Dict, Set, List, Optional, Tuple, Union, NamedTuple, Any, Callable, Iterator
 
 import psutil  # type: ignore[import]
 import werkzeug.urls
@@ -61,7 +62,7 @@ from cmk.gui.sites import (
 import cmk.gui.config as config
 import cmk.gui.log as log
 import cmk.gui.escaping as escaping
-from cmk.gui.i18n import _
+from cmk.gui.i18n import _, _l
 from cmk.gui.globals import g, request as _request
 from cmk.gui.log import logger
 from cmk.gui.exceptions import (
@@ -71,6 +72,7 @@ from cmk.gui.exceptions import (
     MKAuthException,
 )
 import cmk.gui.gui_background_job as gui_background_job
+from cmk.gui.utils.user_attribute_store import user_attribute_store
 from cmk.gui.plugins.userdb.utils import user_sync_default_config
 from cmk.gui.plugins.watolib.utils import wato_fileheader
 
@@ -108,6 +110,23 @@ STATE_SUCCESS = "success"  # Everything is ok
 STATE_ERROR = "error"  # Something went really wrong
 STATE_WARNING = "warning"  # e.g. in case of core config warnings
 
+# The measured steps of a site activation, in the order they are executed
+STEP_QUEUED = "queued"  # Waiting for a free activation slot
+STEP_SYNC_STATE = "sync_state"  # Fetching the sync state from the remote site
+STEP_SYNC_DIFF = "sync_diff"  # Computing the files to be synchronized
+STEP_SYNC_TRANSFER = "sync_transfer"  # Transferring the files to the remote site
+STEP_ACTIVATE = "activate"  # Activating the changes on the site
+STEP_FINALIZE = "finalize"  # Confirming the changes locally
+
+_STEP_TITLES = [
+    (STEP_QUEUED, _l("Queued")),
+    (STEP_SYNC_STATE, _l("Fetching sync state")),
+    (STEP_SYNC_DIFF, _l("Computing differences")),
+    (STEP_SYNC_TRANSFER, _l("Transfering")),
+    (STEP_ACTIVATE, _l("Activating")),
+    (STEP_FINALIZE, _l("Finalizing")),
+]
+
 # Available activation time keys
 
 ACTIVATION_TIME_RESTART = "restart"
@@ -1046,6 +1065,9 @@ class CRESnapshotDataCollector(ABCSnapshotDataCollector):
                                        site_ids: List[SiteId]) -> None:
         origin_site_work_dir = self._site_snapshot_settings[origin_site_id].work_dir
 
+        # The directories are cloned in parallel, limited like the site activations
+        max_jobs = _get_maximum_concurrent_jobs()
+        running: List[Tuple[SiteId, subprocess.Popen]] = []
         for site_id in site_ids:
             self._logger.debug("Processing site %s", site_id)
             snapshot_settings = self._site_snapshot_settings[site_id]
@@ -1053,12 +1075,24 @@ class CRESnapshotDataCollector(ABCSnapshotDataCollector):
             if os.path.exists(snapshot_settings.work_dir):
                 shutil.rmtree(snapshot_settings.work_dir)
 
-            p = subprocess.Popen(["cp", "-al", origin_site_work_dir, snapshot_settings.work_dir],
-                                 shell=False,
-                                 close_fds=True)
-            p.wait()
-            assert p.returncode == 0
-            self._logger.debug("Finished site")
+            if len(running) >= max_jobs:
+                self._wait_for_clone(*running.pop(0))
+
+            running.append(
+                (site_id,
+                 subprocess.Popen(["cp", "-al", origin_site_work_dir, snapshot_settings.work_dir],
+                                  shell=False,
+                                  close_fds=True)))
+
+        for site_id, p in running:
+            self._wait_for_clone(site_id, p)
+
+    def _wait_for_clone(self, site_id: SiteId, p: subprocess.Popen) -> None:
+        p.wait()
+        if p.returncode != 0:
+            raise MKGeneralException(
+                _("Failed to create site config directory of site %s") % site_id)
+        self._logger.debug("Finished site %s", site_id)
 
     def get_generic_components(self) -> List[ReplicationPath]:
         return get_replication_paths()
@@ -1205,15 +1239,21 @@ class ActivateChangesSchedulerBackgroundJob(WatoBackgroundJob):
         job_interface.send_progress_update(_("Going to update %d sites") % len(queued_jobs),
                                            with_timestamp=True)
 
+        self._update_config_sync_manifest(queued_jobs)
+        job_interface.send_progress_update(_("Updated the config sync manifest"),
+                                           with_timestamp=True)
+
         running_jobs: List[ActivateChangesSite] = []
-        max_jobs = self._get_maximum_concurrent_jobs()
+        max_jobs = _get_maximum_concurrent_jobs()
         while queued_jobs or len(running_jobs) > 0:
             # Housekeeping, remove finished jobs
             for job in running_jobs[:]:
                 if job.is_alive():
                     continue
-                job_interface.send_progress_update(_("Finished site update: %s") % job.site_id,
-                                                   with_timestamp=True)
+                job_interface.send_progress_update(
+                    _("Finished site update: %s (took %.1f seconds)") %
+                    (job.site_id, time.time() - job.time_queued),
+                    with_timestamp=True)
                 job.join()
                 running_jobs.remove(job)
 
@@ -1235,25 +1275,20 @@ class ActivateChangesSchedulerBackgroundJob(WatoBackgroundJob):
 
         job_interface.send_result_message(_("Activate changes finished"))
 
-    def _get_maximum_concurrent_jobs(self):
-        if config.wato_activate_changes_concurrency == "auto":
-            processes = self._max_processes_based_on_ram()
-        else:  # (maximum, 23)
-            processes = config.wato_activate_changes_concurrency[1]
-        return max(5, processes)
+    def _update_config_sync_manifest(self, queued_jobs: 'List[ActivateChangesSite]') -> None:
+        """Hash the files of all sites to be synchronized once before the sites are started
 
-    def _max_processes_based_on_ram(self):
-        # This process will be forked mulitple times
-        # Determine its current rss usage and compute a reasonable maximum value
-        try:
-            # We are going to fork this process
-            process = psutil.Process(os.getpid())
-            size = process.memory_info().rss
-            return (0.9 * psutil.virtual_memory().available) // size
-        except RequestTimeout:
-            raise
-        except Exception:
-            return 1
+        Most files in the site config directories are hard links to the same files. They are
+        hashed once here instead of once per site."""
+        manifest = ConfigSyncManifest(_central_config_sync_manifest_path())
+        manifest.load()
+        for job in queued_jobs:
+            snapshot_settings = self._site_snapshot_settings[job.site_id]
+            if snapshot_settings.create_pre_17_snapshot or not job.is_sync_needed(job.site_id):
+                continue
+            _get_config_sync_file_infos(snapshot_settings.snapshot_components,
+                                        Path(snapshot_settings.work_dir), manifest)
+        manifest.save()
 
     def _get_queued_jobs(self) -> 'List[ActivateChangesSite]':
         queued_jobs: List[ActivateChangesSite] = []
@@ -1273,6 +1308,32 @@ class ActivateChangesSchedulerBackgroundJob(WatoBackgroundJob):
         return queued_jobs
 
 
+def _get_maximum_concurrent_jobs() -> int:
+    """The maximum number of sites which are processed in parallel
+
+    Limits the parallel site activations as well as the parallel preparation of the site
+    config directories."""
+    if config.wato_activate_changes_concurrency == "auto":
+        processes = _max_processes_based_on_ram()
+    else:  # (maximum, 23)
+        processes = config.wato_activate_changes_concurrency[1]
+    return int(max(5, processes))
+
+
+def _max_processes_based_on_ram():
+    # This process will be forked mulitple times
+    # Determine its current rss usage and compute a reasonable maximum value
+    try:
+        # We are going to fork this process
+        process = psutil.Process(os.getpid())
+        size = process.memory_info().rss
+        return (0.9 * psutil.virtual_memory().available) // size
+    except RequestTimeout:
+        raise
+    except Exception:
+        return 1
+
+
 class ActivateChangesSite(multiprocessing.Process, ActivateChanges):
     """Executes and monitors a single activation for one site"""
     def __init__(self,
@@ -1299,6 +1360,8 @@ class ActivateChangesSite(multiprocessing.Process, ActivateChanges):
         self._status_details: Optional[str] = None
         self._pid: Optional[int] = None
         self._expected_duration = 10.0
+        self._time_queued: Optional[float] = None
+        self._durations: Dict[str, float] = {}
         self._logger = logger.getChild("site[%s]" % self._site_id)
 
         self._set_result(PHASE_INITIALIZED, _("Initialized"))
@@ -1307,6 +1370,20 @@ class ActivateChangesSite(multiprocessing.Process, ActivateChanges):
     def site_id(self):
         return self._site_id
 
+    @property
+    def time_queued(self) -> float:
+        assert self._time_queued is not None
+        return self._time_queued
+
+    @contextlib.contextmanager
+    def _timed(self, step: str) -> Iterator[None]:
+        """Add the duration of the enclosed code to the given step of the activation"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._durations[step] = self._durations.get(step, 0.0) + time.time() - start
+
     def load(self):
         super(ActivateChangesSite, self).load()
         self._load_this_sites_changes()
@@ -1365,6 +1442,8 @@ class ActivateChangesSite(multiprocessing.Process, ActivateChanges):
     def _do_run(self):
         try:
             self._time_started = time.time()
+            if self._time_queued is not None:
+                self._durations[STEP_QUEUED] = self._time_started - self._time_queued
 
             # Update PID
             # Initially the SiteScheduler set its own PID into the sites state file
@@ -1382,11 +1461,14 @@ class ActivateChangesSite(multiprocessing.Process, ActivateChanges):
             self._set_result(PHASE_FINISHING, _("Finalizing"))
             configuration_warnings = {}
             if self._prevent_activate:
-                self._confirm_synchronized_changes()
+                with self._timed(STEP_FINALIZE):
+                    self._confirm_synchronized_changes()
             else:
                 if self._is_activate_needed(self._site_id):
-                    configuration_warnings = self._do_activate()
-                self._confirm_activated_changes()
+                    with self._timed(STEP_ACTIVATE):
+                        configuration_warnings = self._do_activate()
+                with self._timed(STEP_FINALIZE):
+                    self._confirm_activated_changes()
 
             self._set_done_result(configuration_warnings)
         except Exception as e:
@@ -1475,6 +1557,7 @@ class ActivateChangesSite(multiprocessing.Process, ActivateChanges):
     def _mark_queued(self):
         # Is set by site scheduler
         self._pid = os.getpid()
+        self._time_queued = time.time()
         self._set_result(PHASE_QUEUED, _("Queued"))
 
     def _mark_running(self):
@@ -1521,19 +1604,24 @@ class ActivateChangesSite(multiprocessing.Process, ActivateChanges):
         self._set_sync_state(_("Fetching sync state"))
         self._logger.debug("Starting config sync with >1.7 site")
         replication_paths = self._snapshot_settings.snapshot_components
-        remote_file_infos, remote_config_generation = self._get_config_sync_state(replication_paths)
+        with self._timed(STEP_SYNC_STATE):
+            remote_file_infos, remote_config_generation = self._get_config_sync_state(
+                replication_paths)
         self._logger.debug("Received %d file infos from remote", len(remote_file_infos))
 
-        # In case we experience performance issues here, we could postpone the hashing of the
-        # central files to only be done ad-hoc in get_file_names_to_sync when the other attributes
-        # are not enough to detect a differing file.
+        # The files have already been hashed by the scheduler before the site synchronizations
+        # were started. The manifest is shared by all sites and is only read here.
+        self._set_sync_state(_("Computing differences"))
         site_config_dir = Path(self._snapshot_settings.work_dir)
-        central_file_infos = _get_config_sync_file_infos(replication_paths, site_config_dir)
-        self._logger.debug("Got %d file infos from %s", len(remote_file_infos), site_config_dir)
+        with self._timed(STEP_SYNC_DIFF):
+            manifest = ConfigSyncManifest(_central_config_sync_manifest_path())
+            manifest.load()
+            central_file_infos = _get_config_sync_file_infos(replication_paths, site_config_dir,
+                                                             manifest)
+            self._logger.debug("Got %d file infos from %s", len(remote_file_infos), site_config_dir)
 
-        self._set_sync_state(_("Computing differences"))
-        to_sync_new, to_sync_changed, to_delete = get_file_names_to_sync(
-            self._logger, central_file_infos, remote_file_infos, self._file_filter_func)
+            to_sync_new, to_sync_changed, to_delete = get_file_names_to_sync(
+                self._logger, central_file_infos, remote_file_infos, self._file_filter_func)
 
         self._logger.debug("New files to be synchronized: %r", to_sync_new)
         self._logger.debug("Changed files to be synchronized: %r", to_sync_changed)
@@ -1546,8 +1634,9 @@ class ActivateChangesSite(multiprocessing.Process, ActivateChanges):
         self._set_sync_state(
             _("Transfering: %d new, %d changed and %d vanished files") %
             (len(to_sync_new), len(to_sync_changed), len(to_delete)))
-        self._synchronize_files(to_sync_new + to_sync_changed, to_delete, remote_config_generation,
-                                site_config_dir)
+        with self._timed(STEP_SYNC_TRANSFER):
+            self._synchronize_files(to_sync_new + to_sync_changed, to_delete,
+                                    remote_config_generation, site_config_dir)
         self._logger.debug("Finished config sync")
 
     def _set_sync_state(self, status_details: Optional[str] = None) -> None:
@@ -1601,7 +1690,8 @@ class ActivateChangesSite(multiprocessing.Process, ActivateChanges):
     def _synchronize_pre_17_site(self) -> None:
         """This is done on the central site to initiate the sync process"""
         self._logger.debug("Starting config sync with pre 1.7 site")
-        result = self._push_pre_17_snapshot_to_site()
+        with self._timed(STEP_SYNC_TRANSFER):
+            result = self._push_pre_17_snapshot_to_site()
         self._logger.debug("Finished config sync")
 
         # Pre 1.2.7i3 and sites return True on success and a string on error.
@@ -1734,6 +1824,7 @@ class ActivateChangesSite(multiprocessing.Process, ActivateChanges):
                 "_time_updated": self._time_updated,
                 "_time_ended": self._time_ended,
                 "_expected_duration": self._expected_duration,
+                "_durations": self._durations,
                 "_pid": self._pid,
             })
 
@@ -1748,6 +1839,8 @@ class ActivateChangesSite(multiprocessing.Process, ActivateChanges):
 
         if phase == PHASE_DONE:
             self._status_details += _(" Finished at: %s.") % render.time_of_day(self._time_ended)
+            if self._durations:
+                self._status_details += "<br>%s" % self._render_durations()
         elif phase != PHASE_QUEUED:
             assert isinstance(self._time_started, (int, float))
             estimated_time_left = self._expected_duration - (time.time() - self._time_started)
@@ -1761,6 +1854,11 @@ class ActivateChangesSite(multiprocessing.Process, ActivateChanges):
         if status_details:
             self._status_details += "<br>%s" % status_details
 
+    def _render_durations(self) -> str:
+        return _("Durations: %s") % ", ".join("%s %.1fs" % (title, self._durations[step])
+                                              for step, title in _STEP_TITLES
+                                              if step in self._durations)
+
     def _save_state(self, activation_id: ActivationId, site_id: SiteId,
                     state: SiteActivationState) -> None:
         state_path = ActivateChangesManager.site_state_path(activation_id, site_id)
@@ -2144,8 +2242,12 @@ class AutomationGetConfigSyncState(AutomationCommand):
 
     def execute(self, request: List[ReplicationPath]) -> GetConfigSyncStateResponse:
         with store.lock_checkmk_configuration():
+            manifest = ConfigSyncManifest(_remote_config_sync_manifest_path())
+            manifest.load()
             file_infos = _get_config_sync_file_infos(request,
-                                                     base_dir=Path(cmk.utils.paths.omd_root))
+                                                     base_dir=Path(cmk.utils.paths.omd_root),
+                                                     manifest=manifest)
+            manifest.save()
             transport_file_infos = {
                 k: (v.st_mode, v.st_size, v.link_target, v.file_hash)
                 for k, v in file_infos.items()
@@ -2153,12 +2255,15 @@ class AutomationGetConfigSyncState(AutomationCommand):
             return (transport_file_infos, _get_current_config_generation())
 
 
-def _get_config_sync_file_infos(replication_paths: List[ReplicationPath],
-                                base_dir: Path) -> Dict[str, ConfigSyncFileInfo]:
+def _get_config_sync_file_infos(
+        replication_paths: List[ReplicationPath],
+        base_dir: Path,
+        manifest: 'Optional[ConfigSyncManifest]' = None) -> Dict[str, ConfigSyncFileInfo]:
     """Scans the given replication paths for the information needed for the config sync
 
     It produces a dictionary of sync file infos. One entry is created for each file.  Directories
-    are not added to the dictionary.
+    are not added to the dictionary. When a manifest is given, only the files which changed since
+    they were hashed the last time are hashed.
     """
     infos = {}
 
@@ -2169,29 +2274,42 @@ def _get_config_sync_file_infos(replication_paths: List[ReplicationPath],
             continue  # Only report back existing things
 
         if replication_path.ty == "file":
-            infos[replication_path.site_path] = _get_config_sync_file_info(path)
+            infos[replication_path.site_path] = _get_config_sync_file_info(
+                path, replication_path.site_path, manifest)
 
         elif replication_path.ty == "dir":
             for entry in path.glob("**/*"):
                 if entry.is_dir() and not entry.is_symlink():
                     continue  # Do not add directories at all
 
-                entry_site_path = entry.relative_to(base_dir)
-                infos[str(entry_site_path)] = _get_config_sync_file_info(entry)
+                entry_site_path = str(entry.relative_to(base_dir))
+                infos[entry_site_path] = _get_config_sync_file_info(entry, entry_site_path,
+                                                                    manifest)
 
         else:
             raise NotImplementedError()
     return infos
 
 
-def _get_config_sync_file_info(file_path: Path) -> ConfigSyncFileInfo:
+def _get_config_sync_file_info(
+        file_path: Path,
+        site_path: Optional[str] = None,
+        manifest: 'Optional[ConfigSyncManifest]' = None) -> ConfigSyncFileInfo:
     stat = file_path.lstat()
     is_symlink = file_path.is_symlink()
+
+    file_hash = None
+    if not is_symlink:
+        if manifest is not None and site_path is not None:
+            file_hash = manifest.file_hash(site_path, file_path, stat)
+        else:
+            file_hash = _create_config_sync_file_hash(file_path)
+
     return ConfigSyncFileInfo(
         stat.st_mode,
         stat.st_size,
         os.readlink(str(file_path)) if is_symlink else None,
-        _create_config_sync_file_hash(file_path) if not is_symlink else None,
+        file_hash,
     )
 
 
@@ -2206,6 +2324,57 @@ def _create_config_sync_file_hash(file_path: Path) -> str:
     return sha256.hexdigest()
 
 
+class ConfigSyncManifest:
+    """Persistent hashes of the files handled by the config sync
+
+    Stores the site path of each hashed file together with the inode, size and modification time
+    the file had when it was hashed. A file is only hashed again when one of them has changed.
+
+    The central site shares one manifest between the synchronizations of all sites, the files in
+    the site config directories are hard links to the same files. The remote site keeps its own
+    manifest of the files below its site directory.
+    """
+    def __init__(self, path: Path) -> None:
+        super(ConfigSyncManifest, self).__init__()
+        self._path = path
+        self._entries: Dict[str, Tuple[int, int, int, str]] = {}
+        self._used: Dict[str, Tuple[int, int, int, str]] = {}
+
+    def load(self) -> None:
+        try:
+            self._entries = store.load_object_from_file(self._path, default={})
+        except (MKGeneralException, SyntaxError, ValueError):
+            self._entries = {}  # Start with an empty manifest in case it is not readable
+        self._used = {}
+
+    def save(self) -> None:
+        """Save the entries of the files which were used since the manifest was loaded"""
+        store.makedirs(self._path.parent)
+        store.save_object_to_file(self._path, self._used)
+
+    def file_hash(self, site_path: str, file_path: Path, stat: os.stat_result) -> str:
+        entry = self._entries.get(site_path)
+        if entry is not None and entry[:3] == (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+            self._used[site_path] = entry
+            return entry[3]
+
+        file_hash = _create_config_sync_file_hash(file_path)
+        # A change within the resolution of the modification time would not be recognized,
+        # so recently changed files are hashed again next time
+        if time.time() - stat.st_mtime > 2:
+            entry = (stat.st_ino, stat.st_size, stat.st_mtime_ns, file_hash)
+            self._entries[site_path] = self._used[site_path] = entry
+        return file_hash
+
+
+def _central_config_sync_manifest_path() -> Path:
+    return Path(cmk.utils.paths.var_dir) / "wato" / "config_sync_manifest_central.mk"
+
+
+def _remote_config_sync_manifest_path() -> Path:
+    return Path(cmk.utils.paths.var_dir) / "wato" / "config_sync_manifest_remote.mk"
+
+
 def update_config_generation():
     """Increase the config generation ID
 
@@ -2284,6 +2453,9 @@ class AutomationReceiveConfigSync(AutomationCommand):
 
         _unpack_sync_archive(sync_archive, base_dir)
 
+        # The profile files of the users may have been replaced
+        user_attribute_store().invalidate()
+
 
 def activate_changes_start(
     sites: List[SiteId],
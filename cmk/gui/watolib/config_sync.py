@@ -28,6 +28,7 @@ import cmk.utils.paths
 from cmk.gui.log import logger
 from cmk.gui.i18n import _
 from cmk.gui.exceptions import MKGeneralException
+from cmk.gui.utils.user_attribute_store import user_attribute_store
 
 Command = List[str]
 
@@ -443,6 +444,9 @@ def _update_usersettings(path, subtar):
         if os.path.isdir(p):
             _update_settings_of_user(p, subtar, all_user_tars.get(user, []), user, local_users)
 
+    # The profile files have been replaced, read them to the attribute store again
+    user_attribute_store().invalidate()
+
 
 def _update_settings_of_user(
     path: str,
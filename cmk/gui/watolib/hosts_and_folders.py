@@ -5,6 +5,8 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 import abc
 from collections.abc import Mapping as ABCMapping
+import copy
+import hashlib
 import io
 import pickle
 import operator
@@ -170,7 +172,9 @@ class WithUniqueIdentifier(metaclass=abc.ABCMeta):
         Returns:
             The loaded data.
         """
-        data = store.load_object_from_file(self._store_file_name(), default={})
+        path = self._store_file_name()
+        data = copy.deepcopy(
+            _load_cached(path, lambda: store.load_object_from_file(path, default={})))
         data = self._upgrade_keys(data)
         unique_id = data.get('__id')
         if self._id is None:
@@ -700,6 +704,40 @@ class RawHostsStorage(ABCHostsStorage):
         self.save("    'host_attributes': %s,\n" % format_config_value(cleaned_hosts))
 
 
+# The data loaded from the files and directories of the folders, kept for the lifetime
+# of the process. The entries are validated with the status of the file on each access,
+# so changes made by other processes are recognized.
+_folder_file_cache: Dict[str, Tuple[Tuple[int, int, int], Any]] = {}
+
+
+def _load_cached(path: str, load: Callable[[], Any]) -> Any:
+    """The data loaded from the file or directory at path, which must not be modified"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        _folder_file_cache.pop(path, None)
+        return load()
+
+    signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _folder_file_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    data = load()
+    # A change within the resolution of the modification time would not be recognized,
+    # so recently changed files are not cached
+    if time.time() - stat.st_mtime > 2:
+        _folder_file_cache[path] = (signature, data)
+    return data
+
+
+def _subfolder_names(dir_path: str) -> List[str]:
+    try:
+        return [entry for entry in os.listdir(dir_path) if os.path.isdir(dir_path + "/" + entry)]
+    except FileNotFoundError:
+        return []
+
+
 def make_hosts_storage() -> ABCHostsStorage:
     """Factory creates a storage suitable for current distribution.
     The flag will be located, probably in cee.py"""
@@ -717,7 +755,7 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
     def all_folders():
         if 'wato_folders' not in g:
             wato_folders = g.wato_folders = {}
-            Folder("", "").add_to_dictionary(wato_folders)
+            Folder.root_folder().add_to_dictionary(wato_folders)
         return g.wato_folders
 
     @staticmethod
@@ -735,9 +773,18 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
 
     @staticmethod
     def folder(folder_path):
-        if folder_path in Folder.all_folders():
-            return Folder.all_folders()[folder_path]
-        raise MKGeneralException("No WATO folder %s." % folder_path)
+        if 'wato_folders' in g:
+            if folder_path in g.wato_folders:
+                return g.wato_folders[folder_path]
+            raise MKGeneralException("No WATO folder %s." % folder_path)
+
+        # Only load the folders on the way to the requested folder
+        folder = Folder.root_folder()
+        for subfolder_name in Folder._split_folder_path(folder_path):
+            if not folder.has_subfolder(subfolder_name):
+                raise MKGeneralException("No WATO folder %s." % folder_path)
+            folder = folder.subfolder(subfolder_name)
+        return folder
 
     @staticmethod
     def create_missing_folders(folder_path):
@@ -760,7 +807,9 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
 
     @staticmethod
     def root_folder() -> 'CREFolder':
-        return Folder.folder("")
+        if 'wato_root_folder' not in g:
+            g.wato_root_folder = Folder("", "")
+        return g.wato_root_folder
 
     # Need this for specifying the correct type
     def parent_folder_chain(self) -> 'List[CREFolder]':  # pylint: disable=useless-super-delegation
@@ -768,7 +817,9 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
 
     @staticmethod
     def invalidate_caches():
-        Folder.root_folder().drop_caches()
+        if 'wato_root_folder' in g:
+            g.wato_root_folder.drop_caches()
+        g.pop('wato_root_folder', None)
         g.pop('wato_folders', {})
         for cache_id in ["folder_choices", "folder_choices_full_title"]:
             g.pop(cache_id, None)
@@ -825,7 +876,7 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
         super(CREFolder, self).__init__()
         self._name = name
         self._parent = parent_folder
-        self._subfolders = {}
+        self._loaded_subfolders: Optional[Dict[str, CREFolder]] = None
 
         if attributes is None:
             attributes = {}
@@ -841,10 +892,11 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
             self._root_dir = wato_root_dir()
 
         if folder_path is not None:
+            # The hosts and subfolders are loaded on demand
             self._hosts = None
             self.load_instance()
-            self.load_subfolders()
         else:
+            self._loaded_subfolders = {}
             self._hosts = {}
             self._num_hosts = 0
             self._title = title or self._fallback_title()
@@ -875,6 +927,13 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
     def is_disk_folder(self):
         return True
 
+    @property
+    def _subfolders(self) -> 'Dict[str, CREFolder]':
+        if self._loaded_subfolders is None:
+            self._loaded_subfolders = {}
+            self.load_subfolders()
+        return self._loaded_subfolders
+
     def _load_hosts_on_demand(self):
         if self._hosts is None:
             self._load_hosts()
@@ -886,9 +945,37 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
         if not os.path.exists(self.hosts_file_path()):
             return
 
-        variables = self._load_hosts_file()
+        hosts_data = _load_cached(self.hosts_file_path(), self._load_hosts_data)
         # Can either be set to True or a string (which will be used as host lock message)
-        self._locked_hosts = variables["_lock"]
+        self._locked_hosts = hosts_data["lock"]
+
+        # The loaded data is cached, each host gets its own copy of the attributes
+        for host_name, attributes in hosts_data["hosts"].items():
+            self._hosts[host_name] = Host(self, host_name, copy.deepcopy(attributes),
+                                          copy.copy(hosts_data["nodes_of"].get(host_name)))
+
+    def _load_hosts_data(self) -> Dict[str, Any]:
+        """The hosts of the folder with their attributes and the nodes of the clusters
+
+        The data is read from the hosts data file, which is written together with the
+        hosts.mk and can be loaded without executing it. The hosts.mk is only executed
+        when it has been changed by something else."""
+        try:
+            data = store.load_object_from_file(self.hosts_data_path(), default={})
+        except MKGeneralException:
+            data = {}
+
+        if data and data.get("hosts_file_hash") == self._hosts_file_hash():
+            return {
+                "lock": False,
+                "hosts": {
+                    host_name: self._transform_old_attributes(attributes)
+                    for host_name, attributes in data["hosts"].items()
+                },
+                "nodes_of": data["nodes_of"],
+            }
+
+        variables = self._load_hosts_file()
 
         # Add entries in clusters{} to all_hosts, prepare cluster to node mapping
         nodes_of = {}
@@ -897,15 +984,22 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
             nodes_of[cluster_with_tags.split('|')[0]] = list(map(str, nodes))
 
         # Build list of individual hosts
+        hosts = {}
         for host_name_with_tags in variables["all_hosts"]:
             parts = host_name_with_tags.split('|', 1)
             host_name = parts[0]
-            host = self._create_host_from_variables(host_name, nodes_of, variables)
-            self._hosts[host_name] = host
+            hosts[host_name] = self._host_attributes_from_variables(host_name, variables)
 
-    def _create_host_from_variables(self, host_name, nodes_of, variables):
-        cluster_nodes = nodes_of.get(host_name)
+        return {
+            "lock": variables["_lock"],
+            "hosts": hosts,
+            "nodes_of": nodes_of,
+        }
+
+    def _hosts_file_hash(self) -> str:
+        return hashlib.sha256(store.load_bytes_from_file(self.hosts_file_path())).hexdigest()
 
+    def _host_attributes_from_variables(self, host_name, variables):
         # If we have a valid entry in host_attributes then the hosts.mk file contained
         # valid WATO information from a last save and we use that
         if host_name in variables["host_attributes"]:
@@ -929,7 +1023,7 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
                 if host_name in variables[config_dict]:
                     attributes[attribute_key] = variables[config_dict][host_name]
 
-        return Host(self, host_name, attributes, cluster_nodes)
+        return attributes
 
     def _upgrade_keys(self, data):
         data['attributes'] = self._transform_old_attributes(data.get('attributes', {}))
@@ -1076,8 +1170,9 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
     def _save_hosts_file(self):
         store.makedirs(self.filesystem_path())
         if not self.has_hosts():
-            if os.path.exists(self.hosts_file_path()):
-                os.remove(self.hosts_file_path())
+            for path in [self.hosts_file_path(), self.hosts_data_path()]:
+                if os.path.exists(path):
+                    os.remove(path)
             return
 
         all_hosts: List[str] = []
@@ -1194,6 +1289,19 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
 
             storage.write(self.hosts_file_path())
 
+        # The hosts of the folder in a format which can be loaded without executing it.
+        # The hash connects it to the content of the hosts.mk it was written with.
+        store.save_object_to_file(
+            self.hosts_data_path(), {
+                "hosts_file_hash": hashlib.sha256(storage_list[0].getvalue().encode("utf-8")
+                                                 ).hexdigest(),
+                "hosts": {
+                    host_name: cleaned_hosts[host_name]
+                    for host_name in all_hosts + sorted(clusters)
+                },
+                "nodes_of": clusters,
+            })
+
     def _get_alias_from_extra_conf(self, host_name, variables):
         aliases = self._host_extra_conf(host_name, variables["extra_host_conf"]["alias"])
         if len(aliases) > 0:
@@ -1251,19 +1359,15 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
 
     def load_subfolders(self):
         dir_path = self._root_dir + self.path()
-        if not os.path.exists(dir_path):
-            return
-        for entry in os.listdir(dir_path):
-            subfolder_dir = dir_path + "/" + entry
-            if os.path.isdir(subfolder_dir):
-                if self.path():
-                    subfolder_path = self.path() + "/" + entry
-                else:
-                    subfolder_path = entry
-                self._subfolders[entry] = Folder(entry,
-                                                 subfolder_path,
-                                                 parent_folder=self,
-                                                 root_dir=self._root_dir)
+        for entry in _load_cached(dir_path, lambda: _subfolder_names(dir_path)):
+            if self.path():
+                subfolder_path = self.path() + "/" + entry
+            else:
+                subfolder_path = entry
+            self._subfolders[entry] = Folder(entry,
+                                             subfolder_path,
+                                             parent_folder=self,
+                                             root_dir=self._root_dir)
 
     def wato_info_path(self):
         return self.filesystem_path() + "/.wato"
@@ -1271,6 +1375,9 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
     def hosts_file_path(self):
         return self.filesystem_path() + "/hosts.mk"
 
+    def hosts_data_path(self):
+        return self.filesystem_path() + "/.hosts.wato"
+
     def rules_file_path(self):
         return self.filesystem_path() + "/rules.mk"
 
@@ -1283,7 +1390,8 @@ class CREFolder(WithPermissions, WithAttributes, WithUniqueIdentifier, BaseFolde
         super(CREFolder, self).drop_caches()
         self._choices_for_moving_host = None
 
-        for subfolder in self._subfolders.values():
+        # Subfolders which have not been loaded yet have nothing to drop
+        for subfolder in (self._loaded_subfolders or {}).values():
             subfolder.drop_caches()
 
         if self._hosts is not None:
@@ -28,6 +28,7 @@ from cmk.gui.log import logger
 from cmk.gui.watolib.changes import log_audit
 from cmk.gui.exceptions import MKGeneralException
 from cmk.gui.i18n import _
+from cmk.gui.utils.user_attribute_store import user_attribute_store
 
 DomainSpec = Dict
 
@@ -592,6 +593,9 @@ def extract_snapshot(tar: tarfile.TarFile, domains: Dict[str, DomainSpec]) -> No
     # Cleanup
     _wipe_directory(restore_dir)
 
+    # The profile files may have been replaced, read them to the attribute store again
+    user_attribute_store().invalidate()
+
     if total_errors:
         raise MKGeneralException(
             _("Errors on restoring snapshot:<br>%s") % "<br>".join(total_errors))
@@ -4,6 +4,8 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import multiprocessing
+import os
 import pickle
 import time
 import cmk
@@ -13,6 +15,7 @@ from typing import (
     Dict,
     Set,
     Optional,
+    Tuple,
     TypedDict,
     List,
 )
@@ -45,16 +48,46 @@ class ConfigStatus(TypedDict):
     online_sites: Set[SiteProgramStart]
 
 
+# The aggregations and the searcher of the running compilation. The compilation processes
+# are forked after setting it, so they share the structure data without copying it.
+_compilation_data: Optional[Tuple[Dict[str, BIAggregation], BISearcher]] = None
+
+# Report the compilation times of this number of aggregations in the log
+_NUM_SLOWEST_AGGREGATIONS = 10
+
+# Forking pays off only when each process has a couple of aggregations to compile
+_MIN_AGGREGATIONS_PER_PROCESS = 10
+
+
+def _compile_aggregation(aggr_id: str) -> Tuple[str, BICompiledAggregation, float]:
+    assert _compilation_data is not None
+    aggregations, bi_searcher = _compilation_data
+    return _compile_aggregation_with(aggregations[aggr_id], bi_searcher)
+
+
+def _compile_aggregation_with(aggregation: BIAggregation,
+                              bi_searcher: BISearcher) -> Tuple[str, BICompiledAggregation, float]:
+    start = time.time()
+    compiled_aggregation = aggregation.compile(bi_searcher)
+    return aggregation.id, compiled_aggregation, time.time() - start
+
+
 class BICompiler:
-    def __init__(self, bi_configuration_file, sites_callback: SitesCallback):
+    def __init__(self,
+                 bi_configuration_file,
+                 sites_callback: SitesCallback,
+                 num_processes: int = 1):
         self._sites_callback = sites_callback
         self._bi_configuration_file = bi_configuration_file
+        # Maximum number of processes compiling the aggregations, at most one per CPU
+        self._num_processes = max(1, min(num_processes, os.cpu_count() or 1))
 
         self._logger = logger.getChild("bi.compiler")
         self._compiled_aggregations: Dict[str, BICompiledAggregation] = {}
         self._path_compilation_lock = Path(get_cache_dir(), "compilation.LOCK")
         self._path_compilation_timestamp = Path(get_cache_dir(), "last_compilation")
         self._path_compiled_aggregations = Path(get_cache_dir(), "compiled_aggregations")
+        self._path_compilation_times = Path(get_cache_dir(), "compilation_times")
         self._path_compiled_aggregations.mkdir(parents=True, exist_ok=True)
 
         self._redis_client: Optional['RedisDecoded'] = None
@@ -107,11 +140,8 @@ class BICompiler:
             self.prepare_for_compilation(current_configstatus["online_sites"])
 
             # Compile the raw tree
-            for aggregation in self._bi_packs.get_all_aggregations():
-                start = time.time()
-                self._compiled_aggregations[aggregation.id] = aggregation.compile(self.bi_searcher)
-                self._logger.debug("Compilation of %s took %f" %
-                                   (aggregation.id, time.time() - start))
+            self._compiled_aggregations.update(
+                self._compile_aggregations(self._bi_packs.get_all_aggregations()))
 
             self._verify_aggregation_title_uniqueness(self._compiled_aggregations)
 
@@ -130,6 +160,60 @@ class BICompiler:
         store.save_text_to_file(str(self._path_compilation_timestamp),
                                 str(current_configstatus["configfile_timestamp"]))
 
+    def _compile_aggregations(
+            self, aggregations: List[BIAggregation]) -> Dict[str, BICompiledAggregation]:
+        start = time.time()
+        num_processes = max(
+            1, min(self._num_processes,
+                   len(aggregations) // _MIN_AGGREGATIONS_PER_PROCESS))
+        if num_processes > 1:
+            results = self._compile_in_processes(aggregations, num_processes)
+        else:
+            results = [
+                _compile_aggregation_with(aggregation, self.bi_searcher)
+                for aggregation in aggregations
+            ]
+
+        compilation_times: Dict[str, float] = {}
+        compiled_aggregations: Dict[str, BICompiledAggregation] = {}
+        for aggr_id, compiled_aggregation, duration in results:
+            self._logger.debug("Compilation of %s took %f" % (aggr_id, duration))
+            compilation_times[aggr_id] = duration
+            compiled_aggregations[aggr_id] = compiled_aggregation
+
+        self._report_compilation_times(compilation_times, time.time() - start, num_processes)
+
+        # The processes finish in any order, keep the order of the configuration
+        return {
+            aggregation.id: compiled_aggregations[aggregation.id] for aggregation in aggregations
+        }
+
+    def _compile_in_processes(self, aggregations: List[BIAggregation],
+                              num_processes: int) -> List[Tuple[str, BICompiledAggregation, float]]:
+        global _compilation_data
+        _compilation_data = ({aggregation.id: aggregation for aggregation in aggregations},
+                             self.bi_searcher)
+        try:
+            with multiprocessing.get_context("fork").Pool(num_processes) as pool:
+                return list(
+                    pool.imap_unordered(_compile_aggregation,
+                                        [aggregation.id for aggregation in aggregations]))
+        finally:
+            _compilation_data = None
+
+    def _report_compilation_times(self, compilation_times: Dict[str, float], duration: float,
+                                  num_processes: int) -> None:
+        slowest = sorted(compilation_times.items(), key=lambda x: x[1], reverse=True)
+        self._logger.info(
+            "Compiled %d aggregations in %.2fs using %d processes, slowest: %s" %
+            (len(compilation_times), duration, num_processes, ", ".join(
+                "%s (%.2fs)" % entry for entry in slowest[:_NUM_SLOWEST_AGGREGATIONS])))
+        store.save_object_to_file(self._path_compilation_times, dict(slowest))
+
+    def get_compilation_times(self) -> Dict[str, float]:
+        """The compilation time of each aggregation of the last compilation, the slowest first"""
+        return store.load_object_from_file(self._path_compilation_times, default={})
+
     def _cleanup_vanished_aggregations(self):
         valid_aggregations = list(self._compiled_aggregations.keys())
         for path_object in self._path_compiled_aggregations.iterdir():
@@ -193,6 +277,13 @@ class BICompiler:
             self._logger.warning("Can not determine compilation timestamp %s" % str(e))
         return compilation_timestamp
 
+    def get_compilation_time(self) -> float:
+        """The time of the last compilation, changes with every compilation"""
+        try:
+            return self._path_compilation_timestamp.stat().st_mtime
+        except FileNotFoundError:
+            return 0.0
+
     def _site_status_changed(self, required_program_starts: Set[SiteProgramStart]) -> bool:
         # The cached data may include more data than the currently required_program_starts
         # Empty branches are simply not shown during computation
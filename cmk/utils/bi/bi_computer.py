@@ -5,12 +5,23 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import copy
-from typing import NamedTuple, List, Tuple, Set, Dict, Optional, Iterator
+from typing import Any, NamedTuple, List, Tuple, Set, Dict, Optional, Iterator
 
 import cmk.utils.plugin_registry
 from cmk.utils.type_defs import ServiceName
-from cmk.utils.bi.bi_lib import RequiredBIElement, BIHostSpec
-from cmk.utils.bi.bi_trees import BICompiledRule, BICompiledAggregation, NodeResultBundle
+from cmk.utils.bi.bi_lib import (
+    ABCBICompiledNode,
+    ABCBIStatusFetcher,
+    BIAggregationComputationOptions,
+    RequiredBIElement,
+    BIHostSpec,
+)
+from cmk.utils.bi.bi_trees import (
+    BICompiledLeaf,
+    BICompiledRule,
+    BICompiledAggregation,
+    NodeResultBundle,
+)
 
 BIAggregationFilter = NamedTuple("BIAggregationFilter", [
     ("hosts", List[BIHostSpec]),
@@ -49,10 +60,101 @@ class BIComputerPostprocessingRegistry(
 bi_computer_postprocessing_registry = BIComputerPostprocessingRegistry()
 
 
+class _CachedNode:
+    __slots__ = ["key", "result", "children"]
+
+    def __init__(self) -> None:
+        self.key: Any = None
+        self.result: Optional[NodeResultBundle] = None
+        self.children: List[_CachedNode] = []
+
+
+class BIStateCache:
+    """The computed results of all nodes of the aggregation branches of former computations
+
+    Computing a branch again only computes the leaves whose status values changed and
+    the rules above them. The results of all other nodes are taken from the cache.
+
+    The nodes are identified by their branch and their position in the branch, so the
+    cache has to be cleared when the aggregations are compiled again, see
+    set_compilation_time()."""
+    def __init__(self) -> None:
+        super().__init__()
+        self._compilation_time: Optional[float] = None
+        self._branches: Dict[Tuple[str, str], _CachedNode] = {}
+        self.computed_nodes = 0
+        self.cached_nodes = 0
+
+    def set_compilation_time(self, compilation_time: float) -> None:
+        if compilation_time != self._compilation_time:
+            self._branches.clear()
+            self._compilation_time = compilation_time
+
+    def compute_branches(self, compiled_aggregation: BICompiledAggregation,
+                         branches: List[BICompiledRule],
+                         bi_status_fetcher: ABCBIStatusFetcher) -> List[NodeResultBundle]:
+        """Same as BICompiledAggregation.compute_branches()"""
+        assumed_state_ids = set(bi_status_fetcher.assumed_states)
+        aggregation_results = []
+        for bi_compiled_branch in branches:
+            if assumed_state_ids.intersection(bi_compiled_branch.required_elements()):
+                # Assumed states are only used interactively, they are not cached
+                result = bi_compiled_branch.compute(compiled_aggregation.computation_options,
+                                                    bi_status_fetcher,
+                                                    use_assumed=True)
+            else:
+                cached_branch = self._branches.setdefault(
+                    (compiled_aggregation.id, bi_compiled_branch.properties.title), _CachedNode())
+                result = self._compute_node(bi_compiled_branch, cached_branch,
+                                            compiled_aggregation.computation_options,
+                                            bi_status_fetcher)
+            if result is not None:
+                aggregation_results.append(result)
+        return aggregation_results
+
+    def _compute_node(self, node: ABCBICompiledNode, cached_node: _CachedNode,
+                      computation_options: BIAggregationComputationOptions,
+                      bi_status_fetcher: ABCBIStatusFetcher) -> Optional[NodeResultBundle]:
+        if isinstance(node, BICompiledLeaf):
+            key: Any = node.state_key(bi_status_fetcher)
+            if key is not None and key == cached_node.key:
+                self.cached_nodes += 1
+                return cached_node.result
+            result = node.compute(computation_options, bi_status_fetcher)
+
+        elif isinstance(node, BICompiledRule):
+            if len(cached_node.children) != len(node.nodes):
+                cached_node.children = [_CachedNode() for _node in node.nodes]
+            node_results = [
+                self._compute_node(child, cached_child, computation_options, bi_status_fetcher)
+                for child, cached_child in zip(node.nodes, cached_node.children)
+            ]
+            # Unchanged results of the nodes are the identical objects
+            key = node_results
+            if cached_node.key is not None and all(
+                    result is cached_result
+                    for result, cached_result in zip(node_results, cached_node.key)):
+                self.cached_nodes += 1
+                return cached_node.result
+            result = node.compute_from_results(node_results, computation_options)
+
+        else:
+            return node.compute(computation_options, bi_status_fetcher)
+
+        self.computed_nodes += 1
+        cached_node.key = key
+        cached_node.result = result
+        return result
+
+
 class BIComputer:
-    def __init__(self, compiled_aggregations, bi_status_fetcher):
+    def __init__(self,
+                 compiled_aggregations,
+                 bi_status_fetcher,
+                 bi_state_cache: Optional[BIStateCache] = None):
         self._compiled_aggregations: Dict[str, BICompiledAggregation] = compiled_aggregations
         self._bi_status_fetcher = bi_status_fetcher
+        self._bi_state_cache = bi_state_cache
         self._legacy_branch_cache = {}
 
     def compute_aggregation_result(
@@ -101,10 +203,17 @@ class BIComputer:
     ) -> List[Tuple[BICompiledAggregation, List[NodeResultBundle]]]:
         results = []
         for compiled_aggregation, branches in required_aggregations:
-            node_result_bundles = compiled_aggregation.compute_branches(
-                branches,
-                self._bi_status_fetcher,
-            )
+            if self._bi_state_cache is None:
+                node_result_bundles = compiled_aggregation.compute_branches(
+                    branches,
+                    self._bi_status_fetcher,
+                )
+            else:
+                node_result_bundles = self._bi_state_cache.compute_branches(
+                    compiled_aggregation,
+                    branches,
+                    self._bi_status_fetcher,
+                )
 
             # Postprocess results. Custom user plugins may add additional information for each node
             node_result_bundles = list(
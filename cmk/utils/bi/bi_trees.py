@@ -156,6 +156,14 @@ class BICompiledLeaf(ABCBICompiledNode):
             self,
         )
 
+    def state_key(self, bi_status_fetcher: ABCBIStatusFetcher) -> Optional[Tuple]:
+        """The values of the status of this leaf which are used by compute()"""
+        entity = self._get_entity(bi_status_fetcher)
+        if not entity:
+            return None
+        return (entity.state, entity.has_been_checked, entity.hard_state, entity.plugin_output,
+                entity.scheduled_downtime_depth, entity.in_service_period, entity.acknowledged)
+
     def _map_hoststate_to_bistate(self, host_state: HostState):
         if host_state == BIStates.HOST_UP:
             return BIStates.OK
@@ -282,12 +290,21 @@ class BICompiledRule(ABCBICompiledNode):
                 computation_options: BIAggregationComputationOptions,
                 bi_status_fetcher: ABCBIStatusFetcher,
                 use_assumed=False) -> Optional[NodeResultBundle]:
-        bundled_results = [
-            bundle for bundle in [
+        return self.compute_from_results(
+            [
                 node.compute(computation_options, bi_status_fetcher, use_assumed)
                 for node in self.nodes
-            ] if bundle is not None
-        ]
+            ],
+            computation_options,
+            use_assumed,
+        )
+
+    def compute_from_results(self,
+                             node_results: List[Optional[NodeResultBundle]],
+                             computation_options: BIAggregationComputationOptions,
+                             use_assumed=False) -> Optional[NodeResultBundle]:
+        """Compute the result of this rule from the results of its nodes"""
+        bundled_results = [bundle for bundle in node_results if bundle is not None]
         if not bundled_results:
             return None
         actual_result = self._process_node_compute_result(
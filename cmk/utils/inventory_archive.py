@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""The inventory history of a host
+
+Each time the inventory tree of a host changes, the previous tree is archived in
+inventory_archive/<host>/<timestamp>. Former versions stored the whole tree in each of
+these files. Now most of the files only contain a reverse delta: The changes which turn
+the next newer tree (the tree of the following file or the current inventory tree) into
+the archived tree. Every REBASE_INTERVAL files the whole tree is stored again, which
+limits the number of deltas to apply for reconstructing an archived tree. Files written
+by former versions are whole trees and stay valid.
+
+The deltas work on the raw trees (see StructuredDataTree.get_raw_tree()):
+
+    ("=", value)                  The value is replaced
+    ("d", {key: delta}, [key])    The values of a dict are changed or removed
+    ("l", [(start, end) | list])  A list is built from slices of the source list and
+                                  new elements
+
+Since a delta tells which branches of two trees differ, the history only needs to
+compare these branches.
+"""
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import cmk.utils.store as store
+
+RawTree = Dict[str, Any]
+RawDelta = Tuple
+
+# Store the whole tree again after this number of deltas
+REBASE_INTERVAL = 20
+
+_DELTA_FILE_TAG = "delta"
+
+
+def diff_raw_trees(source: RawTree, target: RawTree) -> RawDelta:
+    """The delta which turns the source tree into the target tree"""
+    delta = _diff(source, target)
+    return ("d", {}, []) if delta is None else delta
+
+
+def _diff(source: Any, target: Any) -> Optional[RawDelta]:
+    if source == target:
+        return None
+
+    if isinstance(source, dict) and isinstance(target, dict):
+        changed = {}
+        for key, value in target.items():
+            if key not in source:
+                changed[key] = ("=", value)
+                continue
+            sub_delta = _diff(source[key], value)
+            if sub_delta is not None:
+                changed[key] = sub_delta
+        removed = [key for key in source if key not in target]
+
+        # Applying the delta appends new keys, which has to result in the same order
+        kept_keys = [key for key in source if key in target]
+        if kept_keys + [key for key in target if key not in source] != list(target):
+            return ("=", target)
+        return ("d", changed, removed)
+
+    if isinstance(source, list) and isinstance(target, list):
+        return ("l", _diff_lists(source, target))
+
+    return ("=", target)
+
+
+def _diff_lists(source: List[Any], target: List[Any]) -> List[Any]:
+    """Slices of the source list and new elements which make up the target list
+
+    The elements are matched by their representation in linear time. Consecutive
+    elements of the source list are taken as one slice."""
+    source_keys = [repr(element) for element in source]
+    first_positions: Dict[str, int] = {}
+    for index, key in enumerate(source_keys):
+        first_positions.setdefault(key, index)
+
+    operations: List[Any] = []
+    for element in target:
+        key = repr(element)
+        last = operations[-1] if operations else None
+        if isinstance(last, tuple) and last[1] < len(source_keys) and source_keys[last[1]] == key:
+            operations[-1] = (last[0], last[1] + 1)
+        elif key in first_positions:
+            operations.append((first_positions[key], first_positions[key] + 1))
+        elif isinstance(last, list):
+            last.append(element)
+        else:
+            operations.append([element])
+    return operations
+
+
+def apply_raw_delta(source: Any, delta: RawDelta) -> Any:
+    """Apply a delta to the source tree
+
+    Unchanged branches of the resulting tree are shared with the source tree."""
+    if delta[0] == "=":
+        return delta[1]
+
+    if delta[0] == "d":
+        _kind, changed, removed = delta
+        removed_keys = set(removed)
+        result = {key: value for key, value in source.items() if key not in removed_keys}
+        for key, sub_delta in changed.items():
+            result[key] = apply_raw_delta(source.get(key), sub_delta)
+        return result
+
+    if delta[0] == "l":
+        elements: List[Any] = []
+        for operation in delta[1]:
+            if isinstance(operation, tuple):
+                elements.extend(source[operation[0]:operation[1]])
+            else:
+                elements.extend(operation)
+        return elements
+
+    raise ValueError("Invalid delta: %r" % (delta,))
+
+
+def restrict_to_delta(raw_tree: RawTree, delta: RawDelta) -> RawTree:
+    """The branches of the tree touched by the delta
+
+    The restricted trees of two trees and the delta between them differ in the same
+    way as the whole trees. Nodes on the way to the changes keep their attributes, the
+    values of changed keys are kept as a whole."""
+    if delta[0] != "d":
+        return raw_tree
+
+    _kind, changed, removed = delta
+    restricted = {
+        key: value for key, value in raw_tree.items() if not isinstance(value, (dict, list))
+    }
+    for key in list(changed) + list(removed):
+        if key not in raw_tree:
+            continue
+        value = raw_tree[key]
+        sub_delta = changed.get(key)
+        if sub_delta is not None and sub_delta[0] == "d" and isinstance(value, dict):
+            value = restrict_to_delta(value, sub_delta)
+        restricted[key] = value
+    return restricted
+
+
+class InventoryArchive:
+    """The archived inventory trees of a host, one file per timestamp"""
+    def __init__(self, archive_dir: Path) -> None:
+        super().__init__()
+        self._archive_dir = archive_dir
+
+    def timestamps(self) -> List[str]:
+        try:
+            return sorted(p.name
+                          for p in self._archive_dir.iterdir()
+                          if not p.name.startswith(".") and not p.is_dir())
+        except FileNotFoundError:
+            return []
+
+    def archive(self, timestamp: str, raw_tree: RawTree, newer_raw_tree: RawTree) -> None:
+        """Archive a tree which has just been replaced by the newer (current) tree
+
+        The tree is stored as delta to the newer tree unless a rebase is due."""
+        store.makedirs(self._archive_dir)
+        if self._num_newest_deltas() >= REBASE_INTERVAL - 1:
+            store.save_object_to_file(self._archive_dir / timestamp, raw_tree)
+        else:
+            store.save_object_to_file(self._archive_dir / timestamp,
+                                      (_DELTA_FILE_TAG, diff_raw_trees(newer_raw_tree, raw_tree)))
+
+    def store_newest_tree(self, newest_raw_tree: RawTree) -> None:
+        """Store the newest archived tree as a whole
+
+        This is needed before the current tree, which the newest delta refers to, is
+        removed."""
+        timestamps = self.timestamps()
+        if not timestamps:
+            return
+        path = self._archive_dir / timestamps[-1]
+        content = store.load_object_from_file(path)
+        if _is_delta(content):
+            store.save_object_to_file(path, apply_raw_delta(newest_raw_tree, content[1]))
+
+    def _num_newest_deltas(self) -> int:
+        num_deltas = 0
+        for timestamp in reversed(self.timestamps()):
+            if not self._is_delta_file(self._archive_dir / timestamp):
+                break
+            num_deltas += 1
+        return num_deltas
+
+    def _is_delta_file(self, path: Path) -> bool:
+        # Whole trees are dicts, deltas are tuples. Avoid parsing the whole file.
+        try:
+            with path.open(encoding="utf-8") as f:
+                return f.read(1) == "("
+        except OSError:
+            return False
+
+    def iter_trees(
+        self,
+        load_current_raw_tree: Callable[[], Optional[RawTree]],
+        newest: Optional[str] = None,
+    ) -> Iterator[Tuple[str, Optional[RawTree], Optional[RawDelta]]]:
+        """The archived trees from the newest to the oldest one
+
+        Each tree comes with the delta which turns the next newer tree into it, in case
+        the file is a delta. The tree is None when it cannot be reconstructed because its
+        file or one of the newer files it depends on is broken.
+
+        In case only the trees up to the timestamp newest are needed, the reconstruction
+        starts at the nearest whole tree instead of the current tree."""
+        timestamps = self.timestamps()
+        end = len(timestamps)
+        if newest is not None:
+            for index, timestamp in enumerate(timestamps):
+                if timestamp >= newest and not self._is_delta_file(self._archive_dir / timestamp):
+                    end = index + 1
+                    break
+
+        newer_raw_tree: Optional[RawTree] = None
+        if end == len(timestamps):
+            newer_raw_tree = load_current_raw_tree()
+
+        for timestamp in reversed(timestamps[:end]):
+            try:
+                content = store.load_object_from_file(self._archive_dir / timestamp)
+            except Exception:
+                content = None
+
+            delta = None
+            raw_tree: Optional[RawTree] = None
+            if _is_delta(content):
+                delta = content[1]
+                if newer_raw_tree is not None:
+                    try:
+                        raw_tree = apply_raw_delta(newer_raw_tree, delta)
+                    except Exception:
+                        delta = None
+            elif isinstance(content, dict):
+                raw_tree = content
+
+            yield timestamp, raw_tree, delta
+            newer_raw_tree = raw_tree
+
+
+def _is_delta(content: Any) -> bool:
+    return isinstance(content, tuple) and len(content) == 2 and content[0] == _DELTA_FILE_TAG
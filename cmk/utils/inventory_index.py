@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Site wide index of the inventory trees of all hosts
+
+The inventory views which show a table of many hosts, like the software packages of
+all hosts, would have to load the whole inventory tree of each host. The index keeps
+the rows of all tables (numerations) and the attributes of the trees by inventory
+path, e.g. "software.packages". It is updated whenever the inventory tree of a host is
+saved. Each indexed tree is recorded with the modification time of the inventory file
+it was created from, so readers can detect and update outdated hosts.
+
+Besides the whole rows, the single values of the rows are stored in an own table,
+which allows to filter and sort the rows by column within SQLite.
+"""
+
+import ast
+import re
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import cmk.utils.paths
+from cmk.utils.structured_data import Attributes, Container, Numeration, StructuredDataTree
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS hosts (
+        host_name TEXT PRIMARY KEY,
+        mtime INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS table_rows (
+        host_name TEXT NOT NULL,
+        path TEXT NOT NULL,
+        row_nr INTEGER NOT NULL,
+        row TEXT NOT NULL,
+        PRIMARY KEY (host_name, path, row_nr)
+    )""",
+    """CREATE TABLE IF NOT EXISTS cells (
+        host_name TEXT NOT NULL,
+        path TEXT NOT NULL,
+        row_nr INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        value,
+        PRIMARY KEY (host_name, path, row_nr, name)
+    )""",
+    "CREATE INDEX IF NOT EXISTS cells_value ON cells (path, name, value)",
+    """CREATE TABLE IF NOT EXISTS attributes (
+        host_name TEXT NOT NULL,
+        path TEXT NOT NULL,
+        name TEXT NOT NULL,
+        value,
+        PRIMARY KEY (host_name, path, name)
+    )""",
+    "CREATE INDEX IF NOT EXISTS attributes_value ON attributes (path, name, value)",
+]
+
+_DATA_TABLES = ["hosts", "table_rows", "cells", "attributes"]
+
+
+class Condition(NamedTuple):
+    """A condition on a column: The operator is one of "~~" (case insensitive regex),
+    ">=" or "<="."""
+    column: str
+    operator: str
+    value: Any
+
+
+def inventory_index_path() -> Path:
+    return Path(cmk.utils.paths.var_dir, "inventory_index.sqlite")
+
+
+def index_path_of(path: Sequence[Any]) -> str:
+    """The key of an inventory path (the list of edges) in the index"""
+    return ".".join("%s" % edge for edge in path)
+
+
+def _regexp(pattern: str, value: Any) -> bool:
+    return isinstance(value, str) and re.search(pattern, value, re.IGNORECASE) is not None
+
+
+def _cell_value(value: Any) -> Any:
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return repr(value)
+
+
+class InventoryIndex:
+    """The index in an SQLite database, written by the inventory and by the GUI"""
+    def __init__(self, path: Path) -> None:
+        super().__init__()
+        self._path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self._path), timeout=60)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            connection.execute(statement)
+        connection.create_function("regexp", 2, _regexp)
+        return connection
+
+    def update_host(self, host_name: str, raw_tree: Dict, mtime: int) -> None:
+        """Replace the indexed tree of the host"""
+        tables: List[Tuple[str, List[Dict]]] = []
+        attributes: List[Tuple[str, Dict]] = []
+        _flatten(StructuredDataTree().create_tree_from_raw_tree(raw_tree).get_root_container(),
+                 tables, attributes)
+
+        connection = self._connect()
+        try:
+            with connection:
+                _delete_host(connection, host_name)
+                connection.execute("INSERT INTO hosts VALUES (?, ?)", (host_name, mtime))
+                connection.executemany("INSERT INTO table_rows VALUES (?, ?, ?, ?)",
+                                       [(host_name, path, row_nr, repr(row))
+                                        for path, rows in tables
+                                        for row_nr, row in enumerate(rows)])
+                connection.executemany("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?)",
+                                       [(host_name, path, row_nr, "%s" % name, _cell_value(value))
+                                        for path, rows in tables for row_nr, row in enumerate(rows)
+                                        for name, value in row.items()])
+                connection.executemany("INSERT OR REPLACE INTO attributes VALUES (?, ?, ?, ?)",
+                                       [(host_name, path, "%s" % name, _cell_value(value))
+                                        for path, attrs in attributes
+                                        for name, value in attrs.items()])
+        finally:
+            connection.close()
+
+    def remove_host(self, host_name: str) -> None:
+        connection = self._connect()
+        try:
+            with connection:
+                _delete_host(connection, host_name)
+        finally:
+            connection.close()
+
+    def mtimes(self) -> Dict[str, int]:
+        """The modification times of the inventory files the trees were indexed from"""
+        connection = self._connect()
+        try:
+            return dict(connection.execute("SELECT host_name, mtime FROM hosts"))
+        finally:
+            connection.close()
+
+    def table_rows(
+        self,
+        path: str,
+        host_names: Sequence[str],
+        conditions: Iterable[Condition] = (),
+        order_by: Optional[Tuple[str, bool]] = None,
+        limit: Optional[int] = None,
+    ) -> Dict[str, List[Dict]]:
+        """The rows of the table at the path of the given hosts by host
+
+        Only rows matching all conditions are returned. With a limit, the first rows in
+        the order of the column order_by (column, reverse) or otherwise in the order of
+        the hosts and their rows are returned."""
+        where = ["r.path = ?"]
+        args: List[Any] = [path]
+        for condition in conditions:
+            if condition.operator == "~~":
+                expression = "regexp(?, c.value)"
+            elif condition.operator in (">=", "<="):
+                expression = "c.value %s ?" % condition.operator
+            else:
+                raise ValueError("Invalid operator: %r" % (condition.operator,))
+            where.append("EXISTS (SELECT 1 FROM cells c WHERE c.host_name = r.host_name"
+                         " AND c.path = r.path AND c.row_nr = r.row_nr AND c.name = ? AND %s)" %
+                         expression)
+            args += [condition.column, condition.value]
+
+        join_order = ""
+        order = ["wanted.ordinal", "r.row_nr"]
+        if order_by is not None:
+            join_order = (" LEFT JOIN cells o ON o.host_name = r.host_name AND o.path = r.path"
+                          " AND o.row_nr = r.row_nr AND o.name = ?")
+            args.insert(0, order_by[0])
+            order.insert(0, "o.value DESC" if order_by[1] else "o.value")
+
+        query = ("SELECT r.host_name, r.row FROM table_rows r"
+                 " JOIN wanted ON wanted.host_name = r.host_name%s WHERE %s ORDER BY %s" %
+                 (join_order, " AND ".join(where), ", ".join(order)))
+        if limit is not None:
+            query += " LIMIT %d" % limit
+
+        rows: Dict[str, List[Dict]] = {}
+        connection = self._connect()
+        try:
+            connection.execute("CREATE TEMP TABLE wanted (host_name TEXT PRIMARY KEY,"
+                               " ordinal INTEGER NOT NULL)")
+            connection.executemany(
+                "INSERT OR IGNORE INTO wanted VALUES (?, ?)",
+                [(host_name, ordinal) for ordinal, host_name in enumerate(host_names)])
+            for host_name, row in connection.execute(query, args):
+                rows.setdefault(host_name, []).append(ast.literal_eval(row))
+        finally:
+            connection.close()
+        return rows
+
+    def attributes(self, path: str, host_names: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """The attributes at the path of the given hosts by host"""
+        attributes: Dict[str, Dict[str, Any]] = {}
+        wanted = set(host_names)
+        connection = self._connect()
+        try:
+            for host_name, name, value in connection.execute(
+                    "SELECT host_name, name, value FROM attributes WHERE path = ?", (path,)):
+                if host_name in wanted:
+                    attributes.setdefault(host_name, {})[name] = value
+        finally:
+            connection.close()
+        return attributes
+
+
+def _delete_host(connection: sqlite3.Connection, host_name: str) -> None:
+    for table in _DATA_TABLES:
+        connection.execute("DELETE FROM %s WHERE host_name = ?" % table, (host_name,))
+
+
+def _flatten(container: Container, tables: List[Tuple[str, List[Dict]]],
+             attributes: List[Tuple[str, Dict]]) -> None:
+    for _edge, abs_path, child in container.get_children():
+        if isinstance(child, Numeration):
+            tables.append((index_path_of(abs_path), child.get_child_data()))
+        elif isinstance(child, Attributes):
+            attributes.append((index_path_of(abs_path), child.get_child_data()))
+        elif isinstance(child, Container):
+            _flatten(child, tables, attributes)
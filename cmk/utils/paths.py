@@ -63,6 +63,7 @@ nagios_binary = _omd_path("bin/nagios")
 apache_config_dir = _omd_path("etc/apache")
 htpasswd_file = _omd_path("etc/htpasswd")
 livestatus_unix_socket = _omd_path("tmp/run/live")
+nagios_checker_socket = _omd_path("tmp/run/nagios_checker")
 livebackendsdir = _omd_path("share/check_mk/livestatus")
 inventory_output_dir = _omd_path("var/check_mk/inventory")
 inventory_archive_dir = _omd_path("var/check_mk/inventory_archive")
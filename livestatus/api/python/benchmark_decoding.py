@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Compare the decoding time of the output formats supported by the livestatus API
+
+The responses are generated here, so no running site is needed. Usage:
+
+    benchmark_decoding.py [NUM_ROWS]
+"""
+
+import json
+import sys
+import time
+
+import livestatus
+
+
+def _rows(num_rows):
+    return [[
+        "host%05d" % (index // 20),
+        "Service ä %d" % index,
+        index % 4,
+        1.5 * index,
+        1605018200 + index,
+        "OK - Everything \"fine\"\nLong output",
+        ["contact1", "contact2"],
+        {
+            "TAGS": "linux prod",
+            "FILENAME": "/wato/hosts.mk"
+        },
+        [[1, "downtime", "cmkadmin"]],
+        None,
+    ] for index in range(num_rows)]
+
+
+def _render_python3(rows):
+    return repr(rows).encode("utf-8")
+
+
+def _render_json(rows):
+    return json.dumps(rows, separators=(",", ":")).encode("utf-8")
+
+
+def main(num_rows):
+    rows = _rows(num_rows)
+    header = b"200          0\n"
+
+    connection = livestatus.SingleSiteConnection("unix:/dev/null")
+    results = {}
+    for output_format, render in [
+        ("python3", _render_python3),
+        ("json", _render_json),
+    ]:
+        data = render(rows)
+        connection.set_output_format(output_format)
+
+        before = time.time()
+        results[output_format] = connection.parse_response(header, data, ())
+        duration = time.time() - before
+
+        print("%-8s %7d rows %9d bytes %8.3f s %8.3f us/row" %
+              (output_format, num_rows, len(data), duration, duration / num_rows * 1000000))
+
+    if results["python3"] != results["json"]:
+        sys.stderr.write("The decoded responses differ\n")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
@@ -6,8 +6,10 @@
 """MK Livestatus Python API"""
 import ast
 import contextlib
+import json
 import os
 import re
+import selectors
 import socket
 import ssl
 import threading
@@ -43,8 +45,14 @@ class LivestatusTestingError(RuntimeError):
 #   '----------------------------------------------------------------------'
 
 # TODO: This mechanism does not take different connection options into account
-# Keep a global array of persistant connections
+# Keep a global array of persistant connections. This is the pool of idle
+# connections: A connection is taken out of the pool while it is used and is
+# given back by SingleSiteConnection.release().
 persistent_connections: Dict[str, socket.socket] = {}
+_persistent_connections_lock = threading.Lock()
+
+# Counts per socket URL how often persistent connections were created and reused
+persistent_connection_stats: Dict[str, Dict[str, int]] = {}
 
 # Regular expression for removing Cache: headers if caching is not allowed
 remove_cache_regex: Pattern = re.compile("\nCache:[^\n]*")
@@ -92,6 +100,24 @@ class MKLivestatusBadGatewayError(MKLivestatusException):
 NO_DEFAULT = lambda: None
 
 
+def _decode_python3(data: bytes) -> LivestatusResponse:
+    return ast.literal_eval(data.decode("utf-8"))
+
+
+def _decode_json(data: bytes) -> LivestatusResponse:
+    # The rows are decoded right from the received bytes into lists
+    return json.loads(data)
+
+
+# The output formats the client can decode. In contrast to "python3", the "json"
+# format can not tell strings and binary data apart: Blob columns are returned
+# as (latin-1 decoded) strings instead of bytes. All other values are equal.
+_OUTPUT_FORMAT_DECODERS = {
+    "python3": _decode_python3,
+    "json": _decode_json,
+}
+
+
 # Escape/strip unwanted chars from (user provided) strings to
 # use them in livestatus queries. Prevent injections of livestatus
 # protocol related chars or strings
@@ -372,6 +398,9 @@ class SingleSiteConnection(Helpers):
         self.socket: Optional[socket.socket] = None
         self.timeout: Optional[int] = None
         self.successful_persistence = False
+        self.output_format = "python3"
+        # Whether a query was sent, but the response was not read completely yet
+        self._awaiting_response = False
 
         # Whether to establish an encrypted connection
         self.tls = tls
@@ -397,11 +426,22 @@ class SingleSiteConnection(Helpers):
         if self.socket:
             self.socket.settimeout(float(timeout))
 
+    def set_output_format(self, output_format: str) -> None:
+        """Choose the format the responses are transferred in ("python3" or "json")
+
+        Decoding JSON is a lot faster, but blob columns are returned as strings."""
+        if output_format not in _OUTPUT_FORMAT_DECODERS:
+            raise MKLivestatusConfigError("Unsupported output format '%s'" % output_format)
+        self.output_format = output_format
+
     def connect(self) -> None:
-        if self.persist and self.socketurl in persistent_connections:
-            self.socket = persistent_connections[self.socketurl]
-            self.successful_persistence = True
-            return
+        if self.persist:
+            with _persistent_connections_lock:
+                self.socket = persistent_connections.pop(self.socketurl, None)
+            if self.socket is not None:
+                self._count_persistent_connection("reused")
+                self.successful_persistence = True
+                return
 
         self.successful_persistence = False
         family, address = _parse_socket_url(self.socketurl)
@@ -446,7 +486,15 @@ class SingleSiteConnection(Helpers):
                 raise MKLivestatusSocketError("Cannot connect to '%s': %s" % (self.socketurl, e))
 
         if self.persist:
-            persistent_connections[self.socketurl] = self.socket
+            self._count_persistent_connection("created")
+
+    def _count_persistent_connection(self, what: str) -> None:
+        with _persistent_connections_lock:
+            counts = persistent_connection_stats.setdefault(self.socketurl, {
+                "created": 0,
+                "reused": 0,
+            })
+            counts[what] += 1
 
     # NOTE:
     # The site_name parameter is here to be able to create a mocked socket in the testing
@@ -471,11 +519,18 @@ class SingleSiteConnection(Helpers):
 
     def disconnect(self) -> None:
         self.socket = None
-        if self.persist:
-            try:
-                del persistent_connections[self.socketurl]
-            except KeyError:
-                pass
+        self._awaiting_response = False
+
+    def release(self) -> None:
+        """Finish using the connection
+
+        Persistent connections are given back to the pool of the process to be reused
+        by later connections to the same socket. This is only done in case no response
+        is pending on the connection, otherwise the connection is dropped."""
+        if self.persist and self.socket is not None and not self._awaiting_response:
+            with _persistent_connections_lock:
+                persistent_connections.setdefault(self.socketurl, self.socket)
+        self.disconnect()
 
     def receive_data(self, size: int) -> bytes:
         if self.socket is None:
@@ -507,7 +562,7 @@ class SingleSiteConnection(Helpers):
             self.auth_header,
             self.add_headers,
             f"Localtime: {int(time.time()):d}",
-            "OutputFormat: python3",
+            f"OutputFormat: {self.output_format}",
             "KeepAlive: on",
             "ResponseHeader: fixed16",
             add_headers,
@@ -526,13 +581,12 @@ class SingleSiteConnection(Helpers):
             # TODO: Use socket.sendall()
             # socket.send() only works with byte strings
             self.socket.send(query.encode("utf-8") + b"\n\n")
+            self._awaiting_response = True
             if getattr(self.collect_queries, 'active', False):
                 self.collect_queries.queries.append(query)
         except IOError as e:
-            if self.persist:
-                del persistent_connections[self.socketurl]
-                self.successful_persistence = False
-            self.socket = None
+            self.successful_persistence = False
+            self.disconnect()
 
             if do_reconnect:
                 # Automatically try to reconnect in case of an error, but only once.
@@ -550,34 +604,9 @@ class SingleSiteConnection(Helpers):
                       suppress_exceptions: Tuple[Type[Exception], ...],
                       timeout_at: Optional[float] = None) -> LivestatusResponse:
         try:
-            # Headers are always ASCII encoded
-            resp = self.receive_data(16)
-            code = resp[0:3].decode("ascii")
-            try:
-                length = int(resp[4:15].lstrip())
-            except Exception:
-                self.disconnect()
-                raise MKLivestatusSocketError(
-                    "Malformed output. Livestatus TCP socket might be unreachable or wrong"
-                    "encryption settings are used.")
-
-            data = self.receive_data(length).decode("utf-8")
-
-            if code == "200":
-                try:
-                    return ast.literal_eval(data)
-                except (ValueError, SyntaxError):
-                    self.disconnect()
-                    raise MKLivestatusSocketError("Malformed output")
-
-            elif code == "404":
-                raise MKLivestatusTableNotFoundError("Not Found (%s): %s" % (code, data.strip()))
-
-            elif code == "502":
-                raise MKLivestatusBadGatewayError(data.strip())
-
-            else:
-                raise MKLivestatusQueryError("%s: %s" % (code, data.strip()))
+            header = self.receive_data(16)
+            data = self.receive_data(self.response_length(header))
+            return self._parse_response(header, data)
 
         except (MKLivestatusSocketClosed, IOError) as e:
             # In case of an IO error or the other side having
@@ -617,6 +646,50 @@ class SingleSiteConnection(Helpers):
             # FIXME: ? self.disconnect()
             raise MKLivestatusSocketError("Unhandled exception: %s" % e)
 
+    def response_length(self, header: bytes) -> int:
+        """Extract the length of the response data from the fixed16 response header"""
+        try:
+            return int(header[4:15].lstrip())
+        except Exception:
+            self.disconnect()
+            raise MKLivestatusSocketError(
+                "Malformed output. Livestatus TCP socket might be unreachable or wrong"
+                "encryption settings are used.")
+
+    def parse_response(self, header: bytes, data: bytes,
+                       suppress_exceptions: Tuple[Type[Exception], ...]) -> LivestatusResponse:
+        """Decode a completely received response, raising errors like recv_response()"""
+        try:
+            return self._parse_response(header, data)
+        except suppress_exceptions:
+            raise
+        except Exception as e:
+            raise MKLivestatusSocketError("Unhandled exception: %s" % e)
+
+    def _parse_response(self, header: bytes, data: bytes) -> LivestatusResponse:
+        self._awaiting_response = False
+
+        # Headers are always ASCII encoded
+        code = header[0:3].decode("ascii")
+
+        if code == "200":
+            try:
+                return _OUTPUT_FORMAT_DECODERS[self.output_format](data)
+            except (ValueError, SyntaxError):
+                self.disconnect()
+                raise MKLivestatusSocketError("Malformed output")
+
+        decoded_data = data.decode("utf-8")
+        if code == "404":
+            raise MKLivestatusTableNotFoundError("Not Found (%s): %s" %
+                                                 (code, decoded_data.strip()))
+
+        elif code == "502":
+            raise MKLivestatusBadGatewayError(decoded_data.strip())
+
+        else:
+            raise MKLivestatusQueryError("%s: %s" % (code, decoded_data.strip()))
+
     def set_prepend_site(self, p: bool) -> None:
         self.prepend_site = p
 
@@ -658,9 +731,7 @@ class SingleSiteConnection(Helpers):
         try:
             self.socket.send(command.encode('utf-8') + b"\n\n")
         except IOError as e:
-            self.socket = None
-            if self.persist:
-                del persistent_connections[self.socketurl]
+            self.disconnect()
             raise MKLivestatusSocketError(str(e))
 
     # Set user to be used in certain authorization domain
@@ -700,6 +771,122 @@ class SingleSiteConnection(Helpers):
 # it possible to connect/disconnect while an object is instantiated.
 
 
+class _PendingResponse:
+    """The response of a single site, read piece by piece from a non-blocking socket"""
+    def __init__(self, sitename: SiteId, connection: SingleSiteConnection, started: float,
+                 deadline: Optional[float]) -> None:
+        super(_PendingResponse, self).__init__()
+        if connection.socket is None:
+            raise MKLivestatusSocketError("Socket to '%s' is not connected" % connection.socketurl)
+        self.sitename = sitename
+        self.connection = connection
+        self.sock = connection.socket
+        self.started = started
+        self.deadline = deadline
+        self.header = b""
+        self._length: Optional[int] = None
+        self._chunks: List[bytes] = []
+        self._received = 0
+
+    @property
+    def data(self) -> bytes:
+        return b"".join(self._chunks)
+
+    def complete(self) -> bool:
+        return self._length is not None and self._received >= self._length
+
+    def read(self) -> bool:
+        """Read everything currently available and tell whether the response is complete
+
+        Reading continues until the socket would block, because TLS sockets may
+        already have buffered data the selector does not know about."""
+        while not self.complete():
+            if self._length is None:
+                size = 16 - len(self.header)
+            else:
+                size = min(self._length - self._received, 65536)
+
+            try:
+                packet = self.sock.recv(size)
+            except (BlockingIOError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                return False
+
+            if not packet:
+                raise MKLivestatusSocketClosed(
+                    "Read zero data from socket, nagios server closed connection")
+
+            if self._length is None:
+                self.header += packet
+                if len(self.header) == 16:
+                    self._length = self.connection.response_length(self.header)
+            else:
+                self._chunks.append(packet)
+                self._received += len(packet)
+
+        return True
+
+
+class QueryCache:
+    """Caches the responses of the sites for a short time
+
+    The responses are cached per site, authenticated user and query. This helps in
+    case several parts of a page (e.g. dashlets and sidebar snapins) send the same
+    queries. Commands sent to a site invalidate the cached responses of the site.
+    The cache may be shared by the connections of all threads of a process."""
+    def __init__(self, ttl: float, max_entries: int = 1000) -> None:
+        super(QueryCache, self).__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Tuple[str, ...], Tuple[float, LivestatusResponse]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(sitename: SiteId, connection: SingleSiteConnection, query_text: str) -> Tuple[str, ...]:
+        return (sitename, connection.auth_header, connection.add_headers, connection.output_format,
+                query_text)
+
+    def get(self, key: Tuple[str, ...]) -> Optional[LivestatusResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] + self.ttl < time.time():
+                self.misses += 1
+                return None
+            self.hits += 1
+        return _copy_rows(entry[1])
+
+    def put(self, key: Tuple[str, ...], response: LivestatusResponse) -> None:
+        now = time.time()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: e for k, e in self._entries.items() if e[0] + self.ttl >= now}
+                if len(self._entries) >= self.max_entries:
+                    return
+            self._entries[key] = (now, _copy_rows(response))
+
+    def invalidate(self, sitename: Optional[SiteId] = None) -> None:
+        with self._lock:
+            self._entries = {} if sitename is None else {
+                k: e for k, e in self._entries.items() if k[0] != sitename
+            }
+
+    def statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": float(self.hits) / lookups if lookups else 0.0,
+            }
+
+
+def _copy_rows(response: LivestatusResponse) -> LivestatusResponse:
+    # The rows are modified by the callers, e.g. to prepend the site
+    return LivestatusResponse([LivestatusRow(list(row)) for row in response])
+
+
 class MultiSiteConnection(Helpers):
     def __init__(self,
                  sites: SiteConfigurations,
@@ -714,6 +901,11 @@ class MultiSiteConnection(Helpers):
         self.only_sites: OnlySites = None
         self.limit: Optional[int] = None
         self.parallelize = True
+        # Maximum time in seconds to wait for the responses of all sites of a parallel
+        # query. Sites may have a lower limit configured with "query_timeout".
+        self.query_timeout: Optional[float] = None
+        self.responsetimes: Dict[SiteId, float] = {}
+        self.query_cache: Optional[QueryCache] = None
 
         # Status host: A status host helps to prevent trying to connect
         # to a remote site which is unreachable. This is done by looking
@@ -852,6 +1044,8 @@ class MultiSiteConnection(Helpers):
 
         if "timeout" in site:
             connection.set_timeout(int(site["timeout"]))
+        if "output_format" in site:
+            connection.set_output_format(site["output_format"])
         connection.connect()
         return connection
 
@@ -860,6 +1054,12 @@ class MultiSiteConnection(Helpers):
             connection.disconnect()
         self.connections.clear()
 
+    def release(self) -> None:
+        """Give the persistent connections back to the pool of the process"""
+        for _name, _site, connection in self.connections:
+            connection.release()
+        self.connections.clear()
+
     # Needed for temporary connection for status_hosts in disabled sites
     def _disconnect_site(self, sitename: SiteId) -> None:
         i = 0
@@ -888,9 +1088,23 @@ class MultiSiteConnection(Helpers):
         """Impose Limit on number of returned datasets (distributed among sites)"""
         self.limit = limit
 
+    def set_query_cache(self, query_cache: Optional[QueryCache]) -> None:
+        """Use the given cache for the responses of the sites (None disables caching)"""
+        self.query_cache = query_cache
+
+    def set_query_timeout(self, timeout: Optional[float] = None) -> None:
+        """Limit the time a parallel query waits for the responses of all sites
+
+        Sites not responding in time are treated as dead sites."""
+        self.query_timeout = timeout
+
     def dead_sites(self) -> Dict[SiteId, DeadSite]:
         return self.deadsites
 
+    def response_times(self) -> Dict[SiteId, float]:
+        """Seconds needed by the sites to respond to the last parallel query"""
+        return self.responsetimes
+
     def alive_sites(self) -> List[SiteId]:
         return [s[0] for s in self.connections]
 
@@ -908,6 +1122,10 @@ class MultiSiteConnection(Helpers):
         for _sitename, _site, connection in self.connections:
             connection.set_auth_domain(domain)
 
+    def set_output_format(self, output_format: str) -> None:
+        for _sitename, _site, connection in self.connections:
+            connection.set_output_format(output_format)
+
     def query(self,
               query: 'QueryTypes',
               add_headers: Union[str, bytes] = u"") -> LivestatusResponse:
@@ -933,7 +1151,16 @@ class MultiSiteConnection(Helpers):
                     limit_header = "Limit: %d\n" % limit
                 else:
                     limit_header = ""
-                r = connection.query(query, add_headers + limit_header)
+                cache_key = None
+                r = None
+                if self.query_cache is not None:
+                    cache_key = QueryCache.key(sitename, connection,
+                                               str(query) + add_headers + limit_header)
+                    r = self.query_cache.get(cache_key)
+                if r is None:
+                    r = connection.query(query, add_headers + limit_header)
+                    if self.query_cache is not None and cache_key is not None:
+                        self.query_cache.put(cache_key, r)
                 if self.prepend_site:
                     for row in r:
                         row.insert(0, sitename)
@@ -970,11 +1197,25 @@ class MultiSiteConnection(Helpers):
         else:
             limit_header = u""
 
-        # First send all queries
+        # First send all queries, except the ones which can be answered from the cache
+        self.responsetimes = {}
+        pending: List[_PendingResponse] = []
+        cached: Dict[SiteId, LivestatusResponse] = {}
+        cache_keys: Dict[SiteId, Tuple[str, ...]] = {}
         for sitename, site, connection in connect_to_sites:
+            if self.query_cache is not None:
+                cache_keys[sitename] = QueryCache.key(sitename, connection,
+                                                      str(query) + add_headers + limit_header)
+                cached_response = self.query_cache.get(cache_keys[sitename])
+                if cached_response is not None:
+                    cached[sitename] = cached_response
+                    continue
+
             try:
                 str_query = connection.build_query(query, add_headers + limit_header)
                 connection.send_query(str_query)
+                pending.append(
+                    _PendingResponse(sitename, connection, time.time(), self._query_deadline(site)))
             except LivestatusTestingError:
                 raise
             except Exception as e:
@@ -983,13 +1224,33 @@ class MultiSiteConnection(Helpers):
                     "site": site,
                 }
 
-        # Then retrieve all answers. We will be as slow as the slowest of all
-        # connections.
+        # Then retrieve all answers at once. We will be as slow as the slowest of
+        # all connections.
+        responses = self._receive_responses(pending, query.suppress_exceptions)
+        started = {response.sitename: response.started for response in pending}
+
+        if self.query_cache is not None:
+            for sitename, response in responses.items():
+                if isinstance(response, list):
+                    self.query_cache.put(cache_keys[sitename], response)
+        responses.update(cached)
+
         result = LivestatusResponse([])
         for sitename, site, connection in connect_to_sites:
+            if sitename not in responses:
+                continue  # Sending the query failed
+
             try:
-                str_query = connection.build_query(query, add_headers + limit_header)
-                r = connection.recv_response(str_query, query.suppress_exceptions)
+                r = responses[sitename]
+                if isinstance(r, Exception):
+                    raise r
+                if r is None:
+                    r = connection.recv_response(
+                        connection.build_query(query, add_headers + limit_header),
+                        query.suppress_exceptions)
+                    self.responsetimes[sitename] = time.time() - started[sitename]
+                    if self.query_cache is not None:
+                        self.query_cache.put(cache_keys[sitename], r)
                 stillalive.append((sitename, site, connection))
                 if self.prepend_site:
                     for row in r:
@@ -1010,6 +1271,87 @@ class MultiSiteConnection(Helpers):
         self.connections = stillalive
         return result
 
+    def _query_deadline(self, site: SiteConfiguration) -> Optional[float]:
+        timeouts = [t for t in [self.query_timeout, site.get("query_timeout")] if t is not None]
+        if not timeouts:
+            return None
+        return time.time() + min(timeouts)
+
+    def _receive_responses(
+        self,
+        pending: List[_PendingResponse],
+        suppress_exceptions: Tuple[Type[Exception], ...],
+    ) -> Dict[SiteId, Union[None, LivestatusResponse, Exception]]:
+        """Read the responses of all sites concurrently
+
+        The sockets are switched to non-blocking mode and read whenever data arrives.
+        Sites which did not respond until their deadline are disconnected and get
+        a timeout error as result.
+
+        The result is None for sites whose responses have to be received with the
+        blocking recv_response(): Sockets which can not be watched by the selector
+        and connections which were closed by the remote end. recv_response() cares
+        about reconnecting and sending the query again in this case."""
+        responses: Dict[SiteId, Union[None, LivestatusResponse, Exception]] = {}
+        waiting: Dict[SiteId, _PendingResponse] = {}
+        selector = selectors.DefaultSelector()
+
+        def finish(response: _PendingResponse, result: Union[None, LivestatusResponse,
+                                                             Exception]) -> None:
+            selector.unregister(response.sock)
+            response.sock.setblocking(True)
+            del waiting[response.sitename]
+            responses[response.sitename] = result
+            self.responsetimes[response.sitename] = time.time() - response.started
+
+        try:
+            for response in pending:
+                try:
+                    selector.register(response.sock, selectors.EVENT_READ, response)
+                except (ValueError, KeyError):
+                    responses[response.sitename] = None  # Not a real socket
+                    continue
+                response.sock.setblocking(False)
+                waiting[response.sitename] = response
+
+            while waiting:
+                now = time.time()
+                for response in list(waiting.values()):
+                    if response.deadline is not None and response.deadline <= now:
+                        finish(
+                            response,
+                            MKLivestatusSocketError(
+                                "Timeout while waiting for the response of site %s" %
+                                response.sitename))
+                        response.connection.disconnect()
+                if not waiting:
+                    break
+
+                deadlines = [r.deadline for r in waiting.values() if r.deadline is not None]
+                timeout = max(0.0, min(deadlines) - now) if deadlines else None
+
+                for key, _mask in selector.select(timeout):
+                    response = key.data
+                    try:
+                        if response.read():
+                            finish(
+                                response,
+                                response.connection.parse_response(response.header, response.data,
+                                                                   suppress_exceptions))
+                    except (MKLivestatusSocketClosed, IOError):
+                        finish(response, None)
+                    except suppress_exceptions as e:
+                        # Raised again by query_parallel(), which keeps the site alive
+                        finish(response, e)
+                    except Exception as e:
+                        finish(response, MKLivestatusSocketError("Unhandled exception: %s" % e))
+        finally:
+            for response in waiting.values():
+                response.sock.setblocking(True)
+            selector.close()
+
+        return responses
+
     # TODO: Is this SiteId(...) the way to go? Without this mypy complains about incompatible bytes
     # vs. Optional[SiteId]
     def command(self, command: AnyStr, sitename: Optional[SiteId] = SiteId("local")) -> None:
@@ -1021,6 +1363,8 @@ class MultiSiteConnection(Helpers):
             raise MKLivestatusConfigError("Cannot send command to unconfigured site '%s'" %
                                           sitename)
         conn[0].command(command)
+        if self.query_cache is not None:
+            self.query_cache.invalidate(sitename)
 
     # Return connection to localhost (UNIX), if available
     def local_connection(self) -> SingleSiteConnection:
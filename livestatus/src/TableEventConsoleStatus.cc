@@ -87,6 +87,9 @@ TableEventConsoleStatus::TableEventConsoleStatus(MonitoringCore *mc)
                                       offsets));
     addColumn(ECRow::makeDoubleColumn("status_average_sync_time",
                                       "The average sync time", offsets));
+    addColumn(ECRow::makeDoubleColumn("status_average_save_time",
+                                      "The average time needed for saving the event state",
+                                      offsets));
     addColumn(ECRow::makeStringColumn(
         "status_replication_slavemode",
         "The replication slavemode (empty or one of sync/takeover)", offsets));
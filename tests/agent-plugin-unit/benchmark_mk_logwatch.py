@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Measure the number of log lines mk_logwatch matches per second
+
+A synthetic log file of NUM_LINES lines is matched against NUM_PATTERNS patterns, once
+by searching each pattern on its own, like mk_logwatch did before, once with the
+PatternMatcher and once by processing the file with process_logfile(). Usage:
+
+    PYTHONPATH=$REPO/agents/plugins benchmark_mk_logwatch.py [NUM_LINES] [NUM_PATTERNS]
+"""
+
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import mk_logwatch
+
+_WORDS = ("request user session connection timeout cache database query worker thread pool "
+          "handler socket client server started finished").split()
+
+_PATTERNS = [
+    u"ERROR",
+    u"FATAL",
+    u"Exception in thread",
+    u"OutOfMemory\\w*",
+    u"took \\d{6,}ms",
+    u"connection refused",
+    u"deadlock detected",
+    u"^\\S+ \\S+ \\[WARN\\]",
+    u"segfault at [0-9a-f]+",
+    u"disk full",
+    u"user=(\\w+) denied",
+    u"panic:",
+    u"timeout after \\d+ retries",
+    u"Traceback",
+    u"killed process (\\d+)",
+    u"\\bE\\d{4}\\b",
+    u"[0-9a-f]{32}",
+    u"(?i)certificate expired",
+    u"\\w+Exception",
+    u"permission denied",
+]
+
+
+def _patterns(num_patterns):
+    patterns = []
+    for index in range(num_patterns):
+        raw_pattern = _PATTERNS[index % len(_PATTERNS)]
+        if index >= len(_PATTERNS):
+            raw_pattern = u"%s %d" % (raw_pattern, index)
+        patterns.append((u"C", re.compile(raw_pattern, re.UNICODE), [], []))
+    return patterns
+
+
+def _write_log(path, num_lines):
+    rand = random.Random(0)
+    with open(path, "w") as log:
+        for index in range(num_lines):
+            if index % 1000 == 0:
+                message = "ERROR connection refused by client"
+            else:
+                message = " ".join(rand.choice(_WORDS) for _unused in range(12))
+            log.write("2020-01-01 12:%02d:%02d [INFO] %s id=%d took %dms\n" %
+                      (index // 60 % 60, index % 60, message, index, index % 977))
+
+
+def _per_pattern(lines, patterns):
+    matched = 0
+    for line in lines:
+        for _lev, pattern, _cont, _repl in patterns:
+            if pattern.search(line[:-1]):
+                matched += 1
+                break
+    return matched
+
+
+def _pattern_matcher(lines, patterns):
+    matcher = mk_logwatch.PatternMatcher([pattern for _lev, pattern, _cont, _repl in patterns])
+    matched = 0
+    for line in lines:
+        if matcher.match(line[:-1])[0] is not None:
+            matched += 1
+    return matched
+
+
+def _process_logfile(path, patterns):
+    section = mk_logwatch.LogfileSection((path, path))
+    section._compiled_patterns = patterns
+    section.options.values["maxoutputsize"] = sys.maxsize
+    _header, output = mk_logwatch.process_logfile(section, {"offset": 0}, False)
+    return sum(1 for line in output if line.startswith("C "))
+
+
+def main(num_lines, num_patterns):
+    patterns = _patterns(num_patterns)
+    fd, path = tempfile.mkstemp(suffix=".log")
+    os.close(fd)
+    try:
+        _write_log(path, num_lines)
+        with open(path) as log:
+            lines = log.readlines()
+
+        results = []
+        for title, run in [
+            ("per pattern", lambda: _per_pattern(lines, patterns)),
+            ("matcher", lambda: _pattern_matcher(lines, patterns)),
+            ("process", lambda: _process_logfile(path, patterns)),
+        ]:
+            start = time.time()
+            results.append(run())
+            duration = time.time() - start
+            print("%-12s %8d lines %3d patterns  %7.3f s  %9.0f lines/s  %6d matched" %
+                  (title, num_lines, num_patterns, duration, num_lines / duration, results[-1]))
+        assert len(set(results)) == 1
+    finally:
+        os.remove(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 200000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 40))
@@ -450,6 +450,45 @@ def test_log_lines_iter(mk_logwatch):
         assert log_iter.get_position() == os.stat(mk_logwatch.__file__).st_size
 
 
+@pytest.mark.parametrize("content, encoding, expected_lines, expected_position", [
+    (
+        u"abc1\näbc2\nabc3\n".encode("utf-8") + b"\xe4bc4\nincomplete",
+        "utf_8",
+        [u"abc1\n", u"äbc2\n", u"abc3\n", u"\ufffdbc4\n"],
+        21,
+    ),
+    (
+        b"\xFF\xFE" + u"abc1\n\u0a41\u4100c2\nabc3\n".encode("utf_16_le"),
+        None,
+        [u"abc1\n", u"\u0a41\u4100c2\n", u"abc3\n"],
+        32,
+    ),
+    (
+        b"short\n" + b"x" * 30 + b"\nshort\n",
+        "utf_8",
+        [u"short\n", u"x" * 12 + u"[TRUNCATED]\n", u"short\n"],
+        43,
+    ),
+])
+def test_log_lines_iter_chunks(mk_logwatch, tmpdir, monkeypatch, content, encoding, expected_lines,
+                               expected_position):
+    monkeypatch.setattr(mk_logwatch.LogLinesIter, "BLOCKSIZE", 5)
+    log_path = os.path.join(str(tmpdir), "testlog")
+    with open(log_path, "wb") as f:
+        f.write(content)
+
+    with mk_logwatch.LogLinesIter(log_path, encoding, max_line_bytes=12) as log_iter:
+        lines = []
+        while True:
+            line = log_iter.next_line()
+            if line is None:
+                break
+            lines.append(line)
+
+        assert lines == expected_lines
+        assert log_iter.get_position() == expected_position
+
+
 @pytest.mark.parametrize(
     "use_specific_encoding,lines,expected_result",
     [
@@ -591,6 +630,56 @@ def test_process_logfile(mk_logwatch, monkeypatch, logfile, patterns, opt_raw, s
         assert state['offset'] >= 15000  # about the size of this file
 
 
+def test_process_logfile_maxbytes(mk_logwatch, tmpdir, monkeypatch):
+    log_path = os.path.join(str(tmpdir), "testlog")
+    with open(log_path, "wb") as f:
+        f.write(b"".join(ensure_binary("ERROR %d\n" % i) for i in range(10)))
+
+    section = mk_logwatch.LogfileSection((log_path, log_path))
+    section.options.values.update({"maxbytes": 20})
+    section._compiled_patterns = [(u"C", re.compile(u"ERROR", re.UNICODE), [], [])]
+    state = {"offset": 0}
+
+    monkeypatch.setattr(sys, 'stdout', MockStdout())
+    _header, warning_and_errors = mk_logwatch.process_logfile(section, state, False)
+    assert warning_and_errors == [
+        u"C ERROR 0\n",
+        u"C ERROR 1\n",
+        u"C Maximum number (20) of new bytes in log file exceeded.\n",
+    ]
+    assert state["offset"] == os.stat(log_path).st_size
+
+
+@pytest.mark.parametrize("raw_pattern, expected", [
+    (u"foo", (u"foo", True)),
+    (u"foo.*barbaz", (u"barbaz", False)),
+    (u"fo+bar", (u"bar", False)),
+    (u"^foo$", (u"foo", False)),
+    (u"(foo)", (None, False)),
+    (u"foo|bar", (None, False)),
+    (u"(?i)foo", (None, False)),
+])
+def test_required_literal(mk_logwatch, raw_pattern, expected):
+    assert mk_logwatch._required_literal(re.compile(raw_pattern, re.UNICODE)) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    (u"nothing to see", (None, None)),
+    (u"ERROR in foo", (1, ())),
+    (u"ERROR in foo, code 42", (0, (u"42",))),
+    (u"error in module bar", (2, (u"bar",))),
+    (u"Connection lost", (3, ())),
+])
+def test_pattern_matcher(mk_logwatch, text, expected):
+    matcher = mk_logwatch.PatternMatcher([
+        re.compile(u"code (\\d+)", re.UNICODE),
+        re.compile(u"ERROR", re.UNICODE),
+        re.compile(u"(?i)error in module (\\w+)", re.UNICODE),
+        re.compile(u"Conn.*lost", re.UNICODE),
+    ])
+    assert matcher.match(text) == expected
+
+
 @pytest.mark.parametrize("input_lines, before, after, expected_output",
                          [([], 2, 3, []),
                           (["0", "1", "2", "C 3", "4", "5", "6", "7", "8", "9", "W 10"
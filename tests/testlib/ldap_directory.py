@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""In-process stand-in for an LDAP directory
+
+Implements the part of the python-ldap connection API (search_ext(), result3() with
+paged results and simple_bind_s()) which is used by the LDAP user connector. The
+objects are kept in memory. Like a directory server does, each change of an object
+updates its uSNChanged and modifyTimestamp attributes, which makes it possible to test
+and benchmark the synchronization without a real directory.
+"""
+
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import ldap  # type: ignore[import]
+from ldap.controls import SimplePagedResultsControl  # type: ignore[import]
+
+LDAPObject = Dict[str, List[str]]
+_Matcher = Callable[[LDAPObject], bool]
+
+
+class LDAPDirectory:
+    def __init__(self, uri: str = "ldap://127.0.0.1") -> None:
+        super().__init__()
+        self._uri = uri
+        self._objects: Dict[str, LDAPObject] = {}
+        self._usn = 0
+        self._next_msgid = 1
+        self._pending: Dict[int, Tuple[List[Tuple[str, LDAPObject]], int]] = {}
+        self._pages: Dict[bytes, List[Tuple[str, LDAPObject]]] = {}
+        self.num_searches = 0
+
+    def add(self, dn: str, attributes: Dict[str, List[str]]) -> None:
+        self._objects[dn.lower()] = {
+            "distinguishedname": [dn],
+        }
+        self.modify(dn, attributes)
+
+    def modify(self, dn: str, attributes: Dict[str, List[str]]) -> None:
+        obj = self._objects[dn.lower()]
+        obj.update({key.lower(): list(values) for key, values in attributes.items()})
+        self._usn += 1
+        obj["usnchanged"] = ["%d" % self._usn]
+        obj["modifytimestamp"] = [time.strftime("%Y%m%d%H%M%SZ", time.gmtime())]
+
+    def delete(self, dn: str) -> None:
+        del self._objects[dn.lower()]
+
+    def simple_bind_s(self, who: str, cred: str) -> None:
+        pass
+
+    def search_ext(self,
+                   base: str,
+                   scope: int,
+                   filterstr: str = "(objectclass=*)",
+                   attrlist: Optional[List[str]] = None,
+                   attrsonly: int = 0,
+                   serverctrls: Optional[List] = None) -> int:
+        self.num_searches += 1
+        page_control = _page_control(serverctrls)
+        if page_control is not None and page_control.cookie:
+            # Continue a paged search
+            result = self._pages.pop(page_control.cookie)
+        else:
+            result = self._search(base.lower(), scope, filterstr, attrlist or [])
+
+        msgid = self._next_msgid
+        self._next_msgid += 1
+        self._pending[msgid] = (result, len(result) if page_control is None else page_control.size)
+        return msgid
+
+    def _search(self, base: str, scope: int, filterstr: str,
+                attrlist: List[str]) -> List[Tuple[str, LDAPObject]]:
+        if base not in self._objects:
+            raise ldap.NO_SUCH_OBJECT({"desc": "No such object"})
+
+        matches = _parse_filter(filterstr)
+        columns = [column.lower() for column in attrlist]
+        result = []
+        for dn, obj in sorted(self._objects.items()):
+            if _in_scope(dn, base, scope) and matches(obj):
+                result.append(
+                    (dn,
+                     {key: values for key, values in obj.items() if not columns or key in columns}))
+        return result
+
+    def result3(self, msgid: int, timeout: Optional[float] = None) -> Tuple[int, List, int, List]:
+        result, page_size = self._pending.pop(msgid)
+        response = [(dn, {key: [v.encode("utf-8")
+                                for v in values]
+                          for key, values in obj.items()})
+                    for dn, obj in result[:page_size]]
+        # The remaining results are handed out to the next search with the cookie
+        cookie = b""
+        if len(result) > page_size:
+            cookie = b"%d" % msgid
+            self._pages[cookie] = result[page_size:]
+        return ldap.RES_SEARCH_RESULT, response, msgid, [
+            SimplePagedResultsControl(size=page_size, cookie=cookie)
+        ]
+
+
+def _page_control(serverctrls: Optional[List]) -> Optional[SimplePagedResultsControl]:
+    for control in serverctrls or []:
+        if control.controlType == ldap.CONTROL_PAGEDRESULTS:
+            return control
+    return None
+
+
+def _in_scope(dn: str, base: str, scope: int) -> bool:
+    if scope == ldap.SCOPE_BASE:
+        return dn == base
+    if scope == ldap.SCOPE_ONELEVEL:
+        return dn.split(",", 1)[-1] == base
+    return dn == base or dn.endswith("," + base)
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\([0-9a-fA-F]{2})", lambda m: chr(int(m.group(1), 16)), value)
+
+
+def _sort_key(value: str) -> Tuple[int, str]:
+    if value.isdigit():
+        return len(value.lstrip("0")), value.lstrip("0")
+    return 0, value.lower()
+
+
+def _parse_filter(filterstr: str) -> _Matcher:
+    matcher, pos = _parse_item(filterstr.strip(), 0)
+    if pos != len(filterstr.strip()):
+        raise ldap.FILTER_ERROR({"desc": "Bad search filter"})
+    return matcher
+
+
+def _parse_item(filterstr: str, pos: int) -> Tuple[_Matcher, int]:
+    if filterstr[pos:pos + 1] != "(":
+        raise ldap.FILTER_ERROR({"desc": "Bad search filter"})
+    pos += 1
+    operator = filterstr[pos]
+    if operator in "&|!":
+        children = []
+        pos += 1
+        while filterstr[pos] == "(":
+            child, pos = _parse_item(filterstr, pos)
+            children.append(child)
+        if operator == "&":
+            return lambda obj: all(child(obj) for child in children), pos + 1
+        if operator == "|":
+            return lambda obj: any(child(obj) for child in children), pos + 1
+        return lambda obj: not children[0](obj), pos + 1
+
+    end = filterstr.index(")", pos)
+    return _parse_comparison(filterstr[pos:end]), end + 1
+
+
+def _parse_comparison(item: str) -> _Matcher:
+    match = re.match(r"([^=<>~]+)(>=|<=|=)(.*)$", item)
+    if match is None:
+        raise ldap.FILTER_ERROR({"desc": "Bad search filter"})
+    attr, operator, value = match.group(1).lower(), match.group(2), match.group(3)
+
+    if operator == ">=":
+        return lambda obj: any(
+            _sort_key(v) >= _sort_key(_unescape(value)) for v in obj.get(attr, []))
+    if operator == "<=":
+        return lambda obj: any(
+            _sort_key(v) <= _sort_key(_unescape(value)) for v in obj.get(attr, []))
+    if value == "*":
+        return lambda obj: attr in obj
+
+    # Only the unescaped "*" is a wildcard
+    pattern = re.compile(".*".join(re.escape(_unescape(part)) for part in value.split("*")) + "$",
+                         re.IGNORECASE)
+    return lambda obj: any(pattern.match(v) for v in obj.get(attr, []))
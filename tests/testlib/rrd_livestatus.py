@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""In-process stand-in for the multisite Livestatus connection serving RRD data
+
+Implements the part of the MultiSiteConnection API (query(), query_row(), set_only_sites()
+and set_prepend_site()) which is used to fetch the RRD data of hosts and services. The
+"rrddata:" columns are answered with generated time series. Each query takes the
+configured latency, like the round trip to the sites, which are queried in parallel.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import livestatus
+
+ServiceKey = Tuple[str, str, str]  # site, host name, service description or "_HOST_"
+_Row = Dict[str, Any]
+_Matcher = Callable[[_Row], bool]
+
+
+class RRDLivestatus:
+    def __init__(self, metrics: Dict[ServiceKey, List[str]], latency: float = 0.0) -> None:
+        super().__init__()
+        self._metrics = metrics
+        self._latency = latency
+        self._only_sites: Optional[List[str]] = None
+        self._prepend_site = False
+        self.queries: List[str] = []
+
+    def set_only_sites(self, sites: Optional[List[str]] = None) -> None:
+        self._only_sites = sites
+
+    def set_prepend_site(self, p: bool) -> None:
+        self._prepend_site = p
+
+    def query_row(self, query: str) -> List[Any]:
+        rows = self.query(query)
+        if not rows:
+            raise livestatus.MKLivestatusNotFoundError(query)
+        return rows[0]
+
+    def query(self, query: str) -> List[List[Any]]:
+        self.queries.append(query)
+        time.sleep(self._latency)
+
+        lines = [line for line in query.split("\n") if line]
+        table = lines[0].split()[1]
+        columns: List[str] = []
+        filters: List[_Matcher] = []
+        for line in lines[1:]:
+            header, value = line.split(": ", 1)
+            if header == "Columns":
+                columns = value.split()
+            elif header == "Filter":
+                filters.append(_filter(value))
+            elif header in ["And", "Or"]:
+                operands = filters[-int(value):]
+                del filters[-int(value):]
+                filters.append(_connective(all if header == "And" else any, operands))
+
+        rows = []
+        for (site, host_name, service_description), perfvars in sorted(self._metrics.items()):
+            if self._only_sites is not None and site not in self._only_sites:
+                continue
+            if (service_description == "_HOST_") != (table == "hosts"):
+                continue
+
+            obj = {"host_name": host_name, "service_description": service_description}
+            if all(matches(obj) for matches in filters):
+                row = [self._column(column, obj, perfvars) for column in columns]
+                rows.append([site] + row if self._prepend_site else row)
+        return rows
+
+    def _column(self, column: str, obj: _Row, perfvars: List[str]) -> Any:
+        if not column.startswith("rrddata:"):
+            return obj[column]
+
+        # The step may be followed by the maximum number of points
+        perfvar, rpn, start, end, step = column.split(":")[1:6]
+        if perfvar not in perfvars:
+            return []
+
+        scale = float(rpn.split(",")[1]) if "," in rpn else 1.0
+        rrd_step = max(60, int(float(step)))
+        rrd_start = int(float(start)) // rrd_step * rrd_step
+        rrd_end = int(float(end)) // rrd_step * rrd_step
+        values = [(index % 100) * scale for index in range((rrd_end - rrd_start) // rrd_step)]
+        return [rrd_start, rrd_end, rrd_step] + values
+
+
+def _filter(spec: str) -> _Matcher:
+    column, _operator, value = spec.split(" ", 2)
+    return lambda obj: obj[column] == value
+
+
+def _connective(func: Callable, operands: List[_Matcher]) -> _Matcher:
+    return lambda obj: func(matches(obj) for matches in operands)
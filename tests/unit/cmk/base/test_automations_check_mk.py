@@ -8,6 +8,8 @@ import pytest  # type: ignore[import]
 
 from testlib.base import Scenario
 
+import cmk.utils.store as store
+from cmk.utils.inventory_archive import InventoryArchive
 from cmk.utils.type_defs import result
 
 import cmk.base.automations.check_mk as check_mk
@@ -43,3 +45,23 @@ class TestAutomationDiagHost:
     def test_execute(self, hostname, ipaddress, raw_data):
         args = [hostname, "agent", ipaddress, "", "6557", "10", "5", "5", ""]
         assert check_mk.AutomationDiagHost().execute(args) == (0, raw_data)
+
+
+def test_delete_host_keeps_inventory_history(monkeypatch, tmp_path):
+    var_dir = tmp_path / "var"
+    archive_dir = var_dir / "inventory_archive"
+    monkeypatch.setattr(check_mk, "var_dir", str(var_dir))
+    monkeypatch.setattr(check_mk, "inventory_archive_dir", str(archive_dir))
+
+    trees = [{"a": i, "b": [1, 2, i]} for i in range(3)]
+    for timestamp, (raw_tree, newer_raw_tree) in zip(["1000", "2000"], zip(trees, trees[1:])):
+        InventoryArchive(archive_dir / "heute").archive(timestamp, raw_tree, newer_raw_tree)
+    store.save_object_to_file(var_dir / "inventory" / "heute", trees[-1])
+
+    check_mk.AutomationDeleteHosts().execute(["heute"])
+
+    assert not (var_dir / "inventory" / "heute").exists()
+    assert [(timestamp, raw_tree)
+            for timestamp, raw_tree, _delta in InventoryArchive(archive_dir /
+                                                                "heute").iter_trees(lambda: None)
+           ] == [("2000", trees[1]), ("1000", trees[0])]
@@ -259,6 +259,26 @@ def test_dump_precompiled_hostcheck(monkeypatch, serial):
     host_check = core_nagios._dump_precompiled_hostcheck(config_cache, serial, "localhost")
     assert host_check is not None
     assert host_check.startswith("#!/usr/bin/env python3")
+    assert paths.nagios_checker_socket not in host_check
+
+
+def test_dump_precompiled_hostcheck_with_checker_helper(monkeypatch, serial):
+    ts = Scenario().add_host("localhost")
+    ts.set_option("nagios_checker_helper", True)
+    config_cache = ts.apply(monkeypatch)
+
+    # Ensure a host check is created
+    monkeypatch.setattr(
+        core_nagios,
+        "_get_needed_plugin_names",
+        lambda c: (set(), {CheckPluginName("uptime")}, set()),
+    )
+
+    host_check = core_nagios._dump_precompiled_hostcheck(config_cache, serial, "localhost")
+    assert host_check is not None
+    assert repr(paths.nagios_checker_socket) in host_check
+    assert host_check.index("_helper.connect(") < host_check.index("import cmk.utils.log")
+    compile(host_check, "localhost", "exec")
 
 
 def test_dump_precompiled_hostcheck_without_check_mk_service(monkeypatch, serial):
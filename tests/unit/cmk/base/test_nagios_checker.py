@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=protected-access
+
+import io
+import socket
+import sys
+import threading
+
+import pytest  # type: ignore[import]
+
+from testlib.base import Scenario  # type: ignore[import]
+
+import cmk.utils.paths
+from cmk.utils.type_defs import CheckPluginName
+
+import cmk.base.agent_based.checking._submit_to_core as _submit_to_core
+import cmk.base.api.agent_based.register as agent_based_register
+import cmk.base.config as config
+import cmk.base.nagios_checker as nagios_checker
+from cmk.base.check_utils import Service
+
+
+def test_request_roundtrip():
+    assert nagios_checker._decode_request(nagios_checker._encode_request("hö st")) == "hö st"
+
+
+def test_decode_empty_request():
+    with pytest.raises(ValueError):
+        nagios_checker._decode_request(b"\n")
+
+
+def test_encode_response():
+    assert nagios_checker._encode_response(2, "CRIT - ö\n") == "2\nCRIT - ö\n".encode("utf-8")
+
+
+def _run_launcher(hostname, stdout):
+    code = compile("import sys\n" + nagios_checker.launcher_source(hostname), "launcher", "exec")
+    orig_stdout, sys.stdout = sys.stdout, stdout
+    try:
+        exec(code, {})  # pylint: disable=exec-used
+    finally:
+        sys.stdout = orig_stdout
+
+
+def test_launcher_falls_back_without_helper(monkeypatch, tmp_path):
+    monkeypatch.setattr(cmk.utils.paths, "nagios_checker_socket", str(tmp_path / "not_existing"))
+    stdout = io.StringIO()
+    _run_launcher("heute", stdout)
+    assert stdout.getvalue() == ""
+
+
+def test_launcher_forwards_to_helper(monkeypatch, tmp_path):
+    socket_path = tmp_path / "nagios_checker"
+    monkeypatch.setattr(cmk.utils.paths, "nagios_checker_socket", str(socket_path))
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(socket_path))
+    server.listen(1)
+
+    requests = []
+
+    def serve():
+        conn = server.accept()[0]
+        requests.append(conn.recv(1024))
+        conn.sendall(nagios_checker._encode_response(2, "CRIT - Something\n"))
+        conn.close()
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+
+    stdout = io.StringIO()
+    with pytest.raises(SystemExit) as e:
+        _run_launcher("heute", stdout)
+
+    thread.join()
+    server.close()
+
+    assert e.value.code == 2
+    assert requests == [b"heute\n"]
+    assert stdout.getvalue() == "CRIT - Something\n"
+
+
+def test_helper_executes_plugins(monkeypatch):
+    # There is no packed config in the unit tests, the scenario is used instead
+    monkeypatch.setattr(config, "load_packed_config", lambda serial: None)
+    nagios_checker._load_plugins_and_config()
+    assert agent_based_register.get_check_plugin(CheckPluginName("uptime")) is not None
+
+    ts = Scenario().add_host("heute")
+    ts.set_option("ipaddresses", {"heute": "127.0.0.1"})
+    ts.set_ruleset("datasource_programs", [
+        ("echo '<<<uptime>>>'; echo 7200.5 1000.0", [], ["heute"], {}),
+    ])
+    ts.set_autochecks("heute", [Service(CheckPluginName("uptime"), None, "Uptime", {})])
+    ts.apply(monkeypatch)
+
+    submitted = []
+    monkeypatch.setattr(
+        _submit_to_core, "_do_submit_to_core",
+        lambda host, service, state, output, cache_info: submitted.append((host, service, state)))
+
+    exit_code, output = nagios_checker.NagiosCheckerHelper()._execute_host_check("heute")
+
+    assert exit_code == 0, output
+    assert submitted == [("heute", "Uptime", 0)]
+    assert config.ipaddresses == {"heute": "127.0.0.1"}
+
+
+@pytest.mark.parametrize("packed_config, expected", [
+    (None, False),
+    ({}, False),
+    ({
+        "nagios_checker_helper": True
+    }, True),
+])
+def test_helper_enabled(monkeypatch, tmp_path, packed_config, expected):
+    monkeypatch.setattr(cmk.utils.paths, "make_helper_config_path", lambda serial: tmp_path)
+    if packed_config is not None:
+        config.PackedConfigStore(None).write(packed_config)
+    assert nagios_checker._helper_enabled() is expected
+
+
+def test_disabled_helper_waits_for_config_change(monkeypatch):
+    config_ids = iter([("1", 0.0, 0.0, 0.0)] * 3 + [("2", 0.0, 0.0, 0.0)])
+    monkeypatch.setattr(nagios_checker, "_current_config_id", lambda: next(config_ids))
+    monkeypatch.setattr(nagios_checker, "_helper_enabled", lambda: False)
+    monkeypatch.setattr(nagios_checker, "_load_plugins_and_config",
+                        lambda: pytest.fail("Loaded the plugins although being disabled"))
+    monkeypatch.setattr(nagios_checker.signal, "signal", lambda signum, handler: None)
+    monkeypatch.setattr(nagios_checker.time, "sleep", lambda seconds: None)
+    execs = []
+    monkeypatch.setattr(nagios_checker.os, "execv", lambda path, args: execs.append(path))
+
+    nagios_checker.NagiosCheckerHelper().run()
+
+    assert execs == [sys.executable]
@@ -4,10 +4,16 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+# pylint: disable=protected-access
+
 import os
+import random
+import threading
+import time
 
 import pytest  # type: ignore[import]
 
+import cmk.base.config as config
 from cmk.base import notify
 
 
@@ -53,3 +59,306 @@ def test_os_environment_does_not_override_notification_script_env(monkeypatch):
 ])
 def test_raw_context_from_env_pipe_decoding(environ, expected):
     assert notify.raw_context_from_env(environ) == expected
+
+
+def test_notification_plugin_pool_limits(monkeypatch):
+    lock = threading.Lock()
+    running = {"mail": 0, "ticket": 0}
+    max_running = {"mail": 0, "ticket": 0, "total": 0}
+    calls = []
+
+    def call_notification_script(plugin_name, plugin_context):
+        with lock:
+            running[plugin_name] += 1
+            max_running[plugin_name] = max(max_running[plugin_name], running[plugin_name])
+            max_running["total"] = max(max_running["total"], sum(running.values()))
+            calls.append((plugin_name, plugin_context["NR"]))
+        time.sleep(0.02)
+        with lock:
+            running[plugin_name] -= 1
+        return 1 if plugin_context["NR"] == "3" else 0
+
+    monkeypatch.setattr(notify, "call_notification_script", call_notification_script)
+
+    pool = notify.NotificationPluginPool(4, {"ticket": 1})
+    for nr in range(8):
+        pool.submit("ticket", {"NR": "%d" % nr})
+        pool.submit("mail", {"NR": "%d" % nr})
+    pool.wait()
+
+    assert max_running["ticket"] == 1
+    assert max_running["total"] <= 4
+    assert max_running["mail"] > 1
+    assert [nr for plugin_name, nr in calls if plugin_name == "ticket"
+           ] == ["%d" % nr for nr in range(8)]
+
+    metrics = pool.metrics()
+    assert 1 <= metrics["workers"] <= 4
+    assert metrics["running"] == 0
+    assert metrics["queue_depth"] == 0
+    assert metrics["max_queue_depth"] > 0
+    assert metrics["plugins"]["ticket"]["calls"] == 8
+    assert metrics["plugins"]["ticket"]["temporary_failures"] == 1
+    assert metrics["plugins"]["mail"]["permanent_failures"] == 0
+
+    pool.shutdown()
+    with pytest.raises(notify.MKGeneralException):
+        pool.submit("mail", {"NR": "9"})
+
+
+def test_call_notification_script_timeout(monkeypatch, tmp_path):
+    script = tmp_path / "slow"
+    script.write_text("#!/bin/sh\necho started\nsleep 60\n")
+    script.chmod(0o755)
+    monkeypatch.setattr(notify, "path_to_notification_script", lambda plugin_name: str(script))
+    monkeypatch.setattr(notify, "_log_to_history", lambda message: None)
+    monkeypatch.setattr(config, "notification_plugin_timeout", 60, raising=False)
+    monkeypatch.setattr(config,
+                        "notification_plugin_pool", {"plugin_timeouts": [("slow", 1)]},
+                        raising=False)
+
+    # Called by a worker, which is not the main thread
+    pool = notify.NotificationPluginPool(1, {})
+    start_time = time.time()
+    pool.submit(
+        "slow", {
+            "CONTACTNAME": "harry",
+            "HOSTNAME": "heute",
+            "HOSTSTATE": "DOWN",
+            "HOSTOUTPUT": "Packet received via smart PING",
+        })
+    pool.wait()
+
+    assert time.time() - start_time < 30
+    assert pool.metrics()["plugins"]["slow"]["temporary_failures"] == 1
+
+
+@pytest.mark.parametrize(
+    "script_text",
+    [
+        # Ignores being terminated
+        "#!/bin/sh\ntrap '' TERM\necho started\nwhile true; do sleep 1; done\n",
+        # Leaves a process behind which keeps the output open
+        "#!/bin/sh\necho started\nsetsid sleep 10 &\nsleep 60\n",
+    ])
+def test_call_notification_script_kill_after_timeout(monkeypatch, tmp_path, script_text):
+    script = tmp_path / "stubborn"
+    script.write_text(script_text)
+    script.chmod(0o755)
+    monkeypatch.setattr(notify, "path_to_notification_script", lambda plugin_name: str(script))
+    monkeypatch.setattr(notify, "_log_to_history", lambda message: None)
+    monkeypatch.setattr(notify, "_NOTIFICATION_PLUGIN_KILL_GRACE", 0.5)
+    monkeypatch.setattr(config, "notification_plugin_timeout", 1, raising=False)
+    monkeypatch.setattr(config, "notification_plugin_pool", {}, raising=False)
+
+    start_time = time.time()
+    assert notify.call_notification_script(
+        "stubborn", {
+            "CONTACTNAME": "harry",
+            "HOSTNAME": "heute",
+            "HOSTSTATE": "DOWN",
+            "HOSTOUTPUT": "Packet received via smart PING",
+        }) == 1
+    assert time.time() - start_time < 10
+
+
+def test_notification_plugin_pool_starts_workers_for_burst(monkeypatch):
+    barrier = threading.Barrier(4, timeout=10)
+
+    def call_notification_script(plugin_name, plugin_context):
+        # Only returns when four calls run at the same time
+        if plugin_context["NR"] != "warmup":
+            barrier.wait()
+        return 0
+
+    monkeypatch.setattr(notify, "call_notification_script", call_notification_script)
+
+    # The idle worker has not picked up the first job of the burst when the next ones are
+    # submitted, which must not keep the pool from starting further workers
+    pool = notify.NotificationPluginPool(4, {})
+    pool.submit("mail", {"NR": "warmup"})
+    pool.wait()
+    while pool._num_idle_workers != 1:
+        time.sleep(0.01)
+
+    for nr in range(4):
+        pool.submit("mail", {"NR": "%d" % nr})
+    pool.wait()
+
+    assert pool.metrics()["workers"] == 4
+    assert pool.metrics()["plugins"]["mail"]["permanent_failures"] == 0
+    pool.shutdown()
+
+
+def _random_rule(rnd):
+    rule = {"description": "rule", "notify_plugin": ("mail", {})}
+    if rnd.random() < 0.1:
+        rule["disabled"] = True
+    if rnd.random() < 0.3:
+        rule["match_hosts"] = rnd.sample(["heute", "morgen", "gestern"], rnd.randint(0, 2))
+    if rnd.random() < 0.3:
+        rule["match_exclude_hosts"] = [rnd.choice(["heute", "morgen"])]
+    if rnd.random() < 0.4:
+        rule["match_hosttags"] = rnd.sample(["prod", "!prod", "lan", "!wan", "/wato/linux+"],
+                                            rnd.randint(1, 2))
+    if rnd.random() < 0.2:
+        rule["match_services"] = [rnd.choice(["CPU", "Disk", "Mem"])]
+    if rnd.random() < 0.2:
+        rule["match_checktype"] = ["cpu.loads"]
+    if rnd.random() < 0.2:
+        rule["match_servicegroups"] = [rnd.choice(["sg1", "sg2"])]
+    if rnd.random() < 0.3:
+        rule["match_host_event"] = rnd.sample(["rd", "dr", "?d", "f"], rnd.randint(1, 2))
+    if rnd.random() < 0.3:
+        rule["match_service_event"] = rnd.sample(["rc", "cr", "?c", "x"], rnd.randint(1, 2))
+    if rnd.random() < 0.2:
+        rule["match_plugin_output"] = rnd.choice(["CRIT", "OK"])
+    if rnd.random() < 0.2:
+        rule["match_contacts"] = [rnd.choice(["harry", "sally"])]
+    return rule
+
+
+def _random_context(rnd):
+    context = {
+        "OMD_SITE": "NO_SITE",
+        "HOSTNAME": rnd.choice(["heute", "morgen", "gestern", "other"]),
+        "HOSTTAGS": " ".join(
+            rnd.sample(["prod", "lan", "wan", "/wato/linux/servers/"], rnd.randint(0, 3))),
+        "CONTACTS": rnd.choice(["harry", "sally", "harry,sally", ""]),
+        "HOSTSTATE": rnd.choice(["UP", "DOWN"]),
+        "PREVIOUSHOSTHARDSTATE": rnd.choice(["UP", "DOWN"]),
+        "HOSTOUTPUT": rnd.choice(["CRIT - down", "OK - up"]),
+        "NOTIFICATIONTYPE": rnd.choice(["PROBLEM", "RECOVERY", "FLAPPINGSTART"]),
+    }
+    if rnd.random() < 0.5:
+        context["WHAT"] = "HOST"
+    else:
+        context.update({
+            "WHAT": "SERVICE",
+            "SERVICEDESC": rnd.choice(["CPU load", "Disk IO", "Memory"]),
+            "SERVICESTATE": rnd.choice(["OK", "CRITICAL"]),
+            "PREVIOUSSERVICEHARDSTATE": rnd.choice(["OK", "CRITICAL"]),
+            "SERVICEOUTPUT": rnd.choice(["CRIT - high", "OK - fine"]),
+            "SERVICECHECKCOMMAND": rnd.choice(["check_mk-cpu.loads", "check_mk-df"]),
+            "SERVICEGROUPNAMES": rnd.choice(["sg1", "sg2,sg3", ""]),
+        })
+    return context
+
+
+def test_notification_rule_index_finds_all_matching_rules():
+    rnd = random.Random(42)
+    rules = [_random_rule(rnd) for _nr in range(300)]
+    rule_index = notify.NotificationRuleIndex(rules)
+
+    num_candidates = num_matches = 0
+    for _nr in range(300):
+        context = _random_context(rnd)
+        candidates = rule_index.candidates(context)
+        assert candidates is not None
+        num_candidates += len(candidates)
+        for nr, rule in enumerate(rules):
+            why_not = notify.rbn_match_rule(rule, context)
+            num_matches += why_not is None
+            assert rule_index.match(nr, rule, context) == why_not
+            if nr not in candidates:
+                assert why_not is not None
+                assert rule_index.why_not_candidate(nr, rule, context)
+
+    assert num_matches > 0
+    assert num_candidates < 300 * len(rules) / 2
+
+
+def test_notification_rule_index_without_event_type():
+    rules = [{"match_host_event": ["rd"]}, {"disabled": True}]
+    assert notify.NotificationRuleIndex(rules).candidates({"HOSTNAME": "heute"}) is None
+    assert notify.NotificationRuleIndex(rules).candidates({"WHAT": "HOST"}) == {0}
+
+
+@pytest.fixture
+def bulkdir(monkeypatch, tmp_path):
+    bulkdir = tmp_path / "bulk"
+    monkeypatch.setattr(notify, "notification_bulkdir", str(bulkdir))
+    monkeypatch.setattr(notify, "notification_bulk_index", str(bulkdir / ".index.mk"))
+    monkeypatch.setattr(notify, "notification_bulk_index_lock", str(bulkdir / ".index.lock"))
+    return bulkdir
+
+
+def _bulk_notify(hostname, interval=60, count=3):
+    notify.do_bulk_notify("mail", {}, {
+        "CONTACTNAME": "harry",
+        "HOSTNAME": hostname,
+        "WHAT": "HOST",
+    }, {
+        "interval": interval,
+        "count": count,
+        "groupby": ["host"],
+        "groupby_custom": [],
+    })
+
+
+def test_bulk_index_finds_ripe_bulks(monkeypatch, bulkdir):
+    for _nr in range(3):
+        _bulk_notify("full")
+    _bulk_notify("young")
+    _bulk_notify("old", interval=0)
+
+    assert {key: entry["count"] for key, entry in notify._load_bulk_index().items()} == {
+        "harry/mail/60,3,host,full": 3,
+        "harry/mail/60,3,host,young": 1,
+        "harry/mail/0,3,host,old": 1,
+    }
+
+    listed = []
+    bulk_uuids = notify.bulk_uuids
+    monkeypatch.setattr(notify, "bulk_uuids",
+                        lambda bulk_dir: listed.append(bulk_dir) or bulk_uuids(bulk_dir))
+
+    ripe = {
+        os.path.basename(bulk_dir): len(uuids)
+        for bulk_dir, _age, _interval, _timeperiod, _count, uuids in notify.find_bulks(True)
+    }
+    assert ripe == {"60,3,host,full": 3, "0,3,host,old": 1}
+    # The directories of bulks which are not ripe are not read
+    assert sorted(os.path.basename(bulk_dir) for bulk_dir in listed) == sorted(ripe)
+
+    assert len(notify.find_bulks(False)) == 3
+
+
+def test_bulk_index_is_rebuilt(bulkdir):
+    _bulk_notify("host1")
+    _bulk_notify("host1")
+    _bulk_notify("host2", interval=0)
+    expected = notify._load_bulk_index()
+
+    # Bulks spooled by former versions have no index
+    os.unlink(notify.notification_bulk_index)
+    rebuilt = notify._load_bulk_index()
+    assert {key: entry["count"] for key, entry in rebuilt.items()
+           } == {key: entry["count"] for key, entry in expected.items()}
+    assert [bulk_dir for bulk_dir, *_rest in notify.find_bulks(True)
+           ] == [str(bulkdir / "harry" / "mail" / "0,3,host,host2")]
+
+
+def test_bulk_index_entry_is_updated(bulkdir):
+    _bulk_notify("host1")
+    _bulk_notify("host1")
+    bulk_dir = str(bulkdir / "harry" / "mail" / "60,3,host,host1")
+    uuids, _oldest = notify.bulk_uuids(bulk_dir)
+
+    # Sent a part of the bulk
+    os.unlink(os.path.join(bulk_dir, uuids[0][1]))
+    notify._update_bulk_index_entry(bulk_dir)
+    assert notify._load_bulk_index()["harry/mail/60,3,host,host1"]["count"] == 1
+
+    os.unlink(os.path.join(bulk_dir, uuids[1][1]))
+    notify._update_bulk_index_entry(bulk_dir)
+    assert notify._load_bulk_index() == {}
+    assert not os.path.exists(bulk_dir)
+
+    # An entry without notifications (e.g. after a crash while storing) is dropped
+    _bulk_notify("host1", interval=0)
+    bulk_dir = str(bulkdir / "harry" / "mail" / "0,3,host,host1")
+    for notify_uuid in os.listdir(bulk_dir):
+        os.unlink(os.path.join(bulk_dir, notify_uuid))
+    assert notify.find_bulks(True) == []
+    assert notify._load_bulk_index() == {}
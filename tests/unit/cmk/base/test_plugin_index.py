@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=redefined-outer-name
+
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest  # type: ignore[import]
+
+import cmk.utils.paths
+
+import cmk.base.plugin_index as plugin_index
+
+
+@pytest.fixture
+def plugin_dirs(monkeypatch, tmp_path):
+    checks_dir = tmp_path / "checks"
+    local_checks_dir = tmp_path / "local_checks"
+    checks_dir.mkdir()
+    local_checks_dir.mkdir()
+    monkeypatch.setattr(cmk.utils.paths, "checks_dir", str(checks_dir))
+    monkeypatch.setattr(cmk.utils.paths, "local_checks_dir", local_checks_dir)
+    monkeypatch.setattr(cmk.utils.paths, "tmp_dir", str(tmp_path))
+
+    (checks_dir / "foo.include").write_text("foo_default_levels = (80.0, 90.0)\n")
+    (checks_dir / "foo").write_text("""
+factory_settings["foo_default_levels"] = {"levels": (1, 2)}
+foo_timeout = 10
+_private = 1
+check_info["foo"] = {"check_function": None}
+check_info["foo.bar"] = {"check_function": None}
+""")
+    (checks_dir / "bar").write_text("""
+check_info["bar"] = {"check_function": None}
+special_agent_info["bar"] = None
+""")
+    return checks_dir, local_checks_dir
+
+
+def _legacy_checks(selection):
+    return [os.path.basename(f) for f in selection.legacy_check_files]
+
+
+def test_check_variable_defaults(plugin_dirs):
+    assert plugin_index.load_plugin_index().check_variable_defaults() == {
+        "foo_default_levels": {
+            "levels": (1, 2)
+        },
+        "foo_timeout": 10,
+    }
+
+
+@pytest.mark.parametrize("check_plugin_names, special_agent_names, expected", [
+    (["foo_bar"], [], ["foo"]),
+    (["mgmt_foo"], [], ["foo"]),
+    ([], ["bar"], ["bar"]),
+    (["not_existing"], [], []),
+])
+def test_select_legacy_checks(plugin_dirs, check_plugin_names, special_agent_names, expected):
+    selection = plugin_index.load_plugin_index().select(
+        check_plugin_names=check_plugin_names,
+        special_agent_names=special_agent_names,
+    )
+    assert _legacy_checks(selection) == expected
+
+
+def test_select_agent_based_modules(plugin_dirs):
+    selection = plugin_index.load_plugin_index().select(check_plugin_names=["uptime"])
+    assert "cmk.base.plugins.agent_based.uptime" in selection.agent_based_modules
+    assert "cmk.base.plugins.agent_based.df" not in selection.agent_based_modules
+
+
+@pytest.mark.parametrize("source", [
+    """
+for name in ["a", "b"]:
+    check_info["computed_" + name] = {}
+""",
+    'check_info["computed_" + "c"] = {}\n',
+    'check_info.update({"computed": {}})\n',
+    'check_info["computed"] = {}\ncheck_info["computed"]["service_description"] = "X"\n',
+    """
+def register(name):
+    check_info[name] = {}
+
+register("computed")
+""",
+    "syntax error",
+])
+def test_unsupported_legacy_checks(plugin_dirs, source):
+    checks_dir = plugin_dirs[0]
+    (checks_dir / "computed").write_text(source)
+    assert plugin_index.load_plugin_index().unsupported_files() == [str(checks_dir / "computed")]
+
+
+def test_supported_legacy_check(plugin_dirs):
+    checks_dir = plugin_dirs[0]
+    (checks_dir / "helpers").write_text("""
+def inventory_helpers(info, what):
+    return []
+
+check_info["helpers"] = {
+    "inventory_function": lambda info: inventory_helpers(info, "x"),
+}
+check_config_variables.append("helpers_timeout")
+""")
+    index = plugin_index.load_plugin_index()
+    assert index.unsupported_files() == []
+    assert _legacy_checks(index.select(check_plugin_names=["helpers"])) == ["helpers"]
+
+
+@pytest.mark.parametrize("source, unsupported", [
+    ("""
+from .agent_based_api.v1 import register
+register.check_plugin(name="x", sections=["y"], service_name="X")
+register.check_plugin(name="z", service_name="Z", discovery_ruleset_type=register.RuleSetType.ALL)
+""", False),
+    ("""
+from .agent_based_api.v1 import register as reg
+reg.check_plugin(name="x", service_name="X")
+""", True),
+    ("""
+from .agent_based_api.v1 import register
+_register = register.check_plugin
+_register(name="x", service_name="X")
+""", True),
+    ("""
+from .agent_based_api import v1
+v1.register.check_plugin(name="x", service_name="X")
+""", True),
+    ("""
+from .agent_based_api.v1 import register
+for name in ["x", "y"]:
+    register.check_plugin(name=name, service_name="X")
+""", True),
+    ("""
+from .agent_based_api.v1 import register
+register.check_plugin(**{"name": "x", "service_name": "X"})
+""", True),
+])
+def test_unsupported_agent_based_modules(tmp_path, source, unsupported):
+    module_path = tmp_path / "module.py"
+    module_path.write_text(source)
+    entry = plugin_index._create_entry("agent_based", str(module_path), (0, 0))
+    assert entry["unsupported"] is unsupported
+
+
+def test_shipped_plugins_are_supported(monkeypatch, tmp_path):
+    monkeypatch.setattr(cmk.utils.paths, "local_checks_dir", tmp_path / "local_checks")
+    monkeypatch.setattr(cmk.utils.paths, "tmp_dir", str(tmp_path))
+    assert plugin_index.load_plugin_index().unsupported_files() == []
+
+
+# Executed in a new process: Plugins loaded once can not be unloaded again
+_LOAD_SCRIPT = """
+import json
+import sys
+from pathlib import Path
+
+import cmk.utils.paths
+for name, (value, is_path) in json.loads(sys.argv[2]).items():
+    setattr(cmk.utils.paths, name, Path(value) if is_path else value)
+
+import cmk.base.api.agent_based.register as agent_based_register
+import cmk.base.check_api as check_api
+import cmk.base.check_table as check_table
+import cmk.base.config as config
+
+if sys.argv[1] == "lazy":
+    errors = config.load_with_plugins_for_hosts(check_api.get_check_api_context, ["heute"])
+else:
+    errors = config.load_all_agent_based_plugins(check_api.get_check_api_context)
+    config.load()
+
+services = check_table.get_check_table("heute").values()
+check_plugins = {}
+for service in services:
+    plugin = agent_based_register.get_check_plugin(service.check_plugin_name)
+    check_plugins[service.description] = None if plugin is None else [
+        str(plugin.name),
+        sorted(str(s) for s in plugin.sections),
+        repr(service.parameters),
+    ]
+
+print(json.dumps({
+    "errors": errors,
+    "check_plugins": check_plugins,
+    "raw_sections": sorted(
+        str(s) for s in agent_based_register.get_relevant_raw_sections(
+            check_plugin_names=[s.check_plugin_name for s in services],
+            inventory_plugin_names=(),
+        )),
+    "all_checks_loaded": config.all_checks_loaded(),
+}))
+"""
+
+
+def _load_for_host(mode):
+    paths = {
+        name: (str(value), isinstance(value, Path))
+        for name, value in vars(cmk.utils.paths).items()
+        if not name.startswith("_") and isinstance(value, (str, Path))
+    }
+    completed = subprocess.run(
+        [sys.executable, "-c", _LOAD_SCRIPT, mode,
+         json.dumps(paths)],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    return json.loads(completed.stdout)
+
+
+@pytest.fixture
+def host_config(monkeypatch, tmp_path):
+    monkeypatch.setattr(cmk.utils.paths, "local_checks_dir", tmp_path / "local_checks")
+    monkeypatch.setattr(cmk.utils.paths, "tmp_dir", str(tmp_path / "tmp"))
+
+    Path(cmk.utils.paths.main_config_file).write_text("""
+all_hosts += ["heute"]
+ipaddresses["heute"] = "127.0.0.1"
+static_checks.setdefault("temperature", []).append((("lnx_thermal", "Zone 1", {}), [], ["heute"]))
+""")
+    Path(cmk.utils.paths.autochecks_dir, "heute.mk").write_text("""[
+  {'check_plugin_name': 'uptime', 'item': None, 'parameters': {}, 'service_labels': {}},
+  {'check_plugin_name': 'df', 'item': u'/', 'parameters': {}, 'service_labels': {}},
+  {'check_plugin_name': 'cpu_loads', 'item': None, 'parameters': (5.0, 10.0), 'service_labels': {}},
+  {'check_plugin_name': 'mem_linux', 'item': None, 'parameters': {}, 'service_labels': {}},
+  {'check_plugin_name': 'kernel_performance', 'item': None, 'parameters': {}, 'service_labels': {}},
+  {'check_plugin_name': 'lnx_thermal', 'item': 'Zone 0', 'parameters': {}, 'service_labels': {}},
+]""")
+    return cmk.utils.paths.local_checks_dir
+
+
+def test_load_with_plugins_for_hosts_loads_same_check_plugins(host_config):
+    full = _load_for_host("full")
+    lazy = _load_for_host("lazy")
+
+    assert len(full["check_plugins"]) == 7
+    assert None not in full["check_plugins"].values()
+    assert full["all_checks_loaded"]
+
+    assert lazy["errors"] == []
+    assert lazy["check_plugins"] == full["check_plugins"]
+    assert lazy["raw_sections"] == full["raw_sections"]
+    assert not lazy["all_checks_loaded"]
+
+
+def test_load_with_plugins_for_hosts_falls_back_to_all_plugins(host_config):
+    host_config.mkdir(parents=True)
+    (host_config / "computed").write_text("""
+for name in ["uptime", "df"]:
+    check_info["local_" + name] = {"check_function": None, "service_description": "X"}
+""")
+    lazy = _load_for_host("lazy")
+    assert lazy["all_checks_loaded"]
+    assert lazy["check_plugins"] == _load_for_host("full")["check_plugins"]
+
+
+def test_local_check_shadows_shipped_check(plugin_dirs):
+    _checks_dir, local_checks_dir = plugin_dirs
+    (local_checks_dir / "foo").write_text('check_info["foo"] = {}\n')
+    selection = plugin_index.load_plugin_index().select(check_plugin_names=["foo"])
+    assert selection.legacy_check_files == [str(local_checks_dir / "foo")]
+
+
+def test_index_is_updated_on_change(plugin_dirs):
+    checks_dir = plugin_dirs[0]
+    assert plugin_index.load_plugin_index().check_variable_defaults()["foo_timeout"] == 10
+    assert plugin_index.plugin_index_path().exists()
+
+    (checks_dir / "foo").write_text("foo_timeout = 200\n")
+    index = plugin_index.load_plugin_index()
+    assert index.check_variable_defaults()["foo_timeout"] == 200
+    assert _legacy_checks(index.select(check_plugin_names=["foo"])) == []
+
+    (checks_dir / "foo").unlink()
+    assert str(checks_dir / "foo") not in plugin_index.load_plugin_index().entries()
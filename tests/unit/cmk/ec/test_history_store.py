@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=protected-access
+
+import logging
+import os
+import time
+
+import pytest  # type: ignore[import]
+
+import cmk.ec.export as ec
+import cmk.ec.history
+import cmk.ec.main
+from cmk.ec.history_store import HistoryStore, convert_history_files
+from cmk.ec.query import QueryGET
+
+logger = logging.getLogger("cmk.mkeventd")
+
+
+def _entry(timestamp, event_id, host, rule_id="rule", text="Some text"):
+    values = [str(timestamp), "NEW", "", "", str(event_id), "1", text] + [""] * 11
+    values[11] = host
+    values[17] = rule_id
+    return "\t".join(values)
+
+
+@pytest.fixture(name="store")
+def fixture_store(tmp_path):
+    store = HistoryStore(tmp_path / "history", logger)
+    yield store
+    store.close()
+
+
+def _filter(column, operator, argument):
+    return (column, operator, lambda x: x == argument, argument)
+
+
+def test_store_line_numbers_continue_across_segments(store):
+    store.add(1000, _entry(1001.0, 1, "a"))
+    store.add(1000, _entry(1002.0, 2, "b"))
+    store.add(2000, _entry(2001.0, 3, "c"))
+
+    assert [period for period, _path in store.segments()] == [1000, 2000]
+    assert [line for line, _entry in store.query([])] == [3, 2, 1]
+
+
+def test_store_query_uses_indexed_columns(store):
+    for index in range(10):
+        store.add(1000, _entry(1000.0 + index, index, "Host%d" % (index % 2), "rule%d" % index))
+
+    def lines(*filters):
+        return [line for line, _entry in store.query(filters)]
+
+    assert lines(_filter("event_host", "=~", "HOST1")) == [10, 8, 6, 4, 2]
+    assert lines(_filter("event_host", "in", ["host0", "nothere"])) == [9, 7, 5, 3, 1]
+    assert lines(_filter("event_rule_id", "=", "rule3")) == [4]
+    assert lines(_filter("event_id", ">=", 8)) == [10, 9]
+    assert lines(_filter("history_line", "=", 5)) == [5]
+    assert lines(_filter("history_time", "<", 1002.0)) == [2, 1]
+    # Not indexed: Filtered by the caller
+    assert lines(_filter("event_text", "=", "xyz")) == list(range(10, 0, -1))
+
+
+def test_store_query_skips_segments_by_time(store):
+    store.add(1000, _entry(1001.0, 1, "a"))
+    store.add(2000, _entry(2001.0, 2, "a"))
+    store.delete_segment(store.segment_path(1000))
+    store.segment_path(1000).write_bytes(b"no database")
+
+    assert [line for line, _entry in store.query([_filter("history_time", ">", 2000.0)])] == [2]
+
+
+def test_store_expire_segment(store):
+    store.add(1000, _entry(1001.0, 1, "a"))
+    path = store.segment_path(1000)
+    assert store.last_modified(path) > 0
+    store.delete_segment(path)
+
+    assert store.segments() == []
+    assert list(store.query([])) == []
+    assert not list(path.parent.glob("1000.sqlite*"))
+
+
+def test_convert_history_files(tmp_path, store):
+    history_dir = tmp_path / "history"
+    history_dir.mkdir()
+    (history_dir /
+     "1000.log").write_text("\n".join([_entry(1001.0, 1, "a"), "garbage",
+                                       _entry(1002.0, 2, "b")]) + "\n")
+    (history_dir / "2000.log").write_text(_entry(2001.0, 3, "c") + "\n")
+
+    convert_history_files(store, history_dir, logger)
+
+    assert not list(history_dir.glob("*.log"))
+    assert [line for line, _entry in store.query([])] == [3, 2, 1]
+
+    # A log file restored after the conversion is not added twice
+    (history_dir / "2000.log").write_text(_entry(2001.0, 3, "c") + "\n")
+    convert_history_files(store, history_dir, logger)
+    assert [line for line, _entry in store.query([])] == [3, 2, 1]
+
+
+@pytest.fixture(name="history")
+def fixture_history(tmp_path):
+    settings = ec.settings('1.2.3i45', tmp_path, tmp_path / "etc", ['mkeventd'])
+    history = cmk.ec.history.History(settings, ec.default_config(), logger,
+                                     cmk.ec.main.StatusTableEvents.columns,
+                                     cmk.ec.main.StatusTableHistory.columns)
+    yield history
+    history._store.close()
+
+
+class _FakeStatusServer:
+    def table(self, name):
+        assert name == "history"
+        return cmk.ec.main.StatusTableHistory(logger, None)
+
+
+def _query(*lines):
+    return QueryGET(_FakeStatusServer(), ["GET history"] + list(lines), logger)
+
+
+def _event(event_id, host):
+    return {"id": event_id, "host": host, "text": "Text of %s" % host, "first": 1.0, "last": 1.0}
+
+
+def test_history_add_and_get(history):
+    for event_id, host in enumerate(["heute", "morgen", "heute", "übermorgen"], 1):
+        history.add(_event(event_id, host), "NEW")
+
+    rows = list(history.get(_query("Filter: event_host = heute")))
+    assert [(row[0], row[5], row[12]) for row in rows] == [(3, 3, "heute"), (1, 1, "heute")]
+
+    rows = list(history.get(_query("Filter: event_text = Text of übermorgen")))
+    assert [row[12] for row in rows] == ["übermorgen"]
+
+    assert len(list(history.get(_query("Limit: 2")))) == 2
+
+
+def test_history_expire(history):
+    history.add(_event(1, "heute"), "NEW")
+    path = history._store.segments()[0][1]
+    for file_path in path.parent.glob("*"):
+        os.utime(file_path, (time.time() - 400 * 86400,) * 2)
+
+    history.housekeeping()
+
+    assert history._store.segments() == []
+    assert list(history.get(_query())) == []
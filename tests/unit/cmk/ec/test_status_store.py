@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=protected-access
+
+import logging
+
+import pytest  # type: ignore[import]
+
+import cmk.ec.status_store as status_store
+from cmk.ec.status_store import StatusStore
+
+logger = logging.getLogger("cmk.mkeventd")
+
+
+def _status(events, next_event_id=1):
+    return {
+        "next_event_id": next_event_id,
+        "events": events,
+        "rule_stats": {
+            "rule": len(events)
+        },
+        "interval_starts": {},
+    }
+
+
+def _event(event_id, text="Text"):
+    return {"id": event_id, "text": text, "phase": "open"}
+
+
+@pytest.fixture(name="path")
+def fixture_path(tmp_path):
+    return tmp_path / "status"
+
+
+def _load(path):
+    return StatusStore(path, logger).load()
+
+
+def test_load_without_status(path):
+    assert _load(path) is None
+
+
+def test_save_appends_changes_to_journal(path):
+    store = StatusStore(path, logger)
+    events = [_event(1), _event(2), _event(3)]
+    assert store.save(_status(events, 4)) == 4  # 3 events + state
+
+    events[1]["text"] = "Changed"
+    del events[0]
+    events.append(_event(4))
+    assert store.save(_status(events, 5)) == 4  # update, new, delete, state
+    assert store.save(_status(events, 5)) == 0
+
+    assert not path.exists()
+    assert _load(path) == _status([_event(2, "Changed"), _event(3), _event(4)], 5)
+
+
+def test_snapshot_replaces_journal(path, monkeypatch):
+    monkeypatch.setattr(status_store, "MIN_JOURNAL_RECORDS_FOR_SNAPSHOT", 2)
+    store = StatusStore(path, logger)
+    events = [_event(1), _event(2)]
+    store.save(_status(events, 3))
+    store.wait_for_snapshot()
+
+    assert path.exists()
+    assert not list(path.parent.glob("status.journal.*"))
+
+    events.append(_event(3))
+    store.save(_status(events, 4))
+    assert [p.name for p in path.parent.glob("status.journal.*")] == ["status.journal.1"]
+    assert _load(path) == _status(events, 4)
+
+
+def test_load_status_of_former_version(path):
+    status = _status([_event(1), _event(2)], 3)
+    path.write_text(repr({k: v for k, v in status.items() if k != "interval_starts"}) + "\n")
+    # Stale journal of an earlier run
+    (path.parent / "status.journal.0").write_text(repr(("delete", 1)) + "\n")
+
+    store = StatusStore(path, logger)
+    assert store.load() == status
+    assert not list(path.parent.glob("status.journal.*"))
+
+    store.save(_status([_event(2)], 3))
+    assert _load(path) == _status([_event(2)], 3)
+
+
+def test_load_ignores_incomplete_record(path):
+    store = StatusStore(path, logger)
+    store.save(_status([_event(1)], 2))
+    with (path.parent / "status.journal.0").open("a") as f:
+        f.write("('event', {'id': 2, 'te")
+
+    assert _load(path) == _status([_event(1)], 2)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Measure run time and peak memory of the availability computation
+
+Synthetic statehist rows of NUM_OBJECTS services with SPANS_PER_OBJECT spans each are
+computed once like former versions did (all spans grouped by object in memory) and
+once object by object. The livestatus response itself is not counted. Usage:
+
+    PYTHONPATH=$REPO benchmark_availability.py [NUM_OBJECTS] [SPANS_PER_OBJECT]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+import cmk.gui.availability as availability
+import cmk.gui.config as config
+import cmk.gui.sites as sites
+
+
+class SyntheticStatehist:
+    def __init__(self, num_objects, spans_per_object):
+        random.seed(42)
+        self._rows = []
+        for span_index in range(spans_per_object):
+            # The statehist table returns the spans in the order of the state changes
+            for index in range(num_objects):
+                span_from = span_index * 600
+                self._rows.append([
+                    "site",
+                    "host%05d" % (index // 20),
+                    "Service %d" % (index % 20), 600, span_from, span_from + 600,
+                    random.choice([0] * 18 + [1, 2]), 0, 0, 0, 1, 1, 0
+                ])
+
+    def set_only_sites(self, only_sites):
+        pass
+
+    def set_prepend_site(self, prepend_site):
+        pass
+
+    def set_limit(self, limit=None):
+        pass
+
+    def query(self, query):
+        # A new response for each query, like from a site
+        return [list(row) for row in self._rows]
+
+
+def _compute_in_memory(avoptions):
+    av_rawdata, _has_reached_logrow_limit = availability.get_availability_rawdata(
+        "service", {}, "", None, None, False, False, avoptions)
+    return availability.compute_availability("service", av_rawdata, avoptions)
+
+
+def _compute_streamed(avoptions):
+    av_objects, _has_reached_logrow_limit = availability.get_availability_spans(
+        "service", {}, "", None, None, False, False, avoptions)
+    return availability.compute_availability_of_objects("service", av_objects, avoptions)
+
+
+def _measure(compute, avoptions, statehist):
+    query = statehist.query
+
+    def measured_query(query_text):
+        # Exclude the response of the site from the peak memory
+        tracemalloc.stop()
+        response = query(query_text)
+        tracemalloc.start()
+        return response
+
+    statehist.query = measured_query
+    try:
+        tracemalloc.start()
+        start = time.time()
+        av_data = compute(avoptions)
+        duration = time.time() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        statehist.query = query
+    return av_data, duration, peak
+
+
+def main(num_objects, spans_per_object):
+    statehist = SyntheticStatehist(num_objects, spans_per_object)
+    sites.live = lambda: statehist
+    availability.load_annotations = lambda: {}
+    config.availability_rollups = False
+
+    avoptions = availability.get_default_avoptions()
+    avoptions.update(range=((0, spans_per_object * 600), ""), logrow_limit=0)
+
+    results = []
+    for title, compute in [("in memory", _compute_in_memory), ("streamed", _compute_streamed)]:
+        av_data, duration, peak = _measure(compute, avoptions, statehist)
+        results.append(av_data)
+        print("%-10s %7d objects %5d spans each  %7.2f s  peak %8.1f MB" %
+              (title, num_objects, spans_per_object, duration, peak / 1024.0**2))
+
+    assert results[0] == results[1]
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 100))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Measure the run time of full and incremental LDAP user synchronizations
+
+NUM_USERS users are synchronized from an in-process LDAP directory stand-in, then
+NUM_CHANGED of them are changed and synchronized again, once with a full and once with
+an incremental synchronization. The users are kept in memory, the number of written
+user profiles is reported instead. Usage:
+
+    OMD_SITE=bench OMD_ROOT=$(mktemp -d) PYTHONPATH=$REPO:$REPO/tests \\
+        benchmark_ldap_sync.py [NUM_USERS] [NUM_CHANGED]
+"""
+
+import copy
+import sys
+import time
+from pathlib import Path
+
+import cmk.utils.paths
+
+import cmk.gui.userdb  # noqa: F401 # pylint: disable=unused-import
+import cmk.gui.plugins.userdb.ldap_connector as ldap_connector
+
+from testlib.ldap_directory import LDAPDirectory
+
+
+def _directory(num_users):
+    directory = LDAPDirectory()
+    for dn in [
+            "dc=check-mk,dc=org",
+            "ou=users,dc=check-mk,dc=org",
+            "ou=groups,dc=check-mk,dc=org",
+    ]:
+        directory.add(dn, {"objectclass": ["container"]})
+    for index in range(num_users):
+        user_id = "user%06d" % index
+        directory.add(
+            "cn=%s,ou=users,dc=check-mk,dc=org" % user_id, {
+                "objectclass": ["user"],
+                "objectcategory": ["person"],
+                "samaccountname": [user_id],
+                "cn": ["User %d" % index],
+                "mail": ["%s@check-mk.org" % user_id],
+            })
+    directory.add(
+        "cn=admins,ou=groups,dc=check-mk,dc=org", {
+            "objectclass": ["group"],
+            "cn": ["admins"],
+            "member": ["cn=user000000,ou=users,dc=check-mk,dc=org"],
+        })
+    return directory
+
+
+def _connection(directory, incremental):
+    config = {
+        "id": "benchmark",
+        "type": "ldap",
+        "description": "Benchmark connection",
+        "disabled": False,
+        "cache_livetime": 300,
+        "active_plugins": {
+            "email": {},
+            "alias": {},
+        },
+        "directory_type": ("ad", {
+            "connect_to": ("fixed_list", {
+                "server": "127.0.0.1"
+            }),
+        }),
+        "user_id_umlauts": "keep",
+        "user_scope": "sub",
+        "user_dn": "ou=users,dc=check-mk,dc=org",
+        "group_dn": "ou=groups,dc=check-mk,dc=org",
+        "group_scope": "sub",
+    }
+    if incremental:
+        config["incremental_sync"] = {"full_sync_interval": 86400}
+
+    connection = ldap_connector.LDAPUserConnector(config)
+    connection._ldap_obj = directory
+    connection._ldap_obj_config = copy.deepcopy(connection._config)
+    return connection
+
+
+def _sync(connection, users):
+    """Sync into the given users, returns the duration and the number of written profiles"""
+    written = []
+
+    def save_users(profiles, updated_user_ids=None):
+        users.clear()
+        users.update(profiles)
+        written.append(len(profiles if updated_user_ids is None else updated_user_ids))
+
+    start = time.time()
+    connection.do_sync(add_to_changelog=False,
+                       only_username=None,
+                       load_users_func=lambda lock: copy.deepcopy(users),
+                       save_users_func=save_users)
+    return time.time() - start, sum(written)
+
+
+def main(num_users, num_changed):
+    Path(cmk.utils.paths.var_dir, "web").mkdir(parents=True, exist_ok=True)
+
+    for title, incremental in [("full", False), ("incremental", True)]:
+        directory = _directory(num_users)
+        connection = _connection(directory, incremental)
+        connection._sync_state_file.unlink(missing_ok=True)
+
+        users = {}
+        _sync(connection, users)
+        for index in range(0, num_users, max(num_users // num_changed, 1))[:num_changed]:
+            directory.modify("cn=user%06d,ou=users,dc=check-mk,dc=org" % index,
+                             {"mail": ["changed%06d@check-mk.org" % index]})
+
+        searches = directory.num_searches
+        duration, num_written = _sync(connection, users)
+        print("%-12s %7d users %5d changed  %7.3f s  %7d profiles written  %3d searches" %
+              (title, num_users, num_changed, duration, num_written,
+               directory.num_searches - searches))
+        assert all(users["user%06d" % index]["email"].startswith("changed")
+                   for index in range(0, num_users, max(num_users // num_changed, 1))[:num_changed])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 10))
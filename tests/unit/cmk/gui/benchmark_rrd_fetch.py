@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Measure the run time of fetching the RRD data of graphs with many services
+
+The RRD data of a graph showing NUM_SERVICES services on NUM_SITES sites is fetched from
+an in-process Livestatus stand-in, which takes LATENCY_MS for each query. This is done
+once with one query per service and once with the batched queries of
+fetch_rrd_data_for_graph(). Usage:
+
+    OMD_SITE=bench OMD_ROOT=$(mktemp -d) PYTHONPATH=$REPO:$REPO/tests \\
+        benchmark_rrd_fetch.py [NUM_SERVICES] [NUM_SITES] [LATENCY_MS]
+"""
+
+import sys
+import time
+
+from cmk.utils.prediction import livestatus_lql
+
+import cmk.gui.plugins.metrics.rrd_fetch as rrd_fetch
+
+from testlib.rrd_livestatus import RRDLivestatus
+
+
+def _per_service(graph_recipe, graph_data_range):
+    """The RRD data fetched with one query per service, like the graphs did before"""
+    point_range = rrd_fetch._point_range(graph_data_range)
+    by_service = rrd_fetch.group_needed_rrd_data_by_service(
+        rrd_fetch.get_needed_sources(graph_recipe["metrics"]))
+    rrd_data = {}
+    for (site, host_name, service_description), entries in by_service.items():
+        entries = list(entries)
+        lql_columns = list(
+            rrd_fetch.rrd_columns(entries, graph_recipe["consolidation_function"], point_range))
+        query = livestatus_lql([host_name], lql_columns, service_description)
+        with rrd_fetch.sites.only_sites(site):
+            row = rrd_fetch.sites.live().query_row(query)
+        for (perfvar, cf, scale), data in zip(entries, row):
+            rrd_data[(site, host_name, service_description, perfvar, cf, scale)] = data
+    return rrd_data
+
+
+def _batched(graph_recipe, graph_data_range):
+    return rrd_fetch.fetch_rrd_data_for_graph(graph_recipe, graph_data_range)
+
+
+def main(num_services, num_sites, latency):
+    services = [("site%d" % (index % num_sites), "host%05d" % index, "CPU load")
+                for index in range(num_services)]
+    live = RRDLivestatus({service: ["load1", "load5"] for service in services}, latency=latency)
+    rrd_fetch.sites.live = lambda *args, **kwargs: live
+
+    graph_recipe = {
+        "metrics": [{
+            "expression": ("rrd",) + service + (perfvar, "max", 1.0)
+        } for service in services for perfvar in ["load1", "load5"]],
+        "consolidation_function": "max",
+    }
+    end = int(time.time()) - 86400
+    graph_data_range = {"time_range": (end - 4 * 3600, end), "step": 60}
+
+    for title, fetch in [("per service", _per_service), ("batched", _batched)]:
+        live.queries.clear()
+        start = time.time()
+        rrd_data = fetch(graph_recipe, graph_data_range)
+        print(
+            "%-12s %6d services %3d sites  %7.3f s  %5d queries  %6d series" %
+            (title, num_services, num_sites, time.time() - start, len(live.queries), len(rrd_data)))
+        assert len(rrd_data) == 2 * num_services
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+            float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.005))
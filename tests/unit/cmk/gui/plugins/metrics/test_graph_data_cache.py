@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import cmk.gui.plugins.metrics.graph_data_cache as graph_data_cache
+
+
+def test_graph_data_cache(monkeypatch):
+    now = [1000.0]
+    auth_user = ["harry"]
+    monkeypatch.setattr(graph_data_cache.time, "time", lambda: now[0])
+    monkeypatch.setattr(graph_data_cache, "_permission_key", lambda: (auth_user[0], ("site1",)))
+
+    computed = []
+
+    def compute():
+        computed.append(now[0])
+        return [{"title": "Load", "rrddata": [1.0, 2.0]}]
+
+    cache = graph_data_cache.GraphDataCache()
+    recipe = {"title": "CPU load", "metrics": []}
+
+    curves = cache.get_curves(recipe, {"time_range": (995, 1000), "step": 60}, compute)
+    curves[0]["scalars"] = {}
+
+    # Same step
+    now[0] = 1019.0
+    assert cache.get_curves(recipe, {
+        "time_range": (1014, 1019),
+        "step": 60
+    }, compute) == [{
+        "title": "Load",
+        "rrddata": [1.0, 2.0]
+    }]
+    assert computed == [1000.0]
+
+    # Other user
+    auth_user[0] = "sally"
+    cache.get_curves(recipe, {"time_range": (1014, 1019), "step": 60}, compute)
+    assert computed == [1000.0, 1019.0]
+
+    # Next step
+    now[0] = 1021.0
+    cache.get_curves(recipe, {"time_range": (1016, 1021), "step": 60}, compute)
+    assert computed == [1000.0, 1019.0, 1021.0]
+
+    assert cache.statistics() == {"hits": 1, "misses": 3, "saved_seconds": 0.0}
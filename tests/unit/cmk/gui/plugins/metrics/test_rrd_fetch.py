@@ -6,9 +6,49 @@
 
 import cmk.gui.plugins.metrics.rrd_fetch as rf
 
+from testlib.rrd_livestatus import RRDLivestatus
+
 
 def test_needed_elements_of_expression():
     assert set(
         rf.needed_elements_of_expression(('transformation', ('q90percentile', 95.0), [
             ('rrd', u'heute', u'CPU utilization', 'util', 'max')
         ]))) == {('heute', 'CPU utilization', 'util', 'max')}
+
+
+def test_fetch_rrd_data_for_graph(monkeypatch):
+    live = RRDLivestatus({
+        ("site1", "host1", "CPU load"): ["load1"],
+        ("site1", "host2", "CPU load"): ["load1"],
+        ("site2", "host1", "CPU load"): ["load1"],
+        ("site2", "host2", "CPU load"): ["load1"],
+        ("site1", "host1", "Memory"): ["mem_used"],
+        ("site1", "host1", "_HOST_"): ["rta"],
+    })
+    monkeypatch.setattr(rf.sites, "live", lambda *args, **kwargs: live)
+
+    needed = [
+        ("site1", "host1", "CPU load", "load1", "max", 1.0),
+        ("site1", "host2", "CPU load", "load1", "max", 1.0),
+        ("site2", "host1", "CPU load", "load1", "max", 1.0),
+        ("site1", "host1", "Memory", "mem_used", "max", 2.0),
+        ("site1", "host1", "_HOST_", "rta", "max", 1.0),
+        ("site1", "missing", "CPU load", "load1", "max", 1.0),
+    ]
+    graph_recipe = {
+        "metrics": [{
+            "expression": ("rrd",) + spec
+        } for spec in needed],
+        "consolidation_function": "max",
+    }
+    rrd_data = rf.fetch_rrd_data_for_graph(graph_recipe, {
+        "time_range": (3600, 7200),
+        "step": 60,
+    })
+
+    # One query per set of RRD columns, the sites are queried by the same query
+    assert len(live.queries) == 3
+    assert sorted(rrd_data) == sorted(needed[:-1])
+    assert rrd_data[needed[0]].twindow == (3600, 7200, 60)
+    assert rrd_data[needed[0]].values == [float(i) for i in range(60)]
+    assert rrd_data[needed[3]].values == [2.0 * i for i in range(60)]
@@ -7,8 +7,10 @@
 # No stub file
 import pytest  # type: ignore[import]
 
+import cmk.gui.config as config
 import cmk.gui.inventory
 import cmk.gui.plugins.views.inventory as inventory
+from cmk.utils.inventory_index import InventoryIndex
 
 RAW_ROWS = [('this_site', 'this_hostname')]
 RAW_ROWS2 = [('this_site', 'this_hostname', 'foobar')]
@@ -97,6 +99,7 @@ EXPECTED_INV_MULTI_KEYS = [
 
 
 def test_query_row_table_inventory(monkeypatch):
+    monkeypatch.setattr(config, "inventory_index", False)
     row_table = inventory.RowTableInventory("invtesttable", ".foo.bar:")
     monkeypatch.setattr(row_table, "_get_raw_data", lambda only_sites, query: RAW_ROWS)
     monkeypatch.setattr(row_table, "_get_inv_data", lambda hostrow: INV_ROWS)
@@ -106,6 +109,7 @@ def test_query_row_table_inventory(monkeypatch):
 
 
 def test_query_row_table_inventory_unknown_columns(monkeypatch):
+    monkeypatch.setattr(config, "inventory_index", False)
     row_table = inventory.RowTableInventory("invtesttable", ".foo.bar:")
     monkeypatch.setattr(row_table, "_get_raw_data", lambda only_sites, query: RAW_ROWS)
     monkeypatch.setattr(row_table, "_get_inv_data", lambda hostrow: INV_ROWS)
@@ -115,6 +119,7 @@ def test_query_row_table_inventory_unknown_columns(monkeypatch):
 
 
 def test_query_row_table_inventory_add_columns(monkeypatch):
+    monkeypatch.setattr(config, "inventory_index", False)
     row_table = inventory.RowTableInventory("invtesttable", ".foo.bar:")
     monkeypatch.setattr(row_table, "_get_raw_data", lambda only_sites, query: RAW_ROWS2)
     monkeypatch.setattr(row_table, "_get_inv_data", lambda hostrow: INV_ROWS)
@@ -123,6 +128,31 @@ def test_query_row_table_inventory_add_columns(monkeypatch):
         assert set(row) == set(EXPECTED_INV_KEYS + ['host_foo'])
 
 
+class _View:
+    sorters: list = []
+
+
+def test_query_row_table_inventory_from_index(monkeypatch, tmp_path):
+    index = InventoryIndex(tmp_path / "inventory_index.sqlite")
+    index.update_host("this_hostname", {"foo": {"bar": INV_ROWS}}, 0)
+
+    monkeypatch.setattr(config, "inventory_index", True)
+    monkeypatch.setattr(cmk.gui.inventory, "get_inventory_index", lambda hostnames: (index, set()))
+    monkeypatch.setattr(cmk.gui.inventory, "load_status_data_tree", lambda hostrow: None)
+    monkeypatch.setattr(cmk.gui.inventory, "has_restricted_inventory_paths", lambda: False)
+
+    row_table = inventory.RowTableInventory("invtesttable", ".foo.bar:")
+    monkeypatch.setattr(row_table, "_get_raw_data", lambda only_sites, query: RAW_ROWS)
+    rows, _len_rows = row_table.query(_View(), [], None, None, None, [])
+    assert rows == [{
+        "site": "this_site",
+        "host_name": "this_hostname",
+        "invtesttable_sid": inv_row["sid"],
+        "invtesttable_value1": inv_row["value1"],
+        "invtesttable_value2": inv_row["value2"],
+    } for inv_row in INV_ROWS]
+
+
 def test_query_row_table_inventory_history(monkeypatch):
     row_table = inventory.RowTableInventoryHistory()
     monkeypatch.setattr(row_table, "_get_raw_data", lambda only_sites, query: RAW_ROWS)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=redefined-outer-name
+
+import copy
+import random
+
+import pytest  # type: ignore[import]
+
+import cmk.gui.availability as availability
+import cmk.gui.config as config
+import cmk.gui.sites as sites
+
+COLUMNS = [
+    "site", "host_name", "service_description", "duration", "from", "until", "state", "host_down",
+    "in_downtime", "in_host_downtime", "in_notification_period", "in_service_period", "is_flapping",
+    "host_groups"
+]
+
+
+def _statehist_rows(num_objects=20, num_changes=30):
+    """Rows of several objects, interleaved like in the statehist table"""
+    random.seed(4711)
+    changes = []
+    for index in range(num_objects):
+        host_name, service = "host%d" % (index // 4), "Service %d" % (index % 4)
+        for _change in range(num_changes):
+            changes.append((random.randint(0, 86400), host_name, service))
+
+    rows = []
+    starts = {}
+    for change_time, host_name, service in sorted(changes):
+        span_from = starts.get((host_name, service), 0)
+        starts[(host_name, service)] = change_time
+        rows.append([
+            "site%d" % (len(host_name) % 2), host_name, service, change_time - span_from, span_from,
+            change_time,
+            random.choice([0, 0, 0, 1, 2, 3, -1]),
+            random.choice([0, 0, 1]),
+            random.choice([0, 0, 0, 1]), 0, 1, 1,
+            random.choice([0, 0, 0, 1]), ["group%d" % (len(rows) % 3), "other"]
+        ])
+    return rows
+
+
+class FakeLive:
+    def __init__(self, rows):
+        self.rows = rows
+        self.limit = None
+
+    def set_only_sites(self, only_sites):
+        pass
+
+    def set_prepend_site(self, prepend_site):
+        pass
+
+    def set_limit(self, limit=None):
+        self.limit = limit
+
+    def query(self, query):
+        return copy.deepcopy(self.rows[:self.limit] if self.limit else self.rows)
+
+
+@pytest.fixture
+def rows(monkeypatch):
+    rows = _statehist_rows()
+    live = FakeLive(rows)
+    monkeypatch.setattr(sites, "live", lambda: live)
+    monkeypatch.setattr(availability, "load_annotations", lambda: {})
+    monkeypatch.setattr(config, "availability_rollups", False, raising=False)
+    return rows
+
+
+def _reference_availability(rows, context, what, avoptions):
+    # The computation of former versions: all spans of all objects in memory
+    if avoptions["logrow_limit"] and len(rows) > avoptions["logrow_limit"]:
+        rows = rows[:avoptions["logrow_limit"]]
+    spans = [dict(zip(COLUMNS, row)) for row in copy.deepcopy(rows)]
+    if avoptions["grouping"] not in [None, "host"]:
+        availability.filter_groups_of_entries(context, avoptions, spans)
+    else:
+        for span in spans:
+            del span["host_groups"]
+    return availability.compute_availability(what, availability.spans_by_object(spans), avoptions)
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {
+        "grouping": "host_groups",
+        "dont_merge": True,
+    },
+    {
+        "short_intervals": 600,
+        "outage_statistics": (["min", "max", "count"], ["crit", "warn"]),
+    },
+    {
+        "logrow_limit": 100,
+    },
+])
+def test_streamed_availability_is_identical(rows, options):
+    context = {"hostgroups": {"hostgroups": "group1|group2", "neg_hostgroups": "off"}}
+    avoptions = availability.get_default_avoptions()
+    avoptions.update(options, range=((0, 86400), ""))
+    if "logrow_limit" not in options:
+        avoptions["logrow_limit"] = 0
+
+    av_objects, has_reached_logrow_limit = availability.get_availability_spans(
+        "service", context, "", None, None, False, False, avoptions)
+    av_data = availability.compute_availability_of_objects("service", av_objects, avoptions)
+
+    assert has_reached_logrow_limit == ("logrow_limit" in options)
+    assert av_data == _reference_availability(rows, context, "service", avoptions)
+
+
+def test_spans_are_created_object_by_object(rows):
+    avoptions = availability.get_default_avoptions()
+    avoptions.update(range=((0, 86400), ""), logrow_limit=0)
+    av_objects, _has_reached_logrow_limit = availability.get_availability_spans(
+        "service", {}, "", None, None, False, False, avoptions)
+
+    objects = []
+    for site_host, service, spans in av_objects:
+        objects.append((site_host, service))
+        assert all(
+            (span["site"], span["host_name"], span["service_description"]) == site_host + (service,)
+            for span in spans)
+        assert [span["from"] for span in spans] == sorted(span["from"] for span in spans)
+    assert len(objects) == len(set(objects)) == 20
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=redefined-outer-name
+
+import re
+import time
+
+import pytest  # type: ignore[import]
+
+import cmk.utils.paths
+import cmk.gui.availability as availability
+import cmk.gui.availability_rollups as availability_rollups
+import cmk.gui.config as config
+import cmk.gui.sites as sites
+
+DAY = 86400
+NOW = int(time.time())
+OK = {"state": 0, "in_downtime": 0, "in_notification_period": 1}
+
+
+class FakeStatehist:
+    """Answers statehist queries from a list of state changes per object
+
+    Like the real table, an object is tracked from the beginning of the queried time
+    range in case it is known before, otherwise from the time it appears."""
+    def __init__(self, changes):
+        self.changes = changes
+        self.queries = []
+        self._only_sites = None
+        self._prepend_site = False
+        self._limit = None
+
+    def alive_sites(self):
+        return ["site1", "site2"]
+
+    def set_only_sites(self, only_sites):
+        self._only_sites = only_sites
+
+    def set_prepend_site(self, prepend_site):
+        self._prepend_site = prepend_site
+
+    def set_limit(self, limit=None):
+        self._limit = limit
+
+    def query(self, query):
+        self.queries.append(query)
+        since = int(re.search(r"Filter: time >= (\d+)", query).group(1))
+        until = int(re.search(r"Filter: time < (\d+)", query).group(1))
+        columns = re.search(r"Columns: (.*)", query).group(1).split()
+        rows = []
+        for (site, host_name, service_description), changes in sorted(self.changes.items()):
+            if self._only_sites is not None and site not in self._only_sites:
+                continue
+            if not _matches(query, host_name, service_description):
+                continue
+            for span in _spans(changes, since, until):
+                span.update(host_name=host_name, service_description=service_description)
+                rows.append(([site] if self._prepend_site else []) +
+                            [span[column] for column in columns])
+        return rows[:self._limit] if self._limit else rows
+
+
+def _matches(query, host_name, service_description):
+    stack = []
+    for line in query.splitlines():
+        if line.startswith("Filter: host_name = "):
+            stack.append(host_name == line[20:])
+        elif line.startswith("Filter: service_description"):
+            operator, value = (line[28:].split(" ", 1) + [""])[:2]
+            stack.append((service_description == value) == (operator == "="))
+        elif line.startswith("And: ") or line.startswith("Or: "):
+            num = int(line.split()[1])
+            values, stack = stack[-num:], stack[:-num]
+            stack.append(all(values) if line.startswith("And") else any(values))
+    return all(stack)
+
+
+def _spans(changes, since, until):
+    first = changes[0][0]
+    if first >= until:
+        return []
+    if first > since:
+        # A new object, with a grace period
+        initial = {"state": -1} if first - since > 600 else changes[0][1]
+        changes = [(since, initial)] + changes
+    spans = []
+    for index, (change_time, attributes) in enumerate(changes):
+        next_time = changes[index + 1][0] if index + 1 < len(changes) else until
+        span_from, span_until = max(change_time, since), min(next_time, until)
+        if span_from >= span_until:
+            continue
+        span = {
+            "from": span_from,
+            "until": span_until,
+            "duration": span_until - span_from,
+            "host_down": 0,
+            "in_host_downtime": 0,
+            "in_service_period": 1,
+            "is_flapping": 0,
+        }
+        span.update(OK)
+        span.update(attributes)
+        spans.append(span)
+    return spans
+
+
+@pytest.fixture
+def statehist(monkeypatch, tmp_path):
+    start = NOW - 12 * DAY
+    changes = {
+        ("site1", "host1", "CPU load"): [
+            (start, {}),
+            (start + 3 * DAY + 100, {
+                "state": 2
+            }),
+            (start + 3 * DAY + 400, {
+                "state": 1,
+                "in_downtime": 1
+            }),
+            (start + 6 * DAY, {}),
+            (NOW - 7200, {
+                "state": 3,
+                "in_notification_period": 0
+            }),
+        ],
+        ("site1", "host1", "Memory"): [
+            (start, {
+                "state": 1
+            }),
+            (start + 5 * DAY + 1234, {
+                "is_flapping": 1
+            }),
+            (start + 8 * DAY - 5, {
+                "state": 2,
+                "host_down": 1
+            }),
+        ],
+        # Created within the time range
+        ("site1", "host2", "CPU load"): [
+            (NOW - 4 * DAY, {}),
+            (NOW - 3 * DAY, {
+                "state": 2
+            }),
+        ],
+        ("site2", "host3", ""): [
+            (start, {}),
+            (start + 9 * DAY, {
+                "state": 1,
+                "in_service_period": 0
+            }),
+        ],
+        ("site2", "host3", "Disk"): [(start, {
+            "state": 2
+        })],
+    }
+    fake_statehist = FakeStatehist(changes)
+    monkeypatch.setattr(sites, "live", lambda: fake_statehist)
+    monkeypatch.setattr(sites, "livestatus_auth_user", lambda: None)
+    monkeypatch.setattr(availability, "load_annotations", lambda: {})
+    monkeypatch.setattr(cmk.utils.paths, "var_dir", str(tmp_path))
+    return fake_statehist
+
+
+def _availability(what, avoptions, use_rollups, monkeypatch):
+    monkeypatch.setattr(config, "availability_rollups", use_rollups, raising=False)
+    av_rawdata, _has_reached_logrow_limit = availability.get_availability_rawdata(
+        what, {}, "", None, None, False, False, avoptions)
+    return [{key: value
+             for key, value in entry.items()
+             if key != "timeline"}
+            for entry in availability.compute_availability(what, av_rawdata, avoptions)]
+
+
+@pytest.mark.parametrize("what", ["host", "service"])
+@pytest.mark.parametrize("options", [
+    {},
+    {
+        "downtimes": {
+            "include": "exclude",
+            "exclude_ok": False
+        },
+        "notification_period": "honor",
+    },
+    {
+        "consider": {
+            "flapping": False,
+            "host_down": False,
+            "unmonitored": False,
+        },
+        "service_period": "exclude",
+        "state_grouping": {
+            "warn": "crit",
+            "unknown": "unknown",
+            "host_down": "host_down",
+        },
+    },
+])
+@pytest.mark.parametrize("time_range", [
+    (NOW - 10 * DAY + 3333, NOW),
+    (NOW - 10 * DAY, NOW - 2 * DAY - 77),
+])
+def test_rollups_compute_same_availability(monkeypatch, statehist, what, options, time_range):
+    avoptions = availability.get_default_avoptions()
+    avoptions.update(options, range=(time_range, ""), logrow_limit=0)
+
+    expected = _availability(what, avoptions, False, monkeypatch)
+    assert expected
+    assert _availability(what, avoptions, True, monkeypatch) == expected
+
+    # The closed days are queried once, the following computations use the rollups
+    statehist.queries.clear()
+    assert _availability(what, avoptions, True, monkeypatch) == expected
+    assert len(statehist.queries) <= 3  # leading edge, trailing edge, new objects
+    whole_range = "Filter: time >= %d\nFilter: time < %d\n" % time_range
+    assert all(
+        "Filter: host_name = host2" in query for query in statehist.queries if whole_range in query)
+
+
+def test_rollups_not_used_for_timeline(monkeypatch, statehist):
+    avoptions = availability.get_default_avoptions()
+    avoptions.update(range=((NOW - 5 * DAY, NOW), ""), show_timeline=True)
+    _availability("service", avoptions, True, monkeypatch)
+    assert len(statehist.queries) == 1
+
+
+def test_closed_days():
+    now = time.mktime((2020, 3, 10, 12, 0, 0, 0, 0, -1))
+    start = time.mktime((2020, 3, 6, 8, 0, 0, 0, 0, -1))
+    days = availability_rollups.closed_days((start, now), now)
+    assert [time.localtime(day_start)[:4] for day_start, _day_end in days] == [
+        (2020, 3, 7, 0),
+        (2020, 3, 8, 0),
+        (2020, 3, 9, 0),
+    ]
+    assert all(day_end == next_start for (_s, day_end), (next_start, _e) in zip(days, days[1:]))
+    assert availability_rollups.closed_days((start, now), days[-1][1] + 1) == days[:-1]
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=redefined-outer-name
+
+import copy
+import os
+import random
+from pathlib import Path
+
+import pytest  # type: ignore[import]
+
+import cmk.utils.paths
+import cmk.utils.store as store
+from cmk.utils.inventory_archive import InventoryArchive
+from cmk.utils.structured_data import StructuredDataTree
+import cmk.gui.inventory as inventory
+
+NUM_VERSIONS = 25
+
+
+def _versions():
+    rnd = random.Random(42)
+    raw_tree = {
+        "hardware": {
+            "cpu": {
+                "cores": 2
+            }
+        },
+        "software": {
+            "packages": [{
+                "name": "package%d" % index,
+                "version": "1.0"
+            } for index in range(100)]
+        },
+    }
+    versions = []
+    for index in range(NUM_VERSIONS):
+        versions.append(("%d" % (1600000000 + index * 3600), raw_tree))
+        raw_tree = copy.deepcopy(raw_tree)
+        packages = raw_tree["software"]["packages"]
+        packages[rnd.randrange(len(packages))]["version"] += ".1"
+        if index % 3 == 0:
+            packages.insert(rnd.randrange(len(packages)), {
+                "name": "new%d" % index,
+                "version": "1.0"
+            })
+        if index % 4 == 0:
+            raw_tree["hardware"]["cpu"]["cores"] += 1
+    return versions
+
+
+@pytest.fixture
+def var_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(cmk.utils.paths, "var_dir", str(tmp_path))
+    monkeypatch.setattr(cmk.utils.paths, "omd_root", tmp_path)
+    monkeypatch.setattr(cmk.utils.paths, "inventory_archive_dir",
+                        str(tmp_path / "inventory_archive"))
+    monkeypatch.setattr(inventory, "_get_permitted_inventory_paths", lambda: None)
+    return tmp_path
+
+
+def _write_inventory(var_dir, hostname, versions, delta_archive):
+    archive_dir = var_dir / "inventory_archive" / hostname
+    archive_dir.mkdir(parents=True)
+    for (timestamp, raw_tree), (_next_timestamp, next_raw_tree) in zip(versions, versions[1:]):
+        if delta_archive:
+            InventoryArchive(archive_dir).archive(timestamp, raw_tree, next_raw_tree)
+        else:
+            # Like former versions: Each archived tree as a whole
+            store.save_object_to_file(archive_dir / timestamp, raw_tree)
+
+    latest_timestamp, latest_raw_tree = versions[-1]
+    inventory_path = var_dir / "inventory" / hostname
+    inventory_path.parent.mkdir(exist_ok=True)
+    store.save_object_to_file(inventory_path, latest_raw_tree)
+    os.utime(str(inventory_path), (int(latest_timestamp), int(latest_timestamp)))
+
+
+def _history(hostname, search_timestamp=None):
+    delta_history, corrupted_history_files = inventory.get_history_deltas(
+        hostname, search_timestamp=search_timestamp)
+    return [(timestamp, new, changed, removed, delta_tree.get_raw_tree())
+            for timestamp, (new, changed, removed, delta_tree) in delta_history
+           ], corrupted_history_files
+
+
+def _reference_history(versions):
+    # Former versions compared the whole trees
+    history = []
+    previous_tree = StructuredDataTree()
+    for timestamp, raw_tree in versions:
+        tree = StructuredDataTree().create_tree_from_raw_tree(raw_tree)
+        new, changed, removed, delta_tree = tree.compare_with(previous_tree)
+        history.append((timestamp, new, changed, removed, delta_tree.get_raw_tree()))
+        previous_tree = tree
+    return history
+
+
+def test_history_from_deltas(var_dir):
+    versions = _versions()
+    _write_inventory(var_dir, "whole", versions, delta_archive=False)
+    _write_inventory(var_dir, "delta", versions, delta_archive=True)
+
+    expected = _reference_history(versions)
+    assert _history("whole") == (expected, [])
+    assert _history("delta") == (expected, [])
+
+    # From the delta cache
+    assert _history("delta") == (expected, [])
+
+    for timestamp, _raw_tree in versions[::6]:
+        assert _history("whole", timestamp) == _history("delta", timestamp)
+
+
+def test_history_with_broken_file(var_dir):
+    versions = _versions()
+    _write_inventory(var_dir, "delta", versions, delta_archive=True)
+    broken_timestamp = versions[10][0]
+    store.save_text_to_file(var_dir / "inventory_archive" / "delta" / broken_timestamp, "{")
+
+    delta_history, corrupted = _history("delta")
+    assert [entry[0] for entry in delta_history
+           ] == [timestamp for timestamp, _raw_tree in versions[-len(delta_history):]]
+    assert corrupted and all(Path(path).name <= versions[11][0] for path in corrupted), corrupted
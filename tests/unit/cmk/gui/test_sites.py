@@ -5,6 +5,7 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import pytest  # type: ignore[import]
+import cmk.gui.config as config
 import cmk.gui.sites as sites
 
 
@@ -69,3 +70,20 @@ def test_encode_socket_for_livestatus(site_spec, result):
 ])
 def test_site_config_for_livestatus_tcp_tls(site_spec, result):
     assert sites._site_config_for_livestatus("mysite", site_spec) == result
+
+
+def test_get_query_cache(monkeypatch):
+    monkeypatch.setattr(sites, "_query_cache", None)
+
+    monkeypatch.setattr(config, "livestatus_query_cache_ttl", 0, raising=False)
+    assert sites._get_query_cache() is None
+
+    monkeypatch.setattr(config, "livestatus_query_cache_ttl", 5, raising=False)
+    query_cache = sites._get_query_cache()
+    assert query_cache is not None
+    assert query_cache.ttl == 5
+    assert sites._get_query_cache() is query_cache
+
+    monkeypatch.setattr(config, "livestatus_query_cache_ttl", 10, raising=False)
+    assert sites._get_query_cache() is not query_cache
+    assert sites.statistics()["query_cache"]["hits"] == 0
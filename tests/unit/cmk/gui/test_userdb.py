@@ -507,6 +507,20 @@ def test_check_credentials_local_user_disallow_locked(with_user):
     assert userdb.check_credentials(user_id, password) is False
 
 
+def test_save_users_updated_user_ids(with_user):
+    user_id = with_user[0]
+
+    users = _load_users_uncached(lock=True)
+    users[user_id]["alias"] = u"Changed"
+    userdb.save_users(users, updated_user_ids=[])
+    assert _load_users_uncached(lock=False)[user_id]["alias"] == u"Changed"
+    assert utils.load_cached_profile(user_id)["alias"] != u"Changed"
+
+    users = _load_users_uncached(lock=True)
+    userdb.save_users(users, updated_user_ids=[user_id])
+    assert utils.load_cached_profile(user_id)["alias"] == u"Changed"
+
+
 # user_id needs to be used here because it executes a reload of the config and the monkeypatch of
 # the config needs to be done after loading the config
 @pytest.fixture()
@@ -6,12 +6,17 @@
 
 # pylint: disable=redefined-outer-name
 
+import copy
 from typing import Dict, List, Union
 from pathlib import Path
 
 import pytest  # type: ignore[import]
 from mockldap import MockLdap, LDAPObject  # type: ignore[import]
 
+from testlib.ldap_directory import LDAPDirectory
+
+import cmk.utils.store as store
+
 # userdb is needed to make the module register the post-config-load-hooks
 import cmk.gui.userdb
 import cmk.gui.plugins.userdb.ldap_connector as ldap
@@ -518,3 +523,120 @@ def test_get_group_memberships_nested(mocked_ldap):
 
     for needed_group_dn, needed_group in needed_groups:
         assert memberships[needed_group_dn] == needed_group
+
+
+@pytest.fixture()
+def ldap_directory():
+    directory = LDAPDirectory()
+    for dn in [
+            "dc=check-mk,dc=org",
+            "ou=users,dc=check-mk,dc=org",
+            "ou=groups,dc=check-mk,dc=org",
+    ]:
+        directory.add(dn, {"objectclass": ["container"]})
+    for user_id in ["alice", "bob"]:
+        directory.add(
+            "cn=%s,ou=users,dc=check-mk,dc=org" % user_id, {
+                "objectclass": ["user"],
+                "objectcategory": ["person"],
+                "samaccountname": [user_id],
+                "cn": [user_id.title()],
+                "mail": ["%s@check-mk.org" % user_id],
+            })
+    directory.add("cn=admins,ou=groups,dc=check-mk,dc=org", {
+        "objectclass": ["group"],
+        "cn": ["admins"],
+        "member": ["cn=alice,ou=users,dc=check-mk,dc=org"],
+    })
+    return directory
+
+
+@pytest.fixture()
+def incremental_connection(monkeypatch, ldap_directory):
+    monkeypatch.setattr(ldap.LDAPUserConnector,
+                        "connect",
+                        lambda self, enforce_new=False, enforce_server=None: None)
+    connection = ldap.LDAPUserConnector({
+        "id": "incremental",
+        "type": "ldap",
+        "description": "Test connection",
+        "disabled": False,
+        "cache_livetime": 300,
+        "incremental_sync": {
+            "full_sync_interval": 86400,
+        },
+        "active_plugins": {
+            "email": {},
+            "alias": {},
+        },
+        "directory_type": ("ad", {
+            "connect_to": ("fixed_list", {
+                "server": "127.0.0.1"
+            }),
+        }),
+        "user_id_umlauts": "keep",
+        "user_scope": "sub",
+        "user_dn": "ou=users,dc=check-mk,dc=org",
+        "group_dn": "ou=groups,dc=check-mk,dc=org",
+        "group_scope": "sub",
+    })
+    connection._ldap_obj = ldap_directory
+    return connection
+
+
+def _sync(connection, users):
+    """Sync into the given users and return the updated_user_ids of the save"""
+    saved = []
+
+    def save_users(profiles, updated_user_ids=None):
+        users.clear()
+        users.update(profiles)
+        saved.append(updated_user_ids)
+
+    connection.do_sync(add_to_changelog=False,
+                       only_username=None,
+                       load_users_func=lambda lock: copy.deepcopy(users),
+                       save_users_func=save_users)
+    return saved
+
+
+def test_incremental_sync(incremental_connection, ldap_directory):
+    users: Dict = {}
+    assert _sync(incremental_connection, users) == [None]
+    assert sorted(users) == ["alice", "bob"]
+    assert users["bob"]["email"] == "bob@check-mk.org"
+
+    # Nothing changed: Only the users with the last change marker are fetched again
+    assert _sync(incremental_connection, users) == []
+
+    ldap_directory.modify("cn=alice,ou=users,dc=check-mk,dc=org", {"mail": ["alice@example.com"]})
+    ldap_directory.delete("cn=bob,ou=users,dc=check-mk,dc=org")
+    assert _sync(incremental_connection, users) == [{"alice"}]
+    assert users["alice"]["email"] == "alice@example.com"
+    # Removed users are found by the next full sync
+    assert sorted(users) == ["alice", "bob"]
+
+
+def test_full_sync_after_interval(incremental_connection, ldap_directory):
+    users: Dict = {}
+    _sync(incremental_connection, users)
+
+    ldap_directory.delete("cn=bob,ou=users,dc=check-mk,dc=org")
+    state = store.load_object_from_file(incremental_connection._sync_state_file)
+    state["last_full_sync"] -= 86400
+    store.save_object_to_file(incremental_connection._sync_state_file, state)
+
+    assert _sync(incremental_connection, users) == [None]
+    assert sorted(users) == ["alice"]
+
+
+def test_full_sync_after_group_change(incremental_connection, ldap_directory):
+    users: Dict = {}
+    _sync(incremental_connection, users)
+
+    ldap_directory.delete("cn=bob,ou=users,dc=check-mk,dc=org")
+    ldap_directory.modify("cn=admins,ou=groups,dc=check-mk,dc=org", {
+        "member": [],
+    })
+    assert _sync(incremental_connection, users) == [None]
+    assert sorted(users) == ["alice"]
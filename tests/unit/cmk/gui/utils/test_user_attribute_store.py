@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=redefined-outer-name
+
+import pytest  # type: ignore[import]
+
+from cmk.gui.utils.user_attribute_store import UserAttributeStore
+
+
+@pytest.fixture()
+def profiles_dir(tmp_path):
+    profiles_dir = tmp_path / "web"
+    for user_id, files in [
+        ("harry", {
+            "serial.mk": "3\n",
+            "num_failed_logins.mk": "1\n",
+            "user_views.mk": "{}\n",
+        }),
+        ("automation", {
+            "automation.secret": "SECRET\n",
+            "session_info.mk": "",
+        }),
+        (".hidden", {
+            "serial.mk": "1\n",
+        }),
+    ]:
+        (profiles_dir / user_id).mkdir(parents=True)
+        for name, content in files.items():
+            (profiles_dir / user_id / name).write_text(content)
+    return profiles_dir
+
+
+@pytest.fixture()
+def attribute_store(profiles_dir, tmp_path):
+    return UserAttributeStore(profiles_dir, tmp_path / "user_attributes.sqlite")
+
+
+def test_filled_from_profile_files(attribute_store):
+    assert attribute_store.load_all() == {
+        "harry": {
+            "serial": "3\n",
+            "num_failed_logins": "1\n",
+        },
+        "automation": {
+            "automation_secret": "SECRET\n",
+        },
+    }
+    assert attribute_store.load("harry", "serial") == "3\n"
+    assert attribute_store.load("harry", "session_info") is None
+    assert attribute_store.load("sally", "serial") is None
+
+
+def test_update(attribute_store):
+    attribute_store.update({
+        "harry": {
+            "serial": "4\n",
+            "num_failed_logins": None,
+        },
+        "sally": {
+            "ui_theme": "modern-dark\n",
+        },
+    })
+    attribute_store.save("automation", "automation_secret", None)
+
+    assert attribute_store.load_all() == {
+        "harry": {
+            "serial": "4\n",
+        },
+        "sally": {
+            "ui_theme": "modern-dark\n",
+        },
+    }
+
+
+def test_invalidate(attribute_store, profiles_dir):
+    attribute_store.save("harry", "serial", "4\n")
+    (profiles_dir / "harry" / "serial.mk").write_text("5\n")
+    assert attribute_store.load("harry", "serial") == "4\n"
+
+    attribute_store.invalidate()
+    assert attribute_store.load("harry", "serial") == "5\n"
+    assert attribute_store.load("automation", "automation_secret") == "SECRET\n"
@@ -7,10 +7,12 @@
 import tarfile
 import io
 import logging
+import os
 from pathlib import Path
 
 import pytest  # type: ignore[import]
 
+import cmk.gui.config as config
 import cmk.gui.watolib.utils
 import cmk.utils.paths
 import cmk.utils.version as cmk_version
@@ -298,6 +300,73 @@ def test_get_config_sync_file_infos():
     }
 
 
+def test_get_config_sync_file_infos_with_manifest(monkeypatch):
+    base_dir = Path(cmk.utils.paths.omd_root) / "replication"
+    _create_get_config_sync_file_infos_test_config(base_dir)
+    for path in base_dir.glob("etc/**/*"):
+        os.utime(str(path), (1000, 1000))
+
+    replication_paths = [
+        ReplicationPath("dir", "d3-single-file", "etc/d3", []),
+        ReplicationPath("dir", "d4-multiple-files", "etc/d4", []),
+        ReplicationPath("dir", "links", "links", []),
+    ]
+    expected = activate_changes._get_config_sync_file_infos(replication_paths, base_dir)
+
+    manifest_path = Path(cmk.utils.paths.var_dir) / "wato" / "manifest.mk"
+    manifest = activate_changes.ConfigSyncManifest(manifest_path)
+    manifest.load()
+    assert activate_changes._get_config_sync_file_infos(replication_paths, base_dir,
+                                                        manifest) == expected
+    manifest.save()
+
+    hashed = []
+    orig_create_hash = activate_changes._create_config_sync_file_hash
+
+    def create_hash(file_path):
+        hashed.append(str(file_path.relative_to(base_dir)))
+        return orig_create_hash(file_path)
+
+    monkeypatch.setattr(activate_changes, "_create_config_sync_file_hash", create_hash)
+
+    # Only the changed file is hashed again
+    with base_dir.joinpath("etc/d4/x1").open("w", encoding="utf-8") as f:
+        f.write(u"Däng2")
+    os.utime(str(base_dir.joinpath("etc/d4/x1")), (2000, 2000))
+
+    manifest = activate_changes.ConfigSyncManifest(manifest_path)
+    manifest.load()
+    sync_infos = activate_changes._get_config_sync_file_infos(replication_paths, base_dir, manifest)
+    assert hashed == ["etc/d4/x1"]
+    assert sync_infos["etc/d4/x1"].file_hash == sync_infos["etc/d4/x2"].file_hash
+    assert {k: v for k, v in sync_infos.items() if k != "etc/d4/x1"
+           } == {k: v for k, v in expected.items() if k != "etc/d4/x1"}
+
+
+def test_clone_site_config_directories(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "wato_activate_changes_concurrency", ("maximum", 5))
+    site_ids = ["site%d" % index for index in range(12)]
+    site_snapshot_settings = {
+        site_id: activate_changes.SnapshotSettings(
+            snapshot_path=str(tmp_path / ("%s.tar.gz" % site_id)),
+            work_dir=str(tmp_path / site_id),
+            snapshot_components=[],
+            component_names=set(),
+            site_config={},
+            create_pre_17_snapshot=False,
+        ) for site_id in site_ids
+    }
+    origin_file = tmp_path / "site0" / "etc" / "file"
+    origin_file.parent.mkdir(parents=True)
+    origin_file.write_text(u"content")
+
+    data_collector = activate_changes.CRESnapshotDataCollector(site_snapshot_settings)
+    data_collector._clone_site_config_directories("site0", site_ids[1:])
+
+    for site_id in site_ids[1:]:
+        assert (tmp_path / site_id / "etc" / "file").stat().st_ino == origin_file.stat().st_ino
+
+
 def _create_get_config_sync_file_infos_test_config(base_dir):
     base_dir.joinpath("etc/d1").mkdir(parents=True, exist_ok=True)
 
@@ -639,6 +639,9 @@ def test_synchronize_site(mocked_responses, monkeypatch, edition_short, tmp_path
     site_activation._time_started = time.time()
     site_activation._synchronize_site()
 
+    assert {activate_changes.STEP_SYNC_STATE, activate_changes.STEP_SYNC_DIFF} <= set(
+        site_activation._durations)
+
 
 # This test does not perform the full synchronization. It executes the central site parts and mocks
 # the remote site HTTP calls
@@ -674,6 +677,7 @@ def test_synchronize_pre_17_site(monkeypatch, edition_short, tmp_path, mocker):
     site_activation._synchronize_site()
 
     get_url_mock.assert_called_once()
+    assert list(site_activation._durations) == [activate_changes.STEP_SYNC_TRANSFER]
     args, kwargs = get_url_mock.call_args
 
     assert args == (
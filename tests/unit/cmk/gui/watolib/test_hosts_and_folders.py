@@ -12,6 +12,7 @@ import pytest  # type: ignore[import]
 from cmk.gui.utils.script_helpers import application_and_request_context
 
 import cmk.gui.config as config
+from cmk.gui.exceptions import MKGeneralException
 import cmk.gui.watolib as watolib
 import cmk.gui.watolib.hosts_and_folders as hosts_and_folders
 from cmk.gui.watolib.search import MatchItem
@@ -401,6 +402,85 @@ def test_subfolder_creation():
     assert len(folder._subfolders) == 1
 
 
+def _create_hosts_in_new_folder(name):
+    folder = hosts_and_folders.Folder.root_folder().create_subfolder(name, name.title(), {})
+    with application_and_request_context():
+        folder.create_hosts([
+            ("host1", {
+                "alias": "Host 1"
+            }, None),
+            ("cluster1", {}, ["host1"]),
+        ])
+    hosts_and_folders.Folder.invalidate_caches()
+
+
+def test_load_hosts_without_executing_hosts_mk(monkeypatch):
+    _create_hosts_in_new_folder("exec")
+
+    def load_mk_file(*args, **kwargs):
+        raise AssertionError("hosts.mk is executed")
+
+    monkeypatch.setattr(hosts_and_folders.store, "load_mk_file", load_mk_file)
+    folder = hosts_and_folders.Folder.folder("exec")
+    assert sorted(folder.hosts()) == ["cluster1", "host1"]
+    assert folder.host("host1").attributes()["alias"] == "Host 1"
+    assert folder.host("cluster1").cluster_nodes() == ["host1"]
+    assert not folder.locked_hosts()
+
+
+def test_load_changed_hosts_mk():
+    _create_hosts_in_new_folder("changed")
+
+    hosts_file_path = hosts_and_folders.Folder.folder("changed").hosts_file_path()
+    with open(hosts_file_path, "a") as f:
+        f.write("\n_lock = True\n")
+    hosts_and_folders.Folder.invalidate_caches()
+
+    folder = hosts_and_folders.Folder.folder("changed")
+    assert sorted(folder.hosts()) == ["cluster1", "host1"]
+    assert folder.locked_hosts()
+
+
+def test_load_single_folder():
+    root = hosts_and_folders.Folder.root_folder()
+    root.create_subfolder("a", "A", {}).create_subfolder("x", "X", {})
+    root.create_subfolder("b", "B", {}).create_subfolder("y", "Y", {})
+    hosts_and_folders.Folder.invalidate_caches()
+
+    assert hosts_and_folders.Folder.folder("a/x").title() == "X"
+    # The folders below the other folders are loaded on demand
+    assert hosts_and_folders.Folder.root_folder().subfolder("b")._loaded_subfolders is None
+    assert sorted(hosts_and_folders.Folder.all_folders()) == ["", "a", "a/x", "b", "b/y"]
+
+    with pytest.raises(MKGeneralException):
+        hosts_and_folders.Folder.folder("a/y")
+
+
+def test_load_cached(tmp_path):
+    path = tmp_path / "file"
+    loaded = []
+
+    def load():
+        loaded.append(path.read_text())
+        return loaded[-1]
+
+    path.write_text("1")
+    os.utime(str(path), (1000, 1000))
+    assert hosts_and_folders._load_cached(str(path), load) == "1"
+    assert hosts_and_folders._load_cached(str(path), load) == "1"
+    assert loaded == ["1"]
+
+    path.write_text("2")
+    os.utime(str(path), (2000, 2000))
+    assert hosts_and_folders._load_cached(str(path), load) == "2"
+
+    # Recently changed files are not cached
+    path.write_text("3")
+    assert hosts_and_folders._load_cached(str(path), load) == "3"
+    assert hosts_and_folders._load_cached(str(path), load) == "3"
+    assert loaded == ["1", "2", "3", "3"]
+
+
 def test_match_item_generator_hosts():
     assert list(
         hosts_and_folders.MatchItemGeneratorHosts(
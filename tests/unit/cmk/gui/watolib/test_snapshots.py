@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import io
+import tarfile
+
+import cmk.utils.paths
+
+from cmk.gui.utils.user_attribute_store import user_attribute_store
+from cmk.gui.watolib.snapshots import extract_snapshot
+
+
+def _add_file(tar, name, content):
+    info = tarfile.TarInfo(name)
+    info.size = len(content)
+    tar.addfile(info, io.BytesIO(content))
+
+
+def test_extract_snapshot_invalidates_user_attribute_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(cmk.utils.paths, "var_dir", str(tmp_path))
+    profiles_dir = tmp_path / "web"
+    (profiles_dir / "harry").mkdir(parents=True)
+    (profiles_dir / "harry" / "serial.mk").write_text("3\n")
+    assert user_attribute_store().load("harry", "serial") == "3\n"
+
+    domain_buf = io.BytesIO()
+    with tarfile.open(fileobj=domain_buf, mode="w:gz") as domain_tar:
+        _add_file(domain_tar, "harry/serial.mk", b"4\n")
+
+    snapshot_buf = io.BytesIO()
+    with tarfile.open(fileobj=snapshot_buf, mode="w") as snapshot_tar:
+        _add_file(snapshot_tar, "authorization.tar.gz", domain_buf.getvalue())
+
+    snapshot_buf.seek(0)
+    with tarfile.open(fileobj=snapshot_buf, mode="r") as snapshot_tar:
+        extract_snapshot(snapshot_tar, {
+            "authorization": {
+                "title": "Users",
+                "prefix": str(profiles_dir),
+                "cleanup": False,
+            },
+        })
+
+    assert (profiles_dir / "harry" / "serial.mk").read_text() == "4\n"
+    assert user_attribute_store().load("harry", "serial") == "4\n"
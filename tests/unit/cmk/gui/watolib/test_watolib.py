@@ -83,6 +83,8 @@ def test_registered_configvars():
         'apache_process_tuning',
         'archive_orphans',
         'auth_by_http_header',
+        'availability_rollups',
+        'bi_compilation_processes',
         'builtin_icon_visibility',
         'bulk_discovery_default_settings',
         'check_mk_perfdata_with_times',
@@ -112,6 +114,8 @@ def test_registered_configvars():
         'inventory_check_autotrigger',
         'inventory_check_interval',
         'inventory_check_severity',
+        'inventory_index',
+        'livestatus_query_cache_ttl',
         'lock_on_logon_failures',
         'log_level',
         'log_levels',
@@ -125,10 +129,12 @@ def test_registered_configvars():
         'mkeventd_pprint_rules',
         'mkeventd_service_levels',
         'multisite_draw_ruleicon',
+        'nagios_checker_helper',
         'notification_backlog',
         'notification_bulk_interval',
         'notification_fallback_email',
         'notification_logging',
+        'notification_plugin_pool',
         'notification_plugin_timeout',
         'page_heading',
         'pagetitle_date_format',
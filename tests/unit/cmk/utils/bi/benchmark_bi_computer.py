@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Measure the computation time of a BI view with and without the state cache
+
+The sample BI pack is applied to generated hosts, no running site is needed. Between
+the requests, the states of CHANGED_PERCENT percent of the services change. Usage:
+
+    PYTHONPATH=$REPO:. benchmark_bi_computer.py [NUM_HOSTS] [CHANGED_PERCENT]
+"""
+
+import copy
+import random
+import sys
+import time
+
+from cmk.utils.bi.bi_computer import BIAggregationFilter, BIComputer, BIStateCache
+from cmk.utils.bi.bi_data_fetcher import BIStatusFetcher, BIStructureFetcher
+from cmk.utils.bi.bi_lib import SitesCallback
+from cmk.utils.bi.bi_packs import BIAggregationPacks
+from cmk.utils.bi.bi_searcher import BISearcher
+
+import bi_test_data.sample_config as sample_config
+
+NUM_REQUESTS = 5
+
+
+def _structure_and_status_rows(num_hosts):
+    structure = {}
+    status_rows = []
+    for index in range(num_hosts):
+        host_name = "host%05d" % index
+        host_structure = list(sample_config.bi_structure_states["heute"])
+        host_structure[-2:] = [host_name + "_alias", host_name]
+        structure[host_name] = tuple(host_structure)
+
+        row = copy.deepcopy(sample_config.bi_status_rows[0])
+        row[1] = host_name
+        status_rows.append(row)
+    return structure, status_rows
+
+
+def _change_states(status_rows, percent):
+    for row in status_rows:
+        for service in row[9]:
+            if random.random() * 100 < percent:
+                service[1] = service[4] = random.choice([0, 1, 2])
+
+
+def main(num_hosts, changed_percent):
+    random.seed(42)
+    sites_callback = SitesCallback(lambda: None, lambda: None)
+    bi_packs = BIAggregationPacks("")
+    bi_packs._load_config(sample_config.bi_packs_config)  # pylint: disable=protected-access
+
+    structure, status_rows = _structure_and_status_rows(num_hosts)
+    structure_fetcher = BIStructureFetcher(sites_callback)
+    structure_fetcher.add_site_data("heute", structure)
+    bi_searcher = BISearcher()
+    bi_searcher.set_hosts(structure_fetcher.hosts)
+    compiled_aggregations = {
+        aggregation.id: aggregation.compile(bi_searcher)
+        for aggregation in bi_packs.get_all_aggregations()
+    }
+    bi_aggregation_filter = BIAggregationFilter([], [], [], [], [], [])
+
+    for title, bi_state_cache in [("without cache", None), ("with cache", BIStateCache())]:
+        random.seed(42)
+        rows = copy.deepcopy(status_rows)
+        durations = []
+        for _request in range(NUM_REQUESTS):
+            # Each request creates new objects, like the GUI does
+            status_fetcher = BIStatusFetcher(sites_callback)
+            status_fetcher.states = status_fetcher.create_bi_status_data(rows)
+            computer = BIComputer(compiled_aggregations, status_fetcher, bi_state_cache)
+
+            start = time.time()
+            computer.compute_results(computer.get_required_aggregations(bi_aggregation_filter))
+            durations.append(time.time() - start)
+            _change_states(rows, changed_percent)
+
+        print("%-14s %6d hosts  first request %7.3f s  following requests %7.3f s" %
+              (title, num_hosts, durations[0], sum(durations[1:]) / (len(durations) - 1)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+            float(sys.argv[2]) if len(sys.argv) > 2 else 1.0))
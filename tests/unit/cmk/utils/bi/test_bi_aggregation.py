@@ -6,8 +6,11 @@
 
 # pylint: disable=redefined-outer-name
 
+import copy
+
 import pytest
 from cmk.utils.bi.bi_aggregation import BIAggregation
+from cmk.utils.bi.bi_computer import BIStateCache
 from cmk.utils.bi.bi_actions import BICallARuleAction
 import bi_test_data.sample_config as sample_config
 
@@ -64,3 +67,50 @@ def test_compute_aggregation(bi_packs_sample_config, bi_structure_fetcher, bi_se
     assert actual_result.acknowledged == expected_acknowledgment
     assert actual_result.downtime_state == expected_downtime_state
     assert actual_result.in_service_period == expected_service_period
+
+
+def _result_states(node_result_bundle):
+    return (node_result_bundle.actual_result,
+            [_result_states(bundle) for bundle in node_result_bundle.nested_results])
+
+
+def test_compute_aggregation_with_state_cache(bi_packs_sample_config, bi_structure_fetcher,
+                                              bi_searcher, bi_status_fetcher):
+    bi_structure_fetcher.add_site_data("heute", sample_config.bi_structure_states)
+    bi_searcher.set_hosts(bi_structure_fetcher.hosts)
+    bi_status_fetcher.states = bi_status_fetcher.create_bi_status_data(sample_config.bi_status_rows)
+    compiled_aggregation = bi_packs_sample_config.get_aggregation("default_aggregation").compile(
+        bi_searcher)
+    branches = compiled_aggregation.branches
+
+    bi_state_cache = BIStateCache()
+    bi_state_cache.set_compilation_time(1.0)
+
+    def compute():
+        bi_state_cache.computed_nodes = bi_state_cache.cached_nodes = 0
+        results = bi_state_cache.compute_branches(compiled_aggregation, branches, bi_status_fetcher)
+        expected = compiled_aggregation.compute_branches(branches, bi_status_fetcher)
+        assert [_result_states(r) for r in results] == [_result_states(r) for r in expected]
+        return results
+
+    first_results = compute()
+    num_nodes = bi_state_cache.computed_nodes
+    assert num_nodes > 0
+
+    # Nothing changed: The results of the branches are taken from the cache
+    assert compute() == first_results
+    assert bi_state_cache.computed_nodes == 0
+
+    # A changed service: Only the leaf and the rules above it are computed again
+    status_rows = copy.deepcopy(sample_config.bi_status_rows)
+    status_rows[0][9][0][1] = 2  # Check_MK Discovery: CRIT
+    bi_status_fetcher.states = bi_status_fetcher.create_bi_status_data(status_rows)
+    results = compute()
+    assert results[0].actual_result.state == 2
+    assert 0 < bi_state_cache.computed_nodes < num_nodes
+    assert bi_state_cache.cached_nodes > 0
+
+    # A new compilation clears the cache
+    bi_state_cache.set_compilation_time(2.0)
+    compute()
+    assert bi_state_cache.computed_nodes == num_nodes
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=redefined-outer-name,protected-access
+
+import pytest
+
+import cmk.utils.paths
+import cmk.utils.bi.bi_compiler as bi_compiler
+from cmk.utils.bi.bi_aggregation import BIAggregation
+from cmk.utils.bi.bi_compiler import BICompiler
+from cmk.utils.bi.bi_lib import SitesCallback
+
+
+@pytest.fixture
+def aggregations(bi_packs_sample_config):
+    default_aggregation = bi_packs_sample_config.get_aggregation("default_aggregation")
+    aggregations = []
+    for index in range(5):
+        aggregation_config = BIAggregation.schema()().dump(default_aggregation)
+        aggregation_config["id"] = "aggr%d" % (4 - index)
+        aggregations.append(BIAggregation(aggregation_config))
+    return aggregations
+
+
+@pytest.mark.parametrize("num_processes", [1, 3])
+def test_compile_aggregations(monkeypatch, tmp_path, bi_searcher_with_sample_config, aggregations,
+                              num_processes):
+    monkeypatch.setattr(cmk.utils.paths, "tmp_dir", str(tmp_path))
+    monkeypatch.setattr(bi_compiler.os, "cpu_count", lambda: 4)
+    monkeypatch.setattr(bi_compiler, "_MIN_AGGREGATIONS_PER_PROCESS", 1)
+    compiler = BICompiler("", SitesCallback(lambda: None, lambda: None), num_processes)
+    compiler.bi_searcher = bi_searcher_with_sample_config
+
+    compiled_aggregations = compiler._compile_aggregations(aggregations)
+
+    # Keeps the order of the configuration, whatever process finished first
+    assert list(compiled_aggregations) == ["aggr4", "aggr3", "aggr2", "aggr1", "aggr0"]
+    expected = aggregations[0].compile(bi_searcher_with_sample_config).serialize()
+    for aggr_id, compiled_aggregation in compiled_aggregations.items():
+        assert compiled_aggregation.serialize() == dict(expected, id=aggr_id)
+
+    compilation_times = compiler.get_compilation_times()
+    assert sorted(compilation_times) == ["aggr0", "aggr1", "aggr2", "aggr3", "aggr4"]
+    assert list(compilation_times.values()) == sorted(compilation_times.values(), reverse=True)
+
+
+@pytest.mark.parametrize("num_processes, cpu_count, expected", [
+    (1, 8, 1),
+    (4, 8, 4),
+    (16, 2, 2),
+    (4, None, 1),
+])
+def test_num_processes_limited_by_cpus(monkeypatch, tmp_path, num_processes, cpu_count, expected):
+    monkeypatch.setattr(cmk.utils.paths, "tmp_dir", str(tmp_path))
+    monkeypatch.setattr(bi_compiler.os, "cpu_count", lambda: cpu_count)
+    compiler = BICompiler("", SitesCallback(lambda: None, lambda: None), num_processes)
+    assert compiler._num_processes == expected
+
+
+def test_compile_few_aggregations_serially(monkeypatch, tmp_path, bi_searcher_with_sample_config,
+                                           aggregations):
+    monkeypatch.setattr(cmk.utils.paths, "tmp_dir", str(tmp_path))
+    monkeypatch.setattr(bi_compiler.os, "cpu_count", lambda: 4)
+    compiler = BICompiler("", SitesCallback(lambda: None, lambda: None), 4)
+    compiler.bi_searcher = bi_searcher_with_sample_config
+
+    def _compile_in_processes(*args):
+        raise AssertionError("Must not fork for %d aggregations" % len(aggregations))
+
+    monkeypatch.setattr(compiler, "_compile_in_processes", _compile_in_processes)
+
+    assert list(compiler._compile_aggregations(aggregations)) == [
+        "aggr4", "aggr3", "aggr2", "aggr1", "aggr0"
+    ]
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import copy
+import random
+from pathlib import Path
+
+import pytest  # type: ignore[import]
+
+import cmk.utils.inventory_archive as inventory_archive
+import cmk.utils.store as store
+from cmk.utils.inventory_archive import (
+    apply_raw_delta,
+    diff_raw_trees,
+    InventoryArchive,
+    restrict_to_delta,
+)
+from cmk.utils.structured_data import StructuredDataTree
+
+TREE_TEST_DATA = Path(__file__).parent / "structured_data" / "tree_test_data"
+
+TREE_PAIRS = [
+    ("tree_old_addresses_arrays_memory", "tree_new_addresses_arrays_memory"),
+    ("tree_old_addresses", "tree_new_addresses"),
+    ("tree_old_arrays", "tree_new_arrays"),
+    ("tree_old_interfaces", "tree_new_interfaces"),
+    ("tree_old_memory", "tree_new_memory"),
+    ("tree_old_heute", "tree_new_heute"),
+    ("tree_addresses_ordered", "tree_addresses_unordered"),
+    ("tree_inv", "tree_status"),
+]
+
+
+def _load(name):
+    return store.load_object_from_file(TREE_TEST_DATA / name)
+
+
+def _software_tree(num_packages):
+    return {
+        "hardware": {
+            "cpu": {
+                "cores": 4,
+                "model": "Intel"
+            },
+            "memory": {
+                "total_ram_usable": 16 * 1024**3
+            },
+        },
+        "software": {
+            "os": {
+                "name": "Debian",
+                "version": "10"
+            },
+            "packages": [{
+                "name": "package%d" % index,
+                "version": "1.%d" % index,
+            } for index in range(num_packages)],
+        },
+    }
+
+
+def _change(raw_tree, rnd):
+    """A new version of the tree: Some packages are updated, added and removed"""
+    raw_tree = copy.deepcopy(raw_tree)
+    packages = raw_tree["software"]["packages"]
+    for _change_nr in range(rnd.randint(1, 5)):
+        index = rnd.randrange(len(packages))
+        action = rnd.choice(["update", "add", "remove"])
+        if action == "update":
+            packages[index]["version"] += ".1"
+        elif action == "add":
+            packages.insert(index, {"name": "new%d" % rnd.randint(0, 10**6), "version": "1.0"})
+        else:
+            del packages[index]
+    if rnd.random() < 0.2:
+        raw_tree["hardware"]["cpu"]["cores"] += 1
+    if rnd.random() < 0.1:
+        raw_tree["hardware"].pop("memory", None)
+    return raw_tree
+
+
+@pytest.mark.parametrize("old_name, new_name", TREE_PAIRS)
+def test_apply_raw_delta(old_name, new_name):
+    old, new = _load(old_name), _load(new_name)
+    for source, target in [(old, new), (new, old), (old, old)]:
+        original_source = copy.deepcopy(source)
+        result = apply_raw_delta(source, diff_raw_trees(source, target))
+        assert result == target
+        assert repr(result) == repr(target)
+        assert source == original_source
+
+
+def test_delta_is_compact():
+    rnd = random.Random(42)
+    tree = _software_tree(2000)
+    changed_tree = _change(tree, rnd)
+    assert len(repr(diff_raw_trees(changed_tree, tree))) < len(repr(tree)) / 50
+
+
+@pytest.mark.parametrize("old_name, new_name", TREE_PAIRS)
+def test_restricted_trees_have_same_delta(old_name, new_name):
+    old, new = _load(old_name), _load(new_name)
+    delta = diff_raw_trees(new, old)
+
+    expected = StructuredDataTree().create_tree_from_raw_tree(new).compare_with(
+        StructuredDataTree().create_tree_from_raw_tree(old))
+    result = StructuredDataTree().create_tree_from_raw_tree(restrict_to_delta(
+        new, delta)).compare_with(StructuredDataTree().create_tree_from_raw_tree(
+            restrict_to_delta(old, delta)))
+
+    assert result[:3] == expected[:3]
+    assert result[3].get_raw_tree() == expected[3].get_raw_tree()
+
+
+def _fill_archive(archive_dir, num_versions):
+    """Archive the versions like the inventory does, returns them by timestamp"""
+    rnd = random.Random(4711)
+    versions = {}
+    current = _software_tree(200)
+    for index in range(num_versions):
+        new = _change(current, rnd)
+        timestamp = "%d" % (1600000000 + index * 3600)
+        InventoryArchive(archive_dir).archive(timestamp, current, new)
+        versions[timestamp] = current
+        current = new
+    return versions, current
+
+
+def test_archive_reconstructs_trees(tmp_path):
+    versions, current = _fill_archive(tmp_path, 45)
+    archive = InventoryArchive(tmp_path)
+    assert archive.timestamps() == sorted(versions)
+
+    full_trees = [
+        timestamp for timestamp in archive.timestamps()
+        if isinstance(store.load_object_from_file(tmp_path / timestamp), dict)
+    ]
+    assert len(full_trees) == 2
+
+    newer_tree = current
+    for timestamp, raw_tree, delta in archive.iter_trees(lambda: current):
+        assert raw_tree == versions[timestamp]
+        if timestamp in full_trees:
+            assert delta is None
+        else:
+            assert apply_raw_delta(newer_tree, delta) == raw_tree
+        newer_tree = raw_tree
+
+
+def test_archive_starts_at_nearest_whole_tree(tmp_path):
+    versions, _current = _fill_archive(tmp_path, 30)
+    timestamps = sorted(versions)
+
+    def load_current_raw_tree():
+        raise AssertionError("The current tree is not needed")
+
+    archive = InventoryArchive(tmp_path)
+    trees = list(archive.iter_trees(load_current_raw_tree, newest=timestamps[3]))
+    assert len(trees) == inventory_archive.REBASE_INTERVAL
+    assert [(timestamp, raw_tree) for timestamp, raw_tree, _delta in trees
+           ] == [(timestamp, versions[timestamp]) for timestamp in reversed(timestamps[:20])]
+
+
+def test_archive_with_whole_trees_of_former_versions(tmp_path):
+    rnd = random.Random(1)
+    old = _software_tree(50)
+    store.save_object_to_file(tmp_path / "1500000000", old)
+    current = _change(old, rnd)
+
+    new = _change(current, rnd)
+    InventoryArchive(tmp_path).archive("1500003600", current, new)
+
+    assert [(timestamp, raw_tree)
+            for timestamp, raw_tree, _delta in InventoryArchive(tmp_path).iter_trees(lambda: new)
+           ] == [("1500003600", current), ("1500000000", old)]
+
+
+def test_archive_with_broken_file(tmp_path):
+    versions, current = _fill_archive(tmp_path, 5)
+    timestamps = sorted(versions)
+    store.save_text_to_file(tmp_path / timestamps[2], "(broken")
+
+    trees = {
+        timestamp: raw_tree
+        for timestamp, raw_tree, _delta in InventoryArchive(tmp_path).iter_trees(lambda: current)
+    }
+    assert trees == {
+        timestamps[4]: versions[timestamps[4]],
+        timestamps[3]: versions[timestamps[3]],
+        timestamps[2]: None,
+        timestamps[1]: None,
+        timestamps[0]: None,
+    }
+
+
+def test_store_newest_tree(tmp_path):
+    versions, current = _fill_archive(tmp_path, 3)
+    archive = InventoryArchive(tmp_path)
+    archive.store_newest_tree(current)
+
+    newest = archive.timestamps()[-1]
+    assert store.load_object_from_file(tmp_path / newest) == versions[newest]
+    assert [raw_tree for _timestamp, raw_tree, _delta in archive.iter_trees(lambda: None)
+           ] == [versions[timestamp] for timestamp in sorted(versions, reverse=True)]
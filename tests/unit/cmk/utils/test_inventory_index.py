@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=redefined-outer-name
+
+import pytest  # type: ignore[import]
+
+from cmk.utils.inventory_index import Condition, index_path_of, InventoryIndex
+
+
+def _raw_tree(packages, cores=2):
+    return {
+        "hardware": {
+            "cpu": {
+                "cores": cores,
+                "model": "Intel",
+            },
+        },
+        "software": {
+            "packages": packages,
+        },
+    }
+
+
+def _packages(*specs):
+    return [{"name": name, "version": version, "size": size} for name, version, size in specs]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = InventoryIndex(tmp_path / "inventory_index.sqlite")
+    index.update_host(
+        "host1", _raw_tree(_packages(("bash", "5.0", 10), ("vim", "8.1", 30), ("zsh", "5.8", 20))),
+        1000)
+    index.update_host("host2", _raw_tree(_packages(("vim", "8.2", 25), ("git", "2.20", 5)), 8),
+                      2000)
+    return index
+
+
+def test_index_path_of():
+    assert index_path_of(["software", "packages"]) == "software.packages"
+    assert index_path_of(["networking", "interfaces", 0]) == "networking.interfaces.0"
+
+
+def test_table_rows(index):
+    assert index.mtimes() == {"host1": 1000, "host2": 2000}
+    assert index.table_rows("software.packages", ["host2", "host1", "unknown"]) == {
+        "host1": _packages(("bash", "5.0", 10), ("vim", "8.1", 30), ("zsh", "5.8", 20)),
+        "host2": _packages(("vim", "8.2", 25), ("git", "2.20", 5)),
+    }
+    assert index.table_rows("software.packages", ["host2"]) == {
+        "host2": _packages(("vim", "8.2", 25), ("git", "2.20", 5)),
+    }
+    assert index.table_rows("software.unknown", ["host1", "host2"]) == {}
+
+
+def test_attributes(index):
+    assert index.attributes("hardware.cpu", ["host1", "host2"]) == {
+        "host1": {
+            "cores": 2,
+            "model": "Intel"
+        },
+        "host2": {
+            "cores": 8,
+            "model": "Intel"
+        },
+    }
+
+
+def test_table_rows_with_conditions(index):
+    assert index.table_rows("software.packages", ["host1", "host2"],
+                            [Condition("name", "~~", "VI")]) == {
+                                "host1": _packages(("vim", "8.1", 30)),
+                                "host2": _packages(("vim", "8.2", 25)),
+                            }
+    assert index.table_rows("software.packages", ["host1", "host2"], [
+        Condition("size", ">=", 10),
+        Condition("size", "<=", 25),
+    ]) == {
+        "host1": _packages(("bash", "5.0", 10), ("zsh", "5.8", 20)),
+        "host2": _packages(("vim", "8.2", 25)),
+    }
+    with pytest.raises(ValueError):
+        index.table_rows("software.packages", ["host1"], [Condition("size", "!=", 10)])
+
+
+def test_table_rows_with_order_and_limit(index):
+    hosts = ["host2", "host1"]
+
+    def _names(rows_by_host):
+        return {host: [row["name"] for row in rows] for host, rows in rows_by_host.items()}
+
+    assert _names(index.table_rows("software.packages", hosts, limit=3)) == {
+        "host2": ["vim", "git"],
+        "host1": ["bash"],
+    }
+    assert _names(index.table_rows("software.packages", hosts, order_by=("size", True),
+                                   limit=2)) == {
+                                       "host1": ["vim"],
+                                       "host2": ["vim"],
+                                   }
+    assert _names(index.table_rows("software.packages", hosts, order_by=("name", False),
+                                   limit=2)) == {
+                                       "host1": ["bash"],
+                                       "host2": ["git"],
+                                   }
+
+
+def test_update_and_remove_host(index):
+    index.update_host("host1", _raw_tree(_packages(("fish", "3.0", 1))), 3000)
+    assert index.mtimes() == {"host1": 3000, "host2": 2000}
+    assert index.table_rows("software.packages", ["host1"]) == {
+        "host1": _packages(("fish", "3.0", 1)),
+    }
+
+    index.remove_host("host1")
+    assert index.mtimes() == {"host2": 2000}
+    assert index.table_rows("software.packages", ["host1"]) == {}
+    assert index.attributes("hardware.cpu", ["host1"]) == {}
@@ -9,6 +9,8 @@
 import errno
 import socket
 import ssl
+import threading
+import time
 from contextlib import closing
 
 import pytest  # type: ignore[import]
@@ -212,3 +214,215 @@ def test_local_connection(mock_livestatus):
     live.expect_query("GET status\nColumns: program_start\nColumnHeaders: off")
     with mock_livestatus(expect_status_query=False):
         livestatus.LocalConnection().query_value("GET status\nColumns: program_start")
+
+
+def _serve_livestatus(sock_path, response, delay=0.0, code=200):
+    server = socket.socket(socket.AF_UNIX)
+    server.bind("%s" % sock_path)
+    server.listen(1)
+
+    def serve():
+        conn = server.accept()[0]
+        with closing(conn), closing(server):
+            request = b""
+            while not request.endswith(b"\n\n"):
+                request += conn.recv(4096)
+            time.sleep(delay)
+            data = (repr(response) if code == 200 else response).encode("utf-8")
+            conn.sendall(b"%d %11d\n" % (code, len(data)) + data)
+            conn.recv(1)  # Wait for the client to close the connection
+
+    thread = threading.Thread(target=serve)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def test_multisite_query_parallel_receives_concurrently(tmp_path):
+    sites = {}
+    for index, delay in enumerate([0.5, 0.5, 0.0]):
+        site_id = "site%d" % index
+        sock_path = tmp_path / site_id
+        _serve_livestatus(sock_path, [[site_id, "x" * 100000]], delay)
+        sites[site_id] = {"socket": "unix:%s" % sock_path}
+
+    live = livestatus.MultiSiteConnection(sites)
+    live.set_prepend_site(True)
+
+    before = time.time()
+    result = live.query("GET hosts\nColumns: name")
+    duration = time.time() - before
+
+    assert sorted(row[:2] for row in result) == [
+        ["site0", "site0"],
+        ["site1", "site1"],
+        ["site2", "site2"],
+    ]
+    assert duration < 1.0
+    assert live.dead_sites() == {}
+    assert sorted(live.response_times()) == ["site0", "site1", "site2"]
+    assert live.response_times()["site2"] < live.response_times()["site0"]
+
+
+def test_multisite_query_parallel_timeout(tmp_path):
+    sites = {}
+    for site_id, delay in [("fast", 0.0), ("slow", 2.0)]:
+        sock_path = tmp_path / site_id
+        _serve_livestatus(sock_path, [[site_id]], delay)
+        sites[site_id] = {"socket": "unix:%s" % sock_path}
+    sites["slow"]["query_timeout"] = 0.2
+
+    live = livestatus.MultiSiteConnection(sites)
+    assert live.query("GET hosts\nColumns: name") == [["fast"]]
+    assert live.alive_sites() == ["fast"]
+    assert list(live.dead_sites()) == ["slow"]
+    assert "Timeout" in str(live.dead_sites()["slow"]["exception"])
+
+
+@pytest.mark.parametrize("output_format, data", [
+    ("python3", b"[[u'heute', 1, 2.5, None, [u'a'], {u'k': u'v'}]]\n"),
+    ("json", b'[["heute",1,2.5,null,["a"],{"k":"v"}]]\n'),
+])
+def test_parse_response_output_formats(output_format, data):
+    live = livestatus.SingleSiteConnection("unix:/tmp/xyz")
+    live.set_output_format(output_format)
+    assert live.build_query(livestatus.Query("GET hosts"), "").splitlines()[2] == \
+        "OutputFormat: %s" % output_format
+    assert live.parse_response(b"200 %11d\n" % len(data), data, ()) == [
+        ["heute", 1, 2.5, None, ["a"], {
+            "k": "v"
+        }],
+    ]
+
+
+def test_parse_response_malformed_json():
+    live = livestatus.SingleSiteConnection("unix:/tmp/xyz")
+    live.set_output_format("json")
+    with pytest.raises(livestatus.MKLivestatusSocketError, match="Malformed output"):
+        live.parse_response(b"200           3\n", b"[[\n", ())
+
+
+def test_set_output_format_unsupported():
+    with pytest.raises(livestatus.MKLivestatusConfigError):
+        livestatus.SingleSiteConnection("unix:/tmp/xyz").set_output_format("csv")
+
+
+def _serve_keepalive(sock_path, queries):
+    """Answer all queries of a single connection with the number of the query"""
+    server = socket.socket(socket.AF_UNIX)
+    server.bind("%s" % sock_path)
+    server.listen(1)
+
+    def serve():
+        conn = server.accept()[0]
+        with closing(conn), closing(server):
+            buf = b""
+            while True:
+                while b"\n\n" not in buf:
+                    packet = conn.recv(4096)
+                    if not packet:
+                        return
+                    buf += packet
+                query, buf = buf.split(b"\n\n", 1)
+                if query.startswith(b"COMMAND "):
+                    continue
+                queries.append(query)
+                data = repr([[len(queries)]]).encode("utf-8")
+                conn.sendall(b"200 %11d\n" % len(data) + data)
+
+    thread = threading.Thread(target=serve)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def test_persistent_connection_is_reused_after_release(tmp_path, monkeypatch):
+    monkeypatch.setattr(livestatus, "persistent_connections", {})
+    monkeypatch.setattr(livestatus, "persistent_connection_stats", {})
+    sock_path = tmp_path / "live"
+    queries = []
+    _serve_keepalive(sock_path, queries)
+    sites = {"heute": {"socket": "unix:%s" % sock_path, "persist": True}}
+
+    for number in [1, 2]:
+        live = livestatus.MultiSiteConnection(sites)
+        assert live.query("GET hosts\nColumns: name") == [[number]]
+        live.release()
+
+    assert len(queries) == 2
+    assert livestatus.persistent_connection_stats == {
+        "unix:%s" % sock_path: {
+            "created": 1,
+            "reused": 1,
+        },
+    }
+
+
+def test_release_drops_connection_with_pending_response(tmp_path, monkeypatch):
+    monkeypatch.setattr(livestatus, "persistent_connections", {})
+    sock_path = tmp_path / "live"
+    _serve_keepalive(sock_path, [])
+
+    live = livestatus.SingleSiteConnection("unix:%s" % sock_path, persist=True)
+    live.send_query("GET hosts")
+    live.release()
+    assert livestatus.persistent_connections == {}
+
+
+def test_query_cache(tmp_path):
+    sock_path = tmp_path / "live"
+    queries = []
+    _serve_keepalive(sock_path, queries)
+
+    live = livestatus.MultiSiteConnection({"heute": {"socket": "unix:%s" % sock_path}})
+    query_cache = livestatus.QueryCache(ttl=60)
+    live.set_query_cache(query_cache)
+    live.set_prepend_site(True)
+
+    assert live.query("GET hosts\nColumns: name") == [["heute", 1]]
+    assert live.query("GET hosts\nColumns: name") == [["heute", 1]]
+    assert live.query("GET services\nColumns: host_name") == [["heute", 2]]
+    assert len(queries) == 2
+
+    live.set_auth_user("read", "harry")
+    live.set_auth_domain("read")
+    assert live.query("GET hosts\nColumns: name") == [["heute", 3]]
+
+    live.command("[123] DISABLE_NOTIFICATIONS", "heute")
+    assert live.query("GET hosts\nColumns: name") == [["heute", 4]]
+
+    assert query_cache.statistics() == {
+        "entries": 1,
+        "hits": 1,
+        "misses": 4,
+        "hit_rate": 0.2,
+    }
+
+
+def test_query_cache_expires(monkeypatch):
+    query_cache = livestatus.QueryCache(ttl=2)
+    connection = livestatus.SingleSiteConnection("unix:/tmp/xyz")
+    key = livestatus.QueryCache.key("heute", connection, "GET hosts")
+
+    monkeypatch.setattr(time, "time", lambda: 1000.0)
+    query_cache.put(key, [["a"]])
+    assert query_cache.get(key) == [["a"]]
+
+    monkeypatch.setattr(time, "time", lambda: 1003.0)
+    assert query_cache.get(key) is None
+
+
+def test_multisite_query_parallel_suppressed_exception(tmp_path):
+    sites = {}
+    for site_id, code, response in [("good", 200, [["good"]]),
+                                    ("old", 404, "Invalid GET request, no such table")]:
+        sock_path = tmp_path / site_id
+        _serve_livestatus(sock_path, response, code=code)
+        sites[site_id] = {"socket": "unix:%s" % sock_path}
+
+    live = livestatus.MultiSiteConnection(sites)
+    query = livestatus.Query("GET hosts\nColumns: name",
+                             suppress_exceptions=(livestatus.MKLivestatusTableNotFoundError,))
+    assert live.query(query) == [["good"]]
+    assert sorted(live.alive_sites()) == ["good", "old"]
+    assert live.dead_sites() == {}